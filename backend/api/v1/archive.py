@@ -0,0 +1,83 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Optional
+from datetime import datetime, timedelta
+import asyncio
+from ...core.datetimes import to_naive_utc
+from ...core.pagination import MAX_PAGE_SIZE
+from ...models.user import User
+from ...services.principals import Principal
+from ...services.retention import retention_engine, archive_store, ArchiveQueryError, TABLES
+from .auth import get_current_user
+from .users import USER_MANAGE
+
+router = APIRouter()
+
+def scope_to_user(table: str, filters: dict, current_user: Principal):
+    """没有 user:manage 权限时只能查询自己的用户活动，归档的通知日志不可读"""
+    if current_user.has_permissions(USER_MANAGE):
+        return
+    if table == "notification_logs":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    if table == "user_activities":
+        if filters.get("userId", current_user.id) != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        filters["userId"] = current_user.id
+
+@router.get("/")
+async def get_archive_summary(
+    current_user: User = Depends(get_current_user)
+):
+    """获取保留策略、归档进度以及各表已归档的日期范围与大小"""
+    tables = await asyncio.to_thread(lambda: {name: archive_store.summary(name) for name in TABLES})
+    return {**retention_engine.report(), "tables": tables}
+
+@router.get("/{table}")
+async def query_archive(
+    table: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    filter: List[str] = Query([], description="column=value, repeatable"),
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: Principal = Depends(get_current_user)
+):
+    """只读查询已归档的行 (按时间范围与列值过滤，游标分页)"""
+    if table not in TABLES:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"table must be one of {list(TABLES)}"
+        )
+    archived, time_column = TABLES[table]
+    filters = {}
+    for item in filter:
+        column, separator, value = item.partition("=")
+        if not separator or column not in archived.c:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"filter must be column=value with a column of {table}"
+            )
+        filters[column] = value
+    scope_to_user(table, filters, current_user)
+    end = to_naive_utc(end) or datetime.utcnow()
+    start = to_naive_utc(start) or end - timedelta(days=1)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    try:
+        return await asyncio.to_thread(
+            archive_store.query, table, time_column, start, end, filters, cursor, limit
+        )
+    except ArchiveQueryError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
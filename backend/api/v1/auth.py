@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
-from backend.core.database import get_db
-from backend.core.security import verify_password, get_password_hash, create_access_token, verify_token
+from backend.core.database import get_async_db
+from backend.core.security import create_access_token, password_hasher, PasswordHasherBusyError
 from backend.core.config import settings
 from backend.models.user import User
+from backend.services.principals import principal_cache, Principal, InvalidCredentialsError
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -21,17 +23,60 @@ class Token(BaseModel):
     token_type: str
 
 @router.post("/login", response_model=Token)
-async def login(user_login: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == user_login.username).first()
-    if not user or not verify_password(user_login.password, user.hashed_password):
+async def login(user_login: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    # Users sign in with their email
+    user = await db.scalar(select(User).where(User.email == user_login.username))
+    try:
+        valid, new_hash = await password_hasher.verify(user_login.password, user.password if user else None)
+    except PasswordHasherBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many logins in progress, retry later",
+            headers={"Retry-After": "1"},
+        )
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored with outdated bcrypt parameters, upgrade while the plain password is at hand
+        user.password = new_hash
+        await db.commit()
 
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.email}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
+    """按令牌签名取缓存的用户与权限，未命中时才解码 JWT 并查询数据库"""
+    try:
+        return await principal_cache.resolve(credentials.credentials, db)
+    except InvalidCredentialsError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+def require_permissions(*codes: str):
+    """路由依赖：当前用户须拥有全部给定的权限代码"""
+    async def check(current_user: Principal = Depends(get_current_user)) -> Principal:
+        if not current_user.has_permissions(*codes):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        return current_user
+    return check
+
+@router.get("/cache")
+async def get_auth_cache_stats(current_user: Principal = Depends(require_permissions("system:monitor"))):
+    """获取认证缓存统计"""
+    return principal_cache.report()
@@ -1,9 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
-from ...core.database import get_db
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
+from datetime import datetime, timedelta
+import asyncio
+from ...core.database import get_async_db
+from ...core.datetimes import to_naive_utc
+from ...core.pagination import Page
+from ...models.node import NodeStatus, NodeHealth
+from ...models.stats import ExecutionStat
 from ...models.user import User
+from ...repositories import NodeRepository
+from ...services.dispatcher import task_dispatcher
+from ...services.script_cache import script_cache
+from ...services.environments import environment_manager
+from ...services.warm_pool import warm_pool
+from ...services.failure_detector import failure_detector
+from ...services.leader import leader_election
+from ...services.execution_stats import summarize
+from ...services.metrics import metric_store, RESOLUTIONS
+from ...services.fleet_metrics import fleet_metrics, AGGREGATE_METRICS, GROUP_BY
+from ...services.heartbeats import (
+    heartbeat_ingestor, IngestBackpressureError, sample_error, DEFAULT_FIELDS, METRIC_FIELDS, REQUIRED_FIELDS
+)
 from .auth import get_current_user
 from pydantic import BaseModel
 
@@ -13,148 +31,317 @@ class NodeCreate(BaseModel):
     name: str
     host: str
     port: int
-    node_type: str = "worker"
-    status: str = "active"
+    description: Optional[str] = None
+    status: NodeStatus = NodeStatus.ONLINE
+    maxConcurrentTasks: int = 1
+    cpuCores: Optional[int] = None
+    memoryGB: Optional[int] = None
+    diskGB: Optional[int] = None
+    osType: Optional[str] = None
+    osVersion: Optional[str] = None
+    pythonVersion: Optional[str] = None
+    tags: Optional[str] = None
 
 class NodeUpdate(BaseModel):
     name: Optional[str] = None
     host: Optional[str] = None
     port: Optional[int] = None
-    node_type: Optional[str] = None
-    status: Optional[str] = None
+    description: Optional[str] = None
+    status: Optional[NodeStatus] = None
+    isAvailable: Optional[bool] = None
+    maxConcurrentTasks: Optional[int] = None
+    cpuCores: Optional[int] = None
+    memoryGB: Optional[int] = None
+    diskGB: Optional[int] = None
+    osType: Optional[str] = None
+    osVersion: Optional[str] = None
+    pythonVersion: Optional[str] = None
+    tags: Optional[str] = None
 
 class NodeResponse(BaseModel):
-    id: int
+    id: str
     name: str
     host: str
     port: int
-    node_type: str
-    status: str
-    created_at: datetime
-    updated_at: datetime
+    description: Optional[str]
+    status: NodeStatus
+    health: NodeHealth
+    isAvailable: bool
+    maxConcurrentTasks: int
+    currentTaskCount: int
+    cpuCores: Optional[int]
+    memoryGB: Optional[int]
+    tags: Optional[str]
+    lastHeartbeat: Optional[datetime]
+    createdAt: datetime
+    updatedAt: datetime
 
     class Config:
         from_attributes = True
 
-# Simple in-memory node storage (in production, use a proper database model)
-nodes_db = []
+class NodeReport(BaseModel):
+    nodeId: str
+    # Each sample is [timestamp (epoch seconds or null), *values in HeartbeatBatch.fields order]
+    samples: List[List[Union[float, str, None]]] = []
 
-@router.get("/", response_model=List[NodeResponse])
+class HeartbeatBatch(BaseModel):
+    fields: List[str] = list(DEFAULT_FIELDS)
+    reports: List[NodeReport]
+
+async def get_node_or_404(node_id: str, repo: NodeRepository):
+    node = await repo.get(node_id)
+    if not node:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Node not found"
+        )
+    return node
+
+@router.get("/", response_model=Page[NodeResponse])
 async def get_nodes(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    status: Optional[NodeStatus] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取节点列表"""
-    # Filter nodes if status is provided
-    if status:
-        filtered_nodes = [node for node in nodes_db if node.get("status") == status]
-    else:
-        filtered_nodes = nodes_db
-    
-    return filtered_nodes[skip:skip + limit]
+    return await NodeRepository(db).list_nodes(status=status, cursor=cursor, limit=limit)
+
+@router.get("/local/script-cache")
+async def get_script_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """获取本节点脚本缓存统计"""
+    return script_cache.report()
+
+@router.get("/local/environments")
+async def get_environment_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """获取本节点运行环境池统计 (构建耗时与运行耗时)"""
+    return environment_manager.report()
+
+@router.get("/local/warm-pool")
+async def get_warm_pool_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """获取本节点预热 Python worker 池状态"""
+    return warm_pool.report()
+
+@router.post("/heartbeats", status_code=status.HTTP_202_ACCEPTED)
+async def report_heartbeats(
+    batch: HeartbeatBatch,
+    current_user: User = Depends(get_current_user)
+):
+    """上报节点心跳与指标，写入缓冲区后批量落库"""
+    unknown = [name for name in batch.fields if name not in METRIC_FIELDS]
+    if unknown or not REQUIRED_FIELDS.issubset(batch.fields):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"fields must include {sorted(REQUIRED_FIELDS)} and only use {list(METRIC_FIELDS)}"
+        )
+    # Everything is checked before anything is buffered, so a rejected batch can be resent whole
+    errors = [
+        {"index": index, "nodeId": report.nodeId, "sample": position, "error": error}
+        for index, report in enumerate(batch.reports)
+        for position, sample in enumerate(report.samples)
+        for error in [sample_error(batch.fields, sample)] if error
+    ]
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=errors
+        )
+    accepted = 0
+    try:
+        heartbeat_ingestor.reserve(sum(len(report.samples) for report in batch.reports))
+        for report in batch.reports:
+            heartbeat_ingestor.submit(report.nodeId, batch.fields, report.samples)
+            accepted += len(report.samples)
+    except IngestBackpressureError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, int(heartbeat_ingestor.flush_interval)))}
+        )
+    return {"accepted": accepted}
+
+@router.get("/local/heartbeats")
+async def get_heartbeat_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """获取心跳采集统计"""
+    return {**heartbeat_ingestor.stats, "pending": heartbeat_ingestor.pending}
+
+@router.get("/liveness")
+async def get_node_liveness(
+    current_user: User = Depends(get_current_user)
+):
+    """获取故障检测状态 (各节点距截止时间与 phi 值)"""
+    return failure_detector.report()
+
+@router.get("/task-queue")
+async def get_task_queue_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """获取任务分发队列状态 (本地缓冲、共享队列长度与本节点拉取统计)"""
+    return await task_dispatcher.report()
+
+@router.get("/leader")
+async def get_leader_status(
+    current_user: User = Depends(get_current_user)
+):
+    """获取主副本选举状态 (本副本是否持有租约及当前持有者)"""
+    return await leader_election.report()
+
+@router.get("/metrics/aggregate")
+async def aggregate_node_metrics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    groupBy: str = "node",
+    metrics: str = "cpuUsage,memoryUsage",
+    percentiles: str = "50,95,99",
+    bins: int = 20,
+    current_user: User = Depends(get_current_user)
+):
+    """按节点/标签/状态/系统分组聚合指标 (分位数、均值、采样速率、直方图)"""
+    names = [name.strip() for name in metrics.split(",") if name.strip()]
+    if groupBy not in GROUP_BY:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"groupBy must be one of {list(GROUP_BY)}"
+        )
+    if not names or any(name not in AGGREGATE_METRICS for name in names):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"metrics must be a comma separated subset of {list(AGGREGATE_METRICS)}"
+        )
+    try:
+        quantiles = [float(q) for q in percentiles.split(",") if q.strip()]
+    except ValueError:
+        quantiles = None
+    if quantiles is None or any(not 0 <= q <= 100 for q in quantiles):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="percentiles must be comma separated numbers between 0 and 100"
+        )
+    if not 1 <= bins <= 1000:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bins must be between 1 and 1000"
+        )
+    end = to_naive_utc(end) or datetime.utcnow()
+    start = to_naive_utc(start) or end - timedelta(hours=1)
+    if start >= end:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="start must be before end"
+        )
+    return await asyncio.to_thread(fleet_metrics.query, start, end, groupBy, names, quantiles, bins)
 
 @router.post("/", response_model=NodeResponse)
 async def create_node(
     node: NodeCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """创建新节点"""
-    new_node = {
-        "id": len(nodes_db) + 1,
-        **node.dict(),
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
-    nodes_db.append(new_node)
+    new_node = await NodeRepository(db).create(**node.dict())
+    task_dispatcher.update_node(new_node)
     return new_node
 
 @router.get("/{node_id}", response_model=NodeResponse)
 async def get_node(
-    node_id: int,
-    db: Session = Depends(get_db),
+    node_id: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取单个节点"""
-    node = next((n for n in nodes_db if n.get("id") == node_id), None)
-    if not node:
+    return await get_node_or_404(node_id, NodeRepository(db))
+
+@router.get("/{node_id}/metrics")
+async def get_node_metrics(
+    node_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    resolution: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """获取节点指标时序 (raw/1m/1h，未指定时按时间跨度选择)"""
+    if resolution is not None and resolution not in RESOLUTIONS:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Node not found"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"resolution must be one of {list(RESOLUTIONS)}"
         )
-    return node
+    end = to_naive_utc(end) or datetime.utcnow()
+    start = to_naive_utc(start) or end - timedelta(hours=1)
+    seconds, points = await asyncio.to_thread(
+        metric_store.series, node_id, start, end, RESOLUTIONS.get(resolution)
+    )
+    label = next(name for name, value in RESOLUTIONS.items() if value == seconds)
+    return {"nodeId": node_id, "resolution": label, "points": points}
+
+@router.get("/{node_id}/stats")
+async def get_node_stats(
+    node_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取节点上任务执行的统计"""
+    await get_node_or_404(node_id, NodeRepository(db))
+    row = await db.get(ExecutionStat, ("node", node_id))
+    return {"nodeId": node_id, **summarize(row)}
 
 @router.put("/{node_id}", response_model=NodeResponse)
 async def update_node(
-    node_id: int,
+    node_id: str,
     node_update: NodeUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """更新节点"""
-    node = next((n for n in nodes_db if n.get("id") == node_id), None)
-    if not node:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Node not found"
-        )
-    
-    # Update node fields
-    for field, value in node_update.dict(exclude_unset=True).items():
-        node[field] = value
-    
-    node["updated_at"] = datetime.utcnow()
+    repo = NodeRepository(db)
+    node = await get_node_or_404(node_id, repo)
+    node = await repo.update(node, node_update.dict(exclude_unset=True))
+    task_dispatcher.update_node(node)
     return node
 
 @router.delete("/{node_id}")
 async def delete_node(
-    node_id: int,
-    db: Session = Depends(get_db),
+    node_id: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """删除节点"""
-    global nodes_db
-    node_index = next((i for i, n in enumerate(nodes_db) if n.get("id") == node_id), None)
-    if node_index is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Node not found"
-        )
-    
-    nodes_db.pop(node_index)
+    repo = NodeRepository(db)
+    node = await get_node_or_404(node_id, repo)
+    await repo.delete(node)
+    task_dispatcher.remove_node(node_id)
     return {"message": "Node deleted successfully"}
 
 @router.post("/{node_id}/actions")
 async def node_actions(
-    node_id: int,
+    node_id: str,
     action: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """节点操作"""
-    node = next((n for n in nodes_db if n.get("id") == node_id), None)
-    if not node:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Node not found"
-        )
-    
-    if action == "start":
-        node["status"] = "active"
-    elif action == "stop":
-        node["status"] = "inactive"
-    elif action == "restart":
-        node["status"] = "restarting"
+    repo = NodeRepository(db)
+    node = await get_node_or_404(node_id, repo)
+
+    if action in ("start", "restart"):
         # In a real implementation, you would restart the node here
-        node["status"] = "active"
+        new_status = NodeStatus.ONLINE
+    elif action == "stop":
+        new_status = NodeStatus.OFFLINE
     else:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Unknown action: {action}"
         )
-    
-    node["updated_at"] = datetime.utcnow()
-    return {"message": f"Node {action} action completed", "node_id": node_id}
\ No newline at end of file
+
+    node = await repo.update(node, {"status": new_status})
+    task_dispatcher.update_node(node)
+    return {"message": f"Node {action} action completed", "node_id": node_id}
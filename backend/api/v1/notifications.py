@@ -1,9 +1,12 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import datetime
-from ...core.database import get_db
+from ...core.database import get_async_db
+from ...core.pagination import Page
+from ...models.notification import NotificationType, NotificationStatus, NotificationPriority
 from ...models.user import User
+from ...repositories import NotificationRepository
 from .auth import get_current_user
 from pydantic import BaseModel
 
@@ -12,150 +15,127 @@ router = APIRouter()
 class NotificationCreate(BaseModel):
     title: str
     message: str
-    notification_type: str = "info"
-    is_read: bool = False
+    notification_type: NotificationType = NotificationType.SYSTEM
+    priority: NotificationPriority = NotificationPriority.NORMAL
+    recipient: Optional[str] = None
+    scheduledAt: Optional[datetime] = None
 
 class NotificationUpdate(BaseModel):
     title: Optional[str] = None
     message: Optional[str] = None
-    notification_type: Optional[str] = None
+    notification_type: Optional[NotificationType] = None
+    priority: Optional[NotificationPriority] = None
     is_read: Optional[bool] = None
 
 class NotificationResponse(BaseModel):
-    id: int
+    id: str
     title: str
     message: str
-    notification_type: str
-    is_read: bool
-    created_at: datetime
-    updated_at: datetime
-    user_id: int
+    type: NotificationType
+    status: NotificationStatus
+    priority: NotificationPriority
+    recipient: str
+    scheduledAt: Optional[datetime]
+    readAt: Optional[datetime]
+    createdAt: datetime
+    updatedAt: datetime
 
     class Config:
         from_attributes = True
 
-# Simple in-memory notification storage (in production, use a proper database model)
-notifications_db = []
+def to_model_fields(values: dict) -> dict:
+    """将接口字段映射为 Notification 模型字段"""
+    if "notification_type" in values:
+        values["type"] = values.pop("notification_type")
+    if "is_read" in values:
+        is_read = values.pop("is_read")
+        values["status"] = NotificationStatus.READ if is_read else NotificationStatus.DELIVERED
+        values["readAt"] = datetime.utcnow() if is_read else None
+    return values
 
-@router.get("/", response_model=List[NotificationResponse])
+async def get_notification_or_404(notification_id: str, repo: NotificationRepository):
+    notification = await repo.get(notification_id)
+    if not notification:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Notification not found"
+        )
+    return notification
+
+@router.get("/", response_model=Page[NotificationResponse])
 async def get_notifications(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    notification_type: Optional[str] = None,
+    notification_type: Optional[NotificationType] = None,
     is_read: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取通知列表"""
-    # Filter notifications
-    filtered_notifications = notifications_db.copy()
-    
-    if notification_type:
-        filtered_notifications = [n for n in filtered_notifications if n.get("notification_type") == notification_type]
-    
-    if is_read is not None:
-        filtered_notifications = [n for n in filtered_notifications if n.get("is_read") == is_read]
-    
-    return filtered_notifications[skip:skip + limit]
+    return await NotificationRepository(db).list_notifications(
+        type=notification_type, is_read=is_read, cursor=cursor, limit=limit
+    )
 
 @router.post("/", response_model=NotificationResponse)
 async def create_notification(
     notification: NotificationCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """创建新通知"""
-    new_notification = {
-        "id": len(notifications_db) + 1,
-        **notification.dict(),
-        "user_id": current_user.id,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
-    notifications_db.append(new_notification)
-    return new_notification
+    values = to_model_fields(notification.dict())
+    values["recipient"] = values["recipient"] or current_user.id
+    return await NotificationRepository(db).create(**values)
+
+@router.delete("/batch")
+async def delete_notifications_batch(
+    notification_ids: List[str],
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """批量删除通知"""
+    deleted_count = await NotificationRepository(db).delete_many(notification_ids)
+    return {"message": f"Deleted {deleted_count} notifications"}
 
 @router.get("/{notification_id}", response_model=NotificationResponse)
 async def get_notification(
-    notification_id: int,
-    db: Session = Depends(get_db),
+    notification_id: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取单个通知"""
-    notification = next((n for n in notifications_db if n.get("id") == notification_id), None)
-    if not notification:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Notification not found"
-        )
-    return notification
+    return await get_notification_or_404(notification_id, NotificationRepository(db))
 
 @router.put("/{notification_id}", response_model=NotificationResponse)
 async def update_notification(
-    notification_id: int,
+    notification_id: str,
     notification_update: NotificationUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """更新通知"""
-    notification = next((n for n in notifications_db if n.get("id") == notification_id), None)
-    if not notification:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Notification not found"
-        )
-    
-    # Update notification fields
-    for field, value in notification_update.dict(exclude_unset=True).items():
-        notification[field] = value
-    
-    notification["updated_at"] = datetime.utcnow()
-    return notification
+    repo = NotificationRepository(db)
+    notification = await get_notification_or_404(notification_id, repo)
+    return await repo.update(notification, to_model_fields(notification_update.dict(exclude_unset=True)))
 
 @router.delete("/{notification_id}")
 async def delete_notification(
-    notification_id: int,
-    db: Session = Depends(get_db),
+    notification_id: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """删除通知"""
-    global notifications_db
-    notification_index = next((i for i, n in enumerate(notifications_db) if n.get("id") == notification_id), None)
-    if notification_index is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Notification not found"
-        )
-    
-    notifications_db.pop(notification_index)
+    repo = NotificationRepository(db)
+    notification = await get_notification_or_404(notification_id, repo)
+    await repo.delete(notification)
     return {"message": "Notification deleted successfully"}
 
 @router.post("/batch/mark-read")
 async def mark_notifications_read(
-    notification_ids: List[int],
-    db: Session = Depends(get_db),
+    notification_ids: List[str],
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """批量标记通知为已读"""
-    marked_count = 0
-    for notification in notifications_db:
-        if notification.get("id") in notification_ids:
-            notification["is_read"] = True
-            notification["updated_at"] = datetime.utcnow()
-            marked_count += 1
-    
+    marked_count = await NotificationRepository(db).mark_read(notification_ids)
     return {"message": f"Marked {marked_count} notifications as read"}
-
-@router.delete("/batch")
-async def delete_notifications_batch(
-    notification_ids: List[int],
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """批量删除通知"""
-    global notifications_db
-    initial_count = len(notifications_db)
-    notifications_db = [n for n in notifications_db if n.get("id") not in notification_ids]
-    deleted_count = initial_count - len(notifications_db)
-    
-    return {"message": f"Deleted {deleted_count} notifications"}
\ No newline at end of file
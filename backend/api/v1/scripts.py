@@ -1,209 +1,342 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response, status, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Set
 from datetime import datetime
+import asyncio
 import os
-import shutil
-from ...core.database import get_db
+import time
+from ...core.database import get_async_db, AsyncSessionLocal
+from ...core.responses import RangeFileResponse, RangeNotSatisfiable, etag_matches, parse_range, select_variant
+from ...core.pagination import Page
+from ...models.script import ScriptType, ScriptLanguage, ScriptStatus
 from ...models.user import User
+from ...repositories import ScriptRepository
+from ...services.storage import HASH_PATTERN, Blob, FileTooLargeError, content_store
 from .auth import get_current_user
 from ...core.config import settings
 from pydantic import BaseModel
 
 router = APIRouter()
 
+# Default language for each script type
+SCRIPT_LANGUAGES = {
+    ScriptType.PYTHON: ScriptLanguage.PYTHON,
+    ScriptType.SHELL: ScriptLanguage.BASH,
+    ScriptType.BATCH: ScriptLanguage.BATCH,
+    ScriptType.POWERSHELL: ScriptLanguage.POWERSHELL,
+    ScriptType.JAVASCRIPT: ScriptLanguage.NODEJS,
+}
+
 class ScriptCreate(BaseModel):
     name: str
     description: Optional[str] = None
-    script_type: str = "python"
-    file_path: Optional[str] = None
+    type: ScriptType = ScriptType.PYTHON
+    language: Optional[ScriptLanguage] = None
+    version: str = "1.0.0"
+    fileHash: str  # content already in the store, e.g. from POST /upload
+    fileName: Optional[str] = None
+    parameters: Optional[str] = None
+    requirements: Optional[str] = None
+    environment: Optional[str] = None
+    timeout: Optional[int] = None
+    maxRetries: Optional[int] = None
+    tags: Optional[str] = None
+    category: Optional[str] = None
 
 class ScriptUpdate(BaseModel):
     name: Optional[str] = None
     description: Optional[str] = None
-    script_type: Optional[str] = None
-    file_path: Optional[str] = None
+    type: Optional[ScriptType] = None
+    language: Optional[ScriptLanguage] = None
+    version: Optional[str] = None
+    status: Optional[ScriptStatus] = None
+    fileName: Optional[str] = None
+    parameters: Optional[str] = None
+    requirements: Optional[str] = None
+    environment: Optional[str] = None
+    timeout: Optional[int] = None
+    maxRetries: Optional[int] = None
+    tags: Optional[str] = None
+    category: Optional[str] = None
 
 class ScriptResponse(BaseModel):
-    id: int
+    id: str
     name: str
     description: Optional[str]
-    script_type: str
-    file_path: Optional[str]
-    created_at: datetime
-    updated_at: datetime
+    type: ScriptType
+    language: ScriptLanguage
+    version: str
+    status: ScriptStatus
+    filePath: str
+    fileName: str
+    fileHash: Optional[str]
+    fileSize: Optional[int]
+    author: Optional[str]
+    createdAt: datetime
+    updatedAt: datetime
+
+    class Config:
+        from_attributes = True
+
+class ScriptVersionResponse(BaseModel):
+    id: str
+    scriptId: str
+    version: str
+    fileHash: Optional[str]
+    fileSize: Optional[int]
+    changelog: Optional[str]
+    isCurrent: bool
+    createdAt: datetime
 
     class Config:
         from_attributes = True
 
-# Simple in-memory script storage (in production, use a proper database model)
-scripts_db = []
+def next_version(version: str) -> str:
+    """1.0.0 -> 1.0.1，末段不是数字时追加 .1"""
+    head, _, last = version.rpartition(".")
+    if last.isdigit():
+        return f"{head}.{int(last) + 1}" if head else str(int(last) + 1)
+    return f"{version}.1"
+
+async def store_upload(file: UploadFile) -> Blob:
+    """分块写入内容仓库并计算 SHA-256，复制过程不占用事件循环"""
+    if not file.filename:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No file provided"
+        )
+    too_large = HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"File exceeds the {settings.max_file_size} byte limit"
+    )
+    if file.size is not None and file.size > settings.max_file_size:
+        raise too_large
+    try:
+        return await asyncio.to_thread(content_store.ingest, file.file, settings.max_file_size)
+    except FileTooLargeError:
+        raise too_large
+    except OSError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save file: {str(e)}"
+        )
+
+# Delayed blob collections still waiting, referenced so they are not garbage collected
+_collections: Set[asyncio.Task] = set()
+
+async def collect_blobs(hashes: List[str], released_at: float):
+    """删除脚本一段时间后回收其内容：此时仍无引用、且删除后没有上传去重命中或按哈希引用过的才删除，
+    正在引用同一内容的上传有时间提交"""
+    await asyncio.sleep(settings.blob_collect_delay)
+    try:
+        async with AsyncSessionLocal() as db:
+            repo = ScriptRepository(db)
+            for file_hash in hashes:
+                if await repo.count_blob_references(file_hash) == 0:
+                    await asyncio.to_thread(content_store.remove_unused, file_hash, released_at)
+    except Exception as e:
+        print(f"Warning: Failed to collect script content {hashes}: {e}")
+
+def script_file_path(script) -> Optional[str]:
+    """脚本内容在本机的路径：有 fileHash 的取内容仓库中的文件，旧脚本只认上传目录下的路径"""
+    if script.fileHash:
+        return content_store.path_for(script.fileHash) if HASH_PATTERN.fullmatch(script.fileHash) else None
+    if not script.filePath:
+        return None
+    path = os.path.realpath(script.filePath)
+    return path if path.startswith(os.path.realpath(settings.upload_dir) + os.sep) else None
+
+async def get_script_or_404(script_id: str, repo: ScriptRepository):
+    script = await repo.get(script_id)
+    if not script:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Script not found"
+        )
+    return script
 
-@router.get("/", response_model=List[ScriptResponse])
+@router.get("/", response_model=Page[ScriptResponse])
 async def get_scripts(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    script_type: Optional[str] = None,
-    db: Session = Depends(get_db),
+    script_type: Optional[ScriptType] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取脚本列表"""
-    # Filter scripts if type is provided
-    if script_type:
-        filtered_scripts = [script for script in scripts_db if script.get("script_type") == script_type]
-    else:
-        filtered_scripts = scripts_db
-    
-    return filtered_scripts[skip:skip + limit]
+    return await ScriptRepository(db).list_scripts(type=script_type, cursor=cursor, limit=limit)
 
 @router.post("/", response_model=ScriptResponse)
 async def create_script(
     script: ScriptCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
-    """创建新脚本"""
-    new_script = {
-        "id": len(scripts_db) + 1,
-        **script.dict(),
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
-    scripts_db.append(new_script)
-    return new_script
-
-@router.post("/upload")
+    """创建新脚本，内容引用已上传到内容仓库的 fileHash"""
+    blob = await asyncio.to_thread(content_store.get, script.fileHash)
+    if blob is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Script content not found, upload it first"
+        )
+    values = script.dict(exclude={"fileHash"})
+    values["language"] = values["language"] or SCRIPT_LANGUAGES[script.type]
+    values["fileName"] = values["fileName"] or blob.hash
+    return await ScriptRepository(db).create_with_version(blob, **values, author=current_user.id)
+
+@router.post("/upload", response_model=ScriptResponse)
 async def upload_script(
     file: UploadFile = File(...),
     name: Optional[str] = None,
     description: Optional[str] = None,
-    script_type: str = "python",
-    db: Session = Depends(get_db),
+    script_type: ScriptType = ScriptType.PYTHON,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """上传脚本文件"""
-    if not file.filename:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No file provided"
-        )
-    
-    # Create upload directory if it doesn't exist
-    upload_dir = os.path.join(settings.upload_dir, "scripts")
-    os.makedirs(upload_dir, exist_ok=True)
-    
-    # Generate unique filename
-    file_extension = os.path.splitext(file.filename)[1]
-    unique_filename = f"{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
-    file_path = os.path.join(upload_dir, unique_filename)
-    
-    # Save file
-    try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-    except Exception as e:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to save file: {str(e)}"
-        )
-    
-    # Create script record
-    script_name = name or file.filename
-    new_script = {
-        "id": len(scripts_db) + 1,
-        "name": script_name,
-        "description": description,
-        "script_type": script_type,
-        "file_path": file_path,
-        "created_at": datetime.utcnow(),
-        "updated_at": datetime.utcnow()
-    }
-    scripts_db.append(new_script)
-    
-    return new_script
+    blob = await store_upload(file)
+    return await ScriptRepository(db).create_with_version(
+        blob,
+        name=name or file.filename,
+        description=description,
+        type=script_type,
+        language=SCRIPT_LANGUAGES[script_type],
+        fileName=file.filename,
+        author=current_user.id
+    )
+
+@router.get("/{script_id}/versions", response_model=List[ScriptVersionResponse])
+async def get_script_versions(
+    script_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取脚本版本列表"""
+    repo = ScriptRepository(db)
+    await get_script_or_404(script_id, repo)
+    return await repo.list_versions(script_id)
+
+@router.post("/{script_id}/versions", response_model=ScriptVersionResponse)
+async def upload_script_version(
+    script_id: str,
+    file: UploadFile = File(...),
+    version: Optional[str] = None,
+    changelog: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """上传脚本新版本"""
+    repo = ScriptRepository(db)
+    script = await get_script_or_404(script_id, repo)
+    blob = await store_upload(file)
+
+    # Re-deploying identical content keeps the current version
+    current = await repo.current_version(script_id)
+    if current and current.fileHash == blob.hash:
+        return current
+    return await repo.add_version(
+        script, blob, version or next_version(script.version), changelog, current_user.id
+    )
 
 @router.get("/{script_id}", response_model=ScriptResponse)
 async def get_script(
-    script_id: int,
-    db: Session = Depends(get_db),
+    script_id: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取单个脚本"""
-    script = next((s for s in scripts_db if s.get("id") == script_id), None)
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
-    return script
+    return await get_script_or_404(script_id, ScriptRepository(db))
 
 @router.put("/{script_id}", response_model=ScriptResponse)
 async def update_script(
-    script_id: int,
+    script_id: str,
     script_update: ScriptUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """更新脚本"""
-    script = next((s for s in scripts_db if s.get("id") == script_id), None)
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
-    
-    # Update script fields
-    for field, value in script_update.dict(exclude_unset=True).items():
-        script[field] = value
-    
-    script["updated_at"] = datetime.utcnow()
-    return script
+    repo = ScriptRepository(db)
+    script = await get_script_or_404(script_id, repo)
+    values = script_update.dict(exclude_unset=True)
+    values["lastModifiedBy"] = current_user.id
+    return await repo.update(script, values)
 
 @router.delete("/{script_id}")
 async def delete_script(
-    script_id: int,
-    db: Session = Depends(get_db),
+    script_id: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """删除脚本"""
-    global scripts_db
-    script_index = next((i for i, s in enumerate(scripts_db) if s.get("id") == script_id), None)
-    if script_index is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
-    
-    # Delete file if it exists
-    script = scripts_db[script_index]
-    if script.get("file_path") and os.path.exists(script["file_path"]):
+    repo = ScriptRepository(db)
+    script = await get_script_or_404(script_id, repo)
+    file_path = None if script.fileHash else script_file_path(script)
+    released_at = time.time()
+    hashes = await repo.delete_with_versions(script)
+
+    # Content is shared by hash, an upload deduplicating against it may not have committed yet
+    if hashes:
+        collection = asyncio.create_task(collect_blobs(hashes, released_at))
+        _collections.add(collection)
+        collection.add_done_callback(_collections.discard)
+    if file_path and os.path.exists(file_path):
         try:
-            os.remove(script["file_path"])
+            os.remove(file_path)
         except Exception as e:
-            print(f"Warning: Failed to delete file {script['file_path']}: {e}")
-    
-    scripts_db.pop(script_index)
+            print(f"Warning: Failed to delete file {file_path}: {e}")
+
     return {"message": "Script deleted successfully"}
 
-@router.get("/{script_id}/download")
+@router.api_route("/{script_id}/download", methods=["GET", "HEAD"])
 async def download_script(
-    script_id: int,
-    db: Session = Depends(get_db),
+    script_id: str,
+    request: Request,
+    range: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """下载脚本文件"""
-    script = next((s for s in scripts_db if s.get("id") == script_id), None)
-    if not script:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Script not found"
-        )
-    
-    file_path = script.get("file_path")
-    if not file_path or not os.path.exists(file_path):
+    script = await get_script_or_404(script_id, ScriptRepository(db))
+
+    file_path = script_file_path(script)
+    try:
+        if file_path is None:
+            raise FileNotFoundError(script.filePath)
+        path, encoding, stat_result = await asyncio.to_thread(select_variant, file_path, accept_encoding)
+    except FileNotFoundError:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Script file not found"
         )
-    
-    return {"file_path": file_path, "filename": os.path.basename(file_path)}
\ No newline at end of file
+
+    # Content-addressed scripts use their hash, each encoding is its own representation
+    tag = script.fileHash or f"{int(stat_result.st_mtime)}-{stat_result.st_size}"
+    etag = f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+    headers = {"etag": etag, "vary": "Accept-Encoding", "cache-control": "no-cache"}
+    if encoding:
+        headers["content-encoding"] = encoding
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    if range and (not if_range or if_range == etag):
+        try:
+            byte_range = parse_range(range, stat_result.st_size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={**headers, "content-range": f"bytes */{stat_result.st_size}"}
+            )
+
+    return RangeFileResponse(
+        path,
+        stat_result=stat_result,
+        byte_range=byte_range,
+        headers=headers,
+        media_type="application/octet-stream",
+        filename=script.fileName or os.path.basename(file_path),
+        method=request.method,
+    )
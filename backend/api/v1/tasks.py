@@ -1,85 +1,410 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, List, Optional, Tuple, Type, Union
 from datetime import datetime
-from ...core.database import get_db
-from ...models.task import Task
+import asyncio
+import codecs
+import json
+import uuid
+from ...core.config import settings
+from ...core.database import get_async_db, AsyncSessionLocal
+from ...core.pagination import Page, paginate
+from ...models.task import (
+    Task, TaskSchedule, TaskExecution, TaskDependency, TaskStatus, TaskPriority,
+    ScheduleCycle, DependencyType, DependencyCondition, ExecutionStatus
+)
+from ...models.stats import ExecutionStat
 from ...models.user import User
+from ...repositories import TaskRepository
+from ...repositories.task import FINISHED_STATUSES
+from ...services.dispatcher import task_dispatcher, DispatcherBusyError
+from ...services.executor import task_executor
+from ...services.scheduler import schedule_engine, compute_next_run
+from ...services.dependencies import dependency_engine, edge_from_model, find_cycle
+from ...services.logs import execution_logs, LogUnavailableError, STREAMS
+from ...services.execution_stats import execution_stats, summarize, ALL_KEY
 from .auth import get_current_user
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, ValidationError
 
 router = APIRouter()
 
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl")
+
 class TaskCreate(BaseModel):
-    title: str
-    description: Optional[str] = None
-    script_path: Optional[str] = None
-    cron_expression: Optional[str] = None
-    priority: str = "medium"
-    status: str = "pending"
+    name: str
+    scriptId: str
+    nodeId: Optional[str] = None
+    parameters: Union[str, dict, list] = "{}"
+    priority: TaskPriority = TaskPriority.MEDIUM
+    maxRunTime: int = Field(gt=0)
+    isConcurrent: bool = False
+    isCompress: bool = False
+    notifyOnComplete: bool = False
+    emailAuthCode: Optional[str] = None
+    filePath: Optional[str] = None
 
 class TaskUpdate(BaseModel):
-    title: Optional[str] = None
-    description: Optional[str] = None
-    script_path: Optional[str] = None
-    cron_expression: Optional[str] = None
-    priority: Optional[str] = None
-    status: Optional[str] = None
+    name: Optional[str] = None
+    scriptId: Optional[str] = None
+    nodeId: Optional[str] = None
+    parameters: Optional[Union[str, dict, list]] = None
+    status: Optional[TaskStatus] = None
+    priority: Optional[TaskPriority] = None
+    maxRunTime: Optional[int] = Field(None, gt=0)
+    isConcurrent: Optional[bool] = None
+    isCompress: Optional[bool] = None
+    notifyOnComplete: Optional[bool] = None
+    emailAuthCode: Optional[str] = None
+    filePath: Optional[str] = None
 
 class TaskResponse(BaseModel):
-    id: int
-    title: str
-    description: Optional[str]
-    script_path: Optional[str]
-    cron_expression: Optional[str]
-    priority: str
-    status: str
-    created_at: datetime
-    updated_at: datetime
-    user_id: int
+    # emailAuthCode is write-only
+    id: str
+    name: str
+    scriptId: str
+    nodeId: Optional[str]
+    parameters: str
+    status: TaskStatus
+    priority: TaskPriority
+    maxRunTime: int
+    isConcurrent: bool
+    isCompress: bool
+    notifyOnComplete: bool
+    filePath: Optional[str]
+    createdAt: datetime
+    updatedAt: datetime
+
+    class Config:
+        from_attributes = True
+
+class ScheduleCreate(BaseModel):
+    cycleType: ScheduleCycle
+    runTime: str
+    isActive: bool = True
+
+class ScheduleUpdate(BaseModel):
+    cycleType: Optional[ScheduleCycle] = None
+    runTime: Optional[str] = None
+    isActive: Optional[bool] = None
+
+class ScheduleResponse(BaseModel):
+    id: str
+    taskId: str
+    cycleType: ScheduleCycle
+    runTime: str
+    isActive: bool
+    lastRunAt: Optional[datetime]
+    nextRunAt: Optional[datetime]
+    createdAt: datetime
 
     class Config:
         from_attributes = True
 
-@router.get("/", response_model=List[TaskResponse])
+class DependencyCreate(BaseModel):
+    dependsOnTaskId: str
+    type: DependencyType = DependencyType.SUCCESS
+    condition: DependencyCondition = DependencyCondition.ALL_SUCCESS
+    timeoutMinutes: Optional[int] = None
+
+class DependencyResponse(BaseModel):
+    id: str
+    taskId: str
+    dependsOnTaskId: str
+    type: DependencyType
+    condition: DependencyCondition
+    timeoutMinutes: Optional[int]
+    isActive: bool
+
+    class Config:
+        from_attributes = True
+
+# Bulk items are validated exactly like the single-task endpoints
+TaskBulkCreate = TaskCreate
+
+class TaskBulkUpdate(TaskUpdate):
+    id: str
+
+class TaskBulkCancel(BaseModel):
+    id: str
+
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[dict]
+
+async def read_bulk_items(request: Request) -> AsyncIterator[Tuple[int, Any]]:
+    """逐条读出 JSON 数组或 NDJSON 流中的条目，无法解析的行以 ValueError 代替"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if content_type not in NDJSON_TYPES:
+        try:
+            items = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Body must be a JSON array or NDJSON (application/x-ndjson)"
+            )
+        if not isinstance(items, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Body must be a JSON array or NDJSON (application/x-ndjson)"
+            )
+        for index, item in enumerate(items):
+            yield index, item
+        return
+
+    index = 0
+    pending = b""
+    async for chunk in request.stream():
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield index, parse_ndjson_line(line)
+                index += 1
+    if pending.strip():
+        yield index, parse_ndjson_line(pending)
+
+def parse_ndjson_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {e}")
+
+async def validate_bulk_items(request: Request, schema: Type[BaseModel]) -> Tuple[List[dict], List[Tuple[int, BaseModel]]]:
+    """一次读取并校验全部条目，返回按序的结果列表与通过校验的 (序号, 条目)"""
+    results, valid = [], []
+    async for index, item in read_bulk_items(request):
+        if index >= settings.task_bulk_max_items:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"At most {settings.task_bulk_max_items} items per request"
+            )
+        # Cancels may list bare task ids
+        if schema is TaskBulkCancel and isinstance(item, str):
+            item = {"id": item}
+        if isinstance(item, ValueError):
+            results.append({"index": index, "error": str(item)})
+            continue
+        try:
+            valid.append((index, schema.model_validate(item)))
+            results.append({"index": index})
+        except ValidationError as e:
+            results.append({"index": index, "error": validation_message(e)})
+    return results, valid
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" if item["loc"] else item["msg"]
+        for item in error.errors()
+    )
+
+def bulk_chunks(items: list) -> List[list]:
+    size = settings.task_bulk_chunk_size
+    return [items[offset:offset + size] for offset in range(0, len(items), size)]
+
+def task_row_values(item: BaseModel, exclude_unset: bool = True) -> dict:
+    """条目转为 Task 列值；创建时 exclude_unset=False 以带上默认值"""
+    values = item.model_dump(exclude_unset=exclude_unset, exclude={"id"})
+    if "parameters" in values and not isinstance(values["parameters"], str):
+        values["parameters"] = json.dumps(values["parameters"])
+    return values
+
+async def check_references(repo: TaskRepository, results: List[dict], chunk: List[Tuple[int, BaseModel]]) -> List[Tuple[int, BaseModel]]:
+    """一次查询校验整块引用的脚本与节点，缺失的条目记为失败"""
+    script_ids = {item.scriptId for _, item in chunk if item.scriptId}
+    node_ids = {item.nodeId for _, item in chunk if item.nodeId}
+    scripts, nodes = await repo.references(script_ids, node_ids)
+    kept = []
+    for index, item in chunk:
+        if item.scriptId and item.scriptId not in scripts:
+            results[index]["error"] = f"Script {item.scriptId} not found"
+        elif item.nodeId and item.nodeId not in nodes:
+            results[index]["error"] = f"Node {item.nodeId} not found"
+        else:
+            kept.append((index, item))
+    return kept
+
+async def check_task_references(repo: TaskRepository, script_id: Optional[str], node_id: Optional[str]):
+    scripts, nodes = await repo.references({script_id} if script_id else set(), {node_id} if node_id else set())
+    if script_id and script_id not in scripts:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Script {script_id} not found"
+        )
+    if node_id and node_id not in nodes:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Node {node_id} not found"
+        )
+
+def bulk_summary(results: List[dict]) -> dict:
+    failed = sum(1 for result in results if "error" in result)
+    return {"succeeded": len(results) - failed, "failed": failed, "results": results}
+
+@router.get("/", response_model=Page[TaskResponse])
 async def get_tasks(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    status: Optional[str] = None,
-    db: Session = Depends(get_db),
+    status: Optional[TaskStatus] = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取任务列表"""
-    query = db.query(Task)
+    query = select(Task)
     if status:
-        query = query.filter(Task.status == status)
-    tasks = query.offset(skip).limit(limit).all()
-    return tasks
+        query = query.where(Task.status == status)
+    return await paginate(db, query, Task, cursor, limit)
 
 @router.post("/", response_model=TaskResponse)
 async def create_task(
     task: TaskCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """创建新任务"""
-    db_task = Task(
-        **task.dict(),
-        user_id=current_user.id
-    )
+    await check_task_references(TaskRepository(db), task.scriptId, task.nodeId)
+    db_task = Task(**task_row_values(task, exclude_unset=False), status=TaskStatus.PENDING)
     db.add(db_task)
-    db.commit()
-    db.refresh(db_task)
+    await db.commit()
+    await db.refresh(db_task)
     return db_task
 
+@router.post("/bulk", response_model=BulkResult)
+async def bulk_create_tasks(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """批量创建任务 (JSON 数组或 NDJSON)，分块事务写入并逐条返回结果"""
+    results, valid = await validate_bulk_items(request, TaskBulkCreate)
+    repo = TaskRepository(db)
+    for chunk in bulk_chunks(valid):
+        chunk = await check_references(repo, results, chunk)
+        now = datetime.utcnow()
+        rows = []
+        for index, item in chunk:
+            task_id = str(uuid.uuid4())
+            rows.append({
+                # Defaults included so every row binds the same columns in the executemany
+                **task_row_values(item, exclude_unset=False),
+                "id": task_id,
+                "status": TaskStatus.PENDING,
+                "createdAt": now,
+                "updatedAt": now,
+            })
+            results[index]["id"] = task_id
+        try:
+            await repo.insert_many(rows)
+        except Exception as e:
+            await db.rollback()
+            # The driver error carries the SQL and bound values of the whole chunk, it stays in the log
+            print(f"Warning: Bulk insert of {len(rows)} tasks failed: {e}")
+            for index, _ in chunk:
+                results[index].pop("id")
+                results[index]["error"] = "Insert failed"
+    return bulk_summary(results)
+
+@router.put("/bulk", response_model=BulkResult)
+async def bulk_update_tasks(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """批量更新任务，每个条目按 id 只修改给出的字段"""
+    results, valid = await validate_bulk_items(request, TaskBulkUpdate)
+    seen = set()
+    unique = []
+    for index, item in valid:
+        if item.id in seen:
+            results[index]["error"] = f"Task {item.id} appears more than once"
+        else:
+            seen.add(item.id)
+            unique.append((index, item))
+
+    repo = TaskRepository(db)
+    for chunk in bulk_chunks(unique):
+        existing = await repo.statuses([item.id for _, item in chunk])
+        for index, item in chunk:
+            if item.id not in existing:
+                results[index]["error"] = "Task not found"
+        chunk = await check_references(repo, results, [
+            (index, item) for index, item in chunk if item.id in existing
+        ])
+        now = datetime.utcnow()
+        rows = [{**task_row_values(item), "id": item.id, "updatedAt": now} for _, item in chunk]
+        try:
+            await repo.update_rows(rows)
+        except Exception as e:
+            await db.rollback()
+            print(f"Warning: Bulk update of {len(rows)} tasks failed: {e}")
+            for index, _ in chunk:
+                results[index]["error"] = "Update failed"
+            continue
+        for index, item in chunk:
+            results[index]["id"] = item.id
+    return bulk_summary(results)
+
+@router.post("/bulk/cancel", response_model=BulkResult)
+async def bulk_cancel_tasks(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """批量取消任务 (任务ID或 {"id": ...})，已结束的任务保持原状态
+
+    取消后排队中的执行不再启动，定时与依赖触发的运行也会跳过，直到任务被手动执行；
+    本副本上正在运行的脚本会被杀掉，其他副本或节点上的执行跑完后不会改写 CANCELLED 状态
+    """
+    results, valid = await validate_bulk_items(request, TaskBulkCancel)
+    repo = TaskRepository(db)
+    for chunk in bulk_chunks(valid):
+        existing = await repo.statuses([item.id for _, item in chunk])
+        cancellable = [
+            item.id for _, item in chunk if item.id in existing and existing[item.id] not in FINISHED_STATUSES
+        ]
+        try:
+            await repo.cancel_many(cancellable)
+        except Exception as e:
+            await db.rollback()
+            print(f"Warning: Bulk cancel of {len(cancellable)} tasks failed: {e}")
+            existing = {}
+            for index, _ in chunk:
+                results[index]["error"] = "Cancel failed"
+        else:
+            task_executor.cancel(cancellable)
+        for index, item in chunk:
+            if "error" in results[index]:
+                continue
+            previous = existing.get(item.id)
+            if previous is None:
+                results[index]["error"] = "Task not found"
+                continue
+            cancelled = previous not in FINISHED_STATUSES
+            results[index].update({
+                "id": item.id,
+                "status": (TaskStatus.CANCELLED if cancelled else previous).value,
+                "cancelled": cancelled,
+            })
+    return bulk_summary(results)
+
+@router.get("/stats")
+async def get_execution_stats(
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取全部任务的执行统计 (次数、成功率、平均/p50/p95 运行时长)，读取预先汇总的一行"""
+    row = await db.get(ExecutionStat, ("all", ALL_KEY))
+    return {**summarize(row), "maintenance": execution_stats.report()}
+
 @router.get("/{task_id}", response_model=TaskResponse)
 async def get_task(
-    task_id: int,
-    db: Session = Depends(get_db),
+    task_id: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """获取单个任务"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -89,66 +414,378 @@ async def get_task(
 
 @router.put("/{task_id}", response_model=TaskResponse)
 async def update_task(
-    task_id: int,
+    task_id: str,
     task_update: TaskUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """更新任务"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
     
+    values = task_row_values(task_update)
+    await check_task_references(TaskRepository(db), values.get("scriptId"), values.get("nodeId"))
     # Update task fields
-    for field, value in task_update.dict(exclude_unset=True).items():
+    for field, value in values.items():
         setattr(task, field, value)
     
-    task.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(task)
+    task.updatedAt = datetime.utcnow()
+    await db.commit()
+    await db.refresh(task)
     return task
 
 @router.delete("/{task_id}")
 async def delete_task(
-    task_id: int,
-    db: Session = Depends(get_db),
+    task_id: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """删除任务"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
     
-    db.delete(task)
-    db.commit()
+    await db.delete(task)
+    await db.commit()
+    dependency_engine.graph.remove_task(task_id)
     return {"message": "Task deleted successfully"}
 
 @router.post("/{task_id}/execute")
 async def execute_task(
-    task_id: int,
-    db: Session = Depends(get_db),
+    task_id: str,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """执行任务"""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = await db.get(Task, task_id)
     if not task:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Task not found"
         )
+    if task.status == TaskStatus.CANCELLED:
+        # Running a cancelled task by hand resumes it, otherwise the executor would skip the run
+        task.status = TaskStatus.PENDING
+        task.updatedAt = datetime.utcnow()
+        await db.commit()
     
-    # Update task status
-    task.status = "running"
-    task.updated_at = datetime.utcnow()
-    db.commit()
+    # Queue by priority; the dispatcher places it on a node with a free slot
+    try:
+        execution_id = task_dispatcher.enqueue(task.id, task.priority, task.nodeId)
+    except DispatcherBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Dispatch queue is full, retry later"
+        )
     
-    # TODO: Implement actual task execution logic
-    # This would involve running the script and updating the task status
+    return {"message": "Task execution started", "task_id": task_id, "execution_id": execution_id}
+
+@router.get("/{task_id}/stats")
+async def get_task_stats(
+    task_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取任务的执行统计"""
+    task = await db.get(Task, task_id)
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    row = await db.get(ExecutionStat, ("task", task_id))
+    return {"taskId": task_id, **summarize(row)}
+
+@router.get("/{task_id}/schedules", response_model=List[ScheduleResponse])
+async def get_task_schedules(
+    task_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取任务的定时调度"""
+    result = await db.scalars(select(TaskSchedule).where(TaskSchedule.taskId == task_id))
+    return result.all()
+
+@router.post("/{task_id}/schedules", response_model=ScheduleResponse)
+async def create_task_schedule(
+    task_id: str,
+    schedule: ScheduleCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """创建定时调度"""
+    task = await db.get(Task, task_id)
+    if not task:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    
+    now = datetime.utcnow()
+    try:
+        next_run_at = compute_next_run(schedule.cycleType, schedule.runTime, now, now)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    return {"message": "Task execution started", "task_id": task_id}
\ No newline at end of file
+    db_schedule = TaskSchedule(
+        **schedule.dict(),
+        taskId=task_id,
+        nextRunAt=next_run_at,
+        createdAt=now
+    )
+    db.add(db_schedule)
+    await db.commit()
+    await db.refresh(db_schedule)
+    schedule_engine.upsert(db_schedule)
+    return db_schedule
+
+@router.put("/schedules/{schedule_id}", response_model=ScheduleResponse)
+async def update_task_schedule(
+    schedule_id: str,
+    schedule_update: ScheduleUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """更新定时调度"""
+    schedule = await db.get(TaskSchedule, schedule_id)
+    if not schedule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Schedule not found"
+        )
+    
+    changes = schedule_update.dict(exclude_unset=True)
+    for field, value in changes.items():
+        setattr(schedule, field, value)
+    
+    # Only a timing change (or re-activation) moves the next deadline
+    if {"cycleType", "runTime", "isActive"} & changes.keys():
+        now = datetime.utcnow()
+        try:
+            schedule.nextRunAt = compute_next_run(
+                schedule.cycleType, schedule.runTime, now, schedule.createdAt or now
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    await db.commit()
+    await db.refresh(schedule)
+    schedule_engine.upsert(schedule)
+    return schedule
+
+@router.delete("/schedules/{schedule_id}")
+async def delete_task_schedule(
+    schedule_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """删除定时调度"""
+    schedule = await db.get(TaskSchedule, schedule_id)
+    if not schedule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Schedule not found"
+        )
+    
+    await db.delete(schedule)
+    await db.commit()
+    schedule_engine.remove(schedule_id)
+    return {"message": "Schedule deleted successfully"}
+
+@router.get("/{task_id}/dependencies", response_model=List[DependencyResponse])
+async def get_task_dependencies(
+    task_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取任务的上游依赖"""
+    result = await db.scalars(select(TaskDependency).where(TaskDependency.taskId == task_id))
+    return result.all()
+
+@router.get("/{task_id}/dependents", response_model=List[DependencyResponse])
+async def get_task_dependents(
+    task_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """获取依赖该任务的下游任务"""
+    result = await db.scalars(
+        select(TaskDependency).where(TaskDependency.dependsOnTaskId == task_id)
+    )
+    return result.all()
+
+@router.get("/{task_id}/check-dependencies")
+async def check_task_dependencies(
+    task_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """查看任务当前的依赖就绪状态，非主副本由库中的依赖与执行推算"""
+    if dependency_engine.running:
+        readiness = dependency_engine.graph.readiness(task_id)
+    else:
+        readiness = await asyncio.to_thread(dependency_engine.stored_readiness, task_id)
+    return {"task_id": task_id, **readiness}
+
+@router.post("/{task_id}/dependencies", response_model=DependencyResponse)
+async def create_task_dependency(
+    task_id: str,
+    dependency: DependencyCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """添加任务依赖，形成环时拒绝"""
+    found = await db.scalar(
+        select(func.count()).select_from(Task).where(Task.id.in_([task_id, dependency.dependsOnTaskId]))
+    )
+    if found != len({task_id, dependency.dependsOnTaskId}):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Task not found"
+        )
+    
+    # Checked against the stored edges, the in-memory graph only exists on the leader
+    if await find_cycle(db, task_id, dependency.dependsOnTaskId):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Dependency {dependency.dependsOnTaskId} -> {task_id} would create a cycle"
+        )
+    
+    db_dependency = TaskDependency(**dependency.dict(), taskId=task_id)
+    db.add(db_dependency)
+    await db.commit()
+    await db.refresh(db_dependency)
+    dependency_engine.add(edge_from_model(db_dependency))
+    return db_dependency
+
+@router.delete("/dependencies/{dependency_id}")
+async def delete_task_dependency(
+    dependency_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """删除任务依赖"""
+    dependency = await db.get(TaskDependency, dependency_id)
+    if not dependency:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dependency not found"
+        )
+    
+    dependency_engine.graph.remove_edge(dependency.taskId, dependency.dependsOnTaskId)
+    await db.delete(dependency)
+    await db.commit()
+    return {"message": "Dependency deleted successfully"}
+
+@router.post("/dependencies/{dependency_id}/approve")
+async def approve_task_dependency(
+    dependency_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """人工确认 MANUAL 依赖，确认时间写入库中，主副本上的依赖引擎据此放行下游的下一次运行"""
+    dependency = await db.get(TaskDependency, dependency_id)
+    if not dependency:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dependency not found"
+        )
+    if dependency.type != DependencyType.MANUAL:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only MANUAL dependencies can be approved"
+        )
+    
+    dependency.approvedAt = datetime.utcnow()
+    await db.commit()
+    await db.refresh(dependency)
+    dependency_engine.add(edge_from_model(dependency))
+    return {"message": "Dependency approved", "dependency_id": dependency_id}
+
+LOG_NOT_HERE = "Log segments of this execution are not stored on this host"
+
+async def check_execution_log(execution_id: str, stream: str, db: AsyncSession):
+    """日志只在运行执行的主机上可读；运行在其他 worker 或副本上的执行返回 409"""
+    if stream not in STREAMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown stream: {stream}"
+        )
+    execution = await db.get(TaskExecution, execution_id)
+    if not execution:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Execution not found"
+        )
+    if execution.status == ExecutionStatus.RUNNING and not execution_logs.is_live(execution_id) \
+            and not task_executor.runs(execution_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Execution is running on another host, its log is not readable here"
+        )
+    return execution
+
+@router.get("/executions/{execution_id}/logs")
+async def read_execution_log(
+    execution_id: str,
+    stream: str = "stdout",
+    offset: int = 0,
+    limit: int = settings.log_chunk_size,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user)
+):
+    """按字节范围读取执行日志"""
+    await check_execution_log(execution_id, stream, db)
+    offset = max(0, offset)
+    limit = max(1, min(limit, settings.log_segment_size))
+    try:
+        data, size = await asyncio.to_thread(execution_logs.read, execution_id, stream, offset, limit)
+    except LogUnavailableError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=LOG_NOT_HERE
+        )
+    return Response(
+        content=data,
+        media_type="text/plain; charset=utf-8",
+        headers={"X-Log-Size": str(size), "X-Next-Offset": str(offset + len(data))}
+    )
+
+@router.get("/executions/{execution_id}/logs/tail")
+async def tail_execution_log(
+    execution_id: str,
+    stream: str = "stdout",
+    offset: int = 0,
+    last_event_id: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
+    """实时跟随执行日志 (SSE)"""
+    # A request-scoped session would hold its connection for as long as the client follows
+    async with AsyncSessionLocal() as db:
+        await check_execution_log(execution_id, stream, db)
+    # EventSource reconnects with the id of the last event it received
+    if last_event_id and last_event_id.isdigit():
+        offset = int(last_event_id)
+
+    async def events():
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        try:
+            async for next_offset, data in execution_logs.follow(execution_id, stream, max(0, offset)):
+                payload = json.dumps({"offset": next_offset, "text": decoder.decode(data)})
+                yield f"id: {next_offset}\nevent: log\ndata: {payload}\n\n"
+        except LogUnavailableError:
+            yield f"event: error\ndata: {json.dumps({'detail': LOG_NOT_HERE})}\n\n"
+            return
+        yield "event: end\ndata: {}\n\n"
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,32 +1,46 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ...core.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from ...core.database import get_async_db
+from ...core.pagination import Page, paginate
+from ...core.security import password_hasher, PasswordHasherBusyError
 from ...models.user import User
 from ...schemas.auth import UserCreate, UserResponse
-from .auth import get_current_user
+from ...services.principals import Principal
+from .auth import get_current_user, require_permissions
 
 router = APIRouter()
 
-@router.get("/", response_model=List[UserResponse])
+USER_MANAGE = "user:manage"
+
+def check_self_or_manager(user_id: str, current_user: Principal):
+    """只能查看或修改自己，管理其他用户需要 user:manage 权限"""
+    if current_user.id != user_id and not current_user.has_permissions(USER_MANAGE):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+
+@router.get("/", response_model=Page[UserResponse])
 async def get_users(
-    skip: int = 0,
+    cursor: Optional[str] = None,
     limit: int = 100,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_permissions(USER_MANAGE))
 ):
     """获取用户列表"""
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    return await paginate(db, select(User), User, cursor, limit)
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
-    user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    user_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """获取单个用户信息"""
-    user = db.query(User).filter(User.id == user_id).first()
+    check_self_or_manager(user_id, current_user)
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -36,13 +50,14 @@ async def get_user(
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user(
-    user_id: int,
+    user_id: str,
     user_update: UserCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(get_current_user)
 ):
     """更新用户信息"""
-    user = db.query(User).filter(User.id == user_id).first()
+    check_self_or_manager(user_id, current_user)
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -52,29 +67,34 @@ async def update_user(
     # Update user fields
     for field, value in user_update.dict(exclude_unset=True).items():
         if field == "password":
-            from ...core.security import get_password_hash
-            setattr(user, field, get_password_hash(value))
-        else:
-            setattr(user, field, value)
+            try:
+                value = await password_hasher.hash(value)
+            except PasswordHasherBusyError:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many password changes in progress, retry later",
+                    headers={"Retry-After": "1"},
+                )
+        setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 @router.delete("/{user_id}")
 async def delete_user(
-    user_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    user_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: Principal = Depends(require_permissions(USER_MANAGE))
 ):
     """删除用户"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     return {"message": "User deleted successfully"}
\ No newline at end of file
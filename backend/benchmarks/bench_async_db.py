@@ -0,0 +1,145 @@
+"""
+数据库访问并发基准测试
+对比 async 路由中使用同步 Session (改造前) 与 AsyncSession (改造后)：
+数据库请求吞吐量，以及同时进行的非数据库请求 (/ping) 的延迟
+
+用法: python -m backend.benchmarks.bench_async_db --requests 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI, Depends
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from backend.core.config import settings
+from backend.core.database import get_async_database_url
+
+# A full scan over the seeded table stands in for a slow query
+QUERY = text("SELECT count(*) FROM bench_rows WHERE payload LIKE :pattern")
+
+
+def build_app(database_url: str, concurrency: int):
+    # The sync path checks out connections on the event loop thread while sessions are
+    # closed from the threadpool; with fewer connections than concurrent requests it
+    # stalls until pool_timeout, so the baseline gets one connection per request
+    engine = create_engine(database_url, pool_size=concurrency, max_overflow=0)
+    SessionLocal = sessionmaker(bind=engine)
+    async_engine = create_async_engine(
+        get_async_database_url(database_url),
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    async def get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    async def sync_query(db: Session = Depends(get_db)):
+        return {"count": db.execute(QUERY, {"pattern": "%needle%"}).scalar()}
+
+    @app.get("/async")
+    async def async_query(db: AsyncSession = Depends(get_async_db)):
+        return {"count": (await db.execute(QUERY, {"pattern": "%needle%"})).scalar()}
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app, engine, async_engine
+
+
+def seed(database_url: str, rows: int):
+    engine = create_engine(database_url)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE bench_rows (id INTEGER PRIMARY KEY, payload TEXT)"))
+        conn.execute(
+            text("INSERT INTO bench_rows (payload) VALUES (:payload)"),
+            [{"payload": f"row-{i}-" + "x" * 64} for i in range(rows)],
+        )
+    engine.dispose()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    ping_latencies = []
+    done = asyncio.Event()
+
+    async def db_request():
+        async with semaphore:
+            response = await client.get(path)
+            response.raise_for_status()
+
+    async def pinger():
+        # Latency is measured from when the ping was due, so event loop stalls show up
+        due = time.perf_counter()
+        while not done.is_set():
+            await asyncio.sleep(max(0.0, due - time.perf_counter()))
+            await client.get("/ping")
+            ping_latencies.append((time.perf_counter() - due) * 1000)
+            due = max(due + 0.005, time.perf_counter())
+
+    ping_task = asyncio.create_task(pinger())
+    started = time.perf_counter()
+    await asyncio.gather(*[db_request() for _ in range(requests)])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ping_task
+
+    print(f"{path:<7} 吞吐量: {requests / elapsed:7.1f} req/s | "
+          f"/ping 延迟 p50={statistics.median(ping_latencies):.1f}ms "
+          f"p99={percentile(ping_latencies, 99):.1f}ms "
+          f"max={max(ping_latencies):.1f}ms (样本 {len(ping_latencies)})")
+
+
+async def run(requests: int, concurrency: int, rows: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        seed(database_url, rows)
+        app, engine, async_engine = build_app(database_url, concurrency)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print("=" * 50)
+            print(f"📊 requests={requests} concurrency={concurrency} rows={rows}")
+            await measure(client, "/sync", requests, concurrency)
+            await measure(client, "/async", requests, concurrency)
+        engine.dispose()
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync vs async database benchmark")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=200000)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.rows))
+
+
+if __name__ == "__main__":
+    main()
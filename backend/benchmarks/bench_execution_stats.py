@@ -0,0 +1,127 @@
+"""
+执行统计读取基准测试
+对比每次从 task_executions 聚合 (改造前仪表盘的做法: 按状态计数与平均时长，分位数需要取出全部时长排序)
+与读取 ExecutionStats 预先汇总的一行，并给出增量计入与校正的耗时
+
+用法: python -m backend.benchmarks.bench_execution_stats --executions 200000 --tasks 50 --reads 200
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+import backend.services.execution_stats as execution_stats_module
+from backend.core.database import Base
+from backend.models.engine import Engine
+from backend.models.node import Node
+from backend.models.script import Script, ScriptLanguage, ScriptType
+from backend.models.stats import ExecutionStat, ExecutionStatCursor, ExecutionStatDaily
+from backend.models.task import ExecutionStatus, Task, TaskExecution
+from backend.services.execution_stats import ExecutionStats, summarize
+
+STATUSES = [ExecutionStatus.SUCCESS] * 8 + [ExecutionStatus.FAILED, ExecutionStatus.CANCELLED]
+
+
+def populate(session_factory, executions: int, tasks: int):
+    now = datetime.utcnow()
+    with session_factory() as db:
+        db.add(Node(id="bench-node", name="bench-node", host="127.0.0.1", port=0))
+        db.add(Script(id="bench-script", name="bench", type=ScriptType.PYTHON, language=ScriptLanguage.PYTHON,
+                      filePath="bench.py", fileName="bench.py"))
+        db.add_all([
+            Task(id=f"bench-{i}", name=f"bench-{i}", scriptId="bench-script", parameters="{}", maxRunTime=60)
+            for i in range(tasks)
+        ])
+        db.commit()
+        rows = []
+        for _ in range(executions):
+            end = now - timedelta(minutes=1, seconds=random.uniform(0, 7 * 86400))
+            rows.append({
+                "id": str(uuid.uuid4()),
+                "taskId": f"bench-{random.randrange(tasks)}",
+                "nodeId": "bench-node",
+                "status": random.choice(STATUSES),
+                "startTime": end - timedelta(seconds=random.expovariate(1 / 30)),
+                "endTime": end,
+            })
+        db.execute(TaskExecution.__table__.insert(), rows)
+        db.commit()
+
+
+def aggregate_on_read(db, task_id: str) -> dict:
+    run_time = func.julianday(TaskExecution.endTime) - func.julianday(TaskExecution.startTime)
+    counts = dict(db.execute(
+        select(TaskExecution.status, func.count()).where(TaskExecution.taskId == task_id)
+        .group_by(TaskExecution.status)
+    ).all())
+    durations = sorted(db.execute(
+        select(run_time * 86400).where(TaskExecution.taskId == task_id, TaskExecution.endTime.isnot(None))
+    ).scalars())
+    return {
+        "totalRuns": sum(counts.values()),
+        "averageRunTime": sum(durations) / len(durations) if durations else None,
+        "p50RunTime": durations[len(durations) // 2] if durations else None,
+        "p95RunTime": durations[int(len(durations) * 0.95)] if durations else None,
+    }
+
+
+def timed_reads(reads: int, tasks: int, read) -> float:
+    started = time.perf_counter()
+    for i in range(reads):
+        read(f"bench-{i % tasks}")
+    return (time.perf_counter() - started) / reads * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Execution statistics read benchmark")
+    parser.add_argument("--executions", type=int, default=200000)
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine, tables=[
+        Node.__table__, Script.__table__, Task.__table__, TaskExecution.__table__, Engine.__table__,
+        ExecutionStat.__table__, ExecutionStatDaily.__table__, ExecutionStatCursor.__table__,
+    ])
+    session_factory = sessionmaker(bind=engine)
+    execution_stats_module.SessionLocal = session_factory
+    populate(session_factory, args.executions, args.tasks)
+
+    print("=" * 50)
+    print(f"📊 SQLite {path} executions={args.executions} tasks={args.tasks}")
+    stats = ExecutionStats(interval=5, settle_seconds=5, batch_size=5000, reconcile_interval=3600, reconcile_days=2)
+    started = time.perf_counter()
+    stats.apply_pending()
+    elapsed = time.perf_counter() - started
+    print(f"首次回填: {elapsed:.2f} s ({args.executions / elapsed:,.0f} executions/s)")
+    started = time.perf_counter()
+    corrections = stats.reconcile()
+    print(f"校正最近 2 天: {time.perf_counter() - started:.2f} s, 修正 {corrections} 行")
+
+    with session_factory() as db:
+        before = timed_reads(args.reads, args.tasks, lambda task_id: aggregate_on_read(db, task_id))
+        after = timed_reads(args.reads, args.tasks, lambda task_id: summarize(
+            db.get(ExecutionStat, ("task", task_id), populate_existing=True)
+        ))
+        expected = aggregate_on_read(db, "bench-0")
+        materialized = summarize(db.get(ExecutionStat, ("task", "bench-0")))
+    print(f"每次聚合 task_executions: {before:.2f} ms/次")
+    print(f"读取汇总行: {after:.3f} ms/次")
+    print(f"加速比: {before / after:.0f}x")
+    print(
+        f"bench-0 p50 {expected['p50RunTime']:.2f}s/{materialized['p50RunTime']:.2f}s, "
+        f"p95 {expected['p95RunTime']:.2f}s/{materialized['p95RunTime']:.2f}s (精确/草图)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+任务执行引擎基准测试
+测量调度吞吐量 (jobs/s) 与入队到开始执行的延迟
+
+用法: python -m backend.benchmarks.bench_executor --jobs 2000 --workers 16
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from backend.services.executor import TaskExecutor, ExecutionSpec
+
+
+class BenchExecutor(TaskExecutor):
+    """跳过数据库读写，只测量引擎本身的调度与进程开销"""
+
+    def __init__(self, *args, command, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.command = command
+        self.latencies = []
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    def _begin(self, job):
+        self.latencies.append(time.perf_counter() - job.enqueued_at)
+        return ExecutionSpec(command=self.command, env=None, cwd=None, max_run_time=30)
+
+    def _finish(self, job, result):
+        if self.stats["succeeded"] + self.stats["failed"] >= self.expected:
+            self.done.set()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(jobs: int, workers: int, command):
+    executor = BenchExecutor(max_workers=workers, queue_size=jobs, command=command)
+    executor.expected = jobs
+    await executor.start()
+
+    started = time.perf_counter()
+    for i in range(jobs):
+        executor.submit(f"bench-{i}")
+    submit_elapsed = time.perf_counter() - started
+    await executor.done.wait()
+    elapsed = time.perf_counter() - started
+    await executor.stop()
+
+    latencies_ms = [v * 1000 for v in executor.latencies]
+    print("=" * 50)
+    print(f"📊 jobs={jobs} workers={workers} command={' '.join(command)}")
+    print(f"入队耗时: {submit_elapsed * 1000:.1f} ms ({jobs / submit_elapsed:,.0f} submits/s)")
+    print(f"吞吐量: {jobs / elapsed:,.1f} jobs/s (总耗时 {elapsed:.2f}s)")
+    print(
+        "入队到开始延迟: "
+        f"p50={statistics.median(latencies_ms):.1f}ms "
+        f"p95={percentile(latencies_ms, 95):.1f}ms "
+        f"p99={percentile(latencies_ms, 99):.1f}ms "
+        f"max={max(latencies_ms):.1f}ms"
+    )
+    print(f"成功 {executor.stats['succeeded']}, 失败 {executor.stats['failed']}")
+    return executor.stats["failed"] == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Task executor benchmark")
+    parser.add_argument("--jobs", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--command", nargs="+", default=[sys.executable, "-c", "pass"])
+    args = parser.parse_args()
+    success = asyncio.run(run(args.jobs, args.workers, args.command))
+    exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
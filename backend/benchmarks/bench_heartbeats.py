@@ -0,0 +1,136 @@
+"""
+心跳采集基准测试
+对比逐条写入 (每个样本一次 INSERT + UPDATE + COMMIT) 与缓冲批量写入的持续吞吐量 (samples/s)
+
+用法: python -m backend.benchmarks.bench_heartbeats --nodes 500 --seconds 10
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.orm import sessionmaker
+
+from backend.core.database import Base, _configure_sqlite
+from backend.models.node import Node, NodeMetric
+from backend.services.heartbeats import HeartbeatIngestor, IngestBackpressureError
+
+FIELDS = ["cpuUsage", "memoryUsage", "diskUsage", "processCount", "loadAverage"]
+
+
+def sample():
+    return [
+        time.time(),
+        round(random.uniform(0, 100), 1),
+        round(random.uniform(0, 100), 1),
+        round(random.uniform(0, 100), 1),
+        random.randint(50, 500),
+        round(random.uniform(0, 8), 2),
+    ]
+
+
+def setup(path: str, nodes: int):
+    engine = create_engine(f"sqlite:///{path}")
+    _configure_sqlite(engine)
+    Base.metadata.create_all(engine, tables=[Node.__table__, NodeMetric.__table__])
+    node_ids = [str(uuid.uuid4()) for _ in range(nodes)]
+    with engine.begin() as conn:
+        conn.execute(insert(Node), [
+            {"id": node_id, "name": f"node-{i}", "host": "10.0.0.1", "port": 8000}
+            for i, node_id in enumerate(node_ids)
+        ])
+    return engine, sessionmaker(bind=engine), node_ids
+
+
+def run_per_row(session_factory, node_ids, seconds: float) -> float:
+    """改造前: 每个心跳请求单独写一行并提交"""
+    written = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        node_id = random.choice(node_ids)
+        values = sample()
+        db = session_factory()
+        try:
+            row = {"nodeId": node_id, "timestamp": datetime.utcfromtimestamp(values[0])}
+            row.update(zip(FIELDS, values[1:]))
+            db.execute(insert(NodeMetric), [row])
+            db.execute(update(Node), [{"id": node_id, "lastHeartbeat": datetime.utcnow()}])
+            db.commit()
+        finally:
+            db.close()
+        written += 1
+    return written / (time.perf_counter() - started)
+
+
+async def run_batched(session_factory, node_ids, seconds: float, samples_per_report: int,
+                      batch_size: int, flush_interval: float):
+    """改造后: 请求只进缓冲区，后台批量写入"""
+    ingestor = HeartbeatIngestor(
+        batch_size=batch_size,
+        flush_interval=flush_interval,
+        max_pending=batch_size * 4,
+        session_factory=session_factory,
+    )
+    await ingestor.start()
+    rejected = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        # Offer reports as fast as the ingestor accepts them, yielding so flushes can finish
+        for _ in range(100):
+            try:
+                ingestor.submit(random.choice(node_ids), FIELDS, [sample() for _ in range(samples_per_report)])
+            except IngestBackpressureError:
+                rejected += 1
+                break
+        await asyncio.sleep(0)
+    await ingestor.stop()
+    elapsed = time.perf_counter() - started
+    return ingestor.stats, rejected, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Heartbeat ingestion benchmark")
+    parser.add_argument("--nodes", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--samples-per-report", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--flush-interval", type=float, default=1.0)
+    parser.add_argument("--report-interval", type=float, default=5.0, help="seconds between reports per node")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine, session_factory, node_ids = setup(os.path.join(directory, "bench.db"), args.nodes)
+        required = args.nodes * args.samples_per_report / args.report_interval
+        print("=" * 50)
+        print(f"📊 nodes={args.nodes} 每 {args.report_interval}s 上报一次，需要 {required:,.0f} samples/s")
+
+        per_row = run_per_row(session_factory, node_ids, min(args.seconds, 5.0))
+        print(f"逐条写入: {per_row:,.0f} samples/s")
+
+        stats, rejected, elapsed = asyncio.run(run_batched(
+            session_factory, node_ids, args.seconds, args.samples_per_report,
+            args.batch_size, args.flush_interval,
+        ))
+        batched = stats["flushed_samples"] / elapsed
+        flushes = max(stats["flushes"], 1)
+        print(f"批量写入: {batched:,.0f} samples/s (持续 {elapsed:.1f}s)")
+        print(
+            f"  批次 {stats['flushes']}, 平均每批 {stats['flushed_samples'] / flushes:,.0f} 条, "
+            f"平均写入耗时 {stats['flush_seconds'] / flushes * 1000:.1f} ms"
+        )
+        print(
+            f"  心跳 {stats['received_heartbeats']:,} 次合并为 {stats['flushed_heartbeats']:,} 次 UPDATE, "
+            f"背压拒绝 {rejected}, 丢弃 {stats['dropped_samples']}"
+        )
+        print(f"加速比: {batched / per_row:.1f}x, 相对需求余量 {batched / required:.1f}x")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+预热 worker 池基准测试
+对比冷启动子进程与预热 worker 池运行同一批小型 PYTHON 脚本的吞吐量与单任务耗时
+
+用法: python -m backend.benchmarks.bench_warm_pool --tasks 1000 --workers 8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from backend.services.executor import TaskExecutor, ExecutionSpec
+from backend.services.warm_pool import WarmPool, WarmPoolConfig
+import backend.services.executor as executor_module
+
+# A short job whose cost is dominated by interpreter startup and imports
+SCRIPT = """
+import json
+import re
+import datetime
+import urllib.request
+
+payload = json.loads('{"items": [1, 2, 3]}')
+print(re.sub(r"\\d", "#", json.dumps(payload)), datetime.date.today())
+"""
+
+PRELOAD = ["json", "re", "datetime", "urllib.request"]
+
+
+class BenchExecutor(TaskExecutor):
+    """跳过数据库读写，只测量进程启动与脚本运行"""
+
+    def __init__(self, *args, script_path, warm, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.script_path = script_path
+        self.warm = warm
+        self.durations = []
+        self.done = asyncio.Event()
+        self.expected = 0
+
+    def _begin(self, job):
+        return ExecutionSpec(
+            command=[sys.executable, self.script_path],
+            env=None,
+            cwd=None,
+            max_run_time=30,
+            warm_script=self.script_path if self.warm else None,
+        )
+
+    async def _spawn(self, job, spec):
+        started = time.perf_counter()
+        result = await super()._spawn(job, spec)
+        self.durations.append(time.perf_counter() - started)
+        return result
+
+    def _finish(self, job, result):
+        if self.stats["succeeded"] + self.stats["failed"] >= self.expected:
+            self.done.set()
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_mode(tasks: int, workers: int, script_path: str, pool: WarmPool = None):
+    executor = BenchExecutor(
+        max_workers=workers, queue_size=tasks, script_path=script_path, warm=pool is not None
+    )
+    executor.expected = tasks
+    await executor.start()
+    started = time.perf_counter()
+    for i in range(tasks):
+        executor.submit(f"bench-{i}")
+    await executor.done.wait()
+    elapsed = time.perf_counter() - started
+    await executor.stop()
+
+    durations_ms = [v * 1000 for v in executor.durations]
+    label = "预热 worker 池" if pool else "冷启动子进程"
+    print(f"[{label}]")
+    print(f"  吞吐量: {tasks / elapsed:,.1f} tasks/s (总耗时 {elapsed:.2f}s)")
+    print(
+        "  单任务耗时: "
+        f"p50={statistics.median(durations_ms):.1f}ms "
+        f"p95={percentile(durations_ms, 95):.1f}ms "
+        f"max={max(durations_ms):.1f}ms"
+    )
+    print(f"  成功 {executor.stats['succeeded']}, 失败 {executor.stats['failed']}")
+    return elapsed, executor.stats["failed"] == 0
+
+
+async def run(tasks: int, workers: int, max_runs: int):
+    with tempfile.TemporaryDirectory() as directory:
+        script_path = os.path.join(directory, "job.py")
+        with open(script_path, "w") as f:
+            f.write(SCRIPT)
+
+        print("=" * 50)
+        print(f"📊 tasks={tasks} workers={workers} maxRuns={max_runs}")
+        cold_elapsed, cold_ok = await run_mode(tasks, workers, script_path)
+
+        pool = WarmPool()
+        spawn_started = time.perf_counter()
+        await pool.start(WarmPoolConfig(enabled=True, size=workers, preload=PRELOAD, max_runs=max_runs))
+        print(f"预热 {workers} 个 worker 耗时: {(time.perf_counter() - spawn_started) * 1000:.0f} ms")
+        executor_module.warm_pool = pool
+        try:
+            warm_elapsed, warm_ok = await run_mode(tasks, workers, script_path, pool)
+        finally:
+            await pool.stop()
+        stats = pool.stats
+        print(f"worker 回收: 按次数 {stats['recycled_runs']}, 按内存 {stats['recycled_memory']}, 异常 {stats['killed']}")
+        print(f"加速比: {cold_elapsed / warm_elapsed:.1f}x")
+    return cold_ok and warm_ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm worker pool benchmark")
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--max-runs", type=int, default=100)
+    args = parser.parse_args()
+    success = asyncio.run(run(args.tasks, args.workers, args.max_runs))
+    exit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,11 +10,20 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str = "sqlite:///./task_scheduler.db"
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: int = 30
+    db_pool_recycle: int = 1800
     
     # Security
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    auth_cache_ttl_seconds: float = 60.0  # resolved users and permissions, never past the token's exp
+    auth_cache_max_entries: int = 10000
+    bcrypt_rounds: int = 12  # changing it rehashes each password at its owner's next login
+    password_hash_workers: int = 4  # concurrent bcrypt computations
+    password_hash_max_pending: int = 256  # logins waiting for a hash beyond this get 503
     
     # CORS
     backend_cors_origins: list = ["http://localhost:3000", "http://localhost:3001"]
@@ -22,9 +31,122 @@ class Settings(BaseSettings):
     # File upload
     upload_dir: str = "./uploads"
     max_file_size: int = 100 * 1024 * 1024  # 100MB
+    upload_chunk_size: int = 1024 * 1024
+    precompress_min_size: int = 1024  # smaller uploads get no .gz variant
+    blob_collect_delay: float = 60.0  # content of deleted scripts is removed this long after, if still unused
     
-    # Redis (for Celery)
+    # Task execution
+    executor_max_workers: int = 8
+    executor_queue_size: int = 10000
+    local_node_name: str = "controller"
+
+    # Execution logs
+    log_dir: str = "./logs"
+    log_segment_size: int = 64 * 1024 * 1024  # roll over to a new segment file
+    log_chunk_size: int = 64 * 1024  # pipe read / range read / tail chunk
+    log_inline_tail_bytes: int = 4096  # stdout/stderr tail kept on TaskExecution
+
+    # Node script cache
+    script_cache_dir: str = "./cache/scripts"
+    script_cache_max_bytes: int = 1024 * 1024 * 1024  # 1GB
+    script_cache_prefetch_minutes: int = 10
+    script_cache_prefetch_interval: float = 60.0
+    script_cache_controller_url: Optional[str] = None  # remote nodes download from here
+    script_cache_controller_token: Optional[str] = None
+
+    # Script environments
+    env_dir: str = "./cache/envs"
+    env_pool_size: int = 20  # ready environments kept per node
+    env_build_timeout: int = 900
+
+    # Warm Python workers, overridden by the warmPool section of the named Engine's config
+    warm_pool_enabled: bool = False
+    warm_pool_engine: Optional[str] = "python"
+    warm_pool_size: int = 4
+    warm_pool_preload: list = ["json", "re", "datetime", "urllib.request"]
+    warm_pool_max_runs: int = 100  # recycle a worker after this many scripts
+    warm_pool_max_memory_growth_mb: int = 256  # recycle when RSS grows past its start by this much
+
+    # Heartbeat ingestion
+    heartbeat_batch_size: int = 5000  # flush once this many samples are buffered
+    heartbeat_flush_interval: float = 1.0  # or after this many seconds
+    heartbeat_max_pending: int = 200000  # reject reports with 503 beyond this
+
+    # Node metrics
+    metrics_rollup_interval: float = 60.0
+    metrics_rollup_delay: float = 30.0  # samples arriving later than this miss their minute
+    metrics_raw_retention_hours: int = 48
+    metrics_minute_retention_days: int = 14
+    metrics_hour_retention_days: int = 400
+    metrics_memory_window_hours: float = 6.0  # recent raw samples kept as NumPy columns for aggregation
+    metrics_memory_block_size: int = 65536
+    metrics_memory_poll_interval: float = 2.0  # new samples from every replica are read by id this often
+
+    # Node failure detection
+    failure_detector_policy: str = "phi"  # "phi" (phi-accrual) or "timeout"
+    failure_detector_timeout: float = 15.0  # upper bound on silence, and the whole rule for "timeout"
+    failure_detector_phi_threshold: float = 8.0
+    failure_detector_min_std: float = 0.5  # seconds, keeps very regular nodes from tripping on jitter
+    failure_detector_window: int = 100  # heartbeat intervals remembered per node
+    failure_detector_check_interval: float = 0.5
+
+    # Bulk task endpoints
+    task_bulk_chunk_size: int = 5000  # rows per transaction
+    task_bulk_max_items: int = 100000  # per request
+
+    # Scheduling
+    scheduler_retry_seconds: int = 30
+    dispatcher_queue_size: int = 100000
+    dispatcher_aging_seconds: float = 60.0
+    dispatcher_refresh_seconds: float = 30.0
+    scheduler_refresh_seconds: float = 30.0  # leader reloads schedules edited through other replicas
+    dependency_poll_interval: float = 1.0  # leader reads dependency edits and executions of other replicas
+    dependency_poll_lag: float = 10.0  # re-read window for rows committed after their timestamps
+
+    # Execution statistics, materialized by the leader from finished task executions
+    execution_stats_interval: float = 5.0
+    execution_stats_settle_seconds: float = 5.0  # executions committed later than this wait for reconciliation
+    execution_stats_batch_size: int = 1000
+    execution_stats_reconcile_interval: float = 3600.0
+    execution_stats_reconcile_days: int = 2  # recent days recounted from task_executions
+
+    # Retention: rows older than this many days are archived as gzipped JSON lines under retention_archive_dir
+    # (one directory per table and day) and deleted; 0 keeps the table forever. node_metrics is otherwise
+    # pruned without archiving after metrics_raw_retention_hours
+    retention_days: dict = {
+        "task_executions": 90,  # must exceed execution_stats_reconcile_days
+        "script_executions": 90,
+        "node_metrics": 0,
+        "engine_metrics": 30,
+        "notification_logs": 90,
+        "user_activities": 180,
+    }
+    retention_archive_dir: str = "./archive"  # shared storage when several replicas serve archive queries
+    retention_interval: float = 3600.0
+    retention_batch_size: int = 5000  # rows read per archive part
+    retention_delete_chunk: int = 500  # rows per delete transaction
+    retention_delete_pause: float = 0.05  # seconds between delete transactions, lets other writers in
+    retention_max_batches: int = 100  # per table per pass
+
+    # Leader election: "none" runs the scheduler in every process, "database" or "redis" (redis_url)
+    # share a lease so only one replica runs the schedule and dependency loops
+    leader_election_backend: str = "none"
+    leader_election_name: str = "task-scheduler:leader"
+    leader_election_lease_seconds: float = 6.0  # a crashed leader is replaced within about this long
+    leader_election_renew_interval: float = 2.0
+    leader_election_replica_id: Optional[str] = None  # defaults to host:pid:random
+    
+    # Redis (task queue and Celery)
     redis_url: str = "redis://localhost:6379"
+
+    # Task queue: "local" keeps dispatch state in this process, "redis" shares it through redis_url
+    # across controller replicas and nodes, "memory" is the in-process stand-in with redis semantics
+    task_queue_backend: str = "local"
+    task_queue_prefix: str = "task-scheduler"
+    task_queue_worker: bool = False  # pull and run queued tasks as the node named local_node_name
+    task_queue_visibility_timeout: float = 60.0  # unacknowledged deliveries go back on the queue after this
+    task_queue_sweep_interval: float = 5.0
+    task_queue_poll_interval: float = 0.5  # longest wait between pulls while the queue is empty
     
     # AI SDK
     z_ai_api_key: Optional[str] = None
@@ -2,13 +2,67 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from backend.core.config import settings
 
-engine = create_engine(settings.database_url)
+# Async drivers used for the same database the sync engine points at
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def get_async_database_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False) if driver else url
+
+def _engine_options(url: str, is_async: bool = False) -> dict:
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    options = {}
+    if is_async and parsed.get_backend_name() == "sqlite":
+        # aiosqlite defaults to NullPool, which reconnects on every session
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return {
+        **options,
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": True,
+    }
+
+def _configure_sqlite(engine):
+    # WAL lets readers proceed while a writer holds the lock; busy_timeout queues writers
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={settings.db_pool_timeout * 1000}")
+        cursor.close()
+
+engine = create_engine(settings.database_url, **_engine_options(settings.database_url))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(
+    get_async_database_url(settings.database_url),
+    **_engine_options(settings.database_url, is_async=True)
+)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+if engine.dialect.name == "sqlite":
+    _configure_sqlite(engine)
+    _configure_sqlite(async_engine.sync_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -18,5 +72,20 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    ensure_indexes()
+
+def ensure_indexes():
+    """为已存在的表补建模型中声明的索引
+
+    create_all 只在建表时创建索引，旧库升级后通过这里补齐；
+    已存在的索引会被跳过，可重复执行。
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,8 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """时区感知的时间转为 UTC 后去掉时区，与库中按 utcnow() 写入的 naive 时间可比较"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
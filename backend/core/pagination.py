@@ -0,0 +1,62 @@
+import base64
+import json
+from datetime import datetime
+from typing import Generic, List, Optional, Tuple, TypeVar, Union
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import Select, String, tuple_, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar("T")
+
+MAX_PAGE_SIZE = 1000
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+def encode_cursor(created_at: Union[datetime, str], id: str) -> str:
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """返回游标中的 createdAt 原文与 id"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, id = json.loads(raw)
+        datetime.fromisoformat(created_at)
+        return created_at, str(id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+async def paginate(db: AsyncSession, query: Select, model, cursor: Optional[str], limit: int) -> dict:
+    """按 (createdAt, id) 倒序的游标分页
+
+    依赖 (createdAt, id) 复合索引，任意深度的翻页都是一次索引范围扫描，
+    翻页期间插入的新数据也不会造成重复或遗漏。
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    sort_key = model.createdAt
+    if db.get_bind().dialect.name == "sqlite":
+        # SQLite keeps DateTime as text and func.now() defaults have no fractional seconds, while a bound
+        # datetime always renders microseconds; comparing the stored text keeps the cursor row equal to itself
+        sort_key = type_coerce(model.createdAt, String)
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        if sort_key is model.createdAt:
+            created_at = datetime.fromisoformat(created_at)
+        query = query.where(tuple_(sort_key, model.id) < tuple_(created_at, id))
+    query = query.add_columns(sort_key.label("cursor_key")).order_by(model.createdAt.desc(), model.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    items = [row[0] for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(rows[limit - 1][1], items[-1].id)
+    return {"items": items, "next_cursor": next_cursor}
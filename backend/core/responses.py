@@ -0,0 +1,114 @@
+import os
+from typing import List, Optional, Tuple
+
+import anyio
+from starlette.responses import FileResponse
+from starlette.types import Receive, Scope, Send
+
+# Pre-compressed variants stored next to a file, in order of preference
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+class RangeNotSatisfiable(Exception):
+    """Range 超出文件大小"""
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """解析单段 Range 头，返回闭区间 (start, end)；无 Range 或多段时返回 None"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start, _, end = header[len("bytes="):].strip().partition("-")
+    try:
+        if not start:
+            # Suffix range: the last N bytes
+            length = int(end)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - length), size - 1
+        first = int(start)
+        last = min(int(end), size - 1) if end else size - 1
+    except ValueError:
+        return None
+    if first >= size or first > last:
+        raise RangeNotSatisfiable()
+    return first, last
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match 弱比较"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def accepted_encodings(header: Optional[str]) -> List[str]:
+    """Accept-Encoding 中 q > 0 的编码"""
+    encodings = []
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            encodings.append(name.strip().lower())
+    return encodings
+
+
+def select_variant(path: str, accept_encoding: Optional[str]) -> Tuple[str, Optional[str], os.stat_result]:
+    """选择客户端可接受的预压缩文件，返回 (路径, Content-Encoding, stat) (在线程中调用)"""
+    accepted = accepted_encodings(accept_encoding)
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        if encoding in accepted or "*" in accepted:
+            try:
+                return path + suffix, encoding, os.stat(path + suffix)
+            except FileNotFoundError:
+                continue
+    return path, None, os.stat(path)
+
+
+class RangeFileResponse(FileResponse):
+    """支持单段 Range 的文件响应，服务器提供 zerocopysend 扩展时走 sendfile"""
+
+    def __init__(self, path: str, stat_result: os.stat_result, byte_range: Optional[Tuple[int, int]] = None, **kwargs):
+        super().__init__(path, stat_result=stat_result, **kwargs)
+        size = stat_result.st_size
+        self.start, end = byte_range or (0, size - 1)
+        self.length = end - self.start + 1
+        self.headers["accept-ranges"] = "bytes"
+        self.headers["content-length"] = str(self.length)
+        if byte_range:
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {self.start}-{end}/{size}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only or self.length <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": self.start,
+                    "count": self.length,
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.start)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
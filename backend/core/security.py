@@ -1,13 +1,17 @@
+import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from backend.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes made with other rounds still verify and are flagged for rehash by verify_and_update
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -15,37 +19,63 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.secret_key, algorithm=settings.algorithm)
-    return encoded_jwt
+class PasswordHasherBusyError(Exception):
+    """等待哈希的请求过多"""
 
-def verify_token(token: str) -> Optional[dict]:
-    try:
-        payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
-        return payload
-    except JWTError:
-        return None
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+class PasswordHasher:
+    """在专用线程池中执行 bcrypt，事件循环不被 100ms 级的哈希计算阻塞
 
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from backend.core.config import settings
+    线程数即同时进行的哈希数，排队超过 max_pending 时直接拒绝，避免登录洪峰堆积无限的等待
+    """
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    def __init__(self, workers: int, max_pending: int, context: CryptContext = pwd_context):
+        self.max_pending = max_pending
+        self.context = context
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._pending = 0
+        self.stats = {
+            "hashed": 0,
+            "verified": 0,
+            "rehashed": 0,
+            "rejected": 0,
+        }
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    async def verify(self, plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+        """返回 (是否匹配, 新哈希)；哈希参数已过时则新哈希不为空，调用方应保存
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+        hashed_password 为空 (用户不存在) 时仍执行一次等价耗时的哈希，响应时间不泄露用户是否存在
+        """
+        if hashed_password is None:
+            await self._run(self.context.dummy_verify)
+            return False, None
+        valid, new_hash = await self._run(self.context.verify_and_update, plain_password, hashed_password)
+        self.stats["verified"] += 1
+        if new_hash:
+            self.stats["rehashed"] += 1
+        return valid, new_hash
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(self.context.hash, password)
+        self.stats["hashed"] += 1
+        return hashed
+
+    def report(self) -> dict:
+        return {**self.stats, "pending": self._pending, "maxPending": self.max_pending}
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise PasswordHasherBusyError(f"{self._pending} password hashes waiting")
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._pending -= 1
+
+password_hasher = PasswordHasher(
+    workers=settings.password_hash_workers,
+    max_pending=settings.password_hash_max_pending,
+)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
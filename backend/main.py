@@ -4,15 +4,55 @@ from fastapi.security import HTTPBearer
 import uvicorn
 from contextlib import asynccontextmanager
 
-from backend.core.database import create_tables
-from backend.api.v1 import auth, users, tasks, scripts, spiders, nodes, notifications
+from backend.core.database import create_tables, async_engine
+from backend.services.executor import task_executor
+from backend.services.dispatcher import task_dispatcher
+from backend.services.scheduler import schedule_engine
+from backend.services.dependencies import dependency_engine
+from backend.services.script_cache import script_cache
+from backend.services.environments import environment_manager
+from backend.services.warm_pool import warm_pool
+from backend.services.heartbeats import heartbeat_ingestor
+from backend.services.metrics import metric_store
+from backend.services.fleet_metrics import fleet_metrics
+from backend.services.failure_detector import failure_detector
+from backend.services.leader import leader_election
+from backend.services.execution_stats import execution_stats
+from backend.services.retention import retention_engine
+from backend.api.v1 import auth, users, tasks, scripts, nodes, notifications, archive
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     create_tables()
+    await fleet_metrics.start()
+    await heartbeat_ingestor.start()
+    await warm_pool.start()
+    await task_executor.start()
+    await task_dispatcher.start()
+    # Only the replica holding the leader lease runs the failure detector and the metric rollup,
+    # dependency, schedule, statistics and retention loops
+    leader_election.on_elected.extend([
+        metric_store.start, failure_detector.start, dependency_engine.start, schedule_engine.start,
+        execution_stats.start, retention_engine.start
+    ])
+    leader_election.on_demoted.extend([
+        retention_engine.stop, execution_stats.stop, schedule_engine.stop, dependency_engine.stop,
+        failure_detector.stop, metric_store.stop
+    ])
+    await leader_election.start()
+    await environment_manager.start()
+    await script_cache.start()
     yield
     # Shutdown
+    await script_cache.stop()
+    await leader_election.stop()
+    await task_dispatcher.stop()
+    await task_executor.stop()
+    await warm_pool.stop()
+    await heartbeat_ingestor.stop()
+    await fleet_metrics.stop()
+    await async_engine.dispose()
 
 app = FastAPI(
     title="Task Scheduler API",
@@ -35,9 +75,9 @@ app.include_router(auth.router, prefix="/api/v1/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/v1/users", tags=["users"])
 app.include_router(tasks.router, prefix="/api/v1/tasks", tags=["tasks"])
 app.include_router(scripts.router, prefix="/api/v1/scripts", tags=["scripts"])
-app.include_router(spiders.router, prefix="/api/v1/spiders", tags=["spiders"])
 app.include_router(nodes.router, prefix="/api/v1/nodes", tags=["nodes"])
 app.include_router(notifications.router, prefix="/api/v1/notifications", tags=["notifications"])
+app.include_router(archive.router, prefix="/api/v1/archive", tags=["archive"])
 
 @app.get("/")
 async def root():
@@ -1,16 +1,20 @@
 from .user import User, Role, Permission, UserRole, RolePermission
-from .node import Node
+from .node import Node, NodeMetric, NodeMetricRollup
 from .script import Script, ScriptVersion
-from .engine import Engine, EngineVersion
-from .task import Task, TaskSchedule, TaskExecution, TaskDependency
-from .spider import SpiderProject
-from .notification import Notification, NotificationConfig
-from .profile import UserProfile, UserSetting
+from .engine import Engine, EngineInstance, EngineMetric, EngineConfig
+from .task import Task, TaskSchedule, TaskExecution, TaskExecutionLog, TaskDependency
+from .spider import Spider
+from .notification import Notification, NotificationLog, NotificationTemplate, NotificationSetting
+from .profile import UserProfile, UserSetting, UserActivity, UserSession
+from .lease import LeaderLease
+from .stats import ExecutionStat, ExecutionStatDaily, ExecutionStatCursor
 
 __all__ = [
     "User", "Role", "Permission", "UserRole", "RolePermission",
-    "Node", "Script", "ScriptVersion", "Engine", "EngineVersion",
-    "Task", "TaskSchedule", "TaskExecution", "TaskDependency",
-    "SpiderProject", "Notification", "NotificationConfig",
-    "UserProfile", "UserSetting"
+    "Node", "NodeMetric", "NodeMetricRollup", "Script", "ScriptVersion",
+    "Engine", "EngineInstance", "EngineMetric", "EngineConfig",
+    "Task", "TaskSchedule", "TaskExecution", "TaskExecutionLog", "TaskDependency",
+    "Spider", "Notification", "NotificationLog", "NotificationTemplate", "NotificationSetting",
+    "UserProfile", "UserSetting", "UserActivity", "UserSession", "LeaderLease",
+    "ExecutionStat", "ExecutionStatDaily", "ExecutionStatCursor"
 ]
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Enum, ForeignKey
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -56,7 +56,7 @@ class Engine(Base):
     failedRuns = Column(Integer, default=0)
     averageRunTime = Column(Integer, nullable=True)  # average run time in seconds
     tags = Column(Text, nullable=True)  # JSON string for engine tags
-    metadata = Column(Text, nullable=True)  # JSON string for additional metadata
+    metadata_ = Column('metadata', Text, nullable=True)  # JSON string for additional metadata
     author = Column(String, nullable=True)
     category = Column(String, nullable=True)
     createdAt = Column(DateTime, default=func.now())
@@ -95,6 +95,8 @@ class EngineInstance(Base):
 
 class EngineMetric(Base):
     __tablename__ = "engine_metrics"
+    # Retention archives and deletes across all engines by time
+    __table_args__ = (Index("ix_engine_metrics_timestamp", "timestamp"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     engineId = Column(String, ForeignKey('engines.id', ondelete='CASCADE'), nullable=False)
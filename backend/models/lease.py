@@ -0,0 +1,13 @@
+from sqlalchemy import Column, String, DateTime, Integer
+from ..core.database import Base
+
+class LeaderLease(Base):
+    __tablename__ = "leader_leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=True)  # replica id, NULL once released
+    term = Column(Integer, nullable=False, default=1)  # bumped on every change of holder
+    version = Column(Integer, nullable=False, default=1)  # bumped on every renewal
+    acquiredAt = Column(DateTime, nullable=True)
+    renewedAt = Column(DateTime, nullable=True)
+    expiresAt = Column(DateTime, nullable=True)  # holder's clock, informational only
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Enum
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, BigInteger, Float, Text, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -20,13 +20,14 @@ class NodeHealth(enum.Enum):
 
 class Node(Base):
     __tablename__ = "nodes"
+    __table_args__ = (Index("ix_nodes_createdAt_id", "createdAt", "id"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
     host = Column(String, nullable=False)
     port = Column(Integer, nullable=False)
     description = Column(Text, nullable=True)
-    status = Column(Enum(NodeStatus), default=NodeStatus.OFFLINE)
+    status = Column(Enum(NodeStatus), default=NodeStatus.OFFLINE, index=True)
     health = Column(Enum(NodeHealth), default=NodeHealth.UNKNOWN)
     isAvailable = Column(Boolean, default=True)
     maxConcurrentTasks = Column(Integer, default=1)
@@ -40,7 +41,7 @@ class Node(Base):
     lastHeartbeat = Column(DateTime, nullable=True)
     lastHealthCheck = Column(DateTime, nullable=True)
     tags = Column(Text, nullable=True)  # JSON string for node tags
-    metadata = Column(Text, nullable=True)  # JSON string for additional metadata
+    metadata_ = Column('metadata', Text, nullable=True)  # JSON string for additional metadata
     createdAt = Column(DateTime, default=func.now())
     updatedAt = Column(DateTime, default=func.now(), onupdate=func.now())
     
@@ -48,22 +49,57 @@ class Node(Base):
     tasks = relationship("Task", back_populates="node")
     taskExecutions = relationship("TaskExecution", back_populates="node")
     nodeMetrics = relationship("NodeMetric", back_populates="node")
+    metricRollups = relationship("NodeMetricRollup", back_populates="node")
 
 class NodeMetric(Base):
     __tablename__ = "node_metrics"
+    __table_args__ = (
+        Index("ix_node_metrics_nodeId_timestamp", "nodeId", "timestamp"),
+        # Rollup windows and retention cut across all nodes by time
+        Index("ix_node_metrics_timestamp", "timestamp"),
+    )
     
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    # Raw samples are the largest table, an integer key keeps rows and the index small
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
     nodeId = Column(String, ForeignKey('nodes.id', ondelete='CASCADE'), nullable=False)
-    cpuUsage = Column(String, nullable=False)  # percentage
-    memoryUsage = Column(String, nullable=False)  # percentage
-    diskUsage = Column(String, nullable=False)  # percentage
-    networkIO = Column(String, nullable=True)  # bytes in/out
-    diskIO = Column(String, nullable=True)  # bytes read/write
+    cpuUsage = Column(Float, nullable=False)  # percentage
+    memoryUsage = Column(Float, nullable=False)  # percentage
+    diskUsage = Column(Float, nullable=False)  # percentage
+    networkIO = Column(Float, nullable=True)  # bytes/s in + out
+    diskIO = Column(Float, nullable=True)  # bytes/s read + write
     processCount = Column(Integer, nullable=True)
-    loadAverage = Column(String, nullable=True)  # system load average
-    temperature = Column(String, nullable=True)  # CPU temperature
-    uptime = Column(String, nullable=True)  # system uptime
+    loadAverage = Column(Float, nullable=True)  # 1 minute system load average
+    temperature = Column(Float, nullable=True)  # CPU temperature in °C
+    uptime = Column(BigInteger, nullable=True)  # seconds
     timestamp = Column(DateTime, default=func.now())
     
     # Relationships
-    node = relationship("Node", back_populates="nodeMetrics")
\ No newline at end of file
+    node = relationship("Node", back_populates="nodeMetrics")
+
+class NodeMetricRollup(Base):
+    __tablename__ = "node_metric_rollups"
+    __table_args__ = (Index("ix_node_metric_rollups_resolution_bucket", "resolution", "bucket"),)
+
+    # One row per node per window, the key doubles as the per-node series index
+    nodeId = Column(String, ForeignKey('nodes.id', ondelete='CASCADE'), primary_key=True)
+    resolution = Column(Integer, primary_key=True)  # window length in seconds (60, 3600)
+    bucket = Column(DateTime, primary_key=True)  # window start
+    cpuUsageMin = Column(Float, nullable=True)
+    cpuUsageMax = Column(Float, nullable=True)
+    cpuUsageSum = Column(Float, nullable=True)
+    cpuUsageCount = Column(Integer, default=0)
+    memoryUsageMin = Column(Float, nullable=True)
+    memoryUsageMax = Column(Float, nullable=True)
+    memoryUsageSum = Column(Float, nullable=True)
+    memoryUsageCount = Column(Integer, default=0)
+    diskUsageMin = Column(Float, nullable=True)
+    diskUsageMax = Column(Float, nullable=True)
+    diskUsageSum = Column(Float, nullable=True)
+    diskUsageCount = Column(Integer, default=0)
+    loadAverageMin = Column(Float, nullable=True)
+    loadAverageMax = Column(Float, nullable=True)
+    loadAverageSum = Column(Float, nullable=True)
+    loadAverageCount = Column(Integer, default=0)
+
+    # Relationships
+    node = relationship("Node", back_populates="metricRollups")
\ No newline at end of file
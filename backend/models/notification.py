@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Enum, ForeignKey
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -30,14 +30,18 @@ class NotificationPriority(enum.Enum):
 
 class Notification(Base):
     __tablename__ = "notifications"
+    __table_args__ = (
+        Index("ix_notifications_createdAt_id", "createdAt", "id"),
+        Index("ix_notifications_status_scheduledAt", "status", "scheduledAt"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    type = Column(Enum(NotificationType), nullable=False)
+    type = Column(Enum(NotificationType), nullable=False, index=True)
     status = Column(Enum(NotificationStatus), default=NotificationStatus.PENDING)
     priority = Column(Enum(NotificationPriority), default=NotificationPriority.NORMAL)
     title = Column(String, nullable=False)
     message = Column(Text, nullable=False)
-    recipient = Column(String, nullable=False)  # email, phone number, webhook URL, etc.
+    recipient = Column(String, nullable=False, index=True)  # email, phone number, webhook URL, etc.
     sender = Column(String, nullable=True)
     subject = Column(String, nullable=True)  # for email notifications
     template = Column(String, nullable=True)  # notification template name
@@ -50,7 +54,7 @@ class Notification(Base):
     deliveredAt = Column(DateTime, nullable=True)
     readAt = Column(DateTime, nullable=True)
     error = Column(Text, nullable=True)  # error message if failed
-    metadata = Column(Text, nullable=True)  # JSON string for additional metadata
+    metadata_ = Column('metadata', Text, nullable=True)  # JSON string for additional metadata
     tags = Column(Text, nullable=True)  # JSON string for notification tags
     isActive = Column(Boolean, default=True)
     createdAt = Column(DateTime, default=func.now())
@@ -58,10 +62,10 @@ class Notification(Base):
     
     # Relationships
     notificationLogs = relationship("NotificationLog", back_populates="notification")
-    notificationTemplates = relationship("NotificationTemplate", back_populates="notifications")
 
 class NotificationLog(Base):
     __tablename__ = "notification_logs"
+    __table_args__ = (Index("ix_notification_logs_sentAt", "sentAt"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     notificationId = Column(String, ForeignKey('notifications.id', ondelete='CASCADE'), nullable=False)
@@ -71,7 +75,7 @@ class NotificationLog(Base):
     attempt = Column(Integer, nullable=False)
     sentAt = Column(DateTime, default=func.now())
     response = Column(Text, nullable=True)  # response from notification service
-    metadata = Column(Text, nullable=True)  # JSON string for additional metadata
+    metadata_ = Column('metadata', Text, nullable=True)  # JSON string for additional metadata
     
     # Relationships
     notification = relationship("Notification", back_populates="notificationLogs")
@@ -91,9 +95,6 @@ class NotificationTemplate(Base):
     version = Column(String, nullable=False, default="1.0")
     createdAt = Column(DateTime, default=func.now())
     updatedAt = Column(DateTime, default=func.now(), onupdate=func.now())
-    
-    # Relationships
-    notifications = relationship("Notification", back_populates="notificationTemplates")
 
 class NotificationSetting(Base):
     __tablename__ = "notification_settings"
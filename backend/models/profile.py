@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Enum, ForeignKey
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -61,13 +61,17 @@ class UserSetting(Base):
 
 class UserActivity(Base):
     __tablename__ = "user_activities"
+    __table_args__ = (
+        Index("ix_user_activities_userId_timestamp", "userId", "timestamp"),
+        Index("ix_user_activities_timestamp", "timestamp"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     userId = Column(String, ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
     action = Column(String, nullable=False)
     resource = Column(String, nullable=True)
     resourceId = Column(String, nullable=True)
-    metadata = Column(Text, nullable=True)  # JSON string for additional metadata
+    metadata_ = Column('metadata', Text, nullable=True)  # JSON string for additional metadata
     ipAddress = Column(String, nullable=True)
     userAgent = Column(String, nullable=True)
     timestamp = Column(DateTime, default=func.now())
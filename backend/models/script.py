@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Enum, ForeignKey
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, Enum, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -27,17 +27,18 @@ class ScriptLanguage(enum.Enum):
 
 class Script(Base):
     __tablename__ = "scripts"
+    __table_args__ = (Index("ix_scripts_createdAt_id", "createdAt", "id"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
-    type = Column(Enum(ScriptType), nullable=False)
+    type = Column(Enum(ScriptType), nullable=False, index=True)
     language = Column(Enum(ScriptLanguage), nullable=False)
     version = Column(String, nullable=False, default="1.0.0")
-    status = Column(Enum(ScriptStatus), default=ScriptStatus.ACTIVE)
+    status = Column(Enum(ScriptStatus), default=ScriptStatus.ACTIVE, index=True)
     filePath = Column(String, nullable=False)  # path to script file
     fileName = Column(String, nullable=False)  # script filename
-    fileHash = Column(String, nullable=True)  # MD5/SHA256 hash for integrity
+    fileHash = Column(String, nullable=True, index=True)  # SHA256 of the content-addressed blob
     fileSize = Column(Integer, nullable=True)  # file size in bytes
     parameters = Column(Text, nullable=True)  # JSON string for parameter definitions
     requirements = Column(Text, nullable=True)  # JSON string for dependencies
@@ -45,7 +46,7 @@ class Script(Base):
     timeout = Column(Integer, nullable=True)  # default timeout in seconds
     maxRetries = Column(Integer, nullable=True)  # default max retry count
     tags = Column(Text, nullable=True)  # JSON string for script tags
-    metadata = Column(Text, nullable=True)  # JSON string for additional metadata
+    metadata_ = Column('metadata', Text, nullable=True)  # JSON string for additional metadata
     author = Column(String, nullable=True)
     category = Column(String, nullable=True)
     isPublic = Column(Boolean, default=False)
@@ -64,10 +65,10 @@ class ScriptVersion(Base):
     __tablename__ = "script_versions"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    scriptId = Column(String, ForeignKey('scripts.id', ondelete='CASCADE'), nullable=False)
+    scriptId = Column(String, ForeignKey('scripts.id', ondelete='CASCADE'), nullable=False, index=True)
     version = Column(String, nullable=False)
     filePath = Column(String, nullable=False)
-    fileHash = Column(String, nullable=True)
+    fileHash = Column(String, nullable=True, index=True)
     fileSize = Column(Integer, nullable=True)
     changelog = Column(Text, nullable=True)
     isCurrent = Column(Boolean, default=False)
@@ -78,6 +79,7 @@ class ScriptVersion(Base):
 
 class ScriptExecution(Base):
     __tablename__ = "script_executions"
+    __table_args__ = (Index("ix_script_executions_endTime", "endTime"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     scriptId = Column(String, ForeignKey('scripts.id', ondelete='CASCADE'), nullable=False)
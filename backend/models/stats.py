@@ -0,0 +1,36 @@
+from sqlalchemy import Column, String, DateTime, Integer, Float, Text
+from ..core.database import Base
+
+class ExecutionStatColumns:
+    scope = Column(String, primary_key=True)  # all, task, node, engine
+    key = Column(String, primary_key=True)  # task/node/engine id, "*" for scope all
+    totalRuns = Column(Integer, default=0)
+    successfulRuns = Column(Integer, default=0)
+    failedRuns = Column(Integer, default=0)
+    cancelledRuns = Column(Integer, default=0)
+    runTimeTotal = Column(Float, default=0.0)  # seconds, over runs with both start and end time
+    runTimeCount = Column(Integer, default=0)
+    runTimeSketch = Column(Text, nullable=True)  # JSON log-bucket histogram of run times
+    p50RunTime = Column(Float, nullable=True)  # from the sketch, kept next to it for cheap reads
+    p95RunTime = Column(Float, nullable=True)
+    lastRunAt = Column(DateTime, nullable=True)  # latest endTime counted
+    updatedAt = Column(DateTime, nullable=True)
+
+class ExecutionStat(ExecutionStatColumns, Base):
+    __tablename__ = "execution_stats"
+
+class ExecutionStatDaily(ExecutionStatColumns, Base):
+    __tablename__ = "execution_stats_daily"
+
+    # Recent days are recounted from task_executions to correct drift in the totals
+    day = Column(DateTime, primary_key=True)  # UTC midnight of endTime
+
+class ExecutionStatCursor(Base):
+    __tablename__ = "execution_stat_cursors"
+
+    # Finished executions up to (throughTime, throughId) by (endTime, id) are counted
+    name = Column(String, primary_key=True)
+    throughTime = Column(DateTime, nullable=True)
+    throughId = Column(String, nullable=True)
+    version = Column(Integer, nullable=False, default=1)  # bumped on every pass, guards a stale leader
+    reconciledAt = Column(DateTime, nullable=True)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, ForeignKey, Enum, Text
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, ForeignKey, Enum, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
@@ -43,13 +43,14 @@ class DependencyCondition(enum.Enum):
 
 class Task(Base):
     __tablename__ = "tasks"
+    __table_args__ = (Index("ix_tasks_createdAt_id", "createdAt", "id"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     name = Column(String, nullable=False)
     scriptId = Column(String, ForeignKey('scripts.id', ondelete='CASCADE'), nullable=False)
-    nodeId = Column(String, ForeignKey('nodes.id', ondelete='SET_NULL'), nullable=True)
+    nodeId = Column(String, ForeignKey('nodes.id', ondelete='SET NULL'), nullable=True)
     parameters = Column(Text, nullable=False)  # JSON string
-    status = Column(Enum(TaskStatus), default=TaskStatus.PENDING)
+    status = Column(Enum(TaskStatus), default=TaskStatus.PENDING, index=True)
     priority = Column(Enum(TaskPriority), default=TaskPriority.MEDIUM)
     maxRunTime = Column(Integer, nullable=False)  # seconds
     isConcurrent = Column(Boolean, default=False)
@@ -70,6 +71,7 @@ class Task(Base):
 
 class TaskSchedule(Base):
     __tablename__ = "task_schedules"
+    __table_args__ = (Index("ix_task_schedules_isActive_nextRunAt", "isActive", "nextRunAt"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     taskId = Column(String, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
@@ -86,6 +88,10 @@ class TaskSchedule(Base):
 
 class TaskExecution(Base):
     __tablename__ = "task_executions"
+    __table_args__ = (
+        Index("ix_task_executions_taskId_startTime", "taskId", "startTime"),
+        Index("ix_task_executions_endTime_id", "endTime", "id"),
+    )
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     taskId = Column(String, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
@@ -93,8 +99,9 @@ class TaskExecution(Base):
     status = Column(Enum(ExecutionStatus), default=ExecutionStatus.RUNNING)
     startTime = Column(DateTime, default=func.now())
     endTime = Column(DateTime, nullable=True)
-    output = Column(Text, nullable=True)  # execution output
-    error = Column(Text, nullable=True)  # error message
+    exitCode = Column(Integer, nullable=True)
+    output = Column(Text, nullable=True)  # tail of stdout, full output lives in TaskExecutionLog segments
+    error = Column(Text, nullable=True)  # error message or tail of stderr
     cpuUsage = Column(String, nullable=True)
     memoryUsage = Column(String, nullable=True)
     diskUsage = Column(String, nullable=True)
@@ -102,16 +109,36 @@ class TaskExecution(Base):
     # Relationships
     task = relationship("Task", back_populates="executions")
     node = relationship("Node", back_populates="taskExecutions")
+    logSegments = relationship("TaskExecutionLog", back_populates="execution", order_by="TaskExecutionLog.sequence")
+
+class TaskExecutionLog(Base):
+    __tablename__ = "task_execution_logs"
+    __table_args__ = (
+        Index("ix_task_execution_logs_executionId_stream_sequence", "executionId", "stream", "sequence"),
+    )
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    executionId = Column(String, ForeignKey('task_executions.id', ondelete='CASCADE'), nullable=False)
+    stream = Column(String, nullable=False)  # stdout, stderr
+    sequence = Column(Integer, nullable=False)
+    startOffset = Column(BigInteger, nullable=False)  # byte offset of the segment within the stream
+    length = Column(BigInteger, nullable=False)
+    filePath = Column(String, nullable=False)
+    createdAt = Column(DateTime, default=func.now())
+    
+    # Relationships
+    execution = relationship("TaskExecution", back_populates="logSegments")
 
 class TaskDependency(Base):
     __tablename__ = "task_dependencies"
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    taskId = Column(String, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
-    dependsOnTaskId = Column(String, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
+    taskId = Column(String, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False, index=True)
+    dependsOnTaskId = Column(String, ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False, index=True)
     type = Column(Enum(DependencyType), default=DependencyType.SUCCESS)
     condition = Column(Enum(DependencyCondition), default=DependencyCondition.ALL_SUCCESS)
     timeoutMinutes = Column(Integer, nullable=True)  # only for TIMEOUT type
+    approvedAt = Column(DateTime, nullable=True)  # only for MANUAL type, satisfies the dependent's next run
     isActive = Column(Boolean, default=True)
     createdAt = Column(DateTime, default=func.now())
     updatedAt = Column(DateTime, default=func.now(), onupdate=func.now())
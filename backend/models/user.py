@@ -1,5 +1,5 @@
-from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Boolean, DateTime, ForeignKey, Table, Index
+from sqlalchemy.orm import backref, relationship
 from sqlalchemy.sql import func
 from ..core.database import Base
 import uuid
@@ -21,6 +21,7 @@ role_permission_table = Table(
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (Index("ix_users_createdAt_id", "createdAt", "id"),)
     
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     email = Column(String, unique=True, nullable=False)
@@ -62,23 +63,18 @@ class Permission(Base):
     roles = relationship("Role", secondary=role_permission_table, back_populates="permissions")
 
 class UserRole(Base):
-    __tablename__ = "user_roles"
-    
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    userId = Column(String, ForeignKey('users.id', ondelete='CASCADE'))
-    roleId = Column(String, ForeignKey('roles.id', ondelete='CASCADE'))
+    __table__ = user_role_table
     
     # Relationships
-    user = relationship("User", backref="user_roles")
-    role = relationship("Role", backref="role_users")
+    # The secondary relationships on User and Role write the same rows
+    user = relationship("User", backref=backref("user_roles", overlaps="roles,users"), overlaps="roles,users")
+    role = relationship("Role", backref=backref("role_users", overlaps="roles,users"), overlaps="roles,users")
 
 class RolePermission(Base):
-    __tablename__ = "role_permissions"
-    
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    roleId = Column(String, ForeignKey('roles.id', ondelete='CASCADE'))
-    permissionId = Column(String, ForeignKey('permissions.id', ondelete='CASCADE'))
+    __table__ = role_permission_table
     
     # Relationships
-    role = relationship("Role", backref="role_permissions")
-    permission = relationship("Permission", backref="permission_roles")
\ No newline at end of file
+    role = relationship("Role", backref=backref("role_permissions", overlaps="permissions,roles"),
+                        overlaps="permissions,roles")
+    permission = relationship("Permission", backref=backref("permission_roles", overlaps="permissions,roles"),
+                              overlaps="permissions,roles")
\ No newline at end of file
@@ -0,0 +1,9 @@
+from .base import BaseRepository
+from .node import NodeRepository
+from .script import ScriptRepository
+from .notification import NotificationRepository
+from .task import TaskRepository
+
+__all__ = [
+    "BaseRepository", "NodeRepository", "ScriptRepository", "NotificationRepository", "TaskRepository"
+]
@@ -0,0 +1,60 @@
+from typing import Any, Dict, Generic, List, Optional, Type, TypeVar
+
+from sqlalchemy import select, update, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.pagination import paginate
+
+ModelType = TypeVar("ModelType")
+
+
+class BaseRepository(Generic[ModelType]):
+    """按主键与索引列访问单个模型的通用仓储"""
+
+    model: Type[ModelType]
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, id: str) -> Optional[ModelType]:
+        return await self.db.get(self.model, id)
+
+    async def list(self, *conditions, cursor: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        """按 (createdAt, id) 游标分页，返回 items 与 next_cursor"""
+        return await paginate(self.db, select(self.model).where(*conditions), self.model, cursor, limit)
+
+    async def create(self, **values: Any) -> ModelType:
+        obj = self.model(**values)
+        self.db.add(obj)
+        await self.db.commit()
+        await self.db.refresh(obj)
+        return obj
+
+    async def update(self, obj: ModelType, values: Dict[str, Any]) -> ModelType:
+        for field, value in values.items():
+            setattr(obj, field, value)
+        await self.db.commit()
+        await self.db.refresh(obj)
+        return obj
+
+    async def delete(self, obj: ModelType):
+        await self.db.delete(obj)
+        await self.db.commit()
+
+    async def update_many(self, ids: List[str], values: Dict[str, Any]) -> int:
+        """单条 UPDATE ... WHERE id IN (...)"""
+        if not ids:
+            return 0
+        result = await self.db.execute(
+            update(self.model).where(self.model.id.in_(ids)).values(**values)
+        )
+        await self.db.commit()
+        return result.rowcount
+
+    async def delete_many(self, ids: List[str]) -> int:
+        """单条 DELETE ... WHERE id IN (...)"""
+        if not ids:
+            return 0
+        result = await self.db.execute(delete(self.model).where(self.model.id.in_(ids)))
+        await self.db.commit()
+        return result.rowcount
@@ -0,0 +1,12 @@
+from typing import Any, Dict, Optional
+
+from ..models.node import Node, NodeStatus
+from .base import BaseRepository
+
+
+class NodeRepository(BaseRepository[Node]):
+    model = Node
+
+    async def list_nodes(self, status: Optional[NodeStatus] = None, cursor: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        conditions = [Node.status == status] if status else []
+        return await self.list(*conditions, cursor=cursor, limit=limit)
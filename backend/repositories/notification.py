@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from ..models.notification import Notification, NotificationType, NotificationStatus
+from .base import BaseRepository
+
+
+class NotificationRepository(BaseRepository[Notification]):
+    model = Notification
+
+    async def list_notifications(
+        self,
+        type: Optional[NotificationType] = None,
+        is_read: Optional[bool] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100,
+    ) -> Dict[str, Any]:
+        conditions = []
+        if type:
+            conditions.append(Notification.type == type)
+        if is_read is not None:
+            conditions.append(
+                Notification.status == NotificationStatus.READ if is_read
+                else Notification.status != NotificationStatus.READ
+            )
+        return await self.list(*conditions, cursor=cursor, limit=limit)
+
+    async def mark_read(self, ids: List[str]) -> int:
+        now = datetime.utcnow()
+        return await self.update_many(ids, {"status": NotificationStatus.READ, "readAt": now, "updatedAt": now})
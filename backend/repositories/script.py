@@ -0,0 +1,82 @@
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import select, update, func
+
+from ..models.script import Script, ScriptType, ScriptVersion
+from ..services.storage import Blob
+from .base import BaseRepository
+
+
+class ScriptRepository(BaseRepository[Script]):
+    model = Script
+
+    async def list_scripts(self, type: Optional[ScriptType] = None, cursor: Optional[str] = None, limit: int = 100) -> Dict[str, Any]:
+        conditions = [Script.type == type] if type else []
+        return await self.list(*conditions, cursor=cursor, limit=limit)
+
+    async def list_versions(self, script_id: str) -> List[ScriptVersion]:
+        result = await self.db.scalars(
+            select(ScriptVersion).where(ScriptVersion.scriptId == script_id).order_by(ScriptVersion.createdAt.desc())
+        )
+        return result.all()
+
+    async def current_version(self, script_id: str) -> Optional[ScriptVersion]:
+        return await self.db.scalar(
+            select(ScriptVersion).where(ScriptVersion.scriptId == script_id, ScriptVersion.isCurrent == True)
+        )
+
+    async def create_with_version(self, blob: Blob, **values: Any) -> Script:
+        """创建脚本及其首个版本，两者指向同一份内容"""
+        script = Script(**values, filePath=blob.path, fileHash=blob.hash, fileSize=blob.size)
+        self.db.add(script)
+        await self.db.flush()
+        self.db.add(self._version_row(script, blob, script.version, None))
+        await self.db.commit()
+        await self.db.refresh(script)
+        return script
+
+    async def add_version(self, script: Script, blob: Blob, version: str, changelog: Optional[str], author: str) -> ScriptVersion:
+        """新增当前版本并让脚本指向它"""
+        await self.db.execute(
+            update(ScriptVersion).where(ScriptVersion.scriptId == script.id).values(isCurrent=False)
+        )
+        row = self._version_row(script, blob, version, changelog)
+        self.db.add(row)
+        script.version = version
+        script.filePath = blob.path
+        script.fileHash = blob.hash
+        script.fileSize = blob.size
+        script.lastModifiedBy = author
+        await self.db.commit()
+        await self.db.refresh(row)
+        return row
+
+    async def delete_with_versions(self, script: Script) -> List[str]:
+        """删除脚本及全部版本，返回它们引用过的内容哈希"""
+        versions = await self.list_versions(script.id)
+        hashes = {v.fileHash for v in versions if v.fileHash}
+        if script.fileHash:
+            hashes.add(script.fileHash)
+        for version in versions:
+            await self.db.delete(version)
+        await self.db.delete(script)
+        await self.db.commit()
+        return list(hashes)
+
+    async def count_blob_references(self, file_hash: str) -> int:
+        scripts = await self.db.scalar(select(func.count()).select_from(Script).where(Script.fileHash == file_hash))
+        versions = await self.db.scalar(
+            select(func.count()).select_from(ScriptVersion).where(ScriptVersion.fileHash == file_hash)
+        )
+        return scripts + versions
+
+    def _version_row(self, script: Script, blob: Blob, version: str, changelog: Optional[str]) -> ScriptVersion:
+        return ScriptVersion(
+            scriptId=script.id,
+            version=version,
+            filePath=blob.path,
+            fileHash=blob.hash,
+            fileSize=blob.size,
+            changelog=changelog,
+            isCurrent=True,
+        )
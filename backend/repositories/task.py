@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import Any, Dict, List, Set, Tuple
+
+from sqlalchemy import select, update, bindparam
+
+from ..models.node import Node
+from ..models.script import Script
+from ..models.task import Task, TaskStatus
+from .base import BaseRepository
+
+# Tasks in these states are left alone by a cancel
+FINISHED_STATUSES = (TaskStatus.SUCCESS, TaskStatus.FAILED, TaskStatus.CANCELLED)
+
+
+class TaskRepository(BaseRepository[Task]):
+    model = Task
+
+    async def statuses(self, ids: List[str]) -> Dict[str, TaskStatus]:
+        if not ids:
+            return {}
+        result = await self.db.execute(select(Task.id, Task.status).where(Task.id.in_(ids)))
+        return dict(result.all())
+
+    async def references(self, script_ids: Set[str], node_ids: Set[str]) -> Tuple[Set[str], Set[str]]:
+        """返回其中实际存在的脚本ID与节点ID"""
+        scripts, nodes = set(), set()
+        if script_ids:
+            scripts = set((await self.db.execute(select(Script.id).where(Script.id.in_(script_ids)))).scalars())
+        if node_ids:
+            nodes = set((await self.db.execute(select(Node.id).where(Node.id.in_(node_ids)))).scalars())
+        return scripts, nodes
+
+    async def insert_many(self, rows: List[Dict[str, Any]]):
+        """一个事务内 executemany 插入，行须带好 id 与时间戳"""
+        if not rows:
+            return
+        await self.db.execute(Task.__table__.insert(), rows)
+        await self.db.commit()
+
+    async def update_rows(self, rows: List[Dict[str, Any]]):
+        """按主键逐行更新不同的列，同一组列的行合并为一次 executemany，整体一个事务"""
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for row in rows:
+            columns = tuple(sorted(key for key in row if key != "id"))
+            groups.setdefault(columns, []).append({**row, "_id": row["id"]})
+        for columns, params in groups.items():
+            await self.db.execute(
+                update(Task.__table__)
+                .where(Task.__table__.c.id == bindparam("_id"))
+                .values({column: bindparam(column) for column in columns}),
+                params,
+            )
+        await self.db.commit()
+
+    async def cancel_many(self, ids: List[str]) -> int:
+        """单条 UPDATE 取消未结束的任务"""
+        if not ids:
+            return 0
+        result = await self.db.execute(
+            update(Task)
+            .where(Task.id.in_(ids), Task.status.notin_(FINISHED_STATUSES))
+            .values(status=TaskStatus.CANCELLED, updatedAt=datetime.utcnow())
+        )
+        await self.db.commit()
+        return result.rowcount
@@ -0,0 +1,587 @@
+"""
+任务依赖引擎
+启动时一次性构建任务 DAG，插入边时按库中的依赖拒绝环；
+为每个下游任务维护未满足依赖计数，执行结束时只重新评估直接下游。
+多副本时引擎只在主副本上运行，按水位轮询其他副本写入的依赖变更与执行开始/结束
+"""
+
+import asyncio
+import heapq
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.task import (
+    Task, TaskDependency, TaskExecution, TaskStatus, ExecutionStatus, DependencyType, DependencyCondition
+)
+from .executor import task_executor, ExecutionJob
+from .dispatcher import task_dispatcher, DispatcherBusyError
+from .failure_detector import failure_detector
+
+TERMINAL_STATUSES = {ExecutionStatus.SUCCESS, ExecutionStatus.FAILED, ExecutionStatus.CANCELLED}
+
+
+class DependencyCycleError(Exception):
+    """添加依赖会形成环"""
+
+
+@dataclass
+class DependencyEdge:
+    dependency_id: str
+    task_id: str
+    depends_on_task_id: str
+    type: DependencyType
+    condition: DependencyCondition
+    timeout_minutes: Optional[int] = None
+    approved_at: Optional[datetime] = None
+
+
+@dataclass
+class DependencyChanges:
+    """一次轮询读到的变更"""
+    edges: List[Tuple[bool, DependencyEdge]] = field(default_factory=list)  # (isActive, edge)
+    edges_through: Optional[datetime] = None
+    active_count: int = 0
+    # Every active (task, upstream) pair, only read after the edge count disagreed, e.g. after a delete
+    active: Optional[Set[Tuple[str, str]]] = None
+    started: List[Tuple[str, str, datetime]] = field(default_factory=list)  # (execution, task, startTime)
+    finished: List[Tuple[str, str, ExecutionStatus, datetime]] = field(default_factory=list)
+
+
+@dataclass
+class Readiness:
+    total: int = 0
+    resolved: int = 0
+    satisfied: int = 0
+    fired: bool = False
+
+
+class DependencyGraph:
+    """内存中的任务依赖图与就绪计数"""
+
+    def __init__(self):
+        # task -> {upstream task -> edge}
+        self._upstream: Dict[str, Dict[str, DependencyEdge]] = {}
+        # task -> set of direct dependents
+        self._downstream: Dict[str, Set[str]] = {}
+        # dependent -> {upstream task -> satisfied} for the current cycle
+        self._resolved: Dict[str, Dict[str, bool]] = {}
+        self._counts: Dict[str, Readiness] = {}
+        self._deadlines: List[Tuple[datetime, str, str]] = []
+        self._edges = 0
+        # upstream task -> number of its TIMEOUT edges, their start times set deadlines
+        self._timeout_upstreams: Dict[str, int] = {}
+
+    def __len__(self):
+        return self._edges
+
+    def add_edge(self, edge: DependencyEdge):
+        """添加依赖边 depends_on_task_id -> task_id，形成环时抛出 DependencyCycleError"""
+        if self._reaches(edge.task_id, edge.depends_on_task_id):
+            raise DependencyCycleError(
+                f"Dependency {edge.depends_on_task_id} -> {edge.task_id} would create a cycle"
+            )
+        upstream = self._upstream.setdefault(edge.task_id, {})
+        previous = upstream.get(edge.depends_on_task_id)
+        if previous is None:
+            self._counts.setdefault(edge.task_id, Readiness()).total += 1
+            self._edges += 1
+        else:
+            self._count_timeout(previous, -1)
+        upstream[edge.depends_on_task_id] = edge
+        self._count_timeout(edge, 1)
+        self._downstream.setdefault(edge.depends_on_task_id, set()).add(edge.task_id)
+
+    def remove_edge(self, task_id: str, depends_on_task_id: str):
+        upstream = self._upstream.get(task_id, {})
+        edge = upstream.pop(depends_on_task_id, None)
+        if edge is None:
+            return
+        self._edges -= 1
+        self._count_timeout(edge, -1)
+        self._downstream.get(depends_on_task_id, set()).discard(task_id)
+        counts = self._counts[task_id]
+        counts.total -= 1
+        satisfied = self._resolved.get(task_id, {}).pop(depends_on_task_id, None)
+        if satisfied is not None:
+            counts.resolved -= 1
+            counts.satisfied -= int(satisfied)
+
+    def remove_task(self, task_id: str):
+        for upstream_id in list(self._upstream.get(task_id, {})):
+            self.remove_edge(task_id, upstream_id)
+        for dependent_id in list(self._downstream.get(task_id, set())):
+            self.remove_edge(dependent_id, task_id)
+        self._upstream.pop(task_id, None)
+        self._downstream.pop(task_id, None)
+        self._resolved.pop(task_id, None)
+        self._counts.pop(task_id, None)
+
+    def edges(self) -> Set[Tuple[str, str]]:
+        return {(task_id, upstream_id) for task_id, upstream in self._upstream.items() for upstream_id in upstream}
+
+    def has_dependents(self, task_id: str) -> bool:
+        return bool(self._downstream.get(task_id))
+
+    def timeout_upstreams(self) -> List[str]:
+        return list(self._timeout_upstreams)
+
+    def edge(self, task_id: str, depends_on_task_id: str) -> Optional[DependencyEdge]:
+        return self._upstream.get(task_id, {}).get(depends_on_task_id)
+
+    def upstream(self, task_id: str) -> List[DependencyEdge]:
+        return list(self._upstream.get(task_id, {}).values())
+
+    def downstream(self, task_id: str) -> List[DependencyEdge]:
+        return [self._upstream[d][task_id] for d in self._downstream.get(task_id, set())]
+
+    def readiness(self, task_id: str) -> Dict:
+        counts = self._counts.get(task_id, Readiness())
+        return {
+            "total": counts.total,
+            "resolved": counts.resolved,
+            "satisfied": counts.satisfied,
+            "unmet": counts.total - counts.satisfied,
+            "fired": counts.fired,
+            "resolvedDependencies": dict(self._resolved.get(task_id, {})),
+        }
+
+    def task_started(self, task_id: str, now: datetime):
+        """上游开始运行时为 TIMEOUT 类型的依赖设置截止时间"""
+        for dependent_id in self._downstream.get(task_id, set()):
+            edge = self._upstream[dependent_id][task_id]
+            if edge.type == DependencyType.TIMEOUT and edge.timeout_minutes:
+                deadline = now + timedelta(minutes=edge.timeout_minutes)
+                heapq.heappush(self._deadlines, (deadline, dependent_id, task_id))
+
+    def next_deadline(self) -> Optional[datetime]:
+        return self._deadlines[0][0] if self._deadlines else None
+
+    def expire(self, now: datetime) -> Tuple[List[str], List[str]]:
+        """到期的 TIMEOUT 依赖视为已满足"""
+        released, blocked = [], []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, dependent_id, upstream_id = heapq.heappop(self._deadlines)
+            if upstream_id in self._upstream.get(dependent_id, {}):
+                self._resolve(dependent_id, upstream_id, True, released, blocked)
+        return released, blocked
+
+    def approve(self, task_id: str, depends_on_task_id: str) -> Tuple[List[str], List[str]]:
+        """人工确认 MANUAL 类型的依赖"""
+        released, blocked = [], []
+        if depends_on_task_id in self._upstream.get(task_id, {}):
+            self._resolve(task_id, depends_on_task_id, True, released, blocked)
+        return released, blocked
+
+    def task_finished(self, task_id: str, status: ExecutionStatus) -> Tuple[List[str], List[str]]:
+        """上游结束时只评估其直接下游
+
+        返回 (可释放的任务, 因依赖无法满足而被阻断的任务)。
+        被阻断的任务按 CANCELLED 继续向下游传播。
+        """
+        released, blocked = [], []
+        pending = [(task_id, status)]
+        while pending:
+            finished_id, finished_status = pending.pop()
+            for dependent_id in list(self._downstream.get(finished_id, set())):
+                edge = self._upstream[dependent_id][finished_id]
+                if edge.type == DependencyType.MANUAL:
+                    continue
+                if edge.type == DependencyType.SUCCESS:
+                    satisfied = finished_status == ExecutionStatus.SUCCESS
+                else:
+                    satisfied = finished_status in TERMINAL_STATUSES
+                newly_blocked = len(blocked)
+                self._resolve(dependent_id, finished_id, satisfied, released, blocked)
+                pending.extend((b, ExecutionStatus.CANCELLED) for b in blocked[newly_blocked:])
+        return released, blocked
+
+    def _resolve(self, dependent_id: str, upstream_id: str, satisfied: bool, released: List[str], blocked: List[str]):
+        resolved = self._resolved.setdefault(dependent_id, {})
+        if upstream_id in resolved:
+            return
+        resolved[upstream_id] = satisfied
+        counts = self._counts[dependent_id]
+        counts.resolved += 1
+        counts.satisfied += int(satisfied)
+
+        if not counts.fired:
+            condition = self._upstream[dependent_id][upstream_id].condition
+            if condition == DependencyCondition.ALL_SUCCESS:
+                ready = counts.satisfied == counts.total
+                failed = not satisfied
+            elif condition == DependencyCondition.ANY_SUCCESS:
+                ready = satisfied
+                failed = counts.resolved == counts.total and counts.satisfied == 0
+            elif condition == DependencyCondition.ALL_COMPLETE:
+                ready = counts.resolved == counts.total
+                failed = False
+            else:
+                ready = True
+                failed = False
+            if ready or failed:
+                counts.fired = True
+                (released if ready else blocked).append(dependent_id)
+
+        if counts.resolved >= counts.total:
+            # Every upstream has reported, start a fresh cycle for the next round
+            self._resolved[dependent_id] = {}
+            counts.resolved = 0
+            counts.satisfied = 0
+            counts.fired = False
+
+    def _count_timeout(self, edge: DependencyEdge, delta: int):
+        if edge.type != DependencyType.TIMEOUT:
+            return
+        count = self._timeout_upstreams.get(edge.depends_on_task_id, 0) + delta
+        if count > 0:
+            self._timeout_upstreams[edge.depends_on_task_id] = count
+        else:
+            self._timeout_upstreams.pop(edge.depends_on_task_id, None)
+
+    def _reaches(self, start: str, target: str) -> bool:
+        """从 start 沿下游方向能否到达 target"""
+        if start == target:
+            return True
+        stack, seen = [start], {start}
+        while stack:
+            for nxt in self._downstream.get(stack.pop(), ()):
+                if nxt == target:
+                    return True
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return False
+
+
+class DependencyEngine:
+    """将依赖图接入执行引擎的事件"""
+
+    def __init__(self, poll_interval: Optional[float], poll_lag: float):
+        self.graph = DependencyGraph()
+        # None when this is the only replica and every event arrives through the executor callbacks
+        self.poll_interval = poll_interval
+        # Rows committed up to this long after their timestamps are still picked up by a poll
+        self.poll_lag = timedelta(seconds=poll_lag)
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        # Tasks this engine cancelled because a round could not be satisfied, a later round resumes them
+        self._blocked: Set[str] = set()
+        self._edges_through: Optional[datetime] = None
+        self._starts_through: Optional[datetime] = None
+        self._ends_through: Optional[datetime] = None
+        # Executions already applied, by the time they started or ended, so a callback and a poll count once
+        self._started: Dict[str, datetime] = {}
+        self._finished: Dict[str, datetime] = {}
+        # Deleted rows leave nothing to poll for, a count mismatch makes the next poll diff the keys
+        self._resync = False
+        # Approvals older than this were settled when the edges were loaded
+        self._approvals_after: Optional[datetime] = None
+
+    @property
+    def running(self) -> bool:
+        return self._runner is not None
+
+    async def start(self):
+        if self._runner:
+            return
+        self._approvals_after = datetime.utcnow() - self.poll_lag
+        edges, self._edges_through, approved = await asyncio.to_thread(self._load)
+        for edge in edges:
+            self._add(edge, approve=edge.dependency_id in approved)
+        self._starts_through = self._ends_through = datetime.utcnow()
+        task_executor.on_started.append(self.task_started)
+        task_executor.on_finished.append(self.task_finished)
+        self._runner = asyncio.create_task(self._run(), name="dependency-engine")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        for listeners, callback in (
+            (task_executor.on_started, self.task_started),
+            (task_executor.on_finished, self.task_finished),
+        ):
+            if callback in listeners:
+                listeners.remove(callback)
+        self.graph = DependencyGraph()
+        self._blocked.clear()
+        self._started.clear()
+        self._finished.clear()
+        self._edges_through = self._starts_through = self._ends_through = self._approvals_after = None
+        self._resync = False
+
+    def add(self, edge: DependencyEdge):
+        """依赖已提交后由本副本的接口调用，主副本上立即生效"""
+        if self._runner:
+            self._add(edge)
+
+    def task_started(self, job: ExecutionJob):
+        now = datetime.utcnow()
+        if self._mark(self._started, job.execution_id, now):
+            self.graph.task_started(job.task_id, now)
+            self._wakeup.set()
+
+    def task_finished(self, job: ExecutionJob, status: ExecutionStatus):
+        if self._mark(self._finished, job.execution_id, datetime.utcnow()):
+            self._dispatch(*self.graph.task_finished(job.task_id, status))
+
+
+    def _dispatch(self, released: List[str], blocked: List[str]):
+        # The executor skips cancelled tasks, ones blocked in an earlier round go back to PENDING first
+        resumed = [task_id for task_id in released if task_id in self._blocked]
+        self._blocked.difference_update(resumed)
+        self._blocked.update(blocked)
+        self._enqueue([task_id for task_id in released if task_id not in resumed])
+        if resumed:
+            asyncio.create_task(self._resume(resumed), name="dependency-resume")
+        if blocked:
+            asyncio.get_running_loop().run_in_executor(None, self._cancel, blocked)
+
+    def _enqueue(self, task_ids: List[str]):
+        # Independent branches are queued together and run in parallel on free nodes
+        for task_id in task_ids:
+            try:
+                task_dispatcher.enqueue(task_id)
+            except DispatcherBusyError:
+                print(f"Warning: Dispatch queue full, dependent task {task_id} not started")
+
+    async def _resume(self, task_ids: List[str]):
+        try:
+            await asyncio.to_thread(self._set_status, task_ids, TaskStatus.CANCELLED, TaskStatus.PENDING)
+        except Exception as e:
+            print(f"Warning: Failed to resume dependent tasks {task_ids}: {e}")
+        self._enqueue(task_ids)
+
+    def stored_readiness(self, task_id: str) -> Dict:
+        """不在主副本上时由库中数据推算就绪状态 (在线程中调用)
+
+        计入本任务最近一次开始之后的人工确认，并按结束时间重放各上游在此之后的执行；超时不计入
+        """
+        db = SessionLocal()
+        try:
+            graph = DependencyGraph()
+            for row in db.query(TaskDependency).filter(
+                TaskDependency.taskId == task_id, TaskDependency.isActive == True
+            ):
+                graph.add_edge(edge_from_model(row))
+            upstream_ids = [edge.depends_on_task_id for edge in graph.upstream(task_id)]
+            if upstream_ids:
+                since = db.query(func.max(TaskExecution.startTime)).filter(TaskExecution.taskId == task_id).scalar()
+                for edge in graph.upstream(task_id):
+                    if _approval_pending(edge, since):
+                        graph.approve(task_id, edge.depends_on_task_id)
+                query = db.query(TaskExecution.taskId, TaskExecution.status).filter(
+                    TaskExecution.taskId.in_(upstream_ids),
+                    TaskExecution.endTime.isnot(None),
+                )
+                if since is not None:
+                    query = query.filter(TaskExecution.endTime > since)
+                for upstream_id, status in query.order_by(TaskExecution.endTime):
+                    graph.task_finished(upstream_id, status)
+            return graph.readiness(task_id)
+        finally:
+            db.close()
+
+    def _add(self, edge: DependencyEdge, approve: Optional[bool] = None):
+        """加入或更新一条边；approve 为空时，人工确认时间变化即视为一次新的确认"""
+        previous = self.graph.edge(edge.task_id, edge.depends_on_task_id)
+        try:
+            self.graph.add_edge(edge)
+        except DependencyCycleError as e:
+            # Two replicas can each accept one half of a cycle, the later edge is left out
+            print(f"Warning: Ignoring dependency {edge.dependency_id}: {e}")
+            return
+        if approve is None and edge.approved_at is not None:
+            approve = edge.approved_at != previous.approved_at if previous else edge.approved_at > self._approvals_after
+        if approve and edge.type == DependencyType.MANUAL:
+            self._dispatch(*self.graph.approve(edge.task_id, edge.depends_on_task_id))
+
+    def _mark(self, seen: Dict[str, datetime], execution_id: str, at: datetime) -> bool:
+        if execution_id in seen:
+            return False
+        seen[execution_id] = at
+        return True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_poll = loop.time() + (self.poll_interval or 0)
+        while True:
+            if self.poll_interval and loop.time() >= next_poll:
+                next_poll = loop.time() + self.poll_interval
+                try:
+                    self._apply(await asyncio.to_thread(
+                        self._changes, self._edges_through, self._starts_through, self._ends_through,
+                        self._resync, self.graph.timeout_upstreams(),
+                    ))
+                except Exception as e:
+                    print(f"Warning: Failed to read dependency changes: {e}")
+            self._dispatch(*self.graph.expire(datetime.utcnow()))
+            self._wakeup.clear()
+            timeout = max(0.0, next_poll - loop.time()) if self.poll_interval else None
+            deadline = self.graph.next_deadline()
+            if deadline:
+                until_deadline = max(0.0, (deadline - datetime.utcnow()).total_seconds())
+                timeout = until_deadline if timeout is None else min(timeout, until_deadline)
+            # Not wait_for, which can drop the cancel from stop() when the wakeup fired first
+            wakeup = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait({wakeup}, timeout=timeout)
+            finally:
+                wakeup.cancel()
+
+    def _apply(self, changes: DependencyChanges):
+        for active, edge in changes.edges:
+            if active:
+                self._add(edge)
+            else:
+                self.graph.remove_edge(edge.task_id, edge.depends_on_task_id)
+        if changes.active is not None:
+            for task_id, upstream_id in self.graph.edges() - changes.active:
+                self.graph.remove_edge(task_id, upstream_id)
+        self._edges_through = changes.edges_through or self._edges_through
+        self._resync = len(self.graph) != changes.active_count
+
+        for execution_id, task_id, started_at in changes.started:
+            self._starts_through = max(self._starts_through, started_at)
+            if self._mark(self._started, execution_id, started_at):
+                self.graph.task_started(task_id, started_at)
+        for execution_id, task_id, status, ended_at in changes.finished:
+            self._ends_through = max(self._ends_through, ended_at)
+            if failure_detector.failed_over.pop(execution_id, None) is not None:
+                # Failed by failover and requeued, the new run resolves the dependents
+                continue
+            if self._mark(self._finished, execution_id, ended_at) and self.graph.has_dependents(task_id):
+                self._dispatch(*self.graph.task_finished(task_id, status))
+
+        # Anything older than the re-read window can no longer be returned twice
+        for seen, through in ((self._started, self._starts_through), (self._finished, self._ends_through)):
+            horizon = through - self.poll_lag
+            for execution_id in [key for key, at in seen.items() if at < horizon]:
+                del seen[execution_id]
+
+    def _changes(self, edges_through: Optional[datetime], starts_through: datetime, ends_through: datetime,
+                 resync: bool, timeout_upstreams: List[str]) -> DependencyChanges:
+        """读取水位之后变更的依赖与开始、结束的执行 (在线程中调用)"""
+        changes = DependencyChanges()
+        db = SessionLocal()
+        try:
+            query = db.query(TaskDependency)
+            if edges_through is not None:
+                query = query.filter(TaskDependency.updatedAt > edges_through - self.poll_lag)
+            for row in query:
+                changes.edges.append((bool(row.isActive), edge_from_model(row)))
+                if row.updatedAt and (changes.edges_through is None or row.updatedAt > changes.edges_through):
+                    changes.edges_through = row.updatedAt
+            changes.active_count = db.query(func.count(TaskDependency.id)).filter(
+                TaskDependency.isActive == True
+            ).scalar()
+            if resync:
+                rows = db.query(TaskDependency.taskId, TaskDependency.dependsOnTaskId).filter(
+                    TaskDependency.isActive == True
+                )
+                changes.active = {tuple(row) for row in rows}
+
+            if timeout_upstreams:
+                changes.started = [tuple(row) for row in db.query(
+                    TaskExecution.id, TaskExecution.taskId, TaskExecution.startTime
+                ).filter(
+                    TaskExecution.taskId.in_(timeout_upstreams),
+                    TaskExecution.startTime > starts_through - self.poll_lag,
+                )]
+            changes.finished = [tuple(row) for row in db.query(
+                TaskExecution.id, TaskExecution.taskId, TaskExecution.status, TaskExecution.endTime
+            ).filter(
+                TaskExecution.endTime > ends_through - self.poll_lag,
+                TaskExecution.status != ExecutionStatus.RUNNING,
+            ).order_by(TaskExecution.endTime, TaskExecution.id)]
+            return changes
+        finally:
+            db.close()
+
+    def _load(self) -> Tuple[List[DependencyEdge], Optional[datetime], Set[str]]:
+        """启用的边、其最新修改时间，以及确认后下游尚未开始运行的人工依赖"""
+        db = SessionLocal()
+        try:
+            rows = db.query(TaskDependency).filter(TaskDependency.isActive == True).all()
+            through = max((row.updatedAt for row in rows if row.updatedAt), default=None)
+            edges = [edge_from_model(row) for row in rows]
+            dependents = {edge.task_id for edge in edges if edge.approved_at is not None}
+            last_started = dict(db.query(TaskExecution.taskId, func.max(TaskExecution.startTime)).filter(
+                TaskExecution.taskId.in_(dependents)
+            ).group_by(TaskExecution.taskId)) if dependents else {}
+            approved = {
+                edge.dependency_id for edge in edges if _approval_pending(edge, last_started.get(edge.task_id))
+            }
+            return edges, through, approved
+        finally:
+            db.close()
+
+    def _cancel(self, task_ids: List[str]):
+        db = SessionLocal()
+        try:
+            db.query(Task).filter(Task.id.in_(task_ids)).update(
+                {Task.status: TaskStatus.CANCELLED}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _set_status(self, task_ids: List[str], current: TaskStatus, status: TaskStatus):
+        db = SessionLocal()
+        try:
+            db.query(Task).filter(Task.id.in_(task_ids), Task.status == current).update(
+                {Task.status: status}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+def edge_from_model(dependency: TaskDependency) -> DependencyEdge:
+    return DependencyEdge(
+        dependency_id=dependency.id,
+        task_id=dependency.taskId,
+        depends_on_task_id=dependency.dependsOnTaskId,
+        type=dependency.type or DependencyType.SUCCESS,
+        condition=dependency.condition or DependencyCondition.ALL_SUCCESS,
+        timeout_minutes=dependency.timeoutMinutes,
+        approved_at=dependency.approvedAt,
+    )
+
+
+def _approval_pending(edge: DependencyEdge, last_started: Optional[datetime]) -> bool:
+    """人工确认发生在下游最近一次开始之后，尚未被一次运行用掉"""
+    return edge.type == DependencyType.MANUAL and edge.approved_at is not None \
+        and (last_started is None or edge.approved_at > last_started)
+
+
+async def find_cycle(db: AsyncSession, task_id: str, depends_on_task_id: str) -> bool:
+    """按库中启用的依赖从 task_id 向下游搜索，能到达 depends_on_task_id 则新边 depends_on_task_id -> task_id 成环
+
+    与主副本内存中的图无关，任何副本上的检查结果都一致
+    """
+    if task_id == depends_on_task_id:
+        return True
+    reachable = select(TaskDependency.taskId).where(
+        TaskDependency.dependsOnTaskId == task_id, TaskDependency.isActive == True
+    ).cte("reachable", recursive=True)
+    reachable = reachable.union(
+        select(TaskDependency.taskId)
+        .join(reachable, TaskDependency.dependsOnTaskId == reachable.c.taskId)
+        .where(TaskDependency.isActive == True)
+    )
+    found = await db.scalar(select(reachable.c.taskId).where(reachable.c.taskId == depends_on_task_id).limit(1))
+    return found is not None
+
+
+dependency_engine = DependencyEngine(
+    poll_interval=settings.dependency_poll_interval if settings.leader_election_backend != "none" else None,
+    poll_lag=settings.dependency_poll_lag,
+)
@@ -0,0 +1,591 @@
+"""
+任务分发器
+按优先级分队列 (URGENT > HIGH > MEDIUM > LOW)，等待过久的任务逐级提升优先级；
+从空闲容量索引中选择节点，通过条件 UPDATE 原子地占用 Node.currentTaskCount
+"""
+
+import asyncio
+import heapq
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.node import Node, NodeStatus
+from ..models.task import Task, TaskExecution, TaskPriority, ExecutionStatus
+from .executor import task_executor, ExecutionJob, ExecutorBusyError, _get_local_node_id
+from .task_queue import TaskQueue, QueueMessage, create_task_queue
+
+PRIORITY_ORDER = [TaskPriority.URGENT, TaskPriority.HIGH, TaskPriority.MEDIUM, TaskPriority.LOW]
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(PRIORITY_ORDER)}
+# Pause before the dispatch loop retries after a failed round
+RETRY_SECONDS = 1.0
+
+
+class DispatcherBusyError(Exception):
+    """分发队列已满"""
+
+
+@dataclass
+class DispatchItem:
+    task_id: str
+    priority: TaskPriority
+    node_id: Optional[str]  # pinned node from Task.nodeId
+    execution_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class NodeCapacity:
+    node_id: str
+    free: int
+    cpu_cores: int = 0
+    version: int = 0
+
+
+class CapacityIndex:
+    """节点空闲容量索引
+
+    最大堆按 (空闲槽位, CPU 核数) 排序，容量变化时压入新版本，
+    旧版本在堆顶时惰性丢弃，因此选点无需扫描全部节点。
+    """
+
+    def __init__(self):
+        self._nodes: Dict[str, NodeCapacity] = {}
+        self._heap: List[Tuple[int, int, int, str]] = []
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def set(self, node_id: str, free: int, cpu_cores: int = 0):
+        capacity = self._nodes.get(node_id)
+        if capacity is None:
+            capacity = self._nodes[node_id] = NodeCapacity(node_id, free, cpu_cores or 0)
+        else:
+            capacity.free = free
+            capacity.cpu_cores = cpu_cores or capacity.cpu_cores
+            capacity.version += 1
+        if free > 0:
+            heapq.heappush(self._heap, (-free, -capacity.cpu_cores, capacity.version, node_id))
+
+    def discard(self, node_id: str):
+        self._nodes.pop(node_id, None)
+
+    def node_ids(self) -> List[str]:
+        return list(self._nodes)
+
+    def free(self, node_id: str) -> int:
+        capacity = self._nodes.get(node_id)
+        return capacity.free if capacity else 0
+
+    def adjust(self, node_id: str, delta: int):
+        capacity = self._nodes.get(node_id)
+        if capacity:
+            self.set(node_id, max(0, capacity.free + delta))
+
+    def best(self) -> Optional[str]:
+        """返回空闲槽位最多的节点"""
+        while self._heap:
+            _, _, version, node_id = self._heap[0]
+            capacity = self._nodes.get(node_id)
+            if capacity is None or capacity.version != version or capacity.free <= 0:
+                heapq.heappop(self._heap)
+                continue
+            return node_id
+        return None
+
+
+class TaskDispatcher:
+    """优先级与容量感知的任务分发器"""
+
+    def __init__(self, max_queue_size: int, aging_seconds: float):
+        self.max_queue_size = max_queue_size
+        self.aging_seconds = aging_seconds
+        self.capacity = CapacityIndex()
+        self._queues: Dict[TaskPriority, Deque[DispatchItem]] = {p: deque() for p in PRIORITY_ORDER}
+        # Pinned items parked until their node frees a slot, so they never block the queue head
+        self._parked: Dict[str, Deque[DispatchItem]] = {}
+        # Tasks enqueued without priority, resolved in one query per dispatch round
+        self._unresolved: List[DispatchItem] = []
+        self._reserved: Dict[str, str] = {}
+        self._size = 0
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._refresher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._runner:
+            return
+        await self.refresh_nodes()
+        # Discarded runs never report a status but still hold their slot
+        task_executor.on_finished.append(self.release)
+        task_executor.on_discarded.append(self.release)
+        self._runner = asyncio.create_task(self._run(), name="task-dispatcher")
+        self._refresher = asyncio.create_task(self._refresh_loop(), name="task-dispatcher-refresh")
+
+    async def stop(self):
+        for runner in (self._runner, self._refresher):
+            if runner:
+                runner.cancel()
+        await asyncio.gather(
+            *[r for r in (self._runner, self._refresher) if r], return_exceptions=True
+        )
+        self._runner = self._refresher = None
+        for listeners in (task_executor.on_finished, task_executor.on_discarded):
+            if self.release in listeners:
+                listeners.remove(self.release)
+
+    def enqueue(
+        self,
+        task_id: str,
+        priority: Optional[TaskPriority] = None,
+        node_id: Optional[str] = None,
+    ) -> str:
+        """加入分发队列，立即返回执行ID；未给出优先级时由分发循环批量查询"""
+        if self._size >= self.max_queue_size:
+            raise DispatcherBusyError("Dispatch queue is full")
+        item = DispatchItem(task_id=task_id, priority=priority or TaskPriority.MEDIUM, node_id=node_id)
+        if priority is None:
+            self._unresolved.append(item)
+        else:
+            self._queues[item.priority].append(item)
+        self._size += 1
+        self._wakeup.set()
+        return item.execution_id
+
+    def queue_depths(self) -> Dict[str, int]:
+        depths = {p.value: len(q) for p, q in self._queues.items()}
+        depths["parked"] = sum(len(q) for q in self._parked.values())
+        depths["unresolved"] = len(self._unresolved)
+        return depths
+
+    async def report(self) -> dict:
+        return {"buffered": self.queue_depths(), "reserved": len(self._reserved)}
+
+    def release(self, job: ExecutionJob, status: Optional[ExecutionStatus] = None):
+        """执行结束或被丢弃后归还节点槽位"""
+        node_id = self._reserved.pop(job.execution_id, None)
+        if node_id is None:
+            return
+        self.capacity.adjust(node_id, 1)
+        self._unpark(node_id)
+        asyncio.get_running_loop().run_in_executor(None, self._decrement, node_id)
+        self._wakeup.set()
+
+    def update_node(self, node: Node):
+        """节点增改后同步容量索引，无需等待定期刷新"""
+        if node.status == NodeStatus.ONLINE and node.isAvailable:
+            free = max(0, (node.maxConcurrentTasks or 1) - (node.currentTaskCount or 0))
+            self.capacity.set(node.id, free, node.cpuCores or 0)
+            if free > 0:
+                self._unpark(node.id)
+                self._wakeup.set()
+        else:
+            self.capacity.discard(node.id)
+            self._unpin(node.id)
+
+    def remove_node(self, node_id: str):
+        """节点被删除或判定失联，停止向其分发，等待它的固定任务改由其他节点运行"""
+        self.capacity.discard(node_id)
+        self._unpin(node_id)
+
+    def forget(self, execution_id: str):
+        """丢弃已失联节点上执行的槽位占用，其结束事件不再归还槽位"""
+        self._reserved.pop(execution_id, None)
+
+    async def refresh_nodes(self):
+        """从数据库重建容量索引，用于感知节点上下线"""
+        rows = await asyncio.to_thread(self._load_nodes)
+        known = set()
+        for node_id, free, cpu_cores in rows:
+            known.add(node_id)
+            self.capacity.set(node_id, free, cpu_cores)
+        for node_id in self.capacity.node_ids():
+            if node_id not in known:
+                self.capacity.discard(node_id)
+        for node_id in list(self._parked):
+            if node_id not in known:
+                self._unpin(node_id)
+            elif self.capacity.free(node_id) > 0:
+                self._unpark(node_id)
+        self._wakeup.set()
+
+    def _unpark(self, node_id: str):
+        # Oldest first, so they keep their place at the head of their queues
+        for item in reversed(self._parked.pop(node_id, ())):
+            self._queues[item.priority].appendleft(item)
+
+    def _unpin(self, node_id: str):
+        """节点离线或被删除时，等待它的任务解除固定，与故障转移一样交给任意有空闲的节点"""
+        items = self._parked.get(node_id)
+        if not items:
+            return
+        for item in items:
+            item.node_id = None
+        self._unpark(node_id)
+        self._wakeup.set()
+
+    def _next_item(self) -> Optional[DispatchItem]:
+        """只比较各队列队首，等待越久有效优先级越高"""
+        now = time.monotonic()
+        best_key, best_queue = None, None
+        for priority, queue in self._queues.items():
+            if not queue:
+                continue
+            head = queue[0]
+            boost = int((now - head.enqueued_at) / self.aging_seconds) if self.aging_seconds else 0
+            key = (max(0, PRIORITY_RANK[priority] - boost), head.enqueued_at)
+            if best_key is None or key < best_key:
+                best_key, best_queue = key, queue
+        return best_queue.popleft() if best_queue else None
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                if self._unresolved:
+                    await self._resolve_priorities()
+                await self._dispatch_ready()
+            except Exception as e:
+                # Items stay queued, a transient database error must not stop dispatching
+                print(f"Warning: Dispatch round failed, retrying: {e}")
+                asyncio.get_running_loop().call_later(RETRY_SECONDS, self._wakeup.set)
+
+    async def _dispatch_ready(self):
+        while True:
+            if len(self.capacity) and self.capacity.best() is None:
+                return
+            item = self._next_item()
+            if item is None:
+                return
+
+            if item.node_id:
+                # Pinned to Task.nodeId: wait for that node instead of blocking the queue
+                if self.capacity.free(item.node_id) <= 0:
+                    self._parked.setdefault(item.node_id, deque()).append(item)
+                    continue
+                node_id = item.node_id
+            else:
+                # With no registered nodes the task runs on the controller itself
+                node_id = self.capacity.best() if len(self.capacity) else None
+
+            if node_id is not None:
+                try:
+                    reserved = await asyncio.to_thread(self._increment, node_id)
+                except Exception:
+                    self._queues[item.priority].appendleft(item)
+                    raise
+                if not reserved:
+                    # Another dispatcher or a stale index took the slot, re-read the node and retry
+                    self.capacity.set(node_id, 0)
+                    self._queues[item.priority].appendleft(item)
+                    asyncio.create_task(self.refresh_nodes())
+                    return
+                self.capacity.adjust(node_id, -1)
+                self._reserved[item.execution_id] = node_id
+
+            try:
+                task_executor.submit(item.task_id, node_id=node_id, execution_id=item.execution_id)
+            except ExecutorBusyError:
+                self._queues[item.priority].appendleft(item)
+                if node_id is not None:
+                    self._reserved.pop(item.execution_id, None)
+                    self.capacity.adjust(node_id, 1)
+                    await asyncio.to_thread(self._decrement, node_id)
+                return
+            self._size -= 1
+
+    async def _resolve_priorities(self):
+        items, self._unresolved = self._unresolved, []
+        try:
+            rows = await asyncio.to_thread(self._load_tasks, list({i.task_id for i in items}))
+        except Exception:
+            self._unresolved = items + self._unresolved
+            raise
+        for item in items:
+            if item.task_id not in rows:
+                self._size -= 1
+                continue
+            item.priority, item.node_id = rows[item.task_id]
+            self._queues[item.priority].append(item)
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(settings.dispatcher_refresh_seconds)
+            try:
+                await self.refresh_nodes()
+            except Exception as e:
+                print(f"Warning: Failed to refresh node capacity: {e}")
+
+    def _increment(self, node_id: str) -> bool:
+        """条件 UPDATE 保证并发分发不会超出 maxConcurrentTasks"""
+        db = SessionLocal()
+        try:
+            updated = db.query(Node).filter(
+                Node.id == node_id,
+                Node.status == NodeStatus.ONLINE,
+                Node.isAvailable == True,
+                Node.currentTaskCount < Node.maxConcurrentTasks,
+            ).update(
+                {Node.currentTaskCount: Node.currentTaskCount + 1},
+                synchronize_session=False,
+            )
+            db.commit()
+            return updated == 1
+        finally:
+            db.close()
+
+    def _decrement(self, node_id: str):
+        db = SessionLocal()
+        try:
+            db.query(Node).filter(Node.id == node_id, Node.currentTaskCount > 0).update(
+                {Node.currentTaskCount: Node.currentTaskCount - 1},
+                synchronize_session=False,
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _load_nodes(self) -> List[Tuple[str, int, int]]:
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                Node.id, Node.maxConcurrentTasks, Node.currentTaskCount, Node.cpuCores
+            ).filter(Node.status == NodeStatus.ONLINE, Node.isAvailable == True).all()
+            return [
+                (node_id, max(0, (max_tasks or 1) - (current or 0)), cpu_cores or 0)
+                for node_id, max_tasks, current, cpu_cores in rows
+            ]
+        finally:
+            db.close()
+
+    def _load_tasks(self, task_ids: List[str]) -> Dict[str, Tuple[TaskPriority, Optional[str]]]:
+        db = SessionLocal()
+        try:
+            rows = db.query(Task.id, Task.priority, Task.nodeId).filter(Task.id.in_(task_ids)).all()
+            return {
+                task_id: (priority or TaskPriority.MEDIUM, node_id)
+                for task_id, priority, node_id in rows
+            }
+        finally:
+            db.close()
+
+
+class QueueDispatcher(TaskDispatcher):
+    """分布式队列模式的分发器
+
+    enqueue 仍只写本地缓冲，分发循环把缓冲批量推入共享队列，不再在本进程选节点；
+    开启 worker 时本进程作为节点按空闲槽位拉取任务交给本地执行器，
+    执行期间定期延长可见性超时，结束后确认。未确认的投递由清扫重新入队，
+    重投时若该执行已经开始 (TaskExecution 已存在)，交给故障检测处理，不再重复执行
+    """
+
+    def __init__(self, queue: TaskQueue, max_queue_size: int, aging_seconds: float, worker: bool,
+                 slots: int, visibility_timeout: float, sweep_interval: float, poll_interval: float):
+        super().__init__(max_queue_size, aging_seconds)
+        self.queue = queue
+        self.worker = worker
+        self.visibility_timeout = visibility_timeout
+        self.sweep_interval = sweep_interval
+        self.poll_interval = poll_interval
+        self.node_id: Optional[str] = None
+        self._slots = asyncio.Semaphore(slots)
+        # execution id -> message being run by this node
+        self._leases: Dict[str, QueueMessage] = {}
+        self._loops: List[asyncio.Task] = []
+        self.stats = {
+            "pushed": 0,
+            "pulled": 0,
+            "acked": 0,
+            "requeued_expired": 0,
+            "skipped_redeliveries": 0,
+            "lost_leases": 0,
+        }
+
+    async def start(self):
+        if self._runner:
+            return
+        self._runner = asyncio.create_task(self._run(), name="task-dispatcher")
+        self._loops = [asyncio.create_task(self._sweep_loop(), name="task-queue-sweep")]
+        if self.worker:
+            self.node_id = await asyncio.to_thread(self._local_node)
+            task_executor.on_finished.append(self._settle)
+            task_executor.on_discarded.append(self._settle)
+            self._loops += [
+                asyncio.create_task(self._pull_loop(), name="task-queue-pull"),
+                asyncio.create_task(self._keepalive_loop(), name="task-queue-keepalive"),
+            ]
+
+    async def stop(self):
+        for runner in [self._runner, *self._loops]:
+            if runner:
+                runner.cancel()
+        await asyncio.gather(*[r for r in [self._runner, *self._loops] if r], return_exceptions=True)
+        self._runner, self._loops = None, []
+        for listeners in (task_executor.on_finished, task_executor.on_discarded):
+            if self._settle in listeners:
+                listeners.remove(self._settle)
+        # Hand over whatever is still buffered, running leases expire and get redelivered
+        if self._unresolved:
+            await self._resolve_priorities()
+        await self._dispatch_ready()
+        await self.queue.close()
+
+    async def report(self) -> dict:
+        return {
+            **self.stats,
+            "worker": self.worker,
+            "nodeId": self.node_id,
+            "running": len(self._leases),
+            "buffered": self.queue_depths(),
+            "queue": await self.queue.depths(),
+        }
+
+    async def _dispatch_ready(self):
+        items = []
+        for queue in self._queues.values():
+            items.extend(queue)
+            queue.clear()
+        if not items:
+            return
+        messages = [
+            QueueMessage(execution_id=item.execution_id, task_id=item.task_id,
+                         priority=item.priority.value, node_id=item.node_id)
+            for item in items
+        ]
+        try:
+            await self.queue.push(messages)
+        except Exception as e:
+            print(f"Warning: Failed to push {len(items)} tasks to the task queue, retrying: {e}")
+            for item in reversed(items):
+                self._queues[item.priority].appendleft(item)
+            asyncio.get_running_loop().call_later(self.poll_interval, self._wakeup.set)
+            return
+        self._size -= len(items)
+        self.stats["pushed"] += len(items)
+
+    async def _pull_loop(self):
+        idle = self.poll_interval / 8
+        while True:
+            await self._slots.acquire()
+            try:
+                message = await self.queue.pull(self.node_id, self.visibility_timeout)
+            except Exception as e:
+                self._slots.release()
+                print(f"Warning: Failed to pull from the task queue: {e}")
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if message is None:
+                self._slots.release()
+                await asyncio.sleep(idle)
+                # Back off while idle, up to poll_interval
+                idle = min(idle * 2, self.poll_interval)
+                continue
+            idle = self.poll_interval / 8
+            self.stats["pulled"] += 1
+            try:
+                await self._run_message(message)
+            except Exception as e:
+                self._slots.release()
+                print(f"Warning: Failed to start queued task {message.task_id}: {e}")
+                await self.queue.nack(message)
+
+    async def _run_message(self, message: QueueMessage):
+        if message.attempts and await asyncio.to_thread(self._started, message.execution_id):
+            # The earlier delivery got as far as running, failover owns that execution
+            await self.queue.ack(message.receipt)
+            self._slots.release()
+            self.stats["skipped_redeliveries"] += 1
+            return
+        if not await asyncio.to_thread(self._increment, self.node_id):
+            # Node taken offline or at maxConcurrentTasks, leave the task to other nodes
+            await self.queue.nack(message)
+            self._slots.release()
+            await asyncio.sleep(self.poll_interval)
+            return
+        try:
+            task_executor.submit(message.task_id, node_id=self.node_id, execution_id=message.execution_id)
+        except ExecutorBusyError:
+            await asyncio.to_thread(self._decrement, self.node_id)
+            await self.queue.nack(message)
+            self._slots.release()
+            await asyncio.sleep(self.poll_interval)
+            return
+        self._leases[message.execution_id] = message
+
+    def _settle(self, job: ExecutionJob, status: Optional[ExecutionStatus] = None):
+        """执行结束 (或被故障转移接管) 后确认消息并归还槽位"""
+        message = self._leases.pop(job.execution_id, None)
+        if message is None:
+            return
+        self._slots.release()
+        asyncio.create_task(self._ack(message))
+
+    async def _ack(self, message: QueueMessage):
+        try:
+            await asyncio.to_thread(self._decrement, self.node_id)
+            if await self.queue.ack(message.receipt):
+                self.stats["acked"] += 1
+            else:
+                print(f"Warning: Delivery of task {message.task_id} expired before it finished")
+        except Exception as e:
+            print(f"Warning: Failed to acknowledge task {message.task_id}: {e}")
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            receipts = [message.receipt for message in self._leases.values()]
+            try:
+                lost = await self.queue.extend(receipts, self.visibility_timeout)
+            except Exception as e:
+                print(f"Warning: Failed to extend task queue leases: {e}")
+                continue
+            if lost:
+                self.stats["lost_leases"] += len(lost)
+                print(f"Warning: {len(lost)} running tasks outlived their queue delivery and may run twice")
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                self.stats["requeued_expired"] += await self.queue.requeue_expired()
+            except Exception as e:
+                print(f"Warning: Failed to requeue expired task deliveries: {e}")
+
+    def _local_node(self) -> str:
+        db = SessionLocal()
+        try:
+            node_id = _get_local_node_id(db)
+            db.commit()
+            return node_id
+        finally:
+            db.close()
+
+    def _started(self, execution_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            return db.query(TaskExecution.id).filter(TaskExecution.id == execution_id).first() is not None
+        finally:
+            db.close()
+
+
+if settings.task_queue_backend == "local":
+    task_dispatcher = TaskDispatcher(
+        max_queue_size=settings.dispatcher_queue_size,
+        aging_seconds=settings.dispatcher_aging_seconds,
+    )
+else:
+    task_dispatcher = QueueDispatcher(
+        create_task_queue(settings.task_queue_backend, settings.redis_url, settings.task_queue_prefix),
+        max_queue_size=settings.dispatcher_queue_size,
+        aging_seconds=settings.dispatcher_aging_seconds,
+        worker=settings.task_queue_worker,
+        slots=settings.executor_max_workers,
+        visibility_timeout=settings.task_queue_visibility_timeout,
+        sweep_interval=settings.task_queue_sweep_interval,
+        poll_interval=settings.task_queue_poll_interval,
+    )
@@ -0,0 +1,282 @@
+"""
+脚本运行环境池
+按 (语言, 规范化后的 Script.requirements) 计算哈希，每种依赖组合只构建一次，
+节点上保留一批就绪环境并按 LRU 淘汰空闲环境，同时统计构建耗时与运行耗时
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from ..core.config import settings
+from ..models.script import ScriptLanguage
+
+READY_MARKER = ".ready"
+BIN_DIR = "Scripts" if os.name == "nt" else "bin"
+PYTHON_EXE = "python.exe" if os.name == "nt" else "python"
+
+
+class EnvironmentBuildError(Exception):
+    """依赖安装失败"""
+
+
+@dataclass
+class Environment:
+    key: str
+    language: ScriptLanguage
+    requirements: List[str]
+    path: str
+    build_seconds: float = 0.0
+    runs: int = 0
+    run_seconds: float = 0.0
+    in_use: int = 0
+    last_used: float = field(default_factory=time.time)
+
+    @property
+    def python(self) -> str:
+        return os.path.join(self.path, BIN_DIR, PYTHON_EXE)
+
+    def apply(self, env: Dict[str, str]):
+        """把环境注入子进程的环境变量"""
+        if self.language == ScriptLanguage.PYTHON:
+            env["VIRTUAL_ENV"] = self.path
+            env["PATH"] = os.path.join(self.path, BIN_DIR) + os.pathsep + env.get("PATH", "")
+        elif self.language == ScriptLanguage.NODEJS:
+            env["NODE_PATH"] = os.path.join(self.path, "node_modules")
+
+
+def parse_requirements(language: ScriptLanguage, raw: Optional[str]) -> List[str]:
+    """把 JSON 列表/字典或按行书写的依赖规范化为排序后的安装参数"""
+    if not raw or not raw.strip():
+        return []
+    try:
+        value = json.loads(raw)
+    except ValueError:
+        value = [line for line in raw.splitlines() if line.strip() and not line.strip().startswith("#")]
+    if isinstance(value, dict):
+        separator = "@" if language == ScriptLanguage.NODEJS else ""
+        specs = []
+        for name, version in value.items():
+            version = str(version or "").strip()
+            if version and version[0].isdigit() and language != ScriptLanguage.NODEJS:
+                version = f"=={version}"
+            specs.append(f"{name}{separator}{version}" if version else name)
+    elif isinstance(value, list):
+        specs = [str(item) for item in value]
+    else:
+        specs = [str(value)]
+    return sorted({spec.strip().lower() for spec in specs if spec.strip()})
+
+
+def environment_key(language: ScriptLanguage, requirements: List[str]) -> str:
+    raw = "\n".join([language.value, *requirements]).encode()
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+class EnvironmentManager:
+    """按依赖哈希复用环境，空闲环境超过 pool_size 时按 LRU 删除"""
+
+    SUPPORTED = (ScriptLanguage.PYTHON, ScriptLanguage.NODEJS)
+
+    def __init__(self, root: str, pool_size: int, build_timeout: int):
+        self.root = root
+        self.pool_size = pool_size
+        self.build_timeout = build_timeout
+        # Least recently used first
+        self._envs: "OrderedDict[str, Environment]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+        self.stats = {
+            "builds": 0,
+            "build_failures": 0,
+            "hits": 0,
+            "evictions": 0,
+        }
+
+    async def start(self):
+        await asyncio.to_thread(self.load)
+
+    def load(self):
+        """加载磁盘上已就绪的环境，清理构建到一半的目录"""
+        os.makedirs(self.root, exist_ok=True)
+        found = []
+        for key in os.listdir(self.root):
+            path = os.path.join(self.root, key)
+            marker = os.path.join(path, READY_MARKER)
+            if not os.path.isdir(path):
+                continue
+            if not os.path.exists(marker):
+                shutil.rmtree(path, ignore_errors=True)
+                continue
+            with open(marker) as f:
+                info = json.load(f)
+            found.append(Environment(
+                key=key,
+                language=ScriptLanguage(info["language"]),
+                requirements=info["requirements"],
+                path=path,
+                build_seconds=info.get("build_seconds", 0.0),
+                last_used=os.path.getmtime(marker),
+            ))
+        with self._lock:
+            self._envs.clear()
+            for env in sorted(found, key=lambda e: e.last_used):
+                self._envs[env.key] = env
+
+    def acquire(self, language: ScriptLanguage, raw_requirements: Optional[str]) -> Optional[Environment]:
+        """返回匹配的就绪环境，不存在时构建；无依赖或语言不支持时返回 None (在线程中调用)
+
+        使用完毕后必须调用 release
+        """
+        requirements = parse_requirements(language, raw_requirements)
+        if not requirements or language not in self.SUPPORTED:
+            return None
+        key = environment_key(language, requirements)
+
+        with self._lock:
+            env = self._envs.get(key)
+            if env:
+                self._envs.move_to_end(key)
+                env.in_use += 1
+                env.last_used = time.time()
+                self.stats["hits"] += 1
+            else:
+                build_lock = self._build_locks.setdefault(key, threading.Lock())
+        if env:
+            # The marker mtime carries the LRU order across restarts
+            os.utime(os.path.join(env.path, READY_MARKER))
+            return env
+
+        # Concurrent tasks needing the same environment wait for a single build
+        with build_lock:
+            with self._lock:
+                env = self._envs.get(key)
+                if env:
+                    self._envs.move_to_end(key)
+                    env.in_use += 1
+                    self.stats["hits"] += 1
+                    return env
+            try:
+                env = self._build(key, language, requirements)
+                with self._lock:
+                    env.in_use += 1
+                    self._envs[key] = env
+            finally:
+                with self._lock:
+                    self._build_locks.pop(key, None)
+        self._evict()
+        return env
+
+    def release(self, key: str, run_seconds: float):
+        """任务结束后归还环境并记录运行耗时"""
+        with self._lock:
+            env = self._envs.get(key)
+            if env:
+                env.in_use = max(0, env.in_use - 1)
+                env.runs += 1
+                env.run_seconds += run_seconds
+
+    def prepare(self, language: ScriptLanguage, raw_requirements: Optional[str]):
+        """提前构建环境，供预取使用 (在线程中调用)"""
+        env = self.acquire(language, raw_requirements)
+        if env:
+            with self._lock:
+                env.in_use = max(0, env.in_use - 1)
+
+    def report(self) -> dict:
+        """构建耗时与运行耗时对比"""
+        with self._lock:
+            envs = list(self._envs.values())
+            stats = dict(self.stats)
+        build_seconds = sum(env.build_seconds for env in envs)
+        run_seconds = sum(env.run_seconds for env in envs)
+        # Every run after the first would otherwise have paid the build again
+        saved_seconds = sum(env.build_seconds * max(0, env.runs - 1) for env in envs)
+        return {
+            **stats,
+            "environments": len(envs),
+            "build_seconds": round(build_seconds, 3),
+            "run_seconds": round(run_seconds, 3),
+            "saved_seconds": round(saved_seconds, 3),
+            "items": [
+                {
+                    "key": env.key,
+                    "language": env.language.value,
+                    "requirements": env.requirements,
+                    "build_seconds": round(env.build_seconds, 3),
+                    "runs": env.runs,
+                    "run_seconds": round(env.run_seconds, 3),
+                    "in_use": env.in_use,
+                }
+                for env in envs
+            ],
+        }
+
+    def _build(self, key: str, language: ScriptLanguage, requirements: List[str]) -> Environment:
+        path = os.path.join(self.root, key)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        env = Environment(key=key, language=language, requirements=requirements, path=path)
+        started = time.perf_counter()
+        try:
+            if language == ScriptLanguage.PYTHON:
+                self._run([sys.executable, "-m", "venv", path])
+                self._run([env.python, "-m", "pip", "install", "--no-input",
+                           "--disable-pip-version-check", *requirements])
+            else:
+                self._run(["npm", "install", "--prefix", path, "--no-audit", "--no-fund", *requirements])
+        except Exception:
+            shutil.rmtree(path, ignore_errors=True)
+            with self._lock:
+                self.stats["build_failures"] += 1
+            raise
+        env.build_seconds = time.perf_counter() - started
+
+        # The marker is written last, a directory without it is an interrupted build
+        with open(os.path.join(path, READY_MARKER), "w") as f:
+            json.dump({
+                "language": language.value,
+                "requirements": requirements,
+                "build_seconds": env.build_seconds,
+            }, f)
+        with self._lock:
+            self.stats["builds"] += 1
+        return env
+
+    def _run(self, command: List[str]):
+        try:
+            subprocess.run(command, check=True, capture_output=True, timeout=self.build_timeout)
+        except subprocess.CalledProcessError as e:
+            output = (e.stderr or e.stdout or b"").decode(errors="replace")[-2000:]
+            raise EnvironmentBuildError(f"{' '.join(command[:4])} failed: {output}")
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise EnvironmentBuildError(f"{' '.join(command[:4])} failed: {e}")
+
+    def _evict(self):
+        victims = []
+        with self._lock:
+            for key in list(self._envs):
+                if len(self._envs) <= self.pool_size:
+                    break
+                if self._envs[key].in_use:
+                    continue
+                victims.append(self._envs.pop(key))
+                self.stats["evictions"] += 1
+        for env in victims:
+            shutil.rmtree(env.path, ignore_errors=True)
+
+
+environment_manager = EnvironmentManager(
+    root=settings.env_dir,
+    pool_size=settings.env_pool_size,
+    build_timeout=settings.env_build_timeout,
+)
@@ -0,0 +1,469 @@
+"""
+执行统计
+主副本按 (endTime, id) 水位增量读取已结束的 TaskExecution，把次数、运行时长累计与 p50/p95 草图
+合并进 execution_stats (全局/任务/节点/引擎) 与按天的 execution_stats_daily，并同步 Engine 上的计数列；
+接口按主键读取一行。定期从 task_executions 重新统计最近几天，把差值修正到总数上
+"""
+
+import asyncio
+import json
+import math
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.engine import Engine
+from ..models.script import Script
+from ..models.stats import ExecutionStat, ExecutionStatDaily, ExecutionStatCursor
+from ..models.task import Task, TaskExecution, ExecutionStatus
+
+CURSOR_NAME = "task_executions"
+SCOPES = ("all", "task", "node", "engine")
+ALL_KEY = "*"
+# Relative error of the run time quantiles
+SKETCH_ACCURACY = 0.01
+# Runs shorter than this share one bucket
+SKETCH_MIN_SECONDS = 0.001
+
+
+def floor_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class RunTimeSketch:
+    """对数分桶直方图，分位数的相对误差不超过 SKETCH_ACCURACY；桶计数可加可减，草图之间可合并"""
+
+    gamma = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+    log_gamma = math.log(gamma)
+
+    def __init__(self, buckets: Optional[Dict[int, int]] = None, zero: int = 0):
+        self.buckets: Dict[int, int] = buckets or {}
+        self.zero = zero
+
+    @property
+    def count(self) -> int:
+        return self.zero + sum(self.buckets.values())
+
+    def add(self, seconds: float, count: int = 1):
+        if seconds < SKETCH_MIN_SECONDS:
+            self.zero += count
+            return
+        index = math.ceil(math.log(seconds) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + count
+
+    def merge(self, other: "RunTimeSketch", sign: int = 1):
+        self.zero += sign * other.zero
+        for index, count in other.buckets.items():
+            merged = self.buckets.get(index, 0) + sign * count
+            if merged:
+                self.buckets[index] = merged
+            else:
+                self.buckets.pop(index, None)
+
+    def quantile(self, q: float) -> Optional[float]:
+        total = self.count
+        if total <= 0:
+            return None
+        rank = q * (total - 1)
+        seen = self.zero
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Midpoint of (gamma^(i-1), gamma^i] in relative terms
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+    def dumps(self) -> str:
+        return json.dumps({"zero": self.zero, "buckets": {str(i): n for i, n in self.buckets.items()}})
+
+    @classmethod
+    def loads(cls, raw: Optional[str]) -> "RunTimeSketch":
+        if not raw:
+            return cls()
+        data = json.loads(raw)
+        return cls({int(i): n for i, n in data.get("buckets", {}).items()}, data.get("zero", 0))
+
+
+@dataclass
+class StatDelta:
+    """一组执行对某一行统计的贡献，校正时是可能为负的差值"""
+    total: int = 0
+    successful: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    run_time_total: float = 0.0
+    run_time_count: int = 0
+    sketch: RunTimeSketch = field(default_factory=RunTimeSketch)
+    last_run_at: Optional[datetime] = None
+
+    def add(self, status: ExecutionStatus, start_time: Optional[datetime], end_time: datetime):
+        self.total += 1
+        if status == ExecutionStatus.SUCCESS:
+            self.successful += 1
+        elif status == ExecutionStatus.FAILED:
+            self.failed += 1
+        else:
+            self.cancelled += 1
+        if start_time is not None:
+            run_time = max((end_time - start_time).total_seconds(), 0.0)
+            self.run_time_total += run_time
+            self.run_time_count += 1
+            self.sketch.add(run_time)
+        if self.last_run_at is None or end_time > self.last_run_at:
+            self.last_run_at = end_time
+
+    @classmethod
+    def from_row(cls, row) -> "StatDelta":
+        return cls(
+            total=row.totalRuns or 0,
+            successful=row.successfulRuns or 0,
+            failed=row.failedRuns or 0,
+            cancelled=row.cancelledRuns or 0,
+            run_time_total=row.runTimeTotal or 0.0,
+            run_time_count=row.runTimeCount or 0,
+            sketch=RunTimeSketch.loads(row.runTimeSketch),
+            last_run_at=row.lastRunAt,
+        )
+
+    def merged(self, other: "StatDelta", sign: int = 1) -> "StatDelta":
+        sketch = RunTimeSketch(dict(self.sketch.buckets), self.sketch.zero)
+        sketch.merge(other.sketch, sign)
+        last_run_at = self.last_run_at
+        if sign > 0 and other.last_run_at is not None and (last_run_at is None or other.last_run_at > last_run_at):
+            last_run_at = other.last_run_at
+        return StatDelta(
+            total=self.total + sign * other.total,
+            successful=self.successful + sign * other.successful,
+            failed=self.failed + sign * other.failed,
+            cancelled=self.cancelled + sign * other.cancelled,
+            run_time_total=self.run_time_total + sign * other.run_time_total,
+            run_time_count=self.run_time_count + sign * other.run_time_count,
+            sketch=sketch,
+            last_run_at=last_run_at,
+        )
+
+    @property
+    def empty(self) -> bool:
+        return not (self.total or self.successful or self.failed or self.cancelled
+                    or self.run_time_count or self.sketch.zero or self.sketch.buckets)
+
+    def apply(self, row, now: datetime):
+        row.totalRuns = (row.totalRuns or 0) + self.total
+        row.successfulRuns = (row.successfulRuns or 0) + self.successful
+        row.failedRuns = (row.failedRuns or 0) + self.failed
+        row.cancelledRuns = (row.cancelledRuns or 0) + self.cancelled
+        row.runTimeTotal = (row.runTimeTotal or 0.0) + self.run_time_total
+        row.runTimeCount = (row.runTimeCount or 0) + self.run_time_count
+        sketch = RunTimeSketch.loads(row.runTimeSketch)
+        sketch.merge(self.sketch)
+        row.runTimeSketch = sketch.dumps()
+        row.p50RunTime = sketch.quantile(0.5)
+        row.p95RunTime = sketch.quantile(0.95)
+        if self.last_run_at is not None and (row.lastRunAt is None or self.last_run_at > row.lastRunAt):
+            row.lastRunAt = self.last_run_at
+        row.updatedAt = now
+
+
+def summarize(row: Optional[ExecutionStat]) -> dict:
+    """统计行转为接口返回，只读现成的列"""
+    if row is None:
+        return {
+            "totalRuns": 0, "successfulRuns": 0, "failedRuns": 0, "cancelledRuns": 0,
+            "successRate": None, "averageRunTime": None, "p50RunTime": None, "p95RunTime": None,
+            "lastRunAt": None, "updatedAt": None,
+        }
+    return {
+        "totalRuns": row.totalRuns,
+        "successfulRuns": row.successfulRuns,
+        "failedRuns": row.failedRuns,
+        "cancelledRuns": row.cancelledRuns,
+        "successRate": row.successfulRuns / row.totalRuns if row.totalRuns else None,
+        "averageRunTime": row.runTimeTotal / row.runTimeCount if row.runTimeCount else None,
+        "p50RunTime": row.p50RunTime,
+        "p95RunTime": row.p95RunTime,
+        "lastRunAt": row.lastRunAt,
+        "updatedAt": row.updatedAt,
+    }
+
+
+class ExecutionStats:
+    """执行统计的增量维护与定期校正，只在主副本上运行"""
+
+    def __init__(self, interval: float, settle_seconds: float, batch_size: int,
+                 reconcile_interval: float, reconcile_days: int):
+        self.interval = interval
+        # Executions are read only once they are this old, so rows committed a little late are still seen
+        self.settle = timedelta(seconds=settle_seconds)
+        self.batch_size = batch_size
+        self.reconcile_interval = reconcile_interval
+        self.reconcile_days = reconcile_days
+        self._runner: Optional[asyncio.Task] = None
+        self.stats = {
+            "applied": 0,
+            "passes": 0,
+            "reconciliations": 0,
+            "corrections": 0,
+            "errors": 0,
+            "last_pass_seconds": 0.0,
+            "last_reconcile_seconds": 0.0,
+        }
+
+    async def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run(), name="execution-stats")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    def report(self) -> dict:
+        return {
+            **self.stats,
+            "running": self._runner is not None,
+            "interval": self.interval,
+            "reconcileInterval": self.reconcile_interval,
+            "reconcileDays": self.reconcile_days,
+        }
+
+    def apply_pending(self, now: Optional[datetime] = None) -> int:
+        """把水位之后、已过 settle 的执行计入统计，返回本次计入的条数 (在线程中调用)"""
+        settled = (now or datetime.utcnow()) - self.settle
+        applied = 0
+        db = SessionLocal()
+        try:
+            while True:
+                cursor = self._cursor(db)
+                query = self._executions().where(TaskExecution.endTime <= settled)
+                if cursor.throughTime is not None:
+                    query = query.where(or_(
+                        TaskExecution.endTime > cursor.throughTime,
+                        and_(TaskExecution.endTime == cursor.throughTime, TaskExecution.id > cursor.throughId),
+                    ))
+                rows = db.execute(
+                    query.order_by(TaskExecution.endTime, TaskExecution.id).limit(self.batch_size)
+                ).all()
+                if not rows:
+                    break
+                totals, daily = self._aggregate(db, rows)
+                last = rows[-1]
+                if not self._advance(db, cursor, {
+                    ExecutionStatCursor.throughTime: last.endTime,
+                    ExecutionStatCursor.throughId: last.id,
+                }):
+                    break
+                self._write(db, totals, daily)
+                db.commit()
+                applied += len(rows)
+                if len(rows) < self.batch_size:
+                    break
+        finally:
+            db.close()
+        self.stats["applied"] += applied
+        return applied
+
+    def reconcile(self, now: Optional[datetime] = None) -> int:
+        """重新统计最近 reconcile_days 天内已计入的执行，差值修正到按天与总数行，返回修正的行数 (在线程中调用)"""
+        now = now or datetime.utcnow()
+        db = SessionLocal()
+        try:
+            cursor = self._cursor(db)
+            if cursor.throughTime is None:
+                return 0
+            since = floor_day(cursor.throughTime) - timedelta(days=self.reconcile_days - 1)
+            through = (cursor.throughTime, cursor.throughId)
+            if not self._advance(db, cursor, {ExecutionStatCursor.reconciledAt: now}):
+                return 0
+
+            engines = self._engine_ids(db)
+            actual: Dict[Tuple[str, str, datetime], StatDelta] = {}
+            rows = db.execute(
+                self._executions().where(
+                    TaskExecution.endTime >= since,
+                    or_(
+                        TaskExecution.endTime < through[0],
+                        and_(TaskExecution.endTime == through[0], TaskExecution.id <= through[1]),
+                    ),
+                ).execution_options(yield_per=self.batch_size)
+            )
+            for row in rows:
+                for scope, key in self._keys(row, engines):
+                    actual.setdefault((scope, key, floor_day(row.endTime)), StatDelta()).add(
+                        row.status, row.startTime, row.endTime
+                    )
+            stored = {
+                (row.scope, row.key, row.day): row
+                for row in db.execute(select(ExecutionStatDaily).where(ExecutionStatDaily.day >= since)).scalars()
+            }
+
+            corrections: Dict[Tuple[str, str], StatDelta] = {}
+            for scope, key, day in set(actual) | set(stored):
+                expected = actual.get((scope, key, day), StatDelta())
+                row = stored.get((scope, key, day))
+                diff = expected.merged(StatDelta.from_row(row), -1) if row else expected
+                if diff.empty:
+                    continue
+                if expected.total == 0:
+                    db.delete(row)
+                elif row is None:
+                    row = ExecutionStatDaily(scope=scope, key=key, day=day)
+                    db.add(row)
+                    diff.apply(row, now)
+                else:
+                    diff.apply(row, now)
+                corrections[(scope, key)] = corrections.get((scope, key), StatDelta()).merged(diff)
+            self._write(db, corrections, {}, now)
+            db.commit()
+        finally:
+            db.close()
+        self.stats["reconciliations"] += 1
+        self.stats["corrections"] += len(corrections)
+        return len(corrections)
+
+    def _executions(self):
+        return select(
+            TaskExecution.id, TaskExecution.taskId, TaskExecution.nodeId, TaskExecution.status,
+            TaskExecution.startTime, TaskExecution.endTime, Script.type,
+        ).outerjoin(Task, Task.id == TaskExecution.taskId).outerjoin(Script, Script.id == Task.scriptId).where(
+            TaskExecution.status != ExecutionStatus.RUNNING,
+            TaskExecution.endTime.isnot(None),
+        )
+
+    def _cursor(self, db) -> ExecutionStatCursor:
+        cursor = db.get(ExecutionStatCursor, CURSOR_NAME)
+        if cursor is None:
+            db.add(ExecutionStatCursor(name=CURSOR_NAME, version=1))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+            cursor = db.get(ExecutionStatCursor, CURSOR_NAME)
+        return cursor
+
+    def _advance(self, db, cursor: ExecutionStatCursor, values: dict) -> bool:
+        """带版本条件地更新水位行，先于统计行写入，另一个副本已推进过时放弃本次"""
+        updated = db.execute(
+            update(ExecutionStatCursor)
+            .where(ExecutionStatCursor.name == CURSOR_NAME, ExecutionStatCursor.version == cursor.version)
+            .values({**values, ExecutionStatCursor.version: ExecutionStatCursor.version + 1})
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            db.rollback()
+            return False
+        # The next batch must compare against the version just written
+        db.expire(cursor)
+        return True
+
+    def _engine_ids(self, db) -> Dict[str, str]:
+        """Engine 按名称对应脚本类型 (与 warm_pool_engine 一样，名为 python 的引擎运行 PYTHON 脚本)"""
+        return {name.lower(): engine_id for engine_id, name in db.execute(select(Engine.id, Engine.name))}
+
+    def _keys(self, row, engines: Dict[str, str]) -> Iterable[Tuple[str, str]]:
+        yield "all", ALL_KEY
+        yield "task", row.taskId
+        if row.nodeId:
+            yield "node", row.nodeId
+        engine_id = engines.get(row.type.value.lower()) if row.type is not None else None
+        if engine_id:
+            yield "engine", engine_id
+
+    def _aggregate(self, db, rows) -> Tuple[Dict[Tuple[str, str], StatDelta], Dict[Tuple[str, str, datetime], StatDelta]]:
+        engines = self._engine_ids(db)
+        totals: Dict[Tuple[str, str], StatDelta] = {}
+        daily: Dict[Tuple[str, str, datetime], StatDelta] = {}
+        for row in rows:
+            day = floor_day(row.endTime)
+            for scope, key in self._keys(row, engines):
+                totals.setdefault((scope, key), StatDelta()).add(row.status, row.startTime, row.endTime)
+                daily.setdefault((scope, key, day), StatDelta()).add(row.status, row.startTime, row.endTime)
+        return totals, daily
+
+    def _write(self, db, totals: Dict[Tuple[str, str], StatDelta],
+               daily: Dict[Tuple[str, str, datetime], StatDelta], now: Optional[datetime] = None):
+        now = now or datetime.utcnow()
+        for scope in SCOPES:
+            keys = {key for s, key in totals if s == scope}
+            if keys:
+                existing = {
+                    row.key: row for row in db.execute(
+                        select(ExecutionStat).where(ExecutionStat.scope == scope, ExecutionStat.key.in_(keys))
+                    ).scalars()
+                }
+                for key in keys:
+                    row = existing.get(key)
+                    if row is None:
+                        row = ExecutionStat(scope=scope, key=key)
+                        db.add(row)
+                    totals[(scope, key)].apply(row, now)
+                    if scope == "engine":
+                        self._sync_engine(db, row)
+            days = {(key, day) for s, key, day in daily if s == scope}
+            if days:
+                existing = {
+                    (row.key, row.day): row for row in db.execute(
+                        select(ExecutionStatDaily).where(
+                            ExecutionStatDaily.scope == scope,
+                            ExecutionStatDaily.key.in_({key for key, _ in days}),
+                            ExecutionStatDaily.day.in_({day for _, day in days}),
+                        )
+                    ).scalars()
+                }
+                for key, day in days:
+                    row = existing.get((key, day))
+                    if row is None:
+                        row = ExecutionStatDaily(scope=scope, key=key, day=day)
+                        db.add(row)
+                    daily[(scope, key, day)].apply(row, now)
+
+    def _sync_engine(self, db, row: ExecutionStat):
+        """Engine 上原有的计数列跟随引擎统计行"""
+        db.execute(
+            update(Engine).where(Engine.id == row.key).values(
+                totalRuns=row.totalRuns,
+                successfulRuns=row.successfulRuns,
+                failedRuns=row.failedRuns,
+                averageRunTime=round(row.runTimeTotal / row.runTimeCount) if row.runTimeCount else None,
+            ).execution_options(synchronize_session=False)
+        )
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        # A new leader checks recent days once it has caught up
+        next_reconcile = loop.time()
+        while True:
+            started = loop.time()
+            try:
+                await asyncio.to_thread(self.apply_pending)
+                self.stats["passes"] += 1
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Warning: Execution stats pass failed: {e}")
+            self.stats["last_pass_seconds"] = loop.time() - started
+            if loop.time() >= next_reconcile:
+                started = loop.time()
+                try:
+                    await asyncio.to_thread(self.reconcile)
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"Warning: Execution stats reconciliation failed: {e}")
+                self.stats["last_reconcile_seconds"] = loop.time() - started
+                next_reconcile = loop.time() + self.reconcile_interval
+            await asyncio.sleep(self.interval)
+
+
+execution_stats = ExecutionStats(
+    interval=settings.execution_stats_interval,
+    settle_seconds=settings.execution_stats_settle_seconds,
+    batch_size=settings.execution_stats_batch_size,
+    reconcile_interval=settings.execution_stats_reconcile_interval,
+    reconcile_days=settings.execution_stats_reconcile_days,
+)
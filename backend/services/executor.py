@@ -0,0 +1,491 @@
+"""
+任务执行引擎
+请求路径只负责入队，由有界 worker 池异步运行 Task 对应的 Script，
+强制 Task.maxRunTime 并写入 TaskExecution 记录，输出按块流式写入分段日志
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.node import Node, NodeStatus
+from ..models.script import ScriptType
+from ..models.task import Task, TaskExecution, TaskStatus, ExecutionStatus
+from .logs import LogSegment, execution_logs, segment_rows
+from .script_cache import script_cache, ScriptFetchError
+from .environments import environment_manager, EnvironmentBuildError
+from .warm_pool import warm_pool, WarmWorkerError
+
+# Interpreter prefix per script type, the script path is appended
+INTERPRETERS = {
+    ScriptType.PYTHON: [sys.executable],
+    ScriptType.SHELL: ["bash"],
+    ScriptType.BATCH: ["cmd", "/c"],
+    ScriptType.POWERSHELL: ["powershell", "-ExecutionPolicy", "Bypass", "-File"],
+    ScriptType.JAVASCRIPT: ["node"],
+}
+# Scripts run in their own process group so a timeout also kills what they started
+PROCESS_GROUPS = hasattr(os, "killpg")
+# How long the output pipes may stay open after the process group was killed
+PIPE_DRAIN_SECONDS = 5
+
+
+class ExecutorBusyError(Exception):
+    """执行队列已满"""
+
+
+@dataclass
+class ExecutionJob:
+    execution_id: str
+    task_id: str
+    node_id: Optional[str] = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    # Set by cancel(), the running script is killed and the run recorded as CANCELLED
+    cancelled: bool = False
+
+
+@dataclass
+class ExecutionSpec:
+    command: List[str]
+    env: Dict[str, str]
+    cwd: Optional[str]
+    max_run_time: Optional[int]
+    environment_key: Optional[str] = None
+    # Script cache entry pinned for this run, released when it ends
+    script_hash: Optional[str] = None
+    # PYTHON scripts without a dedicated environment may run in a warm worker
+    warm_script: Optional[str] = None
+    # Set when the script or its environment could not be prepared, nothing is spawned
+    error: Optional[str] = None
+
+
+@dataclass
+class ExecutionResult:
+    status: ExecutionStatus
+    exit_code: Optional[int]
+    output: str
+    error: Optional[str]
+    log_segments: List[LogSegment] = field(default_factory=list)
+
+
+class TaskExecutor:
+    """有界 worker 池任务执行器"""
+
+    def __init__(self, max_workers: int, queue_size: int):
+        self.max_workers = max_workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._workers: List[asyncio.Task] = []
+        # Callbacks invoked on the event loop as (job) and (job, status)
+        self.on_started: List[Callable[[ExecutionJob], None]] = []
+        self.on_finished: List[Callable[[ExecutionJob, ExecutionStatus], None]] = []
+        # Invoked instead of on_finished when a run ends without a recorded result,
+        # because failover already took the execution over or the run crashed
+        self.on_discarded: List[Callable[[ExecutionJob], None]] = []
+        # Script runs in progress on this process, by execution ID
+        self._running: Dict[str, Tuple[ExecutionJob, asyncio.Task]] = {}
+        self.stats = {
+            "submitted": 0,
+            "started": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "queue_wait_total": 0.0,
+            "queue_wait_max": 0.0,
+        }
+
+    async def start(self):
+        """启动 worker 协程"""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"task-executor-{i}")
+            for i in range(self.max_workers)
+        ]
+
+    async def stop(self):
+        """停止 worker 协程，队列中尚未开始的任务会被丢弃"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, task_id: str, node_id: Optional[str] = None, execution_id: Optional[str] = None) -> str:
+        """将任务加入执行队列，立即返回执行ID"""
+        job = ExecutionJob(
+            execution_id=execution_id or str(uuid.uuid4()),
+            task_id=task_id,
+            node_id=node_id,
+        )
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise ExecutorBusyError("Execution queue is full")
+        self.stats["submitted"] += 1
+        return job.execution_id
+
+    def runs(self, execution_id: str) -> bool:
+        """执行是否正在本进程中运行"""
+        return execution_id in self._running
+
+    def cancel(self, task_ids: List[str]) -> int:
+        """杀掉这些任务在本进程中正在运行的脚本，返回被中止的执行数
+
+        只作用于本副本；其他副本或节点上的执行会跑完，但结果不会覆盖任务的 CANCELLED 状态
+        """
+        task_ids = set(task_ids)
+        stopped = 0
+        for job, run in list(self._running.values()):
+            if job.task_id in task_ids and not job.cancelled:
+                job.cancelled = True
+                run.cancel()
+                stopped += 1
+        return stopped
+
+    async def _worker(self):
+        while True:
+            job = await self.queue.get()
+            try:
+                await self._run_job(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Warning: Task execution {job.execution_id} crashed: {e}")
+                self._notify(self.on_discarded, job)
+            finally:
+                self.queue.task_done()
+
+    async def _run_job(self, job: ExecutionJob):
+        wait = time.perf_counter() - job.enqueued_at
+        self.stats["started"] += 1
+        self.stats["queue_wait_total"] += wait
+        self.stats["queue_wait_max"] = max(self.stats["queue_wait_max"], wait)
+
+        # Database work runs in a thread so the event loop never blocks on it
+        spec = await asyncio.to_thread(self._begin, job)
+        if spec is None:
+            self._notify(self.on_finished, job, ExecutionStatus.CANCELLED)
+            return
+        self._notify(self.on_started, job)
+        started = time.perf_counter()
+        try:
+            if spec.error:
+                result = ExecutionResult(ExecutionStatus.FAILED, None, "", spec.error)
+            else:
+                # Runs as its own task so cancel() can stop the script without stopping this worker
+                run = asyncio.ensure_future(self._spawn(job, spec))
+                self._running[job.execution_id] = (job, run)
+                try:
+                    result = await run
+                except asyncio.CancelledError:
+                    # Cancelled before the script started, e.g. while waiting for a warm worker
+                    if not job.cancelled or asyncio.current_task().cancelling():
+                        raise
+                    result = ExecutionResult(ExecutionStatus.CANCELLED, None, "", "Execution cancelled")
+                finally:
+                    self._running.pop(job.execution_id, None)
+        finally:
+            self._release(spec, time.perf_counter() - started)
+        if result.status == ExecutionStatus.SUCCESS:
+            self.stats["succeeded"] += 1
+        elif result.status == ExecutionStatus.CANCELLED:
+            self.stats["cancelled"] += 1
+        else:
+            self.stats["failed"] += 1
+        try:
+            recorded = await asyncio.to_thread(self._finish, job, result)
+        finally:
+            execution_logs.release(job.execution_id)
+        if recorded:
+            self._notify(self.on_finished, job, result.status)
+        else:
+            self._notify(self.on_discarded, job)
+
+    def _notify(self, listeners, *args):
+        for callback in listeners:
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Warning: Executor listener {callback} failed: {e}")
+
+    async def _spawn(self, job: ExecutionJob, spec: ExecutionSpec) -> ExecutionResult:
+        if spec.warm_script:
+            worker = await warm_pool.acquire()
+            if worker:
+                return await self._run_warm(job, spec, worker)
+        start = asyncio.ensure_future(asyncio.create_subprocess_exec(
+            *spec.command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=spec.cwd,
+            env=spec.env,
+            start_new_session=PROCESS_GROUPS,
+        ))
+        try:
+            process = await asyncio.shield(start)
+        except OSError as e:
+            return ExecutionResult(ExecutionStatus.FAILED, None, "", f"Failed to start process: {e}")
+        except asyncio.CancelledError:
+            # Cancelling the spawn itself kills only the shell, its children would keep running and hold the pipes
+            await _kill_started(start)
+            raise
+
+        # Output goes to segment files chunk by chunk, only a bounded tail stays in memory
+        stdout_log, stderr_log = execution_logs.open(job.execution_id)
+        pumps = asyncio.gather(
+            execution_logs.pump(process.stdout, stdout_log),
+            execution_logs.pump(process.stderr, stderr_log),
+        )
+        error = None
+        deadline = time.monotonic() + spec.max_run_time if spec.max_run_time else None
+        try:
+            await asyncio.wait_for(process.wait(), timeout=spec.max_run_time)
+            # Background children still holding the pipes count against the same limit
+            await asyncio.wait_for(
+                asyncio.shield(pumps), timeout=max(deadline - time.monotonic(), 0) if deadline else None
+            )
+        except asyncio.TimeoutError:
+            _kill_group(process)
+            await process.wait()
+            error = f"Execution exceeded maxRunTime ({spec.max_run_time}s)"
+        except asyncio.CancelledError:
+            _kill_group(process)
+            await process.wait()
+            if not job.cancelled:
+                pumps.cancel()
+                execution_logs.close(job.execution_id)
+                execution_logs.release(job.execution_id)
+                raise
+            error = "Execution cancelled"
+        try:
+            await asyncio.wait_for(pumps, timeout=PIPE_DRAIN_SECONDS)
+        except asyncio.TimeoutError:
+            print(f"Warning: Output pipes of execution {job.execution_id} still open after kill, dropped")
+        return self._result(job, process.returncode, error, stdout_log, stderr_log)
+
+    async def _run_warm(self, job: ExecutionJob, spec: ExecutionSpec, worker) -> ExecutionResult:
+        """交给预热 worker 运行，本次执行的输出管道随任务一起传给 worker"""
+        stdout_read, stdout_write = os.pipe()
+        stderr_read, stderr_write = os.pipe()
+        stdout_log, stderr_log = execution_logs.open(job.execution_id)
+        pumps = asyncio.gather(
+            execution_logs.pump(await _pipe_reader(stdout_read), stdout_log),
+            execution_logs.pump(await _pipe_reader(stderr_read), stderr_log),
+        )
+        exit_code = None
+        error = None
+        try:
+            exit_code = await warm_pool.run(
+                worker, spec.warm_script, spec.env, spec.cwd, spec.max_run_time,
+                (stdout_write, stderr_write),
+            )
+        except asyncio.TimeoutError:
+            error = f"Execution exceeded maxRunTime ({spec.max_run_time}s)"
+        except WarmWorkerError as e:
+            error = str(e)
+        except asyncio.CancelledError:
+            # The pool has already killed the worker
+            if not job.cancelled:
+                pumps.cancel()
+                execution_logs.close(job.execution_id)
+                execution_logs.release(job.execution_id)
+                raise
+            error = "Execution cancelled"
+        finally:
+            # The pipes reach EOF once the worker has dropped its copies too
+            os.close(stdout_write)
+            os.close(stderr_write)
+        await pumps
+        return self._result(job, exit_code, error, stdout_log, stderr_log)
+
+    def _result(self, job: ExecutionJob, exit_code: Optional[int], error: Optional[str],
+                stdout_log, stderr_log) -> ExecutionResult:
+        segments = execution_logs.close(job.execution_id)
+        if job.cancelled:
+            status = ExecutionStatus.CANCELLED
+        elif error is None and exit_code == 0:
+            status = ExecutionStatus.SUCCESS
+        else:
+            status = ExecutionStatus.FAILED
+        return ExecutionResult(
+            status,
+            exit_code,
+            stdout_log.tail.decode(errors="replace"),
+            error or stderr_log.tail.decode(errors="replace") or None,
+            segments,
+        )
+
+    def _begin(self, job: ExecutionJob) -> Optional[ExecutionSpec]:
+        """加载任务与脚本并准备运行环境，再写入 RUNNING 状态的 TaskExecution
+
+        准备 (下载脚本、构建环境) 可能耗时数分钟，不占用数据库会话；
+        之后任何一步出错都会归还已占用的环境与缓存条目。已取消的任务不再运行，返回 None
+        """
+        db = SessionLocal()
+        try:
+            task = db.query(Task).filter(Task.id == job.task_id).first()
+            if not task or task.status == TaskStatus.CANCELLED:
+                return None
+            script = task.script
+        finally:
+            # Loaded attributes stay readable on the detached objects
+            db.close()
+
+        spec = ExecutionSpec(command=[], env={}, cwd=None, max_run_time=None)
+        try:
+            try:
+                self._prepare(job, task, script, spec)
+            except (ScriptFetchError, EnvironmentBuildError, OSError) as e:
+                spec.error = f"Failed to prepare script: {e}"
+            except ValueError as e:
+                spec.error = f"Invalid script environment: {e}"
+
+            db = SessionLocal()
+            try:
+                # Conditional so a cancel committed while the script was prepared still wins
+                started = db.query(Task).filter(Task.id == task.id, Task.status != TaskStatus.CANCELLED).update(
+                    {Task.status: TaskStatus.RUNNING}, synchronize_session=False
+                )
+                if not started:
+                    db.rollback()
+                    self._release(spec)
+                    return None
+                db.add(TaskExecution(
+                    id=job.execution_id,
+                    taskId=task.id,
+                    nodeId=job.node_id or task.nodeId or _get_local_node_id(db),
+                    status=ExecutionStatus.RUNNING,
+                    startTime=datetime.utcnow(),
+                ))
+                db.commit()
+            finally:
+                db.close()
+        except BaseException:
+            self._release(spec)
+            raise
+        return spec
+
+    def _prepare(self, job: ExecutionJob, task: Task, script, spec: ExecutionSpec):
+        """取得脚本文件与运行环境并填好命令，占用的资源随即记入 spec 以便出错时归还"""
+        script_path = script.filePath
+        if script.fileHash:
+            # Content-addressed scripts run from the node cache, a hit needs no transfer
+            script_path = script_cache.get(
+                script.id, script.version, script.fileHash, script.fileName, script.filePath
+            )
+            spec.script_hash = script.fileHash
+        # Reuses the pooled environment for these requirements, builds it on first use
+        environment = environment_manager.acquire(script.language, script.requirements)
+        if environment:
+            spec.environment_key = environment.key
+
+        env = os.environ.copy()
+        if script.environment:
+            env.update({k: str(v) for k, v in json.loads(script.environment).items()})
+        env["TASK_ID"] = task.id
+        env["TASK_EXECUTION_ID"] = job.execution_id
+        env["TASK_PARAMETERS"] = task.parameters or "{}"
+
+        interpreter = INTERPRETERS.get(script.type, [])
+        if environment:
+            environment.apply(env)
+            if script.type == ScriptType.PYTHON:
+                interpreter = [environment.python]
+        spec.command = [*interpreter, script_path]
+        spec.env = env
+        spec.cwd = os.path.dirname(script_path) or None
+        spec.max_run_time = task.maxRunTime or script.timeout
+        spec.warm_script = script_path if script.type == ScriptType.PYTHON and not environment else None
+
+    def _release(self, spec: ExecutionSpec, run_time: float = 0.0):
+        if spec.environment_key:
+            environment_manager.release(spec.environment_key, run_time)
+            spec.environment_key = None
+        if spec.script_hash:
+            script_cache.release(spec.script_hash)
+            spec.script_hash = None
+
+    def _finish(self, job: ExecutionJob, result: ExecutionResult) -> bool:
+        """写入执行结果并更新任务状态，执行已被故障转移接管时返回 False"""
+        db = SessionLocal()
+        try:
+            execution = db.query(TaskExecution).filter(TaskExecution.id == job.execution_id).first()
+            if execution and execution.status != ExecutionStatus.RUNNING:
+                # Its node was declared lost and the task requeued, the late result is discarded
+                return False
+            if execution:
+                execution.status = result.status
+                execution.endTime = datetime.utcnow()
+                execution.exitCode = result.exit_code
+                execution.output = result.output
+                execution.error = result.error
+                db.add_all(segment_rows(job.execution_id, result.log_segments))
+            task = db.query(Task).filter(Task.id == job.task_id).first()
+            # A task cancelled while it ran stays cancelled
+            if task and task.status != TaskStatus.CANCELLED:
+                task.status = (
+                    TaskStatus.SUCCESS if result.status == ExecutionStatus.SUCCESS else TaskStatus.FAILED
+                )
+            db.commit()
+            return True
+        finally:
+            db.close()
+
+
+async def _pipe_reader(fd: int) -> asyncio.StreamReader:
+    """把管道读端包装为 StreamReader"""
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), os.fdopen(fd, "rb", 0))
+    return reader
+
+
+def _kill_group(process: asyncio.subprocess.Process):
+    """杀掉脚本进程及其启动的全部子进程"""
+    try:
+        if PROCESS_GROUPS:
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def _kill_started(start: asyncio.Future):
+    """等待已发起的进程创建完成，再杀掉整个进程组并读完管道"""
+    try:
+        process = await start
+    except OSError:
+        return
+    _kill_group(process)
+    await process.communicate()
+
+
+def _get_local_node_id(db) -> str:
+    """任务未指定节点时，执行记录挂到控制器本机节点"""
+    node = db.query(Node).filter(Node.name == settings.local_node_name).first()
+    if not node:
+        node = Node(
+            name=settings.local_node_name,
+            host="127.0.0.1",
+            port=0,
+            status=NodeStatus.ONLINE,
+            maxConcurrentTasks=settings.executor_max_workers,
+        )
+        db.add(node)
+        db.flush()
+    return node.id
+
+
+task_executor = TaskExecutor(
+    max_workers=settings.executor_max_workers,
+    queue_size=settings.executor_queue_size,
+)
@@ -0,0 +1,346 @@
+"""
+节点故障检测
+按心跳维护每个节点的截止时间，最小堆只弹出已过期的节点，无需扫描全部节点；
+截止时间由 phi-accrual (按历史心跳间隔的分布) 或固定超时计算。
+心跳会被负载均衡到任意副本，各副本批量写入 Node.lastHeartbeat；检测器只在主副本上运行，
+按水位轮询该列取得全部副本收到的心跳。
+节点超时后标记为 OFFLINE/CRITICAL，不再接收新任务；分布式队列模式下其上 RUNNING 的执行
+记为失败并重新分发到健康节点。本地分发模式下所有执行都是本控制器的子进程，nodeId 只是标签，
+这些执行继续运行并照常记录结果，不会重复执行
+"""
+
+import asyncio
+import heapq
+import math
+import statistics
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.node import Node, NodeStatus, NodeHealth
+from ..models.task import Task, TaskExecution, TaskStatus, TaskPriority, ExecutionStatus
+from .dispatcher import task_dispatcher, DispatcherBusyError
+
+POLICIES = ("phi", "timeout")
+# Failed-over executions are forgotten after this long, far past the dependency engine's poll lag,
+# so they do not pile up when no dependency poll consumes them
+FAILED_OVER_SECONDS = 600.0
+
+
+@dataclass
+class NodeLiveness:
+    node_id: str
+    last: float
+    intervals: Deque[float] = field(default_factory=deque)
+    deadline: float = 0.0
+    version: int = 0
+
+
+class FailureDetector:
+    """心跳截止时间索引，节点失联后执行故障转移"""
+
+    def __init__(self, policy: str, timeout: float, phi_threshold: float,
+                 min_std: float, window: int, check_interval: float, requeue: bool, heartbeat_lag: float):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown failure detector policy {policy!r}, expected one of {POLICIES}")
+        self.policy = policy
+        self.timeout = timeout
+        self.window = window
+        self.min_std = min_std
+        self.check_interval = check_interval
+        # Only when executions really run on the lost node, see the module docstring
+        self.requeue = requeue
+        # Replicas flush heartbeats in batches, a poll re-reads this far behind its watermark
+        # so a late flush carrying an older heartbeat is not skipped
+        self.heartbeat_lag = timedelta(seconds=heartbeat_lag)
+        self._watermark: Optional[datetime] = None
+        self._seen: Dict[str, datetime] = {}
+        # Standard deviations above the mean interval at which phi reaches the threshold
+        self._phi_z = statistics.NormalDist().inv_cdf(1 - 10 ** -phi_threshold)
+        self._nodes: Dict[str, NodeLiveness] = {}
+        self._deadlines: List[Tuple[float, int, str]] = []
+        # Nodes taken offline by the detector, brought back by their next heartbeat
+        self._failed: Set[str] = set()
+        # Executions failed here and requeued -> monotonic time, their dependents wait for the new run
+        self.failed_over: Dict[str, float] = {}
+        self._runner: Optional[asyncio.Task] = None
+        self.stats = {
+            "failures": 0,
+            "recoveries": 0,
+            "requeued": 0,
+        }
+
+    async def start(self):
+        """成为主副本时启动"""
+        if self._runner:
+            return
+        # Nodes that were online get a full grace period after a controller restart or failover
+        now = time.monotonic()
+        for node_id, last_heartbeat in await asyncio.to_thread(self._load_nodes):
+            self._track(node_id, now)
+            self._seen[node_id] = last_heartbeat
+            self._watermark = max(self._watermark or last_heartbeat, last_heartbeat)
+        self._runner = asyncio.create_task(self._run(), name="failure-detector")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        # The next leader starts from the database again
+        self._nodes.clear()
+        self._deadlines = []
+        self._failed.clear()
+        self.failed_over.clear()
+        self._seen.clear()
+        self._watermark = None
+
+    def heartbeat(self, node_id: str, received_at: Optional[datetime] = None):
+        """记录一次心跳并推迟该节点的截止时间 (在事件循环中调用)"""
+        # Untracked nodes may have been failed before a controller restart
+        recovering = node_id in self._failed or node_id not in self._nodes
+        now = time.monotonic()
+        if received_at is not None:
+            # Heartbeats arrive through the database some time after another replica received them
+            now -= min(max((datetime.utcnow() - received_at).total_seconds(), 0.0), self.timeout)
+        self._track(node_id, now)
+        if recovering:
+            self._failed.discard(node_id)
+            asyncio.create_task(self._recover(node_id))
+
+    def phi(self, node_id: str, now: Optional[float] = None) -> Optional[float]:
+        """当前怀疑度，越大越可能已失联"""
+        liveness = self._nodes.get(node_id)
+        if liveness is None or len(liveness.intervals) < 2:
+            return None
+        now = now if now is not None else time.monotonic()
+        mean, std = self._distribution(liveness)
+        survival = 1 - statistics.NormalDist(mean, std).cdf(now - liveness.last)
+        return float("inf") if survival <= 0 else -math.log10(survival)
+
+    def expired(self, now: float) -> List[str]:
+        """弹出截止时间已过的节点，复杂度与过期数量成正比"""
+        expired = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, version, node_id = heapq.heappop(self._deadlines)
+            liveness = self._nodes.get(node_id)
+            # Entries superseded by a later heartbeat are dropped here
+            if liveness is None or liveness.version != version:
+                continue
+            del self._nodes[node_id]
+            expired.append(node_id)
+        return expired
+
+    def report(self) -> dict:
+        now = time.monotonic()
+        return {
+            **self.stats,
+            "policy": self.policy,
+            "requeue": self.requeue,
+            "tracked": len(self._nodes),
+            "failed": sorted(self._failed),
+            "failedOver": len(self.failed_over),
+            "nodes": [
+                {
+                    "nodeId": liveness.node_id,
+                    "secondsSinceHeartbeat": round(now - liveness.last, 3),
+                    "secondsToDeadline": round(liveness.deadline - now, 3),
+                    "phi": self.phi(liveness.node_id, now),
+                }
+                for liveness in self._nodes.values()
+            ],
+        }
+
+    def _track(self, node_id: str, now: float):
+        liveness = self._nodes.get(node_id)
+        if liveness is None:
+            liveness = self._nodes[node_id] = NodeLiveness(node_id, now)
+        else:
+            # Replica clocks differ slightly, a heartbeat never moves time backwards
+            now = max(now, liveness.last)
+            liveness.intervals.append(now - liveness.last)
+            if len(liveness.intervals) > self.window:
+                liveness.intervals.popleft()
+            liveness.last = now
+            liveness.version += 1
+        liveness.deadline = now + self._allowed_silence(liveness)
+        heapq.heappush(self._deadlines, (liveness.deadline, liveness.version, node_id))
+
+    def _allowed_silence(self, liveness: NodeLiveness) -> float:
+        """距上次心跳多久后判定失联"""
+        if self.policy == "timeout" or len(liveness.intervals) < 2:
+            return self.timeout
+        mean, std = self._distribution(liveness)
+        # Never more patient than the plain timeout
+        return min(self.timeout, mean + self._phi_z * std)
+
+    def _distribution(self, liveness: NodeLiveness) -> Tuple[float, float]:
+        mean = statistics.fmean(liveness.intervals)
+        return mean, max(self.min_std, statistics.pstdev(liveness.intervals, mean))
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                heartbeats = await asyncio.to_thread(self._poll, self._watermark)
+            except Exception as e:
+                # Without fresh heartbeats every node would look silent, skip this round
+                print(f"Warning: Failed to read node heartbeats: {e}")
+                continue
+            for node_id, last_heartbeat in heartbeats:
+                if node_id in self._seen and last_heartbeat <= self._seen[node_id]:
+                    continue
+                self._seen[node_id] = last_heartbeat
+                self._watermark = max(self._watermark or last_heartbeat, last_heartbeat)
+                self.heartbeat(node_id, last_heartbeat)
+            self.forget_failed_over(time.monotonic())
+            node_ids = self.expired(time.monotonic())
+            if not node_ids:
+                continue
+            try:
+                await self._fail(node_ids)
+            except Exception as e:
+                print(f"Warning: Failover for nodes {node_ids} failed: {e}")
+
+    def forget_failed_over(self, now: float):
+        """丢弃超过 FAILED_OVER_SECONDS 仍未被依赖引擎取走的故障转移记录"""
+        cutoff = now - FAILED_OVER_SECONDS
+        for execution_id in [key for key, failed_at in self.failed_over.items() if failed_at < cutoff]:
+            del self.failed_over[execution_id]
+
+    async def _fail(self, node_ids: List[str]):
+        for node_id in node_ids:
+            task_dispatcher.remove_node(node_id)
+        lost = await asyncio.to_thread(self._mark_offline, node_ids, self.requeue)
+        self._failed.update(node_ids)
+        self.stats["failures"] += len(node_ids)
+        for execution_id, task_id, priority in lost:
+            task_dispatcher.forget(execution_id)
+            try:
+                # Unpinned, so the work moves to whichever healthy node has room
+                task_dispatcher.enqueue(task_id, priority)
+                self.stats["requeued"] += 1
+            except DispatcherBusyError:
+                print(f"Warning: Dispatch queue full, task {task_id} from a lost node not requeued")
+        if lost:
+            print(f"Warning: Nodes {node_ids} stopped sending heartbeats, requeued {len(lost)} executions")
+
+    async def _recover(self, node_id: str):
+        try:
+            if await asyncio.to_thread(self._mark_online, node_id):
+                self.stats["recoveries"] += 1
+                await task_dispatcher.refresh_nodes()
+        except Exception as e:
+            print(f"Warning: Failed to bring node {node_id} back online: {e}")
+
+    def _load_nodes(self) -> List[Tuple[str, datetime]]:
+        db = SessionLocal()
+        try:
+            rows = db.query(Node.id, Node.lastHeartbeat).filter(
+                Node.status.in_([NodeStatus.ONLINE, NodeStatus.BUSY]),
+                Node.lastHeartbeat.isnot(None),
+            ).all()
+            return [tuple(row) for row in rows]
+        finally:
+            db.close()
+
+    def _poll(self, watermark: Optional[datetime]) -> List[Tuple[str, datetime]]:
+        """读取水位之后写入的心跳，只涉及这段时间内报告过的节点 (在线程中调用)"""
+        db = SessionLocal()
+        try:
+            query = db.query(Node.id, Node.lastHeartbeat).filter(Node.lastHeartbeat.isnot(None))
+            if watermark is not None:
+                query = query.filter(Node.lastHeartbeat > watermark - self.heartbeat_lag)
+            return [tuple(row) for row in query.all()]
+        finally:
+            db.close()
+
+    def _mark_offline(self, node_ids: List[str], requeue: bool) -> List[Tuple[str, str, TaskPriority]]:
+        """节点置为 OFFLINE；requeue 时其 RUNNING 执行记为失败、任务回到 PENDING (在线程中调用)
+
+        返回需要重新分发的 (执行ID, 任务ID, 优先级)
+        """
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            values = {
+                Node.status: NodeStatus.OFFLINE,
+                Node.health: NodeHealth.CRITICAL,
+                Node.lastHealthCheck: now,
+            }
+            if requeue:
+                # Its executions are failed below, local ones keep their slots until they finish
+                values[Node.currentTaskCount] = 0
+            db.query(Node).filter(
+                Node.id.in_(node_ids),
+                Node.status.in_([NodeStatus.ONLINE, NodeStatus.BUSY]),
+            ).update(values, synchronize_session=False)
+            if not requeue:
+                db.commit()
+                return []
+            rows = db.query(TaskExecution.id, TaskExecution.nodeId, Task.id, Task.priority).join(
+                Task, Task.id == TaskExecution.taskId
+            ).filter(
+                TaskExecution.nodeId.in_(node_ids),
+                TaskExecution.status == ExecutionStatus.RUNNING,
+            ).all()
+            if rows:
+                # Recorded before the commit so a poll of finished executions can never see them first
+                failed_at = time.monotonic()
+                self.failed_over.update((execution_id, failed_at) for execution_id, _, _, _ in rows)
+                for execution_id, node_id, _, _ in rows:
+                    db.query(TaskExecution).filter(
+                        TaskExecution.id == execution_id,
+                        TaskExecution.status == ExecutionStatus.RUNNING,
+                    ).update(
+                        {
+                            TaskExecution.status: ExecutionStatus.FAILED,
+                            TaskExecution.endTime: now,
+                            TaskExecution.error: f"Node {node_id} stopped sending heartbeats",
+                        },
+                        synchronize_session=False,
+                    )
+                db.query(Task).filter(Task.id.in_({task_id for _, _, task_id, _ in rows})).update(
+                    {Task.status: TaskStatus.PENDING}, synchronize_session=False
+                )
+            db.commit()
+            return [(execution_id, task_id, priority) for execution_id, _, task_id, priority in rows]
+        finally:
+            db.close()
+
+    def _mark_online(self, node_id: str) -> bool:
+        """只恢复由检测器下线的节点，手动停止的节点保持 OFFLINE (在线程中调用)"""
+        db = SessionLocal()
+        try:
+            updated = db.query(Node).filter(
+                Node.id == node_id,
+                Node.status == NodeStatus.OFFLINE,
+                Node.health == NodeHealth.CRITICAL,
+            ).update(
+                {
+                    Node.status: NodeStatus.ONLINE,
+                    Node.health: NodeHealth.HEALTHY,
+                    Node.lastHealthCheck: datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
+            db.commit()
+            return updated == 1
+        finally:
+            db.close()
+
+
+failure_detector = FailureDetector(
+    policy=settings.failure_detector_policy,
+    timeout=settings.failure_detector_timeout,
+    phi_threshold=settings.failure_detector_phi_threshold,
+    min_std=settings.failure_detector_min_std,
+    window=settings.failure_detector_window,
+    check_interval=settings.failure_detector_check_interval,
+    requeue=settings.task_queue_backend != "local",
+    heartbeat_lag=2 * settings.heartbeat_flush_interval,
+)
@@ -0,0 +1,554 @@
+"""
+集群指标聚合
+最近的原始样本按列存放在内存中的定长 NumPy 块里 (随轮询追加、按时间整块淘汰)，
+写入时同时把每个值量化为细分桶编号；查询时逐块用 bincount 得到每个节点的细分直方图，
+再按节点/标签/状态/系统合并，分位数、最值、直方图都从合并后的直方图读出，不对样本排序。
+新样本按 id 从 node_metrics 轮询读入，多副本部署时每个副本都能看到所有副本写入的样本。
+百分比指标桶宽 0.1，其余指标相对误差约 2%；均值与采样速率为精确值。
+超出内存窗口的查询从 node_metrics 或 1m/1h 汇总表批量读取列后用同一套计算
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, or_, select
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.node import Node, NodeMetric, NodeMetricRollup
+from .metrics import EPOCH, ROLLUP_METRICS, metric_store
+
+# Columns kept in memory, the last two are per-second rates reported by the nodes
+AGGREGATE_METRICS = ROLLUP_METRICS + ("networkIO", "diskIO")
+# Metrics measured in percent share fixed 0-100 histogram edges
+PERCENT_METRICS = {"cpuUsage", "memoryUsage", "diskUsage"}
+GROUP_BY = ("node", "tag", "status", "osType")
+ROW = {metric: i for i, metric in enumerate(AGGREGATE_METRICS)}
+# Ids skipped by a poll may belong to a batch another replica has not committed yet, they are re-read this long
+GAP_SECONDS = 30.0
+
+
+def to_epoch(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+
+class Scale:
+    """指标值到细分桶编号的映射，桶 i 覆盖 [edges[i], edges[i+1])，缺失值编号为 bins"""
+
+    def __init__(self, edges: np.ndarray, log_base: Optional[float] = None):
+        self.edges = edges
+        self.bins = len(edges) - 1
+        self.log_base = log_base
+
+    def quantize(self, values: np.ndarray) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if self.log_base is None:
+                step = self.edges[1] - self.edges[0]
+                index = np.floor((values - self.edges[0]) / step)
+            else:
+                # Bin 0 holds everything below the smallest positive edge
+                index = np.floor(np.log(values / self.edges[1]) / np.log(self.log_base)) + 1
+                index[~(values >= self.edges[1])] = 0
+        codes = np.clip(np.nan_to_num(index, nan=0.0), 0, self.bins - 1).astype(np.uint16)
+        codes[np.isnan(values)] = self.bins
+        return codes
+
+
+def _log_edges(smallest: float, largest: float, base: float) -> np.ndarray:
+    count = int(np.ceil(np.log(largest / smallest) / np.log(base))) + 1
+    return np.concatenate(([0.0], smallest * base ** np.arange(count)))
+
+
+SCALES = {
+    metric: Scale(np.linspace(0.0, 100.0, 1001)) if metric in PERCENT_METRICS
+    else Scale(_log_edges(1e-3, 1e13, 1.04), log_base=1.04)
+    for metric in AGGREGATE_METRICS
+}
+
+
+@dataclass
+class Columns:
+    """一段样本的列视图: 若干 (节点下标, 值[指标, n], 桶编号[指标, n], 节点汇总) 分片，节点下标对应 node_ids
+
+    节点汇总为 (每个节点的样本数, 每个节点各指标之和)，只有已写满的块带有缓存的汇总
+    """
+    chunks: List[Tuple[np.ndarray, np.ndarray, np.ndarray, Optional[Tuple[np.ndarray, np.ndarray]]]]
+    node_ids: List[str]
+
+    @property
+    def samples(self) -> int:
+        return sum(len(chunk[0]) for chunk in self.chunks)
+
+
+class _Block:
+    def __init__(self, size: int):
+        self.timestamp = np.empty(size, dtype=np.float64)
+        self.node = np.empty(size, dtype=np.int32)
+        self.values = np.empty((len(AGGREGATE_METRICS), size), dtype=np.float32)
+        self.codes = np.empty((len(AGGREGATE_METRICS), size), dtype=np.uint16)
+        self.length = 0
+        self.oldest = np.inf
+        self.newest = -np.inf
+        self._summary: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def full(self) -> bool:
+        return self.length == len(self.timestamp)
+
+    def summary(self) -> Tuple[np.ndarray, np.ndarray]:
+        """写满后块不再变化，缓存每个节点的样本数与各指标之和"""
+        if self._summary is None:
+            self._summary = _summarize(self.node, self.values, int(self.node.max()) + 1)
+        return self._summary
+
+
+class FleetMetrics:
+    """内存列式样本窗口与分组聚合"""
+
+    def __init__(self, window: timedelta, block_size: int, poll_interval: float, session_factory=SessionLocal):
+        self.window = window
+        self.block_size = block_size
+        self.poll_interval = poll_interval
+        self.session_factory = session_factory
+        self._blocks: List[_Block] = []
+        self._index: Dict[str, int] = {}
+        self._node_ids: List[str] = []
+        # Epoch seconds from which the memory window holds every sample, None until loaded
+        self._complete_since: Optional[float] = None
+        # Highest node_metrics id read so far, and skipped ids below it -> monotonic deadline
+        self._last_id = 0
+        self._gaps: Dict[int, float] = {}
+        self._runner: Optional[asyncio.Task] = None
+        self.stats = {
+            "appended_samples": 0,
+            "loaded_samples": 0,
+            "polls": 0,
+            "evicted_blocks": 0,
+            "queries": 0,
+            "query_seconds": 0.0,
+        }
+
+    @property
+    def samples(self) -> int:
+        return sum(block.length for block in self._blocks)
+
+    async def start(self):
+        """在后台载入窗口内已落库的样本，之后轮询新写入的样本"""
+        if self._runner is not None:
+            return
+        # Rows up to this id are loaded from the table, later ones arrive through polling
+        last_id = await asyncio.to_thread(self._max_id)
+        self._runner = asyncio.create_task(self._run(last_id), name="fleet-metrics-poll")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        self._blocks = []
+        self._complete_since = None
+        self._last_id = 0
+        self._gaps = {}
+
+    async def poll(self):
+        """读入 id 超过已读水位的样本以及之前跳过的 id"""
+        now = time.monotonic()
+        self._gaps = {gap: deadline for gap, deadline in self._gaps.items() if deadline > now}
+        rows = await asyncio.to_thread(self._fetch_new, self._last_id, list(self._gaps))
+        self.stats["polls"] += 1
+        if not rows:
+            return
+        ids = [row[0] for row in rows]
+        for row_id in ids:
+            self._gaps.pop(row_id, None)
+        if ids[-1] > self._last_id:
+            seen = set(ids)
+            for missing in range(self._last_id + 1, ids[-1]):
+                if missing not in seen:
+                    self._gaps[missing] = now + GAP_SECONDS
+            self._last_id = ids[-1]
+        self.append([
+            {"nodeId": row[1], "timestamp": row[2], **dict(zip(AGGREGATE_METRICS, row[3:]))}
+            for row in rows
+        ])
+
+    def append(self, rows: List[dict]):
+        """追加一批已写入的样本行 (在事件循环中调用)"""
+        if not rows:
+            return
+        timestamps = np.fromiter((to_epoch(row["timestamp"]) for row in rows), dtype=np.float64, count=len(rows))
+        nodes = np.fromiter((self._node(row["nodeId"]) for row in rows), dtype=np.int32, count=len(rows))
+        values = np.array(
+            [[row.get(metric) for row in rows] for metric in AGGREGATE_METRICS], dtype=np.float32
+        )
+        self._extend(timestamps, nodes, values)
+        self.stats["appended_samples"] += len(rows)
+        self._evict(time.time() - self.window.total_seconds())
+
+    def covers(self, start: datetime) -> bool:
+        return self._complete_since is not None and to_epoch(start) >= max(
+            self._complete_since, time.time() - self.window.total_seconds()
+        )
+
+    def columns(self, start: datetime, end: datetime) -> Columns:
+        """内存窗口中 [start, end) 内的样本，完全落在区间内的块直接引用不复制"""
+        low, high = to_epoch(start), to_epoch(end)
+        chunks = []
+        # Snapshot lengths, the event loop keeps appending while a query runs in a thread
+        for block, length in [(block, block.length) for block in self._blocks]:
+            if not length or block.newest < low or block.oldest >= high:
+                continue
+            if block.oldest >= low and block.newest < high:
+                summary = block.summary() if length == self.block_size else None
+                chunks.append((block.node[:length], block.values[:, :length], block.codes[:, :length], summary))
+                continue
+            ts = block.timestamp[:length]
+            mask = (ts >= low) & (ts < high)
+            chunks.append((
+                block.node[:length][mask], block.values[:, :length][:, mask], block.codes[:, :length][:, mask], None
+            ))
+        return Columns(chunks=chunks, node_ids=list(self._node_ids))
+
+    def query(self, start: datetime, end: datetime, group_by: str, metrics: Sequence[str],
+              percentiles: Sequence[float], bins: int) -> dict:
+        """分组聚合，窗口在内存范围内时不访问样本表 (在线程中调用)"""
+        started = time.perf_counter()
+        if self.covers(start):
+            source, columns = "memory", self.columns(start, end)
+        else:
+            resolution = metric_store.pick_resolution(start, start, datetime.utcnow())
+            source = {0: "raw", 60: "1m", 3600: "1h"}[resolution]
+            columns = self._read(start, end, resolution)
+        groups = self._groups(group_by)
+        result = aggregate(columns, groups, to_epoch(end) - to_epoch(start), metrics, percentiles, bins)
+        elapsed = time.perf_counter() - started
+        self.stats["queries"] += 1
+        self.stats["query_seconds"] += elapsed
+        return {
+            "source": source,
+            "groupBy": group_by,
+            "start": start,
+            "end": end,
+            **result,
+            "elapsedMs": round(elapsed * 1000, 2),
+        }
+
+    def report(self) -> dict:
+        return {
+            **self.stats,
+            "samples": self.samples,
+            "blocks": len(self._blocks),
+            "nodes": len(self._node_ids),
+            "completeSince": datetime.utcfromtimestamp(self._complete_since) if self._complete_since else None,
+        }
+
+    def _node(self, node_id: str) -> int:
+        index = self._index.get(node_id)
+        if index is None:
+            index = self._index[node_id] = len(self._node_ids)
+            self._node_ids.append(node_id)
+        return index
+
+    def _extend(self, timestamps: np.ndarray, nodes: np.ndarray, values: np.ndarray):
+        codes = np.stack([SCALES[metric].quantize(values[i]) for i, metric in enumerate(AGGREGATE_METRICS)])
+        offset = 0
+        while offset < len(timestamps):
+            if not self._blocks or self._blocks[-1].full:
+                self._blocks.append(_Block(self.block_size))
+            block = self._blocks[-1]
+            count = min(len(timestamps) - offset, self.block_size - block.length)
+            end = block.length + count
+            part = slice(offset, offset + count)
+            block.timestamp[block.length:end] = timestamps[part]
+            block.node[block.length:end] = nodes[part]
+            block.values[:, block.length:end] = values[:, part]
+            block.codes[:, block.length:end] = codes[:, part]
+            block.oldest = min(block.oldest, float(timestamps[part].min()))
+            block.newest = max(block.newest, float(timestamps[part].max()))
+            # Publish the rows only once every column is written
+            block.length = end
+            offset += count
+
+    def _evict(self, cutoff: float):
+        """整块淘汰最新样本也早于 cutoff 的块，正在写入的块保留"""
+        kept = [block for block in self._blocks[:-1] if block.newest >= cutoff] + self._blocks[-1:]
+        self.stats["evicted_blocks"] += len(self._blocks) - len(kept)
+        self._blocks = kept
+
+    async def _run(self, last_id: int):
+        if not await self._load(last_id):
+            return
+        self._last_id = last_id
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.poll()
+            except Exception as e:
+                print(f"Warning: Failed to poll node metrics: {e}")
+
+    async def _load(self, last_id: int) -> bool:
+        since = datetime.utcnow() - self.window
+        try:
+            rows = await asyncio.to_thread(self._fetch_raw, since, last_id)
+        except Exception as e:
+            print(f"Warning: Failed to load recent node metrics into memory: {e}")
+            return False
+        if rows:
+            timestamps, node_ids, nodes, values = _unpack(rows, AGGREGATE_METRICS)
+            index = np.array([self._node(node_id) for node_id in node_ids], dtype=np.int32)
+            self._extend(timestamps, index[nodes], values)
+        self.stats["loaded_samples"] += len(rows)
+        self._complete_since = to_epoch(since)
+        return True
+
+    def _max_id(self) -> int:
+        db = self.session_factory()
+        try:
+            return db.execute(select(func.max(NodeMetric.id))).scalar() or 0
+        finally:
+            db.close()
+
+    def _fetch_raw(self, start: datetime, last_id: int) -> list:
+        """读取 start 之后、id 不超过 last_id 的原始样本 (在线程中调用)"""
+        db = self.session_factory()
+        try:
+            return db.execute(
+                select(NodeMetric.nodeId, NodeMetric.timestamp, *[getattr(NodeMetric, m) for m in AGGREGATE_METRICS])
+                .where(NodeMetric.timestamp >= start, NodeMetric.id <= last_id)
+            ).all()
+        finally:
+            db.close()
+
+    def _fetch_new(self, after_id: int, gap_ids: List[int]) -> list:
+        """按 id 顺序读取 id 大于 after_id 或属于 gap_ids 的样本 (在线程中调用)"""
+        condition = NodeMetric.id > after_id
+        if gap_ids:
+            condition = or_(condition, NodeMetric.id.in_(gap_ids))
+        db = self.session_factory()
+        try:
+            return db.execute(
+                select(NodeMetric.id, NodeMetric.nodeId, NodeMetric.timestamp,
+                       *[getattr(NodeMetric, m) for m in AGGREGATE_METRICS])
+                .where(condition).order_by(NodeMetric.id)
+            ).all()
+        finally:
+            db.close()
+
+    def _read(self, start: datetime, end: datetime, resolution: int) -> Columns:
+        """从样本表或汇总表批量读取列，汇总层以每个窗口的平均值作为样本 (在线程中调用)"""
+        db = self.session_factory()
+        try:
+            if resolution == 0:
+                rows = db.execute(
+                    select(NodeMetric.nodeId, NodeMetric.timestamp, *[getattr(NodeMetric, m) for m in AGGREGATE_METRICS])
+                    .where(NodeMetric.timestamp >= start, NodeMetric.timestamp < end)
+                ).all()
+                metrics = AGGREGATE_METRICS
+            else:
+                rows = db.execute(
+                    select(NodeMetricRollup.nodeId, NodeMetricRollup.bucket, *[
+                        getattr(NodeMetricRollup, f"{m}Sum") / func.nullif(getattr(NodeMetricRollup, f"{m}Count"), 0)
+                        for m in ROLLUP_METRICS
+                    ]).where(
+                        NodeMetricRollup.resolution == resolution,
+                        NodeMetricRollup.bucket >= start,
+                        NodeMetricRollup.bucket < end,
+                    )
+                ).all()
+                metrics = ROLLUP_METRICS
+        finally:
+            db.close()
+        if not rows:
+            return Columns(chunks=[], node_ids=[])
+        _, node_ids, nodes, values = _unpack(rows, metrics)
+        codes = np.stack([SCALES[metric].quantize(values[i]) for i, metric in enumerate(AGGREGATE_METRICS)])
+        return Columns(chunks=[(nodes, values, codes, None)], node_ids=node_ids)
+
+    def _groups(self, group_by: str) -> Dict[str, Tuple[str, ...]]:
+        """nodeId -> 所属分组，一个节点可以有多个标签 (在线程中调用)"""
+        db = self.session_factory()
+        try:
+            rows = db.execute(select(Node.id, Node.tags, Node.status, Node.osType)).all()
+        finally:
+            db.close()
+        groups = {}
+        for node_id, tags, node_status, os_type in rows:
+            if group_by == "node":
+                groups[node_id] = (node_id,)
+            elif group_by == "tag":
+                groups[node_id] = parse_tags(tags)
+            elif group_by == "status":
+                groups[node_id] = (node_status.value if node_status else "unknown",)
+            else:
+                groups[node_id] = (os_type or "unknown",)
+        return groups
+
+
+def parse_tags(tags: Optional[str]) -> Tuple[str, ...]:
+    """Node.tags 可以是 JSON 数组、JSON 对象 (展开为 key=value) 或逗号分隔的字符串"""
+    if not tags:
+        return ()
+    try:
+        parsed = json.loads(tags)
+    except ValueError:
+        parsed = tags.split(",")
+    if isinstance(parsed, dict):
+        return tuple(f"{key}={value}" for key, value in parsed.items())
+    if isinstance(parsed, list):
+        return tuple(str(tag).strip() for tag in parsed if str(tag).strip())
+    return (str(parsed),)
+
+
+def aggregate(columns: Columns, groups: Dict[str, Tuple[str, ...]], seconds: float, metrics: Sequence[str],
+              percentiles: Sequence[float], bins: int) -> dict:
+    """按分组计算样本数、采样速率、均值、最值、分位数与直方图
+
+    每个指标一次 bincount 得到 (节点, 细分桶) 计数，分组结果由所属节点的直方图相加得到，
+    节点属于多个标签时无需复制样本
+    """
+    node_count = len(columns.node_ids)
+    samples = np.zeros(node_count, dtype=np.int64)
+    totals = np.zeros((len(AGGREGATE_METRICS), node_count))
+    for nodes, values, _, summary in columns.chunks:
+        counts, chunk_totals = summary or _summarize(nodes, values, node_count)
+        samples[:len(counts)] += counts
+        totals[:, :len(counts)] += chunk_totals
+    # One bincount over the concatenated chunks, per-chunk counts would each allocate a full (node, bin) table
+    nodes = _concat([chunk[0] for chunk in columns.chunks], np.int32).astype(np.int64)
+    histograms = {}
+    for metric in metrics:
+        width = SCALES[metric].bins + 1
+        codes = _concat([chunk[2][ROW[metric]] for chunk in columns.chunks], np.uint16)
+        histograms[metric] = np.bincount(nodes * width + codes, minlength=node_count * width).reshape(node_count, width)
+
+    # (group, node) memberships sorted by group, so each group is one run for reduceat
+    pairs = sorted(
+        (label, node)
+        for node, node_id in enumerate(columns.node_ids)
+        for label in groups.get(node_id, ())
+    )
+    labels = sorted({label for label, _ in pairs})
+    pair_node = np.array([node for _, node in pairs], dtype=np.int64)
+    starts = np.flatnonzero([i == 0 or pairs[i - 1][0] != label for i, (label, _) in enumerate(pairs)])
+
+    def by_group(per_node: np.ndarray) -> np.ndarray:
+        if not pairs:
+            return np.zeros((0,) + per_node.shape[1:], dtype=per_node.dtype)
+        return np.add.reduceat(per_node[pair_node], starts, axis=0)
+
+    group_samples = by_group(samples)
+    group_nodes = by_group((samples > 0).astype(np.int64))
+    result_groups = [
+        {
+            "group": label,
+            "nodes": int(group_nodes[i]),
+            "samples": int(group_samples[i]),
+            "sampleRate": float(group_samples[i] / seconds) if seconds > 0 else None,
+            "metrics": {},
+        }
+        for i, label in enumerate(labels)
+    ]
+    edges = {}
+    keys = [_percentile_key(q) for q in percentiles]
+    for metric in metrics:
+        scale = SCALES[metric]
+        merged = by_group(histograms[metric][:, :scale.bins])
+        counts = merged.sum(axis=1).tolist()
+        means = by_group(totals[ROW[metric]]).tolist()
+        quantiles = _quantiles(merged, scale.edges, [0.0, *percentiles, 100.0]).tolist()
+        edges[metric] = _output_edges(metric, histograms[metric][:, :scale.bins].sum(axis=0), scale, bins)
+        coarse = _rebin(merged, scale.edges, edges[metric]).tolist()
+        for i, group in enumerate(result_groups):
+            if not counts[i]:
+                group["metrics"][metric] = None
+                continue
+            group["metrics"][metric] = {
+                "count": counts[i],
+                "min": quantiles[i][0],
+                "max": quantiles[i][-1],
+                "mean": means[i] / counts[i],
+                **dict(zip(keys, quantiles[i][1:-1])),
+                "histogram": coarse[i],
+            }
+    return {
+        "samples": int(samples.sum()),
+        "groups": [group for group in result_groups if group["samples"]],
+        "histogramEdges": {metric: values.tolist() for metric, values in edges.items()},
+    }
+
+
+def _quantiles(histograms: np.ndarray, edges: np.ndarray, percentiles: Sequence[float]) -> np.ndarray:
+    """从每行的细分直方图读出分位数，桶内按线性插值"""
+    cumulative = np.cumsum(histograms, axis=1)
+    totals = cumulative[:, -1]
+    result = np.zeros((len(histograms), len(percentiles)))
+    rows = np.arange(len(histograms))
+    for j, q in enumerate(percentiles):
+        # q=0 lands on the first non-empty bin rather than bin 0
+        rank = np.maximum(totals * q / 100.0, 1e-9)
+        index = np.minimum((cumulative < rank[:, None]).sum(axis=1), histograms.shape[1] - 1)
+        before = cumulative[rows, index] - histograms[rows, index]
+        within = np.divide(rank - before, histograms[rows, index],
+                           out=np.zeros(len(rows)), where=histograms[rows, index] > 0)
+        if q <= 0 or q >= 100:
+            # Bounds of the first/last non-empty bin
+            within = np.full(len(rows), 0.0 if q <= 0 else 1.0)
+        result[:, j] = edges[index] + np.clip(within, 0.0, 1.0) * (edges[index + 1] - edges[index])
+    return result
+
+
+def _output_edges(metric: str, overall: np.ndarray, scale: Scale, bins: int) -> np.ndarray:
+    if metric in PERCENT_METRICS:
+        return np.linspace(0.0, 100.0, bins + 1)
+    occupied = np.flatnonzero(overall)
+    if not len(occupied):
+        return np.linspace(0.0, 1.0, bins + 1)
+    low, high = scale.edges[occupied[0]], scale.edges[occupied[-1] + 1]
+    return np.linspace(low, high, bins + 1)
+
+
+def _rebin(histograms: np.ndarray, fine_edges: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """细分桶按中点归入输出桶，超出边界的计入首/末桶"""
+    middles = (fine_edges[:-1] + fine_edges[1:]) / 2
+    target = np.clip(np.searchsorted(edges, middles, side="right") - 1, 0, len(edges) - 2)
+    mapping = np.zeros((len(middles), len(edges) - 1))
+    mapping[np.arange(len(middles)), target] = 1.0
+    return np.rint(histograms @ mapping).astype(np.int64)
+
+
+def _unpack(rows: list, metrics: Sequence[str]) -> Tuple[np.ndarray, List[str], np.ndarray, np.ndarray]:
+    """查询结果行转为 (时间戳, 节点ID列表, 节点下标, 值[AGGREGATE_METRICS, n])，缺少的指标为 NaN"""
+    index: Dict[str, int] = {}
+    nodes = np.fromiter((index.setdefault(row[0], len(index)) for row in rows), dtype=np.int32, count=len(rows))
+    timestamps = np.fromiter((to_epoch(row[1]) for row in rows), dtype=np.float64, count=len(rows))
+    table = np.array([row[2:] for row in rows], dtype=np.float32).reshape(len(rows), len(metrics)).T
+    values = np.full((len(AGGREGATE_METRICS), len(rows)), np.nan, dtype=np.float32)
+    for i, metric in enumerate(metrics):
+        values[ROW[metric]] = table[i]
+    return timestamps, list(index), nodes, values
+
+
+def _summarize(nodes: np.ndarray, values: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    counts = np.bincount(nodes, minlength=size)
+    totals = np.stack([np.bincount(nodes, weights=np.nan_to_num(row), minlength=size) for row in values])
+    return counts, totals
+
+
+def _concat(parts: List[np.ndarray], dtype) -> np.ndarray:
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+
+
+def _percentile_key(q: float) -> str:
+    return f"p{q:g}".replace(".", "_")
+
+
+fleet_metrics = FleetMetrics(
+    window=timedelta(hours=settings.metrics_memory_window_hours),
+    block_size=settings.metrics_memory_block_size,
+    poll_interval=settings.metrics_memory_poll_interval,
+)
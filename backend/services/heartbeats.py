@@ -0,0 +1,194 @@
+"""
+节点心跳与指标采集
+心跳请求只写入内存缓冲区，后台按条数或时间批量写入 NodeMetric，
+同一节点在一个批次内的多次心跳合并为一次 Node.lastHeartbeat/lastHealthCheck 更新
+"""
+
+import asyncio
+import math
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import select, update
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.node import Node, NodeMetric
+
+# Columns a sample may carry, in the order used when a report omits "fields"
+METRIC_FIELDS = (
+    "cpuUsage", "memoryUsage", "diskUsage", "networkIO", "diskIO",
+    "processCount", "loadAverage", "temperature", "uptime",
+)
+DEFAULT_FIELDS = ("cpuUsage", "memoryUsage", "diskUsage")
+REQUIRED_FIELDS = {"cpuUsage", "memoryUsage", "diskUsage"}
+INTEGER_FIELDS = {"processCount", "uptime"}
+
+
+class IngestBackpressureError(Exception):
+    """缓冲区已满，写入跟不上采集速度"""
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def sample_error(fields: List[str], sample: list) -> Optional[str]:
+    """样本格式不对时返回原因：须为 [timestamp(epoch 秒或 null), *fields 对应的数值]，必需指标不能为 null"""
+    if not sample:
+        return "sample is empty, expected [timestamp, *values]"
+    if len(sample) > len(fields) + 1:
+        return f"sample has {len(sample) - 1} values for {len(fields)} fields"
+    timestamp = sample[0]
+    if timestamp is not None:
+        if not _is_number(timestamp):
+            return "timestamp must be epoch seconds or null"
+        try:
+            datetime.utcfromtimestamp(timestamp)
+        except (OverflowError, OSError, ValueError):
+            return "timestamp is out of range"
+    values = dict(zip(fields, sample[1:]))
+    for name in fields:
+        value = values.get(name)
+        if value is None:
+            if name in REQUIRED_FIELDS:
+                return f"{name} is required"
+        elif not _is_number(value):
+            return f"{name} must be a number"
+    return None
+
+
+class HeartbeatIngestor:
+    """缓冲心跳与指标，按 batch_size 或 flush_interval 批量落库"""
+
+    def __init__(self, batch_size: int, flush_interval: float, max_pending: int,
+                 session_factory: Callable = SessionLocal):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self._samples: List[dict] = []
+        # nodeId -> latest heartbeat received since the last flush
+        self._heartbeats: Dict[str, datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._runner: Optional[asyncio.Task] = None
+        self.stats = {
+            "received_samples": 0,
+            "received_heartbeats": 0,
+            "flushed_samples": 0,
+            "flushed_heartbeats": 0,
+            "dropped_samples": 0,
+            "flushes": 0,
+            "flush_seconds": 0.0,
+        }
+
+    @property
+    def pending(self) -> int:
+        return len(self._samples)
+
+    async def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run(), name="heartbeat-ingestor")
+
+    async def stop(self):
+        """停止后台循环并写入剩余数据"""
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        await self.flush()
+
+    def reserve(self, count: int):
+        """一个请求的样本会全部放入缓冲区时才开始写入，否则整体拒绝"""
+        if len(self._samples) + count > self.max_pending:
+            raise IngestBackpressureError(f"{self.pending} samples waiting to be written")
+
+    def submit(self, node_id: str, fields: List[str], samples: List[list],
+               received_at: Optional[datetime] = None):
+        """记录一个节点的心跳及其指标样本 (在事件循环中调用)
+
+        每个样本为 [timestamp(epoch 秒), *fields 对应的值]，timestamp 为空时使用接收时间
+        """
+        self.reserve(len(samples))
+        received_at = received_at or datetime.utcnow()
+        # The controller's clock decides liveness, node clocks may drift
+        self._heartbeats[node_id] = received_at
+        self.stats["received_heartbeats"] += 1
+        self.stats["received_samples"] += len(samples)
+        for sample in samples:
+            if sample_error(fields, sample):
+                self.stats["dropped_samples"] += 1
+                continue
+            timestamp = sample[0]
+            row = {
+                "nodeId": node_id,
+                "timestamp": datetime.utcfromtimestamp(timestamp) if timestamp is not None else received_at,
+            }
+            for name, value in zip(fields, sample[1:]):
+                if value is not None:
+                    row[name] = int(value) if name in INTEGER_FIELDS else float(value)
+            self._samples.append(row)
+        if len(self._samples) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """交换缓冲区并在线程中写入，同一时间只有一个批次在写"""
+        async with self._flush_lock:
+            samples, self._samples = self._samples, []
+            heartbeats, self._heartbeats = self._heartbeats, {}
+            if not samples and not heartbeats:
+                return
+            started = time.perf_counter()
+            try:
+                written = await asyncio.to_thread(self._write, samples, heartbeats)
+            except Exception as e:
+                self.stats["dropped_samples"] += len(samples)
+                print(f"Warning: Failed to write {len(samples)} heartbeat samples: {e}")
+                return
+            self.stats["flushes"] += 1
+            self.stats["flushed_samples"] += len(written)
+            self.stats["dropped_samples"] += len(samples) - len(written)
+            self.stats["flushed_heartbeats"] += len(heartbeats)
+            self.stats["flush_seconds"] += time.perf_counter() - started
+
+    def _write(self, samples: List[dict], heartbeats: Dict[str, datetime]) -> List[dict]:
+        """一次事务内批量插入样本并按节点更新 lastHeartbeat/lastHealthCheck，返回写入的样本行 (在线程中调用)"""
+        db = self.session_factory()
+        try:
+            node_ids = set(heartbeats) | {row["nodeId"] for row in samples}
+            known = set(db.execute(select(Node.id).where(Node.id.in_(node_ids))).scalars())
+            samples = [row for row in samples if row["nodeId"] in known]
+            if samples:
+                # Rows missing a column get NULL, executemany needs the same keys everywhere
+                keys = {key for row in samples for key in row}
+                db.execute(NodeMetric.__table__.insert(), [dict.fromkeys(keys) | row for row in samples])
+            updates = [
+                {"id": node_id, "lastHeartbeat": heartbeat, "lastHealthCheck": heartbeat}
+                for node_id, heartbeat in heartbeats.items() if node_id in known
+            ]
+            if updates:
+                db.execute(update(Node), updates)
+            db.commit()
+            return samples
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            # A cancel arriving just after the event fires is lost by wait_for on 3.11, leaving stop() waiting
+            wakeup = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait({wakeup}, timeout=self.flush_interval)
+            finally:
+                wakeup.cancel()
+            self._wakeup.clear()
+            await self.flush()
+
+
+heartbeat_ingestor = HeartbeatIngestor(
+    batch_size=settings.heartbeat_batch_size,
+    flush_interval=settings.heartbeat_flush_interval,
+    max_pending=settings.heartbeat_max_pending,
+)
@@ -0,0 +1,351 @@
+"""
+主副本选举
+多个 API 副本共享一份租约 (数据库 leader_leases 行或 Redis 键)，持有者每隔 renew_interval 续约，
+只有持有者运行调度循环与依赖循环；持有者失联后其余副本在一个租约期内接管，正常退出时主动释放立即接管。
+持有者在租约到期前仍未续约成功会先行降级，保证同一时刻最多一个副本在调度
+"""
+
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+import redis.asyncio as aioredis
+from sqlalchemy.exc import IntegrityError
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.lease import LeaderLease
+
+BACKENDS = ("none", "database", "redis")
+
+
+class Lease:
+    """租约接口，所有方法在事件循环中调用"""
+
+    async def acquire(self, holder: str, term: Optional[int]) -> Optional[int]:
+        """term 为空时尝试获取，否则续约；返回持有的任期，未持有时返回 None"""
+        raise NotImplementedError
+
+    async def release(self, holder: str, term: int):
+        raise NotImplementedError
+
+    async def describe(self) -> Optional[dict]:
+        """当前持有者，无人持有时返回 None"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class DatabaseLease(Lease):
+    """数据库行租约，所有修改都是带条件的 UPDATE
+
+    续约只递增 version；其他副本按本地单调时钟观察到 version 连续 lease_seconds 未变化才接管，
+    不依赖各副本的墙上时钟一致。expiresAt 只用于冷启动时跳过早已过期的租约
+    """
+
+    def __init__(self, name: str, lease_seconds: float):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self._observed: Optional[int] = None
+        self._observed_at = 0.0
+
+    async def acquire(self, holder: str, term: Optional[int]) -> Optional[int]:
+        return await asyncio.to_thread(self._acquire, holder, term)
+
+    async def release(self, holder: str, term: int):
+        await asyncio.to_thread(self._release, holder, term)
+
+    async def describe(self) -> Optional[dict]:
+        return await asyncio.to_thread(self._describe)
+
+    def _acquire(self, holder: str, term: Optional[int]) -> Optional[int]:
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.lease_seconds)
+        db = SessionLocal()
+        try:
+            if term is not None:
+                renewed = db.query(LeaderLease).filter(
+                    LeaderLease.name == self.name,
+                    LeaderLease.holder == holder,
+                    LeaderLease.term == term,
+                ).update({
+                    LeaderLease.version: LeaderLease.version + 1,
+                    LeaderLease.renewedAt: now,
+                    LeaderLease.expiresAt: expires_at,
+                }, synchronize_session=False)
+                db.commit()
+                return term if renewed else None
+
+            lease = db.get(LeaderLease, self.name)
+            if lease is None:
+                db.add(LeaderLease(
+                    name=self.name, holder=holder, term=1, version=1,
+                    acquiredAt=now, renewedAt=now, expiresAt=expires_at,
+                ))
+                try:
+                    db.commit()
+                except IntegrityError:
+                    db.rollback()
+                    return None
+                return 1
+
+            monotonic = time.monotonic()
+            if lease.version != self._observed:
+                self._observed, self._observed_at = lease.version, monotonic
+            # Left over from a cluster that stopped long ago, well past any clock skew
+            stale = lease.expiresAt is not None and lease.expiresAt + timedelta(seconds=self.lease_seconds) < now
+            if lease.holder not in (None, holder) and not stale \
+                    and monotonic - self._observed_at < self.lease_seconds:
+                return None
+            term = lease.term + 1
+            taken = db.query(LeaderLease).filter(
+                LeaderLease.name == self.name,
+                LeaderLease.version == lease.version,
+            ).update({
+                LeaderLease.holder: holder,
+                LeaderLease.term: term,
+                LeaderLease.version: LeaderLease.version + 1,
+                LeaderLease.acquiredAt: now,
+                LeaderLease.renewedAt: now,
+                LeaderLease.expiresAt: expires_at,
+            }, synchronize_session=False)
+            db.commit()
+            return term if taken else None
+        finally:
+            db.close()
+
+    def _release(self, holder: str, term: int):
+        db = SessionLocal()
+        try:
+            db.query(LeaderLease).filter(
+                LeaderLease.name == self.name,
+                LeaderLease.holder == holder,
+                LeaderLease.term == term,
+            ).update({
+                LeaderLease.holder: None,
+                LeaderLease.version: LeaderLease.version + 1,
+                LeaderLease.expiresAt: None,
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def _describe(self) -> Optional[dict]:
+        db = SessionLocal()
+        try:
+            lease = db.get(LeaderLease, self.name)
+            if lease is None or lease.holder is None:
+                return None
+            return {
+                "holder": lease.holder,
+                "term": lease.term,
+                "acquiredAt": lease.acquiredAt,
+                "renewedAt": lease.renewedAt,
+                "expiresAt": lease.expiresAt,
+            }
+        finally:
+            db.close()
+
+
+# Value is "<term>:<holder>", the term counter lives in a separate key so it survives expiry
+_ACQUIRE = """
+local current = redis.call('GET', KEYS[1])
+if ARGV[3] ~= '' then
+    if current == ARGV[3] .. ':' .. ARGV[1] then
+        redis.call('PEXPIRE', KEYS[1], ARGV[2])
+        return tonumber(ARGV[3])
+    end
+    return false
+end
+if current then
+    return false
+end
+local term = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], term .. ':' .. ARGV[1], 'PX', ARGV[2])
+return term
+"""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisLease(Lease):
+    """Redis 键租约，过期由 Redis 服务器计时"""
+
+    def __init__(self, url: str, name: str, lease_seconds: float):
+        self.key = name
+        self.lease_ms = int(lease_seconds * 1000)
+        self.client = aioredis.from_url(url, decode_responses=True)
+        self._acquire = self.client.register_script(_ACQUIRE)
+        self._release = self.client.register_script(_RELEASE)
+
+    async def acquire(self, holder: str, term: Optional[int]) -> Optional[int]:
+        result = await self._acquire(
+            keys=[self.key, f"{self.key}:term"],
+            args=[holder, self.lease_ms, "" if term is None else term],
+        )
+        return int(result) if result else None
+
+    async def release(self, holder: str, term: int):
+        await self._release(keys=[self.key], args=[f"{term}:{holder}"])
+
+    async def describe(self) -> Optional[dict]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.get(self.key)
+            pipe.pttl(self.key)
+            value, ttl = await pipe.execute()
+        if not value:
+            return None
+        term, holder = value.split(":", 1)
+        return {"holder": holder, "term": int(term), "expiresInSeconds": max(ttl, 0) / 1000}
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class LeaderElection:
+    """持有租约期间运行 on_elected 中的启动回调，失去租约或退出时按 on_demoted 停止"""
+
+    def __init__(self, lease: Optional[Lease], replica_id: str, lease_seconds: float, renew_interval: float):
+        if lease is not None and renew_interval * 2 > lease_seconds:
+            raise ValueError("Leader lease must cover at least two renew intervals")
+        # None runs as the only replica, always the leader
+        self.lease = lease
+        self.replica_id = replica_id
+        self.lease_seconds = lease_seconds
+        self.renew_interval = renew_interval
+        self.is_leader = False
+        self.term: Optional[int] = None
+        self.on_elected: List[Callable[[], Awaitable]] = []
+        self.on_demoted: List[Callable[[], Awaitable]] = []
+        # Monotonic time after which the lease may already belong to another replica
+        self._valid_until = 0.0
+        self._runner: Optional[asyncio.Task] = None
+        self.stats = {
+            "elections": 0,
+            "demotions": 0,
+            "renewals": 0,
+            "errors": 0,
+        }
+
+    async def start(self):
+        if self.lease is None:
+            await self._elect(None)
+        elif self._runner is None:
+            self._runner = asyncio.create_task(self._run(), name="leader-election")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        if self.is_leader:
+            term = self.term
+            await self._demote()
+            if self.lease is not None:
+                # Hand over right away instead of making the others wait out the lease
+                try:
+                    await self.lease.release(self.replica_id, term)
+                except Exception as e:
+                    print(f"Warning: Failed to release leader lease: {e}")
+        if self.lease is not None:
+            await self.lease.close()
+
+    async def report(self) -> dict:
+        holder = None
+        if self.lease is not None:
+            try:
+                holder = await self.lease.describe()
+            except Exception as e:
+                holder = {"error": str(e)}
+        return {
+            **self.stats,
+            "replicaId": self.replica_id,
+            "backend": type(self.lease).__name__ if self.lease else "none",
+            "isLeader": self.is_leader,
+            "term": self.term,
+            "leaseSeconds": self.lease_seconds,
+            "renewInterval": self.renew_interval,
+            "lease": holder,
+        }
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                term = await asyncio.wait_for(
+                    self.lease.acquire(self.replica_id, self.term if self.is_leader else None),
+                    timeout=self.renew_interval,
+                )
+            except asyncio.TimeoutError:
+                self.stats["errors"] += 1
+                print("Warning: Leader lease request timed out")
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Warning: Leader lease request failed: {e}")
+            else:
+                if term is not None:
+                    self._valid_until = started + self.lease_seconds
+                    if self.is_leader:
+                        self.stats["renewals"] += 1
+                    else:
+                        await self._elect(term)
+                elif self.is_leader:
+                    await self._demote()
+            # Step down while the lease is still ours if the next renewal could land too late
+            if self.is_leader and time.monotonic() + self.renew_interval >= self._valid_until:
+                await self._demote()
+            await asyncio.sleep(max(0.0, self.renew_interval - (time.monotonic() - started)))
+
+    async def _elect(self, term: Optional[int]):
+        self.is_leader = True
+        self.term = term
+        self.stats["elections"] += 1
+        for callback in self.on_elected:
+            try:
+                await callback()
+            except Exception as e:
+                print(f"Warning: Leader start callback failed: {e}")
+
+    async def _demote(self):
+        self.is_leader = False
+        self.term = None
+        self.stats["demotions"] += 1
+        for callback in self.on_demoted:
+            try:
+                await callback()
+            except Exception as e:
+                print(f"Warning: Leader stop callback failed: {e}")
+
+
+def create_lease(backend: str, name: str, lease_seconds: float, url: str) -> Optional[Lease]:
+    if backend == "none":
+        return None
+    if backend == "database":
+        return DatabaseLease(name, lease_seconds)
+    if backend == "redis":
+        return RedisLease(url, name, lease_seconds)
+    raise ValueError(f"Unknown leader election backend {backend!r}, expected one of {BACKENDS}")
+
+
+leader_election = LeaderElection(
+    lease=create_lease(
+        settings.leader_election_backend,
+        settings.leader_election_name,
+        settings.leader_election_lease_seconds,
+        settings.redis_url,
+    ),
+    replica_id=settings.leader_election_replica_id
+    or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}",
+    lease_seconds=settings.leader_election_lease_seconds,
+    renew_interval=settings.leader_election_renew_interval,
+)
@@ -0,0 +1,234 @@
+"""
+执行日志存储
+子进程的 stdout/stderr 按块追加写入分段文件，段的偏移记录在 TaskExecutionLog，
+支持按字节范围读取以及对运行中执行的实时跟随，内存占用与输出大小无关
+"""
+
+import asyncio
+import os
+import shutil
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.task import ExecutionStatus, TaskExecution, TaskExecutionLog
+
+STREAMS = ("stdout", "stderr")
+# How often a follower re-checks an execution that is RUNNING but not writing in this process yet
+FOLLOW_POLL_SECONDS = 0.5
+
+
+class LogUnavailableError(Exception):
+    """日志段文件不在本机 (执行运行在其他节点上)"""
+
+
+@dataclass
+class LogSegment:
+    stream: str
+    sequence: int
+    start_offset: int
+    length: int
+    path: str
+
+
+class ExecutionLog:
+    """单次执行的一条输出流，只追加写入"""
+
+    def __init__(self, execution_id: str, stream: str, directory: str, segment_size: int, tail_bytes: int):
+        self.execution_id = execution_id
+        self.stream = stream
+        self.directory = directory
+        self.segment_size = segment_size
+        self.tail_bytes = tail_bytes
+        self.segments: List[LogSegment] = []
+        self.size = 0
+        self.closed = False
+        self.tail = bytearray()
+        self.changed = asyncio.Event()
+        self._file = None
+
+    def append(self, data: bytes):
+        """写入一块输出，当前段写满后滚动到新段 (在线程中调用)"""
+        current = self.segments[-1] if self.segments else None
+        if current is None or current.length >= self.segment_size:
+            current = self._open_segment()
+        # Unbuffered writes: bytes are readable by followers as soon as length moves
+        self._file.write(data)
+        current.length += len(data)
+        self.size += len(data)
+        if self.tail_bytes:
+            self.tail += data
+            del self.tail[:-self.tail_bytes]
+
+    def notify(self):
+        """唤醒等待新数据的跟随者 (在事件循环中调用)"""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+        self.closed = True
+
+    def _open_segment(self) -> LogSegment:
+        if self._file:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        sequence = len(self.segments)
+        segment = LogSegment(
+            stream=self.stream,
+            sequence=sequence,
+            start_offset=self.size,
+            length=0,
+            path=os.path.join(self.directory, f"{self.stream}.{sequence:06d}.log"),
+        )
+        self._file = open(segment.path, "ab", buffering=0)
+        self.segments.append(segment)
+        return segment
+
+
+class ExecutionLogStore:
+    """分段日志的写入、范围读取与实时跟随"""
+
+    def __init__(self, log_dir: str, segment_size: int, chunk_size: int, tail_bytes: int):
+        self.log_dir = log_dir
+        self.segment_size = segment_size
+        self.chunk_size = chunk_size
+        self.tail_bytes = tail_bytes
+        # Executions that are still running, served from memory instead of the database
+        self._live: Dict[str, Dict[str, ExecutionLog]] = {}
+
+    def open(self, execution_id: str) -> Tuple[ExecutionLog, ExecutionLog]:
+        """为一次执行创建 stdout/stderr 写入器，文件在首次写入时才创建"""
+        directory = os.path.join(self.log_dir, "executions", execution_id)
+        logs = {
+            stream: ExecutionLog(execution_id, stream, directory, self.segment_size, self.tail_bytes)
+            for stream in STREAMS
+        }
+        self._live[execution_id] = logs
+        return logs["stdout"], logs["stderr"]
+
+    async def pump(self, reader: asyncio.StreamReader, log: ExecutionLog):
+        """把子进程管道按块写入日志，直到 EOF"""
+        while True:
+            chunk = await reader.read(self.chunk_size)
+            if not chunk:
+                break
+            await asyncio.to_thread(log.append, chunk)
+            log.notify()
+
+    def close(self, execution_id: str) -> List[LogSegment]:
+        """封存一次执行的日志，返回需要持久化的全部段"""
+        segments = []
+        for log in self._live.get(execution_id, {}).values():
+            log.close()
+            log.notify()
+            segments.extend(log.segments)
+        return segments
+
+    def is_live(self, execution_id: str) -> bool:
+        """执行是否正由本进程写入日志"""
+        return execution_id in self._live
+
+    def release(self, execution_id: str):
+        """段已写入数据库后调用，之后的读取改走数据库"""
+        self._live.pop(execution_id, None)
+
+    def remove(self, execution_ids: List[str]):
+        """删除已归档执行的日志目录 (在线程中调用)"""
+        for execution_id in execution_ids:
+            shutil.rmtree(os.path.join(self.log_dir, "executions", execution_id), ignore_errors=True)
+
+    def segments(self, execution_id: str, stream: str) -> List[LogSegment]:
+        """按序返回某条输出流的所有段 (在线程中调用)"""
+        live = self._live.get(execution_id)
+        if live:
+            return list(live[stream].segments)
+        db = SessionLocal()
+        try:
+            rows = db.query(TaskExecutionLog).filter(
+                TaskExecutionLog.executionId == execution_id,
+                TaskExecutionLog.stream == stream,
+            ).order_by(TaskExecutionLog.sequence).all()
+            return [
+                LogSegment(row.stream, row.sequence, row.startOffset, row.length, row.filePath)
+                for row in rows
+            ]
+        finally:
+            db.close()
+
+    def read(self, execution_id: str, stream: str, offset: int, length: int) -> Tuple[bytes, int]:
+        """读取 [offset, offset + length) 范围内的字节，返回 (数据, 当前总大小) (在线程中调用)
+
+        段文件不在本机时抛出 LogUnavailableError
+        """
+        segments = self.segments(execution_id, stream)
+        size = segments[-1].start_offset + segments[-1].length if segments else 0
+        data = bytearray()
+        for segment in segments:
+            end = segment.start_offset + segment.length
+            if end <= offset or len(data) >= length:
+                continue
+            position = offset + len(data) - segment.start_offset
+            try:
+                with open(segment.path, "rb") as f:
+                    f.seek(position)
+                    data += f.read(min(length - len(data), end - segment.start_offset - position))
+            except FileNotFoundError:
+                raise LogUnavailableError(f"Log segment {segment.sequence} of {stream} is not stored on this host")
+        return bytes(data), size
+
+    async def follow(self, execution_id: str, stream: str, offset: int = 0) -> AsyncIterator[Tuple[int, bytes]]:
+        """从 offset 开始跟随输出流，逐块产出 (下一偏移, 数据)，执行结束且读完后返回
+
+        每个跟随者只持有一个读块大小的缓冲区；本进程尚未开始写入时，按库中状态判断执行是否已结束
+        """
+        while True:
+            log = self._live.get(execution_id, {}).get(stream)
+            # Grab the event before reading so an append in between still wakes us
+            changed = log.changed if log else None
+            data, _ = await asyncio.to_thread(self.read, execution_id, stream, offset, self.chunk_size)
+            if data:
+                offset += len(data)
+                yield offset, data
+                continue
+            if log is None:
+                if not await asyncio.to_thread(self._running, execution_id):
+                    return
+                await asyncio.sleep(FOLLOW_POLL_SECONDS)
+                continue
+            if log.closed:
+                return
+            await changed.wait()
+
+    def _running(self, execution_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            status = db.query(TaskExecution.status).filter(TaskExecution.id == execution_id).scalar()
+            return status == ExecutionStatus.RUNNING
+        finally:
+            db.close()
+
+
+def segment_rows(execution_id: str, segments: List[LogSegment]) -> List[TaskExecutionLog]:
+    return [
+        TaskExecutionLog(
+            executionId=execution_id,
+            stream=segment.stream,
+            sequence=segment.sequence,
+            startOffset=segment.start_offset,
+            length=segment.length,
+            filePath=segment.path,
+        )
+        for segment in segments
+    ]
+
+
+execution_logs = ExecutionLogStore(
+    log_dir=settings.log_dir,
+    segment_size=settings.log_segment_size,
+    chunk_size=settings.log_chunk_size,
+    tail_bytes=settings.log_inline_tail_bytes,
+)
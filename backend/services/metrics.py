@@ -0,0 +1,298 @@
+"""
+节点指标时序存储
+原始样本写入 node_metrics (数值列、整型主键)，后台按 1m/1h 窗口汇总 min/max/sum/count 到
+node_metric_rollups，各层按各自的保留期清理；查询按时间跨度自动选择合适的层
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Integer, MetaData, Table, cast, func, inspect, select, text
+
+from ..core.config import settings
+from ..core.database import SessionLocal, engine
+from ..core.datetimes import to_naive_utc
+from ..models.node import NodeMetric, NodeMetricRollup
+
+# Metrics summarized into the rollup tiers
+ROLLUP_METRICS = ("cpuUsage", "memoryUsage", "diskUsage", "loadAverage")
+# (resolution in seconds, source resolution), 0 means raw samples
+TIERS = ((60, 0), (3600, 60))
+RESOLUTIONS = {"raw": 0, "1m": 60, "1h": 3600}
+# Longest span each resolution answers before the next coarser one is used
+MAX_SPAN = {0: timedelta(hours=2), 60: timedelta(days=3)}
+EPOCH = datetime(1970, 1, 1)
+
+
+def floor_time(value: datetime, resolution: int) -> datetime:
+    step = timedelta(seconds=resolution)
+    return EPOCH + ((to_naive_utc(value) - EPOCH) // step) * step
+
+
+class MetricStore:
+    """指标汇总与查询"""
+
+    def __init__(self, rollup_interval: float, rollup_delay: float, retention: Dict[int, timedelta],
+                 max_window: timedelta = timedelta(hours=6), archive_raw: bool = False):
+        self.rollup_interval = rollup_interval
+        self.rollup_delay = timedelta(seconds=rollup_delay)
+        self.retention = retention
+        # Caps how much raw data one pass loads after downtime
+        self.max_window = max_window
+        # Raw samples are archived and deleted by the retention engine instead
+        self.archive_raw = archive_raw
+        self._runner: Optional[asyncio.Task] = None
+        self.stats = {
+            "rollup_rows": {resolution: 0 for resolution, _ in TIERS},
+            "deleted_rows": {resolution: 0 for resolution in retention},
+            "last_rollup_seconds": 0.0,
+        }
+
+    async def start(self):
+        await asyncio.to_thread(self.migrate)
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run(), name="metric-rollup")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    def migrate(self):
+        """旧版 node_metrics (UUID 主键、字符串列) 改名为 node_metrics_legacy，数据转换后写入新表"""
+        inspector = inspect(engine)
+        if "node_metrics" not in inspector.get_table_names():
+            return
+        id_column = next(c for c in inspector.get_columns("node_metrics") if c["name"] == "id")
+        if isinstance(id_column["type"], Integer):
+            return
+        with engine.begin() as conn:
+            if engine.dialect.name != "mysql":
+                # Index names are schema-wide here and would clash with the new table's
+                for index in inspector.get_indexes("node_metrics"):
+                    conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+            conn.execute(text("ALTER TABLE node_metrics RENAME TO node_metrics_legacy"))
+            NodeMetric.__table__.create(conn)
+        try:
+            with engine.begin() as conn:
+                legacy = Table("node_metrics_legacy", MetaData(), autoload_with=conn)
+                columns = [c.name for c in NodeMetric.__table__.columns if c.name != "id"]
+                conn.execute(NodeMetric.__table__.insert().from_select(columns, select(*[
+                    legacy.c[name] if name in ("nodeId", "timestamp")
+                    else cast(func.nullif(legacy.c[name], ""), NodeMetric.__table__.c[name].type)
+                    for name in columns
+                ])))
+        except Exception as e:
+            print(f"Warning: Legacy node metrics kept in node_metrics_legacy, conversion failed: {e}")
+
+    def rollup(self, now: Optional[datetime] = None) -> Dict[int, int]:
+        """汇总所有已结束的窗口并执行保留期清理，返回各层新写入的行数 (在线程中调用)"""
+        now = now or datetime.utcnow()
+        written = {}
+        db = SessionLocal()
+        try:
+            for resolution, source in TIERS:
+                written[resolution] = self._rollup_tier(db, resolution, source, now)
+                self.stats["rollup_rows"][resolution] += written[resolution]
+            self._enforce_retention(db, now)
+        finally:
+            db.close()
+        return written
+
+    def series(self, node_id: str, start: datetime, end: datetime,
+               resolution: Optional[int] = None) -> Tuple[int, List[dict]]:
+        """返回 (所用分辨率, 数据点)，未指定分辨率时按跨度与保留期选择 (在线程中调用)"""
+        if resolution is None:
+            resolution = self.pick_resolution(start, end)
+        db = SessionLocal()
+        try:
+            if resolution == 0:
+                rows = db.execute(
+                    select(NodeMetric.timestamp, *[getattr(NodeMetric, m) for m in ROLLUP_METRICS])
+                    .where(NodeMetric.nodeId == node_id, NodeMetric.timestamp >= start, NodeMetric.timestamp < end)
+                    .order_by(NodeMetric.timestamp)
+                ).all()
+                points = [
+                    {"timestamp": row[0], **{
+                        metric: {"min": value, "max": value, "avg": value}
+                        for metric, value in zip(ROLLUP_METRICS, row[1:])
+                    }}
+                    for row in rows
+                ]
+            else:
+                rows = db.execute(
+                    select(NodeMetricRollup).where(
+                        NodeMetricRollup.nodeId == node_id,
+                        NodeMetricRollup.resolution == resolution,
+                        NodeMetricRollup.bucket >= floor_time(start, resolution),
+                        NodeMetricRollup.bucket < end,
+                    ).order_by(NodeMetricRollup.bucket)
+                ).scalars().all()
+                points = [
+                    {"timestamp": row.bucket, **{metric: _summary(row, metric) for metric in ROLLUP_METRICS}}
+                    for row in rows
+                ]
+            return resolution, points
+        finally:
+            db.close()
+
+    def rolled_up_until(self, db) -> Optional[datetime]:
+        """原始样本已汇总到的时间，此前的样本可以删除"""
+        return self._watermark(db, 60, 0)
+
+    def pick_resolution(self, start: datetime, end: datetime, now: Optional[datetime] = None) -> int:
+        """跨度内且仍在保留期内的最细分辨率"""
+        now = now or datetime.utcnow()
+        for resolution in (0, 60):
+            kept_since = now - self.retention[resolution]
+            if end - start <= MAX_SPAN[resolution] and start >= kept_since:
+                return resolution
+        return 3600
+
+    def _rollup_tier(self, db, resolution: int, source: int, now: datetime) -> int:
+        closed = floor_time(now - self.rollup_delay, resolution)
+        start = self._watermark(db, resolution, source)
+        written = 0
+        while start is not None and start < closed:
+            end = min(closed, start + max(self.max_window, timedelta(seconds=resolution)))
+            rows = self._aggregate(db, resolution, source, start, end)
+            if rows:
+                db.execute(NodeMetricRollup.__table__.insert(), rows)
+                db.commit()
+                written += len(rows)
+                start = end
+            else:
+                # Skip straight over gaps with no samples
+                start = self._first_source_time(db, source, end)
+                start = floor_time(start, resolution) if start else None
+        return written
+
+    def _watermark(self, db, resolution: int, source: int) -> Optional[datetime]:
+        """第一个尚未汇总的窗口起点"""
+        last = db.execute(
+            select(func.max(NodeMetricRollup.bucket)).where(NodeMetricRollup.resolution == resolution)
+        ).scalar()
+        if last is not None:
+            return last + timedelta(seconds=resolution)
+        first = self._first_source_time(db, source, None)
+        return floor_time(first, resolution) if first else None
+
+    def _first_source_time(self, db, source: int, after: Optional[datetime]) -> Optional[datetime]:
+        if source == 0:
+            query = select(func.min(NodeMetric.timestamp))
+            if after is not None:
+                query = query.where(NodeMetric.timestamp >= after)
+        else:
+            query = select(func.min(NodeMetricRollup.bucket)).where(NodeMetricRollup.resolution == source)
+            if after is not None:
+                query = query.where(NodeMetricRollup.bucket >= after)
+        return db.execute(query).scalar()
+
+    def _aggregate(self, db, resolution: int, source: int, start: datetime, end: datetime) -> List[dict]:
+        buckets: Dict[Tuple[str, datetime], dict] = {}
+        if source == 0:
+            result = db.execute(
+                select(NodeMetric.nodeId, NodeMetric.timestamp, *[getattr(NodeMetric, m) for m in ROLLUP_METRICS])
+                .where(NodeMetric.timestamp >= start, NodeMetric.timestamp < end)
+            )
+            for node_id, timestamp, *values in result:
+                row = _bucket_row(buckets, node_id, resolution, floor_time(timestamp, resolution))
+                for metric, value in zip(ROLLUP_METRICS, values):
+                    if value is not None:
+                        _merge(row, metric, value, value, value, 1)
+        else:
+            result = db.execute(
+                select(NodeMetricRollup).where(
+                    NodeMetricRollup.resolution == source,
+                    NodeMetricRollup.bucket >= start,
+                    NodeMetricRollup.bucket < end,
+                )
+            ).scalars()
+            for child in result:
+                row = _bucket_row(buckets, child.nodeId, resolution, floor_time(child.bucket, resolution))
+                for metric in ROLLUP_METRICS:
+                    count = getattr(child, f"{metric}Count") or 0
+                    if count:
+                        _merge(row, metric, getattr(child, f"{metric}Min"), getattr(child, f"{metric}Max"),
+                               getattr(child, f"{metric}Sum"), count)
+        return list(buckets.values())
+
+    def _enforce_retention(self, db, now: datetime):
+        """删除超出保留期的数据，尚未汇总到上一层的数据不删除"""
+        watermarks = {resolution: self._watermark(db, resolution, source) for resolution, source in TIERS}
+        rolled_into = {source: resolution for resolution, source in TIERS}
+        for resolution, keep in self.retention.items():
+            if resolution == 0 and self.archive_raw:
+                continue
+            cutoff = now - keep
+            if resolution in rolled_into:
+                watermark = watermarks[rolled_into[resolution]]
+                if watermark is None:
+                    continue
+                cutoff = min(cutoff, watermark)
+            if resolution == 0:
+                deleted = db.query(NodeMetric).filter(NodeMetric.timestamp < cutoff).delete(
+                    synchronize_session=False
+                )
+            else:
+                deleted = db.query(NodeMetricRollup).filter(
+                    NodeMetricRollup.resolution == resolution,
+                    NodeMetricRollup.bucket < cutoff,
+                ).delete(synchronize_session=False)
+            db.commit()
+            self.stats["deleted_rows"][resolution] += deleted
+
+    async def _run(self):
+        while True:
+            started = asyncio.get_running_loop().time()
+            try:
+                await asyncio.to_thread(self.rollup)
+            except Exception as e:
+                print(f"Warning: Node metric rollup failed: {e}")
+            self.stats["last_rollup_seconds"] = asyncio.get_running_loop().time() - started
+            await asyncio.sleep(self.rollup_interval)
+
+
+def _bucket_row(buckets: Dict[Tuple[str, datetime], dict], node_id: str, resolution: int,
+                bucket: datetime) -> dict:
+    row = buckets.get((node_id, bucket))
+    if row is None:
+        row = buckets[(node_id, bucket)] = {"nodeId": node_id, "resolution": resolution, "bucket": bucket}
+        for metric in ROLLUP_METRICS:
+            row.update({f"{metric}Min": None, f"{metric}Max": None, f"{metric}Sum": None, f"{metric}Count": 0})
+    return row
+
+
+def _merge(row: dict, metric: str, low: float, high: float, total: float, count: int):
+    if row[f"{metric}Count"]:
+        row[f"{metric}Min"] = min(row[f"{metric}Min"], low)
+        row[f"{metric}Max"] = max(row[f"{metric}Max"], high)
+        row[f"{metric}Sum"] += total
+    else:
+        row[f"{metric}Min"], row[f"{metric}Max"], row[f"{metric}Sum"] = low, high, total
+    row[f"{metric}Count"] += count
+
+
+def _summary(row: NodeMetricRollup, metric: str) -> Optional[dict]:
+    count = getattr(row, f"{metric}Count")
+    if not count:
+        return None
+    return {
+        "min": getattr(row, f"{metric}Min"),
+        "max": getattr(row, f"{metric}Max"),
+        "avg": getattr(row, f"{metric}Sum") / count,
+    }
+
+
+metric_store = MetricStore(
+    rollup_interval=settings.metrics_rollup_interval,
+    rollup_delay=settings.metrics_rollup_delay,
+    retention={
+        0: timedelta(hours=settings.metrics_raw_retention_hours),
+        60: timedelta(days=settings.metrics_minute_retention_days),
+        3600: timedelta(days=settings.metrics_hour_retention_days),
+    },
+    archive_raw=bool(settings.retention_days.get("node_metrics")),
+)
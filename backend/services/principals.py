@@ -0,0 +1,204 @@
+"""
+认证主体缓存
+按 JWT 签名缓存已解析的用户与展开后的权限集合，命中时既不解码令牌也不查询数据库；
+条目有效期不超过令牌的 exp，用户、角色或权限在本进程提交修改后相关条目立即失效，
+其他副本上的条目最多在 ttl 后过期
+"""
+
+import asyncio
+import hmac
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Optional, Set
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from ..core.config import settings
+from ..core.security import verify_token
+from ..models.user import User, Role, Permission, UserRole, RolePermission
+
+
+class InvalidCredentialsError(Exception):
+    """令牌无效、过期或用户不存在/已停用"""
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: str
+    email: str
+    name: Optional[str]
+    isActive: bool
+    roles: FrozenSet[str]  # role ids
+    permissions: FrozenSet[str]  # permission codes
+
+    def has_permissions(self, *codes: str) -> bool:
+        return all(code in self.permissions for code in codes)
+
+
+@dataclass
+class CacheEntry:
+    token: str
+    principal: Principal
+    expires_at: float  # monotonic
+
+
+class PrincipalCache:
+    """签名 -> 主体的 LRU 缓存"""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._by_user: Dict[str, Set[str]] = {}
+        # Concurrent first requests with the same token share one lookup
+        self._loading: Dict[str, asyncio.Future] = {}
+        # Bumped by every invalidation, a lookup that raced one is not cached
+        self._generation = 0
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "invalidations": 0,
+        }
+
+    async def resolve(self, token: str, db: AsyncSession) -> Principal:
+        signature = token.rsplit(".", 1)[-1]
+        entry = self._entries.get(signature)
+        if entry is not None:
+            if entry.expires_at > time.monotonic() and hmac.compare_digest(entry.token, token):
+                self._entries.move_to_end(signature)
+                self.stats["hits"] += 1
+                return entry.principal
+            if entry.expires_at <= time.monotonic():
+                self._discard(signature)
+
+        self.stats["misses"] += 1
+        loading = self._loading.get(token)
+        if loading is not None:
+            return await asyncio.shield(loading)
+        loading = self._loading[token] = asyncio.get_running_loop().create_future()
+        generation = self._generation
+        try:
+            principal, expires_at = await self._load(token, db)
+        except asyncio.CancelledError:
+            loading.cancel()
+            raise
+        except Exception as e:
+            loading.set_exception(e)
+            # Nobody else may be waiting, keep the loop from logging an unretrieved exception
+            loading.exception()
+            raise
+        else:
+            loading.set_result(principal)
+        finally:
+            del self._loading[token]
+        if generation == self._generation and expires_at > time.monotonic():
+            self._store(signature, CacheEntry(token, principal, expires_at))
+        return principal
+
+    def invalidate_users(self, user_ids: Set[str]):
+        self._generation += 1
+        for user_id in user_ids:
+            for signature in list(self._by_user.get(user_id, ())):
+                self._discard(signature)
+                self.stats["invalidations"] += 1
+
+    def invalidate_roles(self, role_ids: Set[str]):
+        self.invalidate_users({
+            entry.principal.id for entry in self._entries.values() if entry.principal.roles & role_ids
+        })
+
+    def clear(self):
+        self._generation += 1
+        self.stats["invalidations"] += len(self._entries)
+        self._entries.clear()
+        self._by_user.clear()
+
+    def report(self) -> dict:
+        return {**self.stats, "entries": len(self._entries), "ttl": self.ttl}
+
+    async def _load(self, token: str, db: AsyncSession):
+        payload = verify_token(token)
+        if payload is None or not payload.get("sub"):
+            raise InvalidCredentialsError("Could not validate credentials")
+        user = await db.scalar(
+            select(User)
+            .where(User.email == payload["sub"])
+            .options(selectinload(User.roles).selectinload(Role.permissions))
+        )
+        if user is None or not user.isActive:
+            raise InvalidCredentialsError("Could not validate credentials")
+        principal = Principal(
+            id=user.id,
+            email=user.email,
+            name=user.name,
+            isActive=user.isActive,
+            roles=frozenset(role.id for role in user.roles),
+            permissions=frozenset(permission.code for role in user.roles for permission in role.permissions),
+        )
+        # Never outlive the token itself
+        lifetime = self.ttl
+        if payload.get("exp") is not None:
+            lifetime = min(lifetime, payload["exp"] - time.time())
+        return principal, time.monotonic() + lifetime
+
+    def _store(self, signature: str, entry: CacheEntry):
+        self._discard(signature)
+        self._entries[signature] = entry
+        self._by_user.setdefault(entry.principal.id, set()).add(signature)
+        while len(self._entries) > self.max_entries:
+            self._discard(next(iter(self._entries)))
+
+    def _discard(self, signature: str):
+        entry = self._entries.pop(signature, None)
+        if entry is None:
+            return
+        signatures = self._by_user.get(entry.principal.id)
+        if signatures is not None:
+            signatures.discard(signature)
+            if not signatures:
+                del self._by_user[entry.principal.id]
+
+    def install(self):
+        """监听 ORM 提交，用户/角色/权限变化后失效相关条目"""
+        event.listen(Session, "after_flush", self._collect_changes)
+        event.listen(Session, "after_commit", self._apply_changes)
+        event.listen(Session, "after_rollback", self._drop_changes)
+
+    def _collect_changes(self, session: Session, flush_context):
+        for obj in (*session.new, *session.dirty, *session.deleted):
+            if not isinstance(obj, (User, UserRole, Role, RolePermission, Permission)):
+                continue
+            changes = session.info.setdefault("principal_changes", {"users": set(), "roles": set(), "all": False})
+            if isinstance(obj, User):
+                changes["users"].add(obj.id)
+            elif isinstance(obj, UserRole):
+                changes["users"].add(obj.userId)
+            elif isinstance(obj, Role):
+                changes["roles"].add(obj.id)
+            elif isinstance(obj, RolePermission):
+                changes["roles"].add(obj.roleId)
+            else:
+                changes["all"] = True
+
+    def _apply_changes(self, session: Session):
+        changes = session.info.pop("principal_changes", None)
+        if not changes:
+            return
+        if changes["all"]:
+            self.clear()
+            return
+        self.invalidate_users(changes["users"])
+        self.invalidate_roles(changes["roles"])
+
+    def _drop_changes(self, session: Session):
+        session.info.pop("principal_changes", None)
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.auth_cache_ttl_seconds,
+    max_entries=settings.auth_cache_max_entries,
+)
+principal_cache.install()
@@ -0,0 +1,320 @@
+"""
+数据保留与归档
+主副本按各表的保留策略分批取出超期行，按天写成 gzip 压缩的 JSON Lines 归档文件后以小事务分块删除；
+归档按 表/日期 目录分区，只读查询按时间范围只打开相关日期的文件，逐行按列值过滤
+"""
+
+import asyncio
+import base64
+import enum
+import gzip
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import Table, delete, select
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.datetimes import to_naive_utc
+from ..models.engine import EngineMetric
+from ..models.node import NodeMetric
+from ..models.notification import NotificationLog
+from ..models.profile import UserActivity
+from ..models.script import ScriptExecution
+from ..models.stats import ExecutionStatCursor
+from ..models.task import TaskExecution, TaskExecutionLog
+from .execution_stats import CURSOR_NAME
+from .logs import execution_logs
+from .metrics import metric_store
+
+# Archived tables and the column their age is measured by, rows where it is NULL never expire
+TABLES: Dict[str, Tuple[Table, str]] = {
+    "task_executions": (TaskExecution.__table__, "endTime"),
+    "script_executions": (ScriptExecution.__table__, "endTime"),
+    "node_metrics": (NodeMetric.__table__, "timestamp"),
+    "engine_metrics": (EngineMetric.__table__, "timestamp"),
+    "notification_logs": (NotificationLog.__table__, "sentAt"),
+    "user_activities": (UserActivity.__table__, "timestamp"),
+}
+DAY_FORMAT = "%Y-%m-%d"
+PART_SUFFIX = ".jsonl.gz"
+
+
+class ArchiveQueryError(Exception):
+    """归档查询参数无效"""
+
+
+@dataclass
+class RetentionPolicy:
+    table: Table
+    time_column: str
+    keep: timedelta
+    # Dependent rows deleted in the same transaction as their parents, as (table, foreign key column)
+    children: Tuple[Tuple[Table, str], ...] = ()
+    # Newest time another service is done with, expired rows past it wait
+    ready_until: Optional[Callable[[Any], Optional[datetime]]] = None
+    # Called with the primary keys of every committed delete
+    on_deleted: Optional[Callable[[List[Any]], None]] = None
+
+    @property
+    def name(self) -> str:
+        return self.table.name
+
+
+class ArchiveStore:
+    """<root>/<表>/<日期>/part-*.jsonl.gz，分片写完并 fsync 后才改名可见"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def write(self, table: str, day: str, key: str, rows: List[dict]) -> int:
+        """写入一个分片并返回其字节数 (在线程中调用)
+
+        文件名由批次的首尾主键决定，删除失败后重试同一批会覆盖原文件而不是多出一份
+        """
+        directory = os.path.join(self.root, table, day)
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha1(f"{rows[0][key]}|{rows[-1][key]}|{len(rows)}".encode()).hexdigest()[:16]
+        path = os.path.join(directory, f"part-{digest}{PART_SUFFIX}")
+        temporary = f"{path}.tmp"
+        with open(temporary, "wb") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=_json_default, ensure_ascii=False).encode())
+                    f.write(b"\n")
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(temporary, path)
+        return os.path.getsize(path)
+
+    def summary(self, table: str) -> dict:
+        """某表归档的日期范围、分片数与大小 (在线程中调用)"""
+        days = self._days(table)
+        files = size = 0
+        for day in days:
+            for name in self._parts(table, day):
+                files += 1
+                size += os.path.getsize(os.path.join(self.root, table, day, name))
+        return {
+            "firstDay": days[0] if days else None,
+            "lastDay": days[-1] if days else None,
+            "days": len(days),
+            "files": files,
+            "bytes": size,
+        }
+
+    def query(self, table: str, time_column: str, start: datetime, end: datetime,
+              filters: Dict[str, str], cursor: Optional[str], limit: int) -> dict:
+        """返回 [start, end) 内且各列等于给定值的行，按 日期/分片/行号 顺序游标分页 (在线程中调用)"""
+        position = decode_position(cursor) if cursor else None
+        start, end = to_naive_utc(start), to_naive_utc(end)
+        first_day, last_day = start.strftime(DAY_FORMAT), end.strftime(DAY_FORMAT)
+        items: List[dict] = []
+        last = None
+        for day in self._days(table):
+            if day < first_day or day > last_day or (position and day < position[0]):
+                continue
+            for name in self._parts(table, day):
+                if position and (day, name) < position[:2]:
+                    continue
+                with gzip.open(os.path.join(self.root, table, day, name), "rt", encoding="utf-8") as f:
+                    for line_number, line in enumerate(f):
+                        if position and (day, name) == position[:2] and line_number <= position[2]:
+                            continue
+                        row = json.loads(line)
+                        timestamp = row.get(time_column)
+                        if timestamp is None or not start <= to_naive_utc(datetime.fromisoformat(timestamp)) < end:
+                            continue
+                        if any(str(row.get(column)) != value for column, value in filters.items()):
+                            continue
+                        if len(items) == limit:
+                            return {"items": items, "next_cursor": encode_position(*last)}
+                        items.append(row)
+                        last = (day, name, line_number)
+        return {"items": items, "next_cursor": None}
+
+    def _days(self, table: str) -> List[str]:
+        directory = os.path.join(self.root, table)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory) if os.path.isdir(os.path.join(directory, name)))
+
+    def _parts(self, table: str, day: str) -> List[str]:
+        return sorted(name for name in os.listdir(os.path.join(self.root, table, day)) if name.endswith(PART_SUFFIX))
+
+
+def encode_position(day: str, name: str, line: int) -> str:
+    raw = json.dumps([day, name, line]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_position(cursor: str) -> Tuple[str, str, int]:
+    try:
+        day, name, line = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(day), str(name), int(line)
+    except (ValueError, TypeError):
+        raise ArchiveQueryError("Invalid cursor")
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode()
+    return str(value)
+
+
+class RetentionEngine:
+    """按策略归档并删除超期行，只在主副本上运行"""
+
+    def __init__(self, policies: List[RetentionPolicy], archive: ArchiveStore, interval: float,
+                 batch_size: int, delete_chunk: int, delete_pause: float, max_batches: int):
+        self.policies = {policy.name: policy for policy in policies}
+        self.archive = archive
+        self.interval = interval
+        self.batch_size = batch_size
+        self.delete_chunk = delete_chunk
+        self.delete_pause = delete_pause
+        # Bounds one pass, a large backlog is worked off over several intervals
+        self.max_batches = max_batches
+        self._runner: Optional[asyncio.Task] = None
+        self.stats = {
+            "archived_rows": {name: 0 for name in self.policies},
+            "archive_files": 0,
+            "archive_bytes": 0,
+            "errors": 0,
+            "last_pass_seconds": 0.0,
+        }
+
+    async def start(self):
+        if self._runner is None and self.policies:
+            self._runner = asyncio.create_task(self._run(), name="retention")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    def report(self) -> dict:
+        return {
+            **self.stats,
+            "running": self._runner is not None,
+            "policies": {name: policy.keep.total_seconds() / 86400 for name, policy in self.policies.items()},
+            "interval": self.interval,
+        }
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """归档并删除各表的超期行，返回各表删除的行数 (在线程中调用)"""
+        now = now or datetime.utcnow()
+        deleted = {}
+        for name, policy in self.policies.items():
+            try:
+                deleted[name] = self._expire(policy, now)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Warning: Retention of {name} failed: {e}")
+        return deleted
+
+    def _expire(self, policy: RetentionPolicy, now: datetime) -> int:
+        table = policy.table
+        time_column = table.c[policy.time_column]
+        key = list(table.primary_key.columns)[0]
+        deleted = 0
+        db = SessionLocal()
+        try:
+            cutoff = now - policy.keep
+            if policy.ready_until is not None:
+                ready = policy.ready_until(db)
+                if ready is None:
+                    return 0
+                cutoff = min(cutoff, ready)
+            for _ in range(self.max_batches):
+                rows = db.execute(
+                    select(table).where(time_column < cutoff).order_by(time_column, key).limit(self.batch_size)
+                ).mappings().all()
+                # Don't hold the read transaction open while the files are written
+                db.commit()
+                if not rows:
+                    break
+                days: Dict[str, List[dict]] = {}
+                for row in rows:
+                    days.setdefault(row[time_column.name].strftime(DAY_FORMAT), []).append(dict(row))
+                for day, day_rows in days.items():
+                    self.stats["archive_bytes"] += self.archive.write(table.name, day, key.name, day_rows)
+                    self.stats["archive_files"] += 1
+
+                # Rows are only deleted once their archive part is durable
+                ids = [row[key.name] for row in rows]
+                for offset in range(0, len(ids), self.delete_chunk):
+                    chunk = ids[offset:offset + self.delete_chunk]
+                    for child, column in policy.children:
+                        db.execute(delete(child).where(child.c[column].in_(chunk)))
+                    db.execute(delete(table).where(key.in_(chunk)))
+                    db.commit()
+                    deleted += len(chunk)
+                    self.stats["archived_rows"][table.name] += len(chunk)
+                    if policy.on_deleted is not None:
+                        policy.on_deleted(chunk)
+                    time.sleep(self.delete_pause)
+                if len(rows) < self.batch_size:
+                    break
+        finally:
+            db.close()
+        return deleted
+
+    async def _run(self):
+        while True:
+            started = asyncio.get_running_loop().time()
+            await asyncio.to_thread(self.run_once)
+            self.stats["last_pass_seconds"] = asyncio.get_running_loop().time() - started
+            await asyncio.sleep(self.interval)
+
+
+def _counted_until(db) -> Optional[datetime]:
+    """执行统计的水位，尚未计入统计的执行先不归档"""
+    cursor = db.get(ExecutionStatCursor, CURSOR_NAME)
+    return cursor.throughTime if cursor else None
+
+
+def build_policies(days: Dict[str, float]) -> List[RetentionPolicy]:
+    unknown = set(days) - set(TABLES)
+    if unknown:
+        raise ValueError(f"Unknown retention tables {sorted(unknown)}, expected some of {list(TABLES)}")
+    # Reconciliation recounts these days from task_executions, archiving them would undo the totals
+    if 0 < days.get("task_executions", 0) <= settings.execution_stats_reconcile_days:
+        raise ValueError("task_executions must be kept longer than execution_stats_reconcile_days")
+    policies = []
+    for name, keep in days.items():
+        if not keep:
+            continue
+        table, time_column = TABLES[name]
+        policy = RetentionPolicy(table, time_column, timedelta(days=keep))
+        if name == "task_executions":
+            policy.children = ((TaskExecutionLog.__table__, "executionId"),)
+            policy.ready_until = _counted_until
+            policy.on_deleted = execution_logs.remove
+        elif name == "node_metrics":
+            policy.ready_until = metric_store.rolled_up_until
+        policies.append(policy)
+    return policies
+
+
+archive_store = ArchiveStore(settings.retention_archive_dir)
+
+retention_engine = RetentionEngine(
+    policies=build_policies(settings.retention_days),
+    archive=archive_store,
+    interval=settings.retention_interval,
+    batch_size=settings.retention_batch_size,
+    delete_chunk=settings.retention_delete_chunk,
+    delete_pause=settings.retention_delete_pause,
+    max_batches=settings.retention_max_batches,
+)
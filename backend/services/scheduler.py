@@ -0,0 +1,314 @@
+"""
+定时调度引擎
+按 nextRunAt 维护最小堆，休眠到最近的截止时间再触发，
+每次唤醒的开销只与到期的调度数量相关，与调度总数无关；
+多副本时定期按 updatedAt 水位只读取其他副本改过的调度
+"""
+
+import asyncio
+import calendar
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, time as dt_time
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.task import TaskSchedule, ScheduleCycle
+from .dispatcher import task_dispatcher, DispatcherBusyError
+
+# A refresh re-reads rows this far behind its watermark, updatedAt is set before the commit lands
+REFRESH_LAG = timedelta(seconds=5)
+
+
+def parse_run_time(run_time: str) -> dt_time:
+    """解析 "HH:MM" 格式的运行时间"""
+    try:
+        hour, minute = run_time.strip().split(":")
+        return dt_time(int(hour), int(minute))
+    except (ValueError, AttributeError):
+        raise ValueError(f"Invalid runTime '{run_time}', expected HH:MM")
+
+
+def compute_next_run(
+    cycle_type: ScheduleCycle,
+    run_time: str,
+    after: datetime,
+    anchor: Optional[datetime] = None,
+) -> datetime:
+    """计算 after 之后的下一次运行时间
+
+    WEEKLY 使用 anchor 的星期几，MONTHLY 使用 anchor 的日期（按月末截断），
+    anchor 通常是调度的创建时间。所有时间均为 UTC。
+    """
+    at = parse_run_time(run_time)
+    anchor = anchor or after
+
+    if cycle_type == ScheduleCycle.DAILY:
+        candidate = datetime.combine(after.date(), at)
+        if candidate <= after:
+            candidate += timedelta(days=1)
+        return candidate
+
+    if cycle_type == ScheduleCycle.WEEKLY:
+        days_ahead = (anchor.weekday() - after.weekday()) % 7
+        candidate = datetime.combine(after.date() + timedelta(days=days_ahead), at)
+        if candidate <= after:
+            candidate += timedelta(days=7)
+        return candidate
+
+    if cycle_type == ScheduleCycle.MONTHLY:
+        year, month = after.year, after.month
+        for _ in range(2):
+            day = min(anchor.day, calendar.monthrange(year, month)[1])
+            candidate = datetime.combine(datetime(year, month, day).date(), at)
+            if candidate > after:
+                return candidate
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return candidate
+
+    raise ValueError(f"Unsupported cycleType: {cycle_type}")
+
+
+@dataclass
+class ScheduleEntry:
+    schedule_id: str
+    task_id: str
+    cycle_type: ScheduleCycle
+    run_time: str
+    anchor: datetime
+    next_run_at: datetime
+
+
+@dataclass
+class ScheduleChanges:
+    """一次加载读到的调度"""
+    entries: List[ScheduleEntry] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)  # deactivated since the watermark
+    through: Optional[datetime] = None
+    active_count: int = 0
+    # Every active schedule ID, only read after the count disagreed, e.g. after a delete
+    active: Optional[Set[str]] = None
+
+
+class ScheduleEngine:
+    """基于最小堆的进程内调度器"""
+
+    def __init__(self, refresh_interval: Optional[float] = None):
+        # Periodic reload from the database, picks up edits made through other replicas
+        self.refresh_interval = refresh_interval
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._entries: Dict[str, ScheduleEntry] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._edits = 0
+        self._through: Optional[datetime] = None
+        self._resync = False
+
+    async def start(self):
+        """从数据库加载激活的调度并启动调度循环"""
+        if self._runner:
+            return
+        changes = await asyncio.to_thread(self._load)
+        for entry in changes.entries:
+            self._push(entry)
+        self._through = changes.through
+        self._runner = asyncio.create_task(self._run(), name="schedule-engine")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        self._heap.clear()
+        self._entries.clear()
+        self._through = None
+        self._resync = False
+
+    def upsert(self, schedule: TaskSchedule):
+        """调度创建或修改后调用，按新的 nextRunAt 重新入堆"""
+        # Not the leader, the change is loaded from the database once this replica is elected
+        if self._runner is None:
+            return
+        self._edits += 1
+        if not schedule.isActive or schedule.nextRunAt is None:
+            self.remove(schedule.id)
+            return
+        self._push(ScheduleEntry(
+            schedule_id=schedule.id,
+            task_id=schedule.taskId,
+            cycle_type=schedule.cycleType,
+            run_time=schedule.runTime,
+            anchor=schedule.createdAt or schedule.nextRunAt,
+            next_run_at=schedule.nextRunAt,
+        ))
+
+    def remove(self, schedule_id: str):
+        """移除调度，堆中的旧条目在弹出时被惰性丢弃"""
+        self._edits += 1
+        self._entries.pop(schedule_id, None)
+
+    def due_within(self, seconds: float) -> List[str]:
+        """未来 seconds 秒内将触发的任务ID，按触发时间顺序遍历堆，只访问不晚于截止时间的条目"""
+        horizon = datetime.utcnow() + timedelta(seconds=seconds)
+        task_ids: Dict[str, None] = {}
+        # Children are never earlier than their parent, so a frontier of heap positions yields entries in order
+        frontier = [(self._heap[0], 0)] if self._heap else []
+        while frontier:
+            (run_at, _, schedule_id), position = heapq.heappop(frontier)
+            if run_at > horizon:
+                break
+            entry = self._entries.get(schedule_id)
+            # Stale copies left behind by edits and removals
+            if entry is not None and entry.next_run_at == run_at:
+                task_ids[entry.task_id] = None
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(self._heap):
+                    heapq.heappush(frontier, (self._heap[child], child))
+        return list(task_ids)
+
+    def _push(self, entry: ScheduleEntry):
+        self._entries[entry.schedule_id] = entry
+        heapq.heappush(self._heap, (entry.next_run_at, next(self._counter), entry.schedule_id))
+        # Wake the loop in case this deadline is earlier than the one it sleeps on
+        self._wakeup.set()
+
+    def _pop_due(self, now: datetime) -> List[ScheduleEntry]:
+        due = []
+        seen = set()
+        while self._heap and self._heap[0][0] <= now:
+            run_at, _, schedule_id = heapq.heappop(self._heap)
+            entry = self._entries.get(schedule_id)
+            # Skip entries superseded by an edit or removed since they were pushed,
+            # and the copy an edit that kept nextRunAt pushed for the same time
+            if entry is None or entry.next_run_at != run_at or schedule_id in seen:
+                continue
+            seen.add(schedule_id)
+            due.append(entry)
+        return due
+
+    async def _refresh(self):
+        """只应用水位之后变更的调度，开销与变更数量相关"""
+        edits = self._edits
+        changes = await asyncio.to_thread(self._load, self._through, self._resync)
+        # A local edit landed while loading and may be newer than what was read, try again next time
+        if edits != self._edits:
+            return
+        for schedule_id in changes.removed:
+            self._entries.pop(schedule_id, None)
+        if changes.active is not None:
+            for schedule_id in set(self._entries) - changes.active:
+                del self._entries[schedule_id]
+        for entry in changes.entries:
+            # Rows re-read inside the lag window, or persisted by this loop's own runs, are unchanged
+            if self._entries.get(entry.schedule_id) != entry:
+                self._push(entry)
+        self._through = changes.through or self._through
+        self._resync = len(self._entries) != changes.active_count
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        refresh_at = loop.time() + (self.refresh_interval or 0)
+        while True:
+            if self.refresh_interval and loop.time() >= refresh_at:
+                try:
+                    await self._refresh()
+                except Exception as e:
+                    print(f"Warning: Failed to reload schedules: {e}")
+                refresh_at = loop.time() + self.refresh_interval
+            now = datetime.utcnow()
+            due = self._pop_due(now)
+            if due:
+                updates = [self._fire(entry, now) for entry in due]
+                try:
+                    await asyncio.to_thread(self._persist, updates)
+                except Exception as e:
+                    print(f"Warning: Failed to persist schedule run times: {e}")
+
+            self._wakeup.clear()
+            timeout = None
+            if self._heap:
+                timeout = max(0.0, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+            if self.refresh_interval:
+                until_refresh = max(0.0, refresh_at - loop.time())
+                timeout = until_refresh if timeout is None else min(timeout, until_refresh)
+            # asyncio.wait rather than wait_for: on 3.11 wait_for swallows a stop() that lands right after a wakeup
+            wakeup = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait({wakeup}, timeout=timeout)
+            finally:
+                wakeup.cancel()
+
+    def _fire(self, entry: ScheduleEntry, now: datetime) -> Tuple[str, Optional[datetime], datetime]:
+        last_run_at = None
+        try:
+            task_dispatcher.enqueue(entry.task_id)
+            last_run_at = now
+            entry.next_run_at = compute_next_run(entry.cycle_type, entry.run_time, now, entry.anchor)
+        except DispatcherBusyError:
+            entry.next_run_at = now + timedelta(seconds=settings.scheduler_retry_seconds)
+        heapq.heappush(self._heap, (entry.next_run_at, next(self._counter), entry.schedule_id))
+        return entry.schedule_id, last_run_at, entry.next_run_at
+
+    def _load(self, since: Optional[datetime] = None, resync: bool = False) -> ScheduleChanges:
+        """since 为空时读取全部激活的调度，否则只读 updatedAt 在水位之后的行 (在线程中调用)"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            changes = ScheduleChanges()
+            query = db.query(TaskSchedule)
+            if since is None:
+                query = query.filter(TaskSchedule.isActive == True)
+            else:
+                query = query.filter(TaskSchedule.updatedAt > since - REFRESH_LAG)
+            for schedule in query.all():
+                if schedule.updatedAt and (changes.through is None or schedule.updatedAt > changes.through):
+                    changes.through = schedule.updatedAt
+                if not schedule.isActive:
+                    changes.removed.append(schedule.id)
+                    continue
+                anchor = schedule.createdAt or now
+                if schedule.nextRunAt is None:
+                    schedule.nextRunAt = compute_next_run(schedule.cycleType, schedule.runTime, now, anchor)
+                # A nextRunAt already in the past fires once on the first tick
+                changes.entries.append(ScheduleEntry(
+                    schedule_id=schedule.id,
+                    task_id=schedule.taskId,
+                    cycle_type=schedule.cycleType,
+                    run_time=schedule.runTime,
+                    anchor=anchor,
+                    next_run_at=schedule.nextRunAt,
+                ))
+            # Deleted rows leave nothing to read, a count mismatch makes the next refresh diff the IDs
+            changes.active_count = db.query(func.count(TaskSchedule.id)).filter(TaskSchedule.isActive == True).scalar()
+            if resync:
+                changes.active = set(
+                    db.execute(select(TaskSchedule.id).where(TaskSchedule.isActive == True)).scalars()
+                )
+            db.commit()
+            return changes
+        finally:
+            db.close()
+
+    def _persist(self, updates: List[Tuple[str, Optional[datetime], datetime]]):
+        db = SessionLocal()
+        try:
+            mappings = []
+            for schedule_id, last_run_at, next_run_at in updates:
+                values = {"id": schedule_id, "nextRunAt": next_run_at}
+                if last_run_at:
+                    values["lastRunAt"] = last_run_at
+                mappings.append(values)
+            db.bulk_update_mappings(TaskSchedule, mappings)
+            db.commit()
+        finally:
+            db.close()
+
+
+schedule_engine = ScheduleEngine(
+    refresh_interval=settings.scheduler_refresh_seconds if settings.leader_election_backend != "none" else None,
+)
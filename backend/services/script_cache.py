@@ -0,0 +1,294 @@
+"""
+节点脚本缓存
+按 ScriptVersion.fileHash 内容寻址，磁盘占用超过上限时按 LRU 淘汰，
+后台预取本节点未来 N 分钟内将运行的任务脚本 (并预建其运行环境)，命中时任务启动无需从控制器传输
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import or_
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.node import Node
+from ..models.script import Script
+from ..models.task import Task, TaskSchedule
+from .environments import environment_manager
+
+# fetcher(script_id, file_hash, source_path, dest_path) writes the content to dest_path
+Fetcher = Callable[[str, str, Optional[str], str], None]
+
+
+class ScriptFetchError(Exception):
+    """脚本内容获取失败或校验不通过"""
+
+
+@dataclass
+class CacheEntry:
+    file_hash: str
+    path: str
+    size: int
+    # Executions currently running this file, pinned entries are never evicted
+    pins: int = 0
+
+
+def copy_from_store(script_id: str, file_hash: str, source: Optional[str], dest: str):
+    """与控制器同机时直接硬链接内容仓库中的文件，跨文件系统时复制"""
+    if not source or not os.path.exists(source):
+        raise ScriptFetchError(f"Script content {file_hash} not found at {source}")
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copyfile(source, dest)
+
+
+class HttpFetcher:
+    """远程节点从控制器下载脚本并校验 SHA-256"""
+
+    def __init__(self, base_url: str, token: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+    def __call__(self, script_id: str, file_hash: str, source: Optional[str], dest: str):
+        digest = hashlib.sha256()
+        url = f"{self.base_url}/api/v1/scripts/{script_id}/download"
+        with httpx.stream("GET", url, headers={**self.headers, "Accept-Encoding": "identity"}) as response:
+            if response.status_code != 200:
+                raise ScriptFetchError(f"Download of script {script_id} failed: HTTP {response.status_code}")
+            with open(dest, "wb") as f:
+                for chunk in response.iter_raw():
+                    digest.update(chunk)
+                    f.write(chunk)
+        if digest.hexdigest() != file_hash:
+            raise ScriptFetchError(f"Script {script_id} changed during download, expected {file_hash}")
+
+
+class ScriptCache:
+    """按内容哈希缓存脚本文件，磁盘占用按 LRU 限制在 max_bytes 以内"""
+
+    def __init__(self, root: str, max_bytes: int, fetcher: Fetcher):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.fetcher = fetcher
+        self.size = 0
+        # Least recently used first
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # script_id -> (version, file_hash) last resolved, for freshness checks
+        self._versions: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+        self._fetch_locks: Dict[str, threading.Lock] = {}
+        self._runner: Optional[asyncio.Task] = None
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "prefetched": 0,
+            "fetched_bytes": 0,
+            "fetch_seconds": 0.0,
+        }
+
+    async def start(self):
+        """加载磁盘上已有的缓存并启动预取循环"""
+        await asyncio.to_thread(self.load)
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run(), name="script-cache-prefetch")
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "pinned": sum(1 for entry in self._entries.values() if entry.pins),
+                "size_bytes": self.size,
+                "max_bytes": self.max_bytes,
+            }
+
+    def load(self):
+        """重建索引，按最近访问时间恢复 LRU 顺序，重启后热脚本依然命中"""
+        os.makedirs(self.root, exist_ok=True)
+        found = []
+        for file_hash in os.listdir(self.root):
+            directory = os.path.join(self.root, file_hash)
+            if file_hash.startswith(".") or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                stat_result = os.stat(os.path.join(directory, name))
+                found.append((stat_result.st_mtime, CacheEntry(file_hash, os.path.join(directory, name), stat_result.st_size)))
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+            for _, entry in sorted(found, key=lambda item: item[0]):
+                self._entries[entry.file_hash] = entry
+                self.size += entry.size
+        self._evict()
+
+    def is_fresh(self, script_id: str, version: str) -> bool:
+        """节点上缓存的是否为该脚本的当前版本"""
+        with self._lock:
+            known = self._versions.get(script_id)
+            return known is not None and known[0] == version and known[1] in self._entries
+
+    def get(self, script_id: str, version: str, file_hash: str, file_name: str,
+            source: Optional[str] = None, prefetch: bool = False) -> str:
+        """返回脚本在本地缓存中的路径，未命中时获取 (在线程中调用)
+
+        非预取的调用会钉住该条目直到 release(file_hash)，运行中的脚本不会被淘汰
+        """
+        pin = 0 if prefetch else 1
+        with self._lock:
+            self._versions[script_id] = (version, file_hash)
+            entry = self._hit(file_hash, pin)
+            if entry:
+                if not prefetch:
+                    self.stats["hits"] += 1
+                return entry.path
+            fetch_lock = self._fetch_locks.setdefault(file_hash, threading.Lock())
+
+        # One fetch per hash, concurrent callers wait for it and then hit
+        with fetch_lock:
+            try:
+                with self._lock:
+                    entry = self._hit(file_hash, pin)
+                if entry:
+                    return entry.path
+                entry = self._fetch(script_id, file_hash, file_name, source)
+                entry.pins = pin
+                with self._lock:
+                    self._entries[file_hash] = entry
+                    self.size += entry.size
+                    self.stats["prefetched" if prefetch else "misses"] += 1
+            finally:
+                # Also after a failed fetch, a caller already waiting on this lock then fetches itself
+                with self._lock:
+                    self._fetch_locks.pop(file_hash, None)
+        self._evict(keep=file_hash)
+        return entry.path
+
+    def release(self, file_hash: str):
+        """执行结束后解除 get 的钉住，超出上限时补做淘汰"""
+        with self._lock:
+            entry = self._entries.get(file_hash)
+            if entry is None or entry.pins <= 0:
+                return
+            entry.pins -= 1
+            over = self.size > self.max_bytes
+        if over:
+            self._evict()
+
+    def _hit(self, file_hash: str, pin: int) -> Optional[CacheEntry]:
+        """在持有 _lock 时调用，条目存在时更新 LRU 并钉住"""
+        entry = self._entries.get(file_hash)
+        if entry is None:
+            return None
+        try:
+            # mtime carries the LRU order across restarts; under the lock so eviction cannot interleave
+            os.utime(entry.path)
+        except FileNotFoundError:
+            # Removed behind our back, fetch it again
+            self._entries.pop(file_hash)
+            self.size -= entry.size
+            return None
+        self._entries.move_to_end(file_hash)
+        entry.pins += pin
+        return entry
+
+    def _fetch(self, script_id: str, file_hash: str, file_name: str, source: Optional[str]) -> CacheEntry:
+        os.makedirs(self.root, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.root, prefix=".fetch-")
+        started = time.perf_counter()
+        try:
+            staged = os.path.join(staging, os.path.basename(file_name) or file_hash)
+            self.fetcher(script_id, file_hash, source, staged)
+            directory = os.path.join(self.root, file_hash)
+            shutil.rmtree(directory, ignore_errors=True)
+            os.replace(staging, directory)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        path = os.path.join(directory, os.path.basename(staged))
+        size = os.path.getsize(path)
+        with self._lock:
+            self.stats["fetched_bytes"] += size
+            self.stats["fetch_seconds"] += time.perf_counter() - started
+        return CacheEntry(file_hash, path, size)
+
+    def _evict(self, keep: Optional[str] = None):
+        """淘汰最久未使用的脚本直到占用不超过 max_bytes"""
+        victims = []
+        with self._lock:
+            for file_hash in list(self._entries):
+                if self.size <= self.max_bytes:
+                    break
+                if file_hash == keep or self._entries[file_hash].pins:
+                    continue
+                entry = self._entries.pop(file_hash)
+                self.size -= entry.size
+                self.stats["evictions"] += 1
+                victims.append(entry)
+        for entry in victims:
+            shutil.rmtree(os.path.dirname(entry.path), ignore_errors=True)
+
+    async def _run(self):
+        horizon = timedelta(minutes=settings.script_cache_prefetch_minutes)
+        while True:
+            try:
+                await asyncio.to_thread(self.prefetch, horizon)
+            except Exception as e:
+                print(f"Warning: Script prefetch failed: {e}")
+            await asyncio.sleep(settings.script_cache_prefetch_interval)
+
+    def prefetch(self, horizon: timedelta):
+        """把 horizon 内将在本节点运行的任务脚本拉入缓存并预先构建运行环境 (在线程中调用)"""
+        for script in self._upcoming_scripts(horizon):
+            try:
+                if script.fileHash and not self.is_fresh(script.id, script.version):
+                    self.get(script.id, script.version, script.fileHash, script.fileName,
+                             script.filePath, prefetch=True)
+                environment_manager.prepare(script.language, script.requirements)
+            except Exception as e:
+                print(f"Warning: Failed to prefetch script {script.id}: {e}")
+
+    def _upcoming_scripts(self, horizon: timedelta) -> List[Script]:
+        """按 (isActive, nextRunAt) 索引查询，不依赖只在主副本上加载的调度堆"""
+        db = SessionLocal()
+        try:
+            local = db.query(Node.id).filter(Node.name == settings.local_node_name).scalar()
+            return db.query(Script).join(Task, Task.scriptId == Script.id).join(
+                TaskSchedule, TaskSchedule.taskId == Task.id
+            ).filter(
+                TaskSchedule.isActive == True,
+                TaskSchedule.nextRunAt <= datetime.utcnow() + horizon,
+                or_(Task.nodeId.is_(None), Task.nodeId == local),
+            ).distinct().all()
+        finally:
+            db.close()
+
+
+def _default_fetcher() -> Fetcher:
+    if settings.script_cache_controller_url:
+        return HttpFetcher(settings.script_cache_controller_url, settings.script_cache_controller_token)
+    return copy_from_store
+
+
+script_cache = ScriptCache(
+    root=settings.script_cache_dir,
+    max_bytes=settings.script_cache_max_bytes,
+    fetcher=_default_fetcher(),
+)
@@ -0,0 +1,129 @@
+"""
+内容寻址脚本存储
+上传内容按 SHA-256 存放，一次遍历完成分块落盘与哈希计算，
+相同内容只保存一份，Script 与 ScriptVersion 通过 fileHash 共享同一文件；
+新内容入库时同时生成 gzip 预压缩副本供下载使用。
+去重命中与按哈希引用都会刷新文件 mtime，删除脚本后只回收此后未再被引用的内容
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from ..core.config import settings
+
+
+HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+
+class FileTooLargeError(Exception):
+    """上传内容超过 max_file_size"""
+
+
+@dataclass
+class Blob:
+    hash: str
+    size: int
+    path: str
+    deduplicated: bool
+
+
+class ContentStore:
+    """按 sha256 分目录存放的只读文件仓库"""
+
+    def __init__(self, root: str, chunk_size: int, precompress_min_size: int):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.precompress_min_size = precompress_min_size
+
+    def path_for(self, file_hash: str) -> str:
+        return os.path.join(self.root, file_hash[:2], file_hash[2:4], file_hash)
+
+    def get(self, file_hash: str) -> Optional[Blob]:
+        """按哈希取已入库的内容，不是 sha256 或内容不存在时返回 None (在线程中调用)"""
+        if not HASH_PATTERN.fullmatch(file_hash or ""):
+            return None
+        path = self.path_for(file_hash)
+        try:
+            # The caller is about to reference it, see remove_unused
+            os.utime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+        return Blob(file_hash, size, path, deduplicated=True)
+
+    def ingest(self, source: BinaryIO, max_size: int) -> Blob:
+        """从文件对象分块复制到仓库并计算哈希 (在线程中调用)"""
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                while True:
+                    chunk = source.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_size:
+                        raise FileTooLargeError(f"File exceeds {max_size} bytes")
+                    digest.update(chunk)
+                    tmp.write(chunk)
+
+            file_hash = digest.hexdigest()
+            path = self.path_for(file_hash)
+            try:
+                os.utime(path)
+                os.remove(tmp_path)
+                return Blob(file_hash, size, path, deduplicated=True)
+            except FileNotFoundError:
+                pass
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            if size >= self.precompress_min_size:
+                self._precompress(path, size)
+            return Blob(file_hash, size, path, deduplicated=False)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def remove_unused(self, file_hash: str, released_at: float) -> bool:
+        """released_at (time.time()) 之后未被去重上传或按哈希引用过时删除 (在线程中调用)"""
+        try:
+            if os.path.getmtime(self.path_for(file_hash)) >= released_at:
+                return False
+        except FileNotFoundError:
+            return False
+        self.remove(file_hash)
+        return True
+
+    def remove(self, file_hash: str):
+        """删除已无引用的内容及其压缩副本 (在线程中调用)"""
+        path = self.path_for(file_hash)
+        for candidate in (path, path + ".gz"):
+            if os.path.exists(candidate):
+                os.remove(candidate)
+
+    def _precompress(self, path: str, size: int):
+        """生成 .gz 副本，压缩后不更小时丢弃"""
+        tmp_path = path + ".gz.tmp"
+        with open(path, "rb") as source, gzip.open(tmp_path, "wb", compresslevel=9) as target:
+            shutil.copyfileobj(source, target, self.chunk_size)
+        if os.path.getsize(tmp_path) < size:
+            os.replace(tmp_path, path + ".gz")
+        else:
+            os.remove(tmp_path)
+
+
+content_store = ContentStore(
+    root=os.path.join(settings.upload_dir, "blobs"),
+    chunk_size=settings.upload_chunk_size,
+    precompress_min_size=settings.precompress_min_size,
+)
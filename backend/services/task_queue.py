@@ -0,0 +1,297 @@
+"""
+分布式任务队列
+控制器把就绪任务按优先级推入共享队列 (指定节点的任务进入该节点的专属队列)，
+节点拉取任务时消息移入处理中集合并带有可见性超时，执行结束后确认删除；
+超时仍未确认 (worker 崩溃或失联) 的消息由任意副本的清扫放回队首，投递次数加一。
+RedisTaskQueue 用 Lua 脚本保证每一步原子，MemoryTaskQueue 是语义相同的进程内实现，用于测试与单进程部署
+"""
+
+import json
+import time
+from collections import deque
+from dataclasses import dataclass, field, replace
+from typing import Deque, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from ..models.task import TaskPriority
+
+# Pull order, a node's own queue goes before the shared one at the same priority
+PRIORITY_ORDER = [TaskPriority.URGENT, TaskPriority.HIGH, TaskPriority.MEDIUM, TaskPriority.LOW]
+BACKENDS = ("local", "redis", "memory")
+
+
+@dataclass
+class QueueMessage:
+    execution_id: str
+    task_id: str
+    priority: str
+    node_id: Optional[str] = None  # pinned node from Task.nodeId
+    enqueued_at: float = field(default_factory=time.time)
+    attempts: int = 0  # deliveries that timed out before being acknowledged
+
+    def dumps(self) -> str:
+        payload = {
+            "executionId": self.execution_id,
+            "taskId": self.task_id,
+            "priority": self.priority,
+            "enqueuedAt": self.enqueued_at,
+            "attempts": self.attempts,
+        }
+        # Left out rather than null, the Lua scripts test for its presence
+        if self.node_id:
+            payload["nodeId"] = self.node_id
+        return json.dumps(payload)
+
+    @classmethod
+    def loads(cls, payload) -> "QueueMessage":
+        data = json.loads(payload)
+        return cls(
+            execution_id=data["executionId"],
+            task_id=data["taskId"],
+            priority=data["priority"],
+            node_id=data.get("nodeId"),
+            enqueued_at=data["enqueuedAt"],
+            attempts=data["attempts"],
+        )
+
+    @property
+    def receipt(self) -> str:
+        """每次投递唯一，过期重投后旧投递的确认不会删掉新投递"""
+        return f"{self.execution_id}:{self.attempts}"
+
+
+class TaskQueue:
+    """队列接口，所有方法在事件循环中调用"""
+
+    async def push(self, messages: List[QueueMessage]):
+        raise NotImplementedError
+
+    async def pull(self, node_id: Optional[str], visibility_timeout: float) -> Optional[QueueMessage]:
+        """按优先级取出一条消息并移入处理中集合，没有消息时返回 None"""
+        raise NotImplementedError
+
+    async def ack(self, receipt: str) -> bool:
+        """确认完成并删除，投递已过期被重新入队时返回 False"""
+        raise NotImplementedError
+
+    async def extend(self, receipts: List[str], visibility_timeout: float) -> List[str]:
+        """延长仍在处理中的投递，返回已经不在处理中的回执"""
+        raise NotImplementedError
+
+    async def nack(self, message: QueueMessage):
+        """放弃处理，消息立即回到队首"""
+        raise NotImplementedError
+
+    async def requeue_expired(self, limit: int = 1000) -> int:
+        """把可见性超时的投递放回队首，返回数量"""
+        raise NotImplementedError
+
+    async def depths(self) -> Dict[str, int]:
+        """共享队列长度与处理中数量"""
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+_PULL = """
+local now = redis.call('TIME')
+local deadline = tonumber(now[1]) + tonumber(now[2]) / 1000000 + tonumber(ARGV[1])
+for i = 3, #KEYS do
+    local payload = redis.call('RPOP', KEYS[i])
+    if payload then
+        local message = cjson.decode(payload)
+        local receipt = message['executionId'] .. ':' .. message['attempts']
+        redis.call('ZADD', KEYS[1], deadline, receipt)
+        redis.call('HSET', KEYS[2], receipt, payload)
+        return payload
+    end
+end
+return false
+"""
+
+_ACK = """
+redis.call('HDEL', KEYS[2], ARGV[1])
+return redis.call('ZREM', KEYS[1], ARGV[1])
+"""
+
+_EXTEND = """
+local now = redis.call('TIME')
+local deadline = tonumber(now[1]) + tonumber(now[2]) / 1000000 + tonumber(ARGV[1])
+local lost = {}
+for i = 2, #ARGV do
+    if redis.call('ZADD', KEYS[1], 'XX', 'CH', deadline, ARGV[i]) == 0
+        and not redis.call('ZSCORE', KEYS[1], ARGV[i]) then
+        table.insert(lost, ARGV[i])
+    end
+end
+return lost
+"""
+
+_NACK = """
+local payload = redis.call('HGET', KEYS[2], ARGV[1])
+if not payload then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+redis.call('RPUSH', KEYS[3], payload)
+return 1
+"""
+
+_REQUEUE_EXPIRED = """
+local now = redis.call('TIME')
+local expired = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', tonumber(now[1]) + tonumber(now[2]) / 1000000,
+                           'LIMIT', 0, tonumber(ARGV[2]))
+for _, receipt in ipairs(expired) do
+    local payload = redis.call('HGET', KEYS[2], receipt)
+    redis.call('ZREM', KEYS[1], receipt)
+    redis.call('HDEL', KEYS[2], receipt)
+    if payload then
+        local message = cjson.decode(payload)
+        message['attempts'] = message['attempts'] + 1
+        local queue = ARGV[1] .. ':queue:'
+        if message['nodeId'] then
+            queue = queue .. message['nodeId'] .. ':'
+        end
+        redis.call('RPUSH', queue .. message['priority'], cjson.encode(message))
+    end
+end
+return #expired
+"""
+
+
+class RedisTaskQueue(TaskQueue):
+    """基于 Redis 列表与有序集合的队列，多个控制器副本与节点可同时使用
+
+    入队 LPUSH、出队 RPOP，重新投递 RPUSH 回到队首；处理中集合以 Redis 服务器时间为准，
+    各机器时钟不一致不影响超时判断
+    """
+
+    def __init__(self, url: str, prefix: str):
+        self.prefix = prefix
+        self.client = aioredis.from_url(url, decode_responses=True)
+        self._inflight = f"{prefix}:inflight"
+        self._payloads = f"{prefix}:payloads"
+        self._pull = self.client.register_script(_PULL)
+        self._ack = self.client.register_script(_ACK)
+        self._extend = self.client.register_script(_EXTEND)
+        self._nack = self.client.register_script(_NACK)
+        self._requeue_expired = self.client.register_script(_REQUEUE_EXPIRED)
+
+    def queue_key(self, priority: str, node_id: Optional[str] = None) -> str:
+        return f"{self.prefix}:queue:{node_id}:{priority}" if node_id else f"{self.prefix}:queue:{priority}"
+
+    async def push(self, messages: List[QueueMessage]):
+        if not messages:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for message in messages:
+                pipe.lpush(self.queue_key(message.priority, message.node_id), message.dumps())
+            await pipe.execute()
+
+    async def pull(self, node_id: Optional[str], visibility_timeout: float) -> Optional[QueueMessage]:
+        keys = [self._inflight, self._payloads]
+        for priority in PRIORITY_ORDER:
+            if node_id:
+                keys.append(self.queue_key(priority.value, node_id))
+            keys.append(self.queue_key(priority.value))
+        payload = await self._pull(keys=keys, args=[visibility_timeout])
+        return QueueMessage.loads(payload) if payload else None
+
+    async def ack(self, receipt: str) -> bool:
+        return await self._ack(keys=[self._inflight, self._payloads], args=[receipt]) == 1
+
+    async def extend(self, receipts: List[str], visibility_timeout: float) -> List[str]:
+        if not receipts:
+            return []
+        return list(await self._extend(keys=[self._inflight], args=[visibility_timeout, *receipts]))
+
+    async def nack(self, message: QueueMessage):
+        await self._nack(
+            keys=[self._inflight, self._payloads, self.queue_key(message.priority, message.node_id)],
+            args=[message.receipt],
+        )
+
+    async def requeue_expired(self, limit: int = 1000) -> int:
+        return await self._requeue_expired(keys=[self._inflight, self._payloads], args=[self.prefix, limit])
+
+    async def depths(self) -> Dict[str, int]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            for priority in PRIORITY_ORDER:
+                pipe.llen(self.queue_key(priority.value))
+            pipe.zcard(self._inflight)
+            counts = await pipe.execute()
+        depths = {priority.value: count for priority, count in zip(PRIORITY_ORDER, counts)}
+        depths["inflight"] = counts[-1]
+        return depths
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class MemoryTaskQueue(TaskQueue):
+    """进程内实现，与 RedisTaskQueue 语义一致 (含可见性超时与重新投递)"""
+
+    def __init__(self):
+        # (node_id or None, priority) -> messages, popped from the left
+        self._queues: Dict[Tuple[Optional[str], str], Deque[QueueMessage]] = {}
+        # receipt -> (deadline, message)
+        self._inflight: Dict[str, Tuple[float, QueueMessage]] = {}
+
+    def _queue(self, priority: str, node_id: Optional[str]) -> Deque[QueueMessage]:
+        return self._queues.setdefault((node_id or None, priority), deque())
+
+    async def push(self, messages: List[QueueMessage]):
+        for message in messages:
+            self._queue(message.priority, message.node_id).append(message)
+
+    async def pull(self, node_id: Optional[str], visibility_timeout: float) -> Optional[QueueMessage]:
+        for priority in PRIORITY_ORDER:
+            for owner in ((node_id, None) if node_id else (None,)):
+                queue = self._queues.get((owner, priority.value))
+                if queue:
+                    message = queue.popleft()
+                    self._inflight[message.receipt] = (time.time() + visibility_timeout, message)
+                    return message
+        return None
+
+    async def ack(self, receipt: str) -> bool:
+        return self._inflight.pop(receipt, None) is not None
+
+    async def extend(self, receipts: List[str], visibility_timeout: float) -> List[str]:
+        deadline = time.time() + visibility_timeout
+        lost = []
+        for receipt in receipts:
+            entry = self._inflight.get(receipt)
+            if entry is None:
+                lost.append(receipt)
+            else:
+                self._inflight[receipt] = (deadline, entry[1])
+        return lost
+
+    async def nack(self, message: QueueMessage):
+        if self._inflight.pop(message.receipt, None) is not None:
+            self._queue(message.priority, message.node_id).appendleft(message)
+
+    async def requeue_expired(self, limit: int = 1000) -> int:
+        now = time.time()
+        expired = [receipt for receipt, (deadline, _) in self._inflight.items() if deadline <= now][:limit]
+        for receipt in expired:
+            _, message = self._inflight.pop(receipt)
+            self._queue(message.priority, message.node_id).appendleft(replace(message, attempts=message.attempts + 1))
+        return len(expired)
+
+    async def depths(self) -> Dict[str, int]:
+        depths = {priority.value: len(self._queues.get((None, priority.value), ())) for priority in PRIORITY_ORDER}
+        depths["inflight"] = len(self._inflight)
+        return depths
+
+
+def create_task_queue(backend: str, url: str, prefix: str) -> TaskQueue:
+    if backend == "redis":
+        return RedisTaskQueue(url, prefix)
+    if backend == "memory":
+        return MemoryTaskQueue()
+    raise ValueError(f"Unknown task queue backend {backend!r}, expected one of {BACKENDS}")
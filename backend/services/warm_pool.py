@@ -0,0 +1,235 @@
+"""
+预热 Python worker 池
+每个节点常驻若干已导入常用模块的 Python 进程，PYTHON 脚本经管道交给空闲 worker 运行，
+省去解释器启动与导入开销；worker 运行 N 次或内存增长超过上限后回收重建
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.engine import Engine
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "warm_worker.py")
+HEADER_SIZE = 4
+# Passing pipe descriptors to a worker needs SCM_RIGHTS
+SUPPORTED = hasattr(socket, "send_fds") and hasattr(socket, "AF_UNIX")
+
+
+class WarmWorkerError(Exception):
+    """worker 进程异常退出或协议出错"""
+
+
+@dataclass
+class WarmPoolConfig:
+    enabled: bool
+    size: int
+    preload: List[str] = field(default_factory=list)
+    max_runs: int = 100
+    max_memory_growth: int = 256 * 1024 * 1024  # bytes
+
+    @classmethod
+    def from_engine(cls, raw_config: Optional[str]) -> "WarmPoolConfig":
+        """以 settings 为默认值，合并 Engine.config 中的 warmPool 段"""
+        config = cls(
+            enabled=settings.warm_pool_enabled,
+            size=settings.warm_pool_size,
+            preload=list(settings.warm_pool_preload),
+            max_runs=settings.warm_pool_max_runs,
+            max_memory_growth=settings.warm_pool_max_memory_growth_mb * 1024 * 1024,
+        )
+        try:
+            warm = json.loads(raw_config or "{}").get("warmPool") or {}
+        except (ValueError, AttributeError):
+            return config
+        config.enabled = bool(warm.get("enabled", config.enabled))
+        config.size = int(warm.get("size", config.size))
+        config.preload = list(warm.get("preload", config.preload))
+        config.max_runs = int(warm.get("maxRuns", config.max_runs))
+        if "maxMemoryGrowthMb" in warm:
+            config.max_memory_growth = int(warm["maxMemoryGrowthMb"]) * 1024 * 1024
+        return config
+
+
+class WarmWorker:
+    """一个常驻 worker 进程及其控制 socket"""
+
+    def __init__(self, process: asyncio.subprocess.Process, sock: socket.socket):
+        self.process = process
+        self.sock = sock
+        self.baseline_rss = 0
+        self.rss = 0
+        self.runs = 0
+        self._buffer = bytearray()
+
+    async def handshake(self, timeout: float):
+        message = await asyncio.wait_for(self._read_message(), timeout)
+        self.baseline_rss = self.rss = message["rss"]
+
+    async def run(self, request: dict, fds: Tuple[int, int]) -> int:
+        """发送任务与输出管道，等待脚本结束并返回退出码"""
+        payload = json.dumps(request).encode()
+        loop = asyncio.get_running_loop()
+        try:
+            # The header is tiny and the worker is idle, so this never blocks
+            socket.send_fds(self.sock, [len(payload).to_bytes(HEADER_SIZE, "big")], list(fds))
+            await loop.sock_sendall(self.sock, payload)
+        except OSError as e:
+            raise WarmWorkerError(f"Warm worker unavailable: {e}")
+        message = await self._read_message()
+        self.runs += 1
+        self.rss = message["rss"]
+        return message["exit_code"]
+
+    async def _read_message(self) -> dict:
+        loop = asyncio.get_running_loop()
+        while b"\n" not in self._buffer:
+            chunk = await loop.sock_recv(self.sock, 4096)
+            if not chunk:
+                raise WarmWorkerError(f"Warm worker exited with code {await self.process.wait()}")
+            self._buffer += chunk
+        line, _, rest = bytes(self._buffer).partition(b"\n")
+        self._buffer = bytearray(rest)
+        return json.loads(line)
+
+    def kill(self):
+        self.sock.close()
+        if self.process.returncode is None:
+            self.process.kill()
+
+
+class WarmPool:
+    """固定大小的预热 worker 池，worker 出错、超时或需要回收时替换为新进程"""
+
+    def __init__(self, spawn_timeout: float = 60.0):
+        self.spawn_timeout = spawn_timeout
+        self.config = WarmPoolConfig(enabled=False, size=0)
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._workers: Set[WarmWorker] = set()
+        self._spawning: Set[asyncio.Task] = set()
+        self.stats = {
+            "runs": 0,
+            "spawned": 0,
+            "recycled_runs": 0,
+            "recycled_memory": 0,
+            "killed": 0,
+        }
+
+    @property
+    def available(self) -> bool:
+        return bool(self._workers) or bool(self._spawning)
+
+    async def start(self, config: Optional[WarmPoolConfig] = None):
+        """读取配置并预先启动全部 worker"""
+        self.config = config or await asyncio.to_thread(self._load_config)
+        if not self.config.enabled or not SUPPORTED or self._workers:
+            return
+        await asyncio.gather(*(self._spawn() for _ in range(self.config.size)))
+
+    async def stop(self):
+        for task in list(self._spawning):
+            task.cancel()
+        await asyncio.gather(*self._spawning, return_exceptions=True)
+        for worker in list(self._workers):
+            worker.kill()
+            await worker.process.wait()
+        self._workers.clear()
+        self._idle = asyncio.Queue()
+
+    def _load_config(self) -> WarmPoolConfig:
+        """配置来自名为 settings.warm_pool_engine 的 Engine (在线程中调用)"""
+        raw_config = None
+        if settings.warm_pool_engine:
+            db = SessionLocal()
+            try:
+                raw_config = db.query(Engine.config).filter(
+                    Engine.name == settings.warm_pool_engine
+                ).scalar()
+            finally:
+                db.close()
+        return WarmPoolConfig.from_engine(raw_config)
+
+    async def acquire(self) -> Optional[WarmWorker]:
+        """等待空闲 worker，池未启用或 worker 无法启动时返回 None"""
+        if not self.available:
+            return None
+        return await self._idle.get()
+
+    async def run(self, worker: WarmWorker, script_path: str, env: Optional[Dict[str, str]],
+                  cwd: Optional[str], timeout: Optional[float], fds: Tuple[int, int]) -> int:
+        """在 worker 中运行脚本，超时抛出 asyncio.TimeoutError，worker 异常抛出 WarmWorkerError"""
+        request = {"path": script_path, "env": env, "cwd": cwd}
+        try:
+            exit_code = await asyncio.wait_for(worker.run(request, fds), timeout)
+        except BaseException:
+            # Timed out, cancelled or broken: the worker state is unknown, replace it
+            self._discard(worker, "killed")
+            raise
+        self.stats["runs"] += 1
+        if worker.runs >= self.config.max_runs:
+            self._discard(worker, "recycled_runs")
+        elif worker.rss - worker.baseline_rss > self.config.max_memory_growth:
+            self._discard(worker, "recycled_memory")
+        else:
+            self._idle.put_nowait(worker)
+        return exit_code
+
+    def report(self) -> dict:
+        workers = list(self._workers)
+        return {
+            **self.stats,
+            "enabled": self.config.enabled and SUPPORTED,
+            "size": self.config.size,
+            "idle": self._idle.qsize(),
+            "workers": [
+                {"pid": w.process.pid, "runs": w.runs, "rss": w.rss, "baselineRss": w.baseline_rss}
+                for w in workers
+            ],
+        }
+
+    def _discard(self, worker: WarmWorker, reason: str):
+        self.stats[reason] += 1
+        self._workers.discard(worker)
+        worker.kill()
+        task = asyncio.create_task(self._spawn(), name="warm-pool-spawn")
+        self._spawning.add(task)
+        task.add_done_callback(self._spawning.discard)
+
+    async def _spawn(self):
+        parent, child = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, WORKER_SCRIPT, str(child.fileno()), json.dumps(self.config.preload),
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                pass_fds=(child.fileno(),),
+            )
+        except OSError as e:
+            parent.close()
+            print(f"Warning: Failed to start warm worker: {e}")
+            # Wakes one waiter so it falls back to a cold start instead of waiting forever
+            self._idle.put_nowait(None)
+            return
+        finally:
+            child.close()
+        parent.setblocking(False)
+        worker = WarmWorker(process, parent)
+        try:
+            await worker.handshake(self.spawn_timeout)
+        except (asyncio.TimeoutError, WarmWorkerError, ValueError) as e:
+            worker.kill()
+            print(f"Warning: Warm worker failed to start: {e}")
+            self._idle.put_nowait(None)
+            return
+        self.stats["spawned"] += 1
+        self._workers.add(worker)
+        self._idle.put_nowait(worker)
+
+
+warm_pool = WarmPool()
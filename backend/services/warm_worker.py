@@ -0,0 +1,130 @@
+"""
+常驻 Python worker 进程
+由 warm_pool 以脚本方式启动 (不导入 backend 包)，预先导入常用模块后循环接收任务：
+每个任务连同该次执行的 stdout/stderr 管道通过 Unix socket 传入，在本进程内以 __main__ 运行脚本
+
+用法: python warm_worker.py <socket fd> <preload modules JSON>
+"""
+
+import importlib
+import json
+import os
+import runpy
+import socket
+import struct
+import sys
+import traceback
+
+HEADER = struct.Struct("!I")
+
+
+def rss() -> int:
+    """当前常驻内存 (字节)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def send(sock: socket.socket, message: dict):
+    sock.sendall(json.dumps(message).encode() + b"\n")
+
+
+def receive(sock: socket.socket):
+    """读取一个请求，返回 (请求, [stdout fd, stderr fd])，控制端关闭时返回 (None, [])"""
+    header, fds, _, _ = socket.recv_fds(sock, HEADER.size, 2)
+    if not header:
+        return None, []
+    header += recv_exactly(sock, HEADER.size - len(header))
+    (length,) = HEADER.unpack(header)
+    return json.loads(recv_exactly(sock, length)), fds
+
+
+def recv_exactly(sock: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise EOFError("Control socket closed")
+        data += chunk
+    return bytes(data)
+
+
+def run(request: dict, stdout_fd: int, stderr_fd: int) -> int:
+    """在本进程中运行脚本，返回退出码"""
+    path = request["path"]
+    saved_environ = dict(os.environ)
+    saved_cwd = os.getcwd()
+    saved_argv = sys.argv
+    saved_path = list(sys.path)
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    os.close(stdout_fd)
+    os.close(stderr_fd)
+    try:
+        if request.get("env") is not None:
+            os.environ.clear()
+            os.environ.update(request["env"])
+        if request.get("cwd"):
+            os.chdir(request["cwd"])
+        sys.argv = [path]
+        sys.path.insert(0, os.path.dirname(os.path.abspath(path)))
+        try:
+            runpy.run_path(path, run_name="__main__")
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                exit_code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except BaseException:
+            traceback.print_exc()
+            exit_code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.environ.clear()
+        os.environ.update(saved_environ)
+        os.chdir(saved_cwd)
+        sys.argv = saved_argv
+        sys.path[:] = saved_path
+        # Closing our copies lets the executor see EOF on this execution's pipes
+        detach_output()
+    return exit_code
+
+
+def detach_output():
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+    os.close(devnull)
+
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    for name in json.loads(sys.argv[2]):
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"Warning: Warm worker failed to preload {name}: {e}", file=sys.stderr)
+    detach_output()
+    send(sock, {"ready": True, "rss": rss()})
+
+    while True:
+        request, fds = receive(sock)
+        if request is None:
+            break
+        exit_code = run(request, *fds)
+        send(sock, {"exit_code": exit_code, "rss": rss()})
+
+
+if __name__ == "__main__":
+    main()
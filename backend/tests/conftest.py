@@ -0,0 +1,90 @@
+"""
+测试公共配置
+导入 backend 之前把数据库与各存储目录指向临时目录；用到数据库的用例先清空所有表
+"""
+
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+import pytest
+
+ROOT = tempfile.mkdtemp(prefix="task-scheduler-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(ROOT, 'test.db')}"
+for name in ("upload_dir", "log_dir", "script_cache_dir", "env_dir", "retention_archive_dir"):
+    os.environ[name.upper()] = os.path.join(ROOT, name)
+
+from backend.core.database import Base, SessionLocal, create_tables  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def tables():
+    create_tables()
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def clean_db():
+    db = SessionLocal()
+    try:
+        for table in reversed(Base.metadata.sorted_tables):
+            db.execute(table.delete())
+        db.commit()
+    finally:
+        db.close()
+
+
+@pytest.fixture
+async def async_db(clean_db):
+    """异步会话，用例结束后释放连接池，避免连接跨事件循环复用"""
+    from backend.core.database import AsyncSessionLocal, async_engine
+
+    async with AsyncSessionLocal() as db:
+        yield db
+    await async_engine.dispose()
+
+
+class Principal:
+    """代替登录用户，权限代码由用例设置"""
+    id = "user-1"
+    username = "tester"
+    permissions = frozenset()
+
+    def has_permissions(self, *codes: str) -> bool:
+        return all(code in self.permissions for code in codes)
+
+
+@asynccontextmanager
+async def _api_client(router, prefix: str):
+    import httpx
+    from fastapi import FastAPI
+
+    from backend.api.v1.auth import get_current_user
+    from backend.core.database import async_engine
+
+    app = FastAPI()
+    app.include_router(router, prefix=prefix)
+    app.dependency_overrides[get_current_user] = Principal
+    try:
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            yield client
+    finally:
+        await async_engine.dispose()
+
+
+@pytest.fixture
+def api_client():
+    """只挂载一个路由的应用，跳过登录校验"""
+    return _api_client
+
+
+@pytest.fixture
+def grant(monkeypatch):
+    """给代替的登录用户授予权限代码"""
+    def grant(*codes: str):
+        monkeypatch.setattr(Principal, "permissions", frozenset(codes))
+    return grant
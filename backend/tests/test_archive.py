@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.api.v1 import archive
+from backend.core.database import SessionLocal
+from backend.models import User, UserActivity
+from backend.services.retention import ArchiveStore, RetentionEngine, build_policies
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = ArchiveStore(str(tmp_path))
+    monkeypatch.setattr(archive, "archive_store", store)
+    return store
+
+
+def at(minutes: int) -> str:
+    return (datetime(2026, 1, 1) + timedelta(minutes=minutes)).isoformat()
+
+
+@pytest.fixture
+def activities(store):
+    store.write("user_activities", "2026-01-01", "id", [
+        {"id": f"a{i}", "userId": "user-1" if i % 2 else "user-2", "action": "login", "timestamp": at(i)}
+        for i in range(6)
+    ])
+    store.write("notification_logs", "2026-01-01", "id", [
+        {"id": "l1", "notificationId": "n1", "message": "hi", "sentAt": at(1)}
+    ])
+
+
+async def query(api_client, table: str, **params):
+    params = {"start": "2026-01-01T00:00:00", "end": "2026-01-02T00:00:00", **params}
+    async with api_client(archive.router, "/api/v1/archive") as client:
+        return await client.get(f"/api/v1/archive/{table}", params=params)
+
+
+@pytest.mark.anyio
+async def test_user_activities_are_scoped_to_the_caller(api_client, activities):
+    response = await query(api_client, "user_activities")
+
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()["items"]] == ["a1", "a3", "a5"]
+    assert (await query(api_client, "user_activities", filter="userId=user-2")).status_code == 403
+
+
+@pytest.mark.anyio
+async def test_user_manage_reads_every_user(api_client, activities, grant):
+    grant("user:manage")
+
+    everyone = await query(api_client, "user_activities")
+    other = await query(api_client, "user_activities", filter="userId=user-2")
+    logs = await query(api_client, "notification_logs")
+
+    assert len(everyone.json()["items"]) == 6
+    assert [row["id"] for row in other.json()["items"]] == ["a0", "a2", "a4"]
+    assert [row["id"] for row in logs.json()["items"]] == ["l1"]
+
+
+@pytest.mark.anyio
+async def test_notification_logs_need_user_manage(api_client, activities):
+    assert (await query(api_client, "notification_logs")).status_code == 403
+
+
+def rows(*minutes: int, user_id: str = "user-1"):
+    return [{"id": f"a{m}", "userId": user_id, "action": "login", "timestamp": at(m)} for m in minutes]
+
+
+def test_rewriting_a_batch_replaces_its_part(store, tmp_path):
+    store.write("user_activities", "2026-01-01", "id", rows(1, 2))
+    store.write("user_activities", "2026-01-01", "id", rows(1, 2))
+    store.write("user_activities", "2026-01-01", "id", rows(3))
+
+    summary = store.summary("user_activities")
+    assert (summary["days"], summary["files"]) == (1, 2)
+    assert not list(tmp_path.rglob("*.tmp"))
+    assert store.summary("notification_logs") == {"firstDay": None, "lastDay": None, "days": 0, "files": 0, "bytes": 0}
+
+
+def test_cursor_pages_through_parts_and_days_in_order(store):
+    store.write("user_activities", "2026-01-01", "id", rows(1, 2, 3))
+    store.write("user_activities", "2026-01-01", "id", rows(4))
+    store.write("user_activities", "2026-01-02", "id", rows(24 * 60 + 1, 24 * 60 + 2))
+    start, end = datetime(2026, 1, 1), datetime(2026, 1, 3)
+
+    pages, cursor = [], None
+    while True:
+        page = store.query("user_activities", "timestamp", start, end, {}, cursor, 2)
+        pages.append([row["id"] for row in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    ids = [row_id for page in pages for row_id in page]
+    assert sorted(ids) == sorted(["a1", "a2", "a3", "a4", "a1441", "a1442"])
+    assert len(ids) == len(set(ids))
+    assert ids[-2:] == ["a1441", "a1442"]
+    assert all(len(page) == 2 for page in pages)
+
+
+def test_query_filters_by_time_and_column_and_skips_other_days(store, tmp_path):
+    store.write("user_activities", "2026-01-01", "id", rows(10, 20, 30) + rows(25, user_id="user-2"))
+    # Days outside the range are never opened
+    (tmp_path / "user_activities" / "2025-12-31").mkdir()
+    (tmp_path / "user_activities" / "2025-12-31" / "part-broken.jsonl.gz").write_bytes(b"not gzip")
+
+    result = store.query("user_activities", "timestamp", datetime(2026, 1, 1, 0, 15), datetime(2026, 1, 1, 0, 30),
+                         {"userId": "user-1"}, None, 10)
+
+    assert [row["id"] for row in result["items"]] == ["a20"]
+    assert result["next_cursor"] is None
+
+
+@pytest.mark.anyio
+async def test_bad_queries_are_rejected(api_client, activities, grant):
+    grant("user:manage")
+
+    assert (await query(api_client, "users")).status_code == 404
+    assert (await query(api_client, "user_activities", filter="password=x")).status_code == 400
+    assert (await query(api_client, "user_activities", filter="userId")).status_code == 400
+    assert (await query(api_client, "user_activities", cursor="not-a-cursor")).status_code == 400
+    assert (await query(api_client, "user_activities", end="2026-01-01T00:00:00")).status_code == 400
+
+
+def test_expired_rows_are_archived_before_they_are_deleted(store, clean_db):
+    now = datetime(2026, 3, 1)
+    with SessionLocal() as db:
+        db.add(User(id="user-1", email="me@example.com", password="x"))
+        for activity_id, age in [("old1", 41), ("old2", 40.5), ("old3", 40), ("new1", 10), ("new2", 1)]:
+            db.add(UserActivity(id=activity_id, userId="user-1", action="login", timestamp=now - timedelta(days=age)))
+        db.commit()
+    engine = RetentionEngine(build_policies({"user_activities": 30}), store, interval=60,
+                             batch_size=2, delete_chunk=1, delete_pause=0, max_batches=10)
+
+    assert engine.run_once(now) == {"user_activities": 3}
+    assert engine.run_once(now) == {"user_activities": 0}
+
+    with SessionLocal() as db:
+        assert sorted(row.id for row in db.query(UserActivity)) == ["new1", "new2"]
+    archived = store.query("user_activities", "timestamp", now - timedelta(days=60), now, {}, None, 10)
+    assert [row["id"] for row in archived["items"]] == ["old1", "old2", "old3"]
+    assert store.summary("user_activities")["days"] == 2
+    assert engine.report()["archived_rows"] == {"user_activities": 3}
+
+
+@pytest.mark.parametrize("days", [{"sessions": 30}, {"task_executions": 1}])
+def test_invalid_policies_are_rejected(days):
+    with pytest.raises(ValueError):
+        build_policies(days)
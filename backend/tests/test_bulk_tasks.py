@@ -0,0 +1,134 @@
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from backend.api.v1 import tasks
+from backend.api.v1.auth import get_current_user
+from backend.core.database import SessionLocal, async_engine
+from backend.models import Script, Task
+from backend.models.script import ScriptLanguage, ScriptType
+from backend.models.task import TaskPriority, TaskStatus
+from backend.repositories import TaskRepository
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def client(clean_db):
+    with SessionLocal() as db:
+        db.add(Script(id="s1", name="s", type=ScriptType.PYTHON, language=ScriptLanguage.PYTHON,
+                      filePath="s.py", fileName="s.py"))
+        db.commit()
+    app = FastAPI()
+    app.include_router(tasks.router, prefix="/tasks")
+    app.dependency_overrides[get_current_user] = lambda: None
+    async with httpx.AsyncClient(app=app, base_url="http://test") as c:
+        yield c
+    await async_engine.dispose()
+
+
+def item(name, **values):
+    return {"name": name, "scriptId": "s1", "maxRunTime": 60, **values}
+
+
+def stored(*task_ids):
+    with SessionLocal() as db:
+        return {task.id: task for task in db.query(Task).filter(Task.id.in_(task_ids))}
+
+
+async def create(client, *items):
+    response = await client.post("/tasks/bulk", json=list(items))
+    assert response.status_code == 200
+    return [result["id"] for result in response.json()["results"]]
+
+
+async def test_bulk_create_reports_each_item(client):
+    response = await client.post("/tasks/bulk", json=[
+        item("plain"),
+        item("full", parameters={"x": 1}, emailAuthCode="code", priority="HIGH"),
+        {"name": "missing fields"},
+        item("bad script", scriptId="nope"),
+        item("bad node", nodeId="nope"),
+    ])
+
+    body = response.json()
+    assert (body["succeeded"], body["failed"]) == (2, 3)
+    results = body["results"]
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+    assert "scriptId" in results[2]["error"]
+    assert results[3]["error"] == "Script nope not found"
+    assert results[4]["error"] == "Node nope not found"
+
+    rows = stored(results[0]["id"], results[1]["id"])
+    plain, full = rows[results[0]["id"]], rows[results[1]["id"]]
+    # Items that leave out optional fields share a chunk with items that set them
+    assert plain.parameters == "{}" and plain.emailAuthCode is None and plain.status == TaskStatus.PENDING
+    assert json.loads(full.parameters) == {"x": 1}
+    assert full.emailAuthCode == "code" and full.priority == TaskPriority.HIGH
+
+
+async def test_bulk_create_accepts_ndjson(client):
+    body = b"\n".join([json.dumps(item("a")).encode(), b"{broken", json.dumps(item("b")).encode()])
+    response = await client.post("/tasks/bulk", content=body, headers={"content-type": "application/x-ndjson"})
+
+    results = response.json()["results"]
+    assert "id" in results[0] and "id" in results[2]
+    assert results[1]["error"].startswith("Invalid JSON")
+
+
+async def test_bulk_create_rejects_a_body_that_is_not_a_list(client):
+    response = await client.post("/tasks/bulk", json={"name": "x"})
+
+    assert response.status_code == 400
+
+
+async def test_bulk_insert_failure_does_not_leak_the_driver_error(client, monkeypatch):
+    async def fail(self, rows):
+        raise RuntimeError(f"INSERT failed with {rows[0]['emailAuthCode']}")
+
+    monkeypatch.setattr(TaskRepository, "insert_many", fail)
+    response = await client.post("/tasks/bulk", json=[item("a", emailAuthCode="secret")])
+
+    result = response.json()["results"][0]
+    assert result == {"index": 0, "error": "Insert failed"}
+
+
+async def test_bulk_update_changes_only_given_fields(client):
+    first, second, third = await create(client, item("a"), item("b"), item("c"))
+
+    response = await client.put("/tasks/bulk", json=[
+        {"id": first, "priority": "URGENT"},
+        {"id": second, "name": "renamed", "maxRunTime": 5},
+        {"id": "ghost"},
+        {"id": first, "name": "again"},
+        {"id": third, "scriptId": "nope"},
+    ])
+
+    results = response.json()["results"]
+    assert results[0]["id"] == first and results[1]["id"] == second
+    assert results[2]["error"] == "Task not found"
+    assert results[3]["error"] == f"Task {first} appears more than once"
+    assert results[4]["error"] == "Script nope not found"
+    # The second update of the same id is rejected before any write, so the first one still lands
+    rows = stored(first, second)
+    assert rows[first].priority == TaskPriority.URGENT and rows[first].name == "a"
+    assert rows[second].name == "renamed" and rows[second].maxRunTime == 5
+
+
+async def test_bulk_cancel_leaves_finished_tasks_alone(client):
+    pending, done = await create(client, item("pending"), item("done"))
+    with SessionLocal() as db:
+        db.get(Task, done).status = TaskStatus.SUCCESS
+        db.commit()
+
+    response = await client.post("/tasks/bulk/cancel", json=[pending, {"id": done}, "ghost"])
+
+    results = response.json()["results"]
+    assert results[0] == {"index": 0, "id": pending, "status": "CANCELLED", "cancelled": True}
+    assert results[1] == {"index": 1, "id": done, "status": "SUCCESS", "cancelled": False}
+    assert results[2]["error"] == "Task not found"
+    rows = stored(pending, done)
+    assert rows[pending].status == TaskStatus.CANCELLED
+    assert rows[done].status == TaskStatus.SUCCESS
@@ -0,0 +1,205 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.api.v1 import tasks
+from backend.core.database import SessionLocal
+from backend.models import Node, Script, Task, TaskDependency, TaskExecution
+from backend.models.script import ScriptLanguage, ScriptType
+from backend.models.task import DependencyCondition, DependencyType, ExecutionStatus
+from backend.services import dependencies
+from backend.services.dependencies import (
+    DependencyCycleError, DependencyEdge, DependencyEngine, DependencyGraph, find_cycle
+)
+
+
+def edge(task_id: str, depends_on_task_id: str, type=DependencyType.SUCCESS,
+         condition=DependencyCondition.ALL_SUCCESS, timeout_minutes=None) -> DependencyEdge:
+    return DependencyEdge(f"{depends_on_task_id}->{task_id}", task_id, depends_on_task_id, type, condition, timeout_minutes)
+
+
+def graph(*edges: DependencyEdge) -> DependencyGraph:
+    built = DependencyGraph()
+    for e in edges:
+        built.add_edge(e)
+    return built
+
+
+def test_all_success_releases_after_every_upstream_succeeds():
+    g = graph(edge("C", "A"), edge("C", "B"))
+
+    assert g.task_finished("A", ExecutionStatus.SUCCESS) == ([], [])
+    assert g.readiness("C")["unmet"] == 1
+    assert g.task_finished("B", ExecutionStatus.SUCCESS) == (["C"], [])
+    # The round is complete, the next one starts from scratch
+    assert g.readiness("C")["resolved"] == 0
+
+
+def test_failure_blocks_and_propagates_downstream():
+    g = graph(edge("B", "A"), edge("C", "B"), edge("D", "C", DependencyType.COMPLETION))
+
+    released, blocked = g.task_finished("A", ExecutionStatus.FAILED)
+
+    assert released == ["D"]
+    assert blocked == ["B", "C"]
+
+
+def test_any_success_fires_once_per_round():
+    g = graph(*(edge("C", u, condition=DependencyCondition.ANY_SUCCESS) for u in "AB"))
+
+    assert g.task_finished("A", ExecutionStatus.FAILED) == ([], [])
+    assert g.task_finished("B", ExecutionStatus.SUCCESS) == (["C"], [])
+
+    g.task_finished("A", ExecutionStatus.SUCCESS)
+    assert g.task_finished("B", ExecutionStatus.SUCCESS) == ([], [])
+
+
+def test_any_success_blocks_when_every_upstream_failed():
+    g = graph(*(edge("C", u, condition=DependencyCondition.ANY_SUCCESS) for u in "AB"))
+
+    g.task_finished("A", ExecutionStatus.FAILED)
+    assert g.task_finished("B", ExecutionStatus.CANCELLED) == ([], ["C"])
+
+
+def test_all_complete_ignores_the_outcome():
+    g = graph(*(edge("C", u, DependencyType.COMPLETION, DependencyCondition.ALL_COMPLETE) for u in "AB"))
+
+    g.task_finished("A", ExecutionStatus.FAILED)
+    assert g.task_finished("B", ExecutionStatus.SUCCESS) == (["C"], [])
+
+
+def test_timeout_dependency_is_satisfied_at_its_deadline():
+    g = graph(edge("B", "A", DependencyType.TIMEOUT, timeout_minutes=5))
+    started = datetime(2024, 1, 1)
+
+    assert g.timeout_upstreams() == ["A"]
+    g.task_started("A", started)
+    assert g.next_deadline() == started + timedelta(minutes=5)
+    assert g.expire(started + timedelta(minutes=4)) == ([], [])
+    assert g.expire(started + timedelta(minutes=5)) == (["B"], [])
+
+
+def test_manual_dependency_waits_for_approval():
+    g = graph(edge("B", "A", DependencyType.MANUAL))
+
+    assert g.task_finished("A", ExecutionStatus.SUCCESS) == ([], [])
+    assert g.approve("B", "A") == (["B"], [])
+
+
+def test_cycles_are_rejected():
+    g = graph(edge("B", "A"), edge("C", "B"))
+
+    with pytest.raises(DependencyCycleError):
+        g.add_edge(edge("A", "C"))
+    with pytest.raises(DependencyCycleError):
+        g.add_edge(edge("A", "A"))
+    assert len(g) == 2
+
+
+def test_removing_an_edge_updates_readiness():
+    g = graph(edge("C", "A"), edge("C", "B"))
+    g.task_finished("A", ExecutionStatus.SUCCESS)
+
+    g.remove_edge("C", "B")
+
+    assert g.readiness("C")["total"] == 1
+    assert g.edges() == {("C", "A")}
+    assert not g.has_dependents("B")
+
+
+def add_tasks(db, task_ids):
+    db.add(Script(id="s1", name="s", type=ScriptType.PYTHON, language=ScriptLanguage.PYTHON,
+                  filePath="s.py", fileName="s.py"))
+    for task_id in task_ids:
+        db.add(Task(id=task_id, name=task_id, scriptId="s1", parameters="{}", maxRunTime=5))
+
+
+@pytest.mark.anyio
+async def test_find_cycle_uses_the_stored_active_edges(async_db):
+    with SessionLocal() as db:
+        add_tasks(db, "ABCD")
+        db.add(TaskDependency(taskId="B", dependsOnTaskId="A"))
+        db.add(TaskDependency(taskId="C", dependsOnTaskId="B"))
+        db.add(TaskDependency(taskId="D", dependsOnTaskId="C", isActive=False))
+        db.commit()
+
+    assert await find_cycle(async_db, "A", "C")
+    assert await find_cycle(async_db, "A", "A")
+    assert not await find_cycle(async_db, "D", "A")
+    # The inactive C -> D edge doesn't count
+    assert not await find_cycle(async_db, "C", "D")
+
+
+@pytest.fixture
+def queued(clean_db, monkeypatch):
+    """依赖引擎放行的任务"""
+    released = []
+    monkeypatch.setattr(dependencies.task_dispatcher, "enqueue", lambda task_id, *args: released.append(task_id))
+    with SessionLocal() as db:
+        add_tasks(db, "AB")
+        db.add(TaskDependency(id="gate", taskId="B", dependsOnTaskId="A", type=DependencyType.MANUAL))
+        db.commit()
+    return released
+
+
+def approve_in_db(approved_at):
+    with SessionLocal() as db:
+        dependency = db.get(TaskDependency, "gate")
+        dependency.approvedAt = approved_at
+        db.commit()
+
+
+@pytest.mark.anyio
+async def test_approval_is_stored_when_this_replica_runs_no_engine(queued, api_client):
+    async with api_client(tasks.router, "/tasks") as client:
+        response = await client.post("/tasks/dependencies/gate/approve")
+
+    assert response.status_code == 200
+    with SessionLocal() as db:
+        assert db.get(TaskDependency, "gate").approvedAt is not None
+
+    # The replica that becomes leader later still honours it
+    engine = DependencyEngine(poll_interval=None, poll_lag=1)
+    await engine.start()
+    try:
+        assert queued == ["B"]
+    finally:
+        await engine.stop()
+
+
+@pytest.mark.anyio
+async def test_approval_used_by_a_run_is_not_applied_again(queued):
+    approve_in_db(datetime.utcnow() - timedelta(minutes=5))
+    with SessionLocal() as db:
+        db.add(Node(id="n1", name="n1", host="h", port=1))
+        db.add(TaskExecution(id="run", taskId="B", nodeId="n1", status=ExecutionStatus.SUCCESS,
+                             startTime=datetime.utcnow() - timedelta(minutes=1)))
+        db.commit()
+
+    engine = DependencyEngine(poll_interval=None, poll_lag=1)
+    await engine.start()
+    try:
+        assert queued == []
+        assert engine.stored_readiness("B")["resolvedDependencies"] == {}
+    finally:
+        await engine.stop()
+
+
+@pytest.mark.anyio
+async def test_leader_picks_up_approvals_made_on_other_replicas(queued):
+    engine = DependencyEngine(poll_interval=0.05, poll_lag=1)
+    await engine.start()
+    try:
+        approve_in_db(datetime.utcnow())
+        for _ in range(40):
+            if queued:
+                break
+            await asyncio.sleep(0.05)
+        assert queued == ["B"]
+
+        # Re-reading the same row inside the poll lag doesn't approve twice
+        await asyncio.sleep(0.2)
+        assert queued == ["B"]
+    finally:
+        await engine.stop()
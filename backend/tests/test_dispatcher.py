@@ -0,0 +1,149 @@
+import pytest
+
+from backend.core.database import SessionLocal
+from backend.models import Node
+from backend.models.node import NodeStatus
+from backend.models.task import TaskPriority
+from backend.services import dispatcher
+from backend.services.dispatcher import CapacityIndex, DispatcherBusyError, TaskDispatcher
+
+
+def test_capacity_index_prefers_free_slots_then_cpu_cores():
+    index = CapacityIndex()
+    index.set("small", 2, cpu_cores=4)
+    index.set("big", 2, cpu_cores=16)
+    index.set("busy", 1, cpu_cores=64)
+
+    assert index.best() == "big"
+    index.adjust("big", -1)
+    assert index.best() == "small"
+    index.adjust("small", -2)
+    assert index.best() == "busy"
+
+
+def test_capacity_index_drops_stale_and_removed_nodes():
+    index = CapacityIndex()
+    index.set("a", 3)
+    index.set("b", 1)
+    index.set("a", 0)
+
+    assert index.best() == "b"
+    index.discard("b")
+    assert index.best() is None
+    assert index.free("b") == 0
+    assert len(index) == 1
+
+
+def test_next_item_orders_by_priority_then_age():
+    queue = TaskDispatcher(max_queue_size=10, aging_seconds=0)
+    for task_id, priority in [("low", TaskPriority.LOW), ("m1", TaskPriority.MEDIUM),
+                              ("urgent", TaskPriority.URGENT), ("m2", TaskPriority.MEDIUM)]:
+        queue.enqueue(task_id, priority)
+
+    order = []
+    while (item := queue._next_item()) is not None:
+        order.append(item.task_id)
+    assert order == ["urgent", "m1", "m2", "low"]
+
+
+def test_waiting_items_are_promoted():
+    queue = TaskDispatcher(max_queue_size=10, aging_seconds=60)
+    queue.enqueue("old", TaskPriority.LOW)
+    queue.enqueue("new", TaskPriority.HIGH)
+    # Three aging steps lift LOW to URGENT
+    queue._queues[TaskPriority.LOW][0].enqueued_at -= 181
+
+    assert queue._next_item().task_id == "old"
+
+
+def test_full_queue_rejects_new_items():
+    queue = TaskDispatcher(max_queue_size=1, aging_seconds=0)
+    queue.enqueue("a", TaskPriority.LOW)
+
+    with pytest.raises(DispatcherBusyError):
+        queue.enqueue("b", TaskPriority.URGENT)
+
+
+@pytest.mark.anyio
+async def test_dispatch_fills_free_slots_and_parks_pinned_items(clean_db, monkeypatch):
+    with SessionLocal() as db:
+        db.add(Node(id="n1", name="n1", host="h", port=1, status=NodeStatus.ONLINE, maxConcurrentTasks=3, cpuCores=8))
+        db.add(Node(id="n2", name="n2", host="h", port=2, status=NodeStatus.ONLINE, maxConcurrentTasks=1, cpuCores=4))
+        db.commit()
+    submitted = []
+    monkeypatch.setattr(dispatcher.task_executor, "submit",
+                        lambda task_id, node_id=None, execution_id=None: submitted.append((task_id, node_id)))
+    queue = TaskDispatcher(max_queue_size=10, aging_seconds=0)
+    await queue.refresh_nodes()
+
+    queue.enqueue("pinned", TaskPriority.URGENT, node_id="n2")
+    for task_id in ("a", "b", "c", "d"):
+        queue.enqueue(task_id, TaskPriority.MEDIUM)
+    await queue._dispatch_ready()
+
+    assert submitted == [("pinned", "n2"), ("a", "n1"), ("b", "n1"), ("c", "n1")]
+    assert queue.queue_depths()["MEDIUM"] == 1
+    with SessionLocal() as db:
+        assert {n.id: n.currentTaskCount for n in db.query(Node)} == {"n1": 3, "n2": 1}
+
+
+@pytest.mark.anyio
+async def test_pinned_item_for_a_full_node_does_not_block_the_queue(clean_db, monkeypatch):
+    with SessionLocal() as db:
+        db.add(Node(id="n1", name="n1", host="h", port=1, status=NodeStatus.ONLINE, maxConcurrentTasks=1))
+        db.add(Node(id="n2", name="n2", host="h", port=2, status=NodeStatus.ONLINE, maxConcurrentTasks=1,
+                    currentTaskCount=1))
+        db.commit()
+    submitted = []
+    monkeypatch.setattr(dispatcher.task_executor, "submit",
+                        lambda task_id, node_id=None, execution_id=None: submitted.append((task_id, node_id)))
+    queue = TaskDispatcher(max_queue_size=10, aging_seconds=0)
+    await queue.refresh_nodes()
+
+    queue.enqueue("pinned", TaskPriority.URGENT, node_id="n2")
+    queue.enqueue("free", TaskPriority.LOW)
+    await queue._dispatch_ready()
+
+    assert submitted == [("free", "n1")]
+    assert queue.queue_depths()["parked"] == 1
+
+    # The parked item goes back to the head of its queue once its node has room
+    queue.capacity.set("n2", 1)
+    queue._unpark("n2")
+    assert queue._next_item().task_id == "pinned"
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("lose", ["remove", "offline", "refresh"])
+async def test_items_parked_for_a_lost_node_are_unpinned(clean_db, monkeypatch, lose):
+    with SessionLocal() as db:
+        db.add(Node(id="n1", name="n1", host="h", port=1, status=NodeStatus.ONLINE, maxConcurrentTasks=1))
+        db.add(Node(id="n2", name="n2", host="h", port=2, status=NodeStatus.ONLINE, maxConcurrentTasks=1,
+                    currentTaskCount=1))
+        db.commit()
+    submitted = []
+    monkeypatch.setattr(dispatcher.task_executor, "submit",
+                        lambda task_id, node_id=None, execution_id=None: submitted.append((task_id, node_id)))
+    queue = TaskDispatcher(max_queue_size=10, aging_seconds=0)
+    await queue.refresh_nodes()
+    queue.enqueue("pinned", TaskPriority.HIGH, node_id="n2")
+    await queue._dispatch_ready()
+    assert queue.queue_depths()["parked"] == 1
+
+    if lose == "remove":
+        queue.remove_node("n2")
+    elif lose == "offline":
+        with SessionLocal() as db:
+            node = db.get(Node, "n2")
+            node.status = NodeStatus.OFFLINE
+            queue.update_node(node)
+    else:
+        with SessionLocal() as db:
+            db.delete(db.get(Node, "n2"))
+            db.commit()
+        await queue.refresh_nodes()
+    await queue._dispatch_ready()
+
+    assert submitted == [("pinned", "n1")]
+    assert queue.queue_depths()["parked"] == 0
+    assert queue._size == 0
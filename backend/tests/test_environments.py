@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+
+import pytest
+
+from backend.models.script import ScriptLanguage
+from backend.services.environments import (
+    READY_MARKER,
+    EnvironmentBuildError,
+    EnvironmentManager,
+    environment_key,
+    parse_requirements,
+)
+
+
+class Installer:
+    """代替 venv/pip，记录每次构建的命令"""
+
+    def __init__(self, delay: float = 0):
+        self.delay = delay
+        self.commands = []
+        self.fail = False
+
+    def __call__(self, command):
+        self.commands.append(command)
+        time.sleep(self.delay)
+        if self.fail:
+            raise EnvironmentBuildError("pip install failed")
+
+    @property
+    def builds(self) -> int:
+        return sum(1 for command in self.commands if "venv" in command)
+
+
+@pytest.fixture
+def installer():
+    return Installer()
+
+
+@pytest.fixture
+def manager(tmp_path, installer):
+    manager = EnvironmentManager(str(tmp_path), pool_size=2, build_timeout=60)
+    manager._run = installer
+    return manager
+
+
+@pytest.mark.parametrize("raw", [
+    '["Requests==2.31", "pyyaml"]',
+    '{"pyyaml": "", "requests": "2.31"}',
+    "# deps\npyyaml\n\nrequests==2.31\n",
+])
+def test_requirements_in_any_form_share_one_key(raw):
+    requirements = parse_requirements(ScriptLanguage.PYTHON, raw)
+
+    assert requirements == ["pyyaml", "requests==2.31"]
+    assert environment_key(ScriptLanguage.PYTHON, requirements) == environment_key(
+        ScriptLanguage.PYTHON, ["pyyaml", "requests==2.31"])
+
+
+def test_node_versions_use_an_at_sign():
+    assert parse_requirements(ScriptLanguage.NODEJS, '{"lodash": "4.17.21"}') == ["lodash@4.17.21"]
+
+
+@pytest.mark.parametrize("language, raw", [
+    (ScriptLanguage.PYTHON, None),
+    (ScriptLanguage.PYTHON, "  "),
+    (ScriptLanguage.BASH, '["jq"]'),
+])
+def test_nothing_to_install_needs_no_environment(manager, installer, language, raw):
+    assert manager.acquire(language, raw) is None
+    assert installer.commands == []
+
+
+def test_matching_environment_is_reused(manager, installer):
+    env = manager.acquire(ScriptLanguage.PYTHON, '["requests"]')
+    manager.release(env.key, 1.5)
+
+    assert manager.acquire(ScriptLanguage.PYTHON, "requests") is env
+    assert installer.builds == 1
+    assert manager.stats["hits"] == 1
+    assert env.in_use == 1
+    assert os.path.exists(os.path.join(env.path, READY_MARKER))
+    assert manager.report()["run_seconds"] == 1.5
+
+
+def test_concurrent_acquires_wait_for_one_build(manager, installer):
+    installer.delay = 0.05
+    envs = []
+    threads = [
+        threading.Thread(target=lambda: envs.append(manager.acquire(ScriptLanguage.PYTHON, '["requests"]')))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert installer.builds == 1
+    assert len({id(env) for env in envs}) == 1
+    assert envs[0].in_use == 4
+    assert manager._build_locks == {}
+
+
+def test_least_recently_used_idle_environment_is_evicted(manager):
+    a = manager.acquire(ScriptLanguage.PYTHON, '["a"]')
+    b = manager.acquire(ScriptLanguage.PYTHON, '["b"]')
+    manager.release(a.key, 0)
+    manager.release(b.key, 0)
+    manager.prepare(ScriptLanguage.PYTHON, '["a"]')
+    # b is idle and least recently used, c stays in use
+    manager.acquire(ScriptLanguage.PYTHON, '["c"]')
+
+    assert [env["requirements"] for env in manager.report()["items"]] == [["a"], ["c"]]
+    assert not os.path.exists(b.path)
+    assert manager.stats["evictions"] == 1
+
+
+def test_environments_in_use_are_not_evicted(manager):
+    for name in ["a", "b", "c"]:
+        manager.acquire(ScriptLanguage.PYTHON, f'["{name}"]')
+
+    assert manager.report()["environments"] == 3
+    assert manager.stats["evictions"] == 0
+
+
+def test_failed_build_leaves_nothing_behind(manager, installer, tmp_path):
+    installer.fail = True
+    with pytest.raises(EnvironmentBuildError):
+        manager.acquire(ScriptLanguage.PYTHON, '["broken"]')
+
+    assert os.listdir(tmp_path) == []
+    assert manager._build_locks == {}
+    assert manager.stats["build_failures"] == 1
+
+
+def test_load_keeps_ready_environments_in_lru_order(manager, tmp_path, installer):
+    first = manager.acquire(ScriptLanguage.PYTHON, '["a"]')
+    second = manager.acquire(ScriptLanguage.PYTHON, '["b"]')
+    # Built last but used longest ago
+    os.utime(os.path.join(second.path, READY_MARKER), (1, 1))
+    os.makedirs(tmp_path / "interrupted")
+
+    reloaded = EnvironmentManager(str(tmp_path), pool_size=2, build_timeout=60)
+    reloaded._run = installer
+    reloaded.load()
+
+    assert list(reloaded._envs) == [second.key, first.key]
+    assert not os.path.exists(tmp_path / "interrupted")
+    assert reloaded.acquire(ScriptLanguage.PYTHON, '["a"]').path == first.path
+    assert installer.builds == 2
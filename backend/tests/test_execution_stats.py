@@ -0,0 +1,134 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.core.database import SessionLocal
+from backend.models import Node, Script, Task, TaskExecution
+from backend.models.script import ScriptLanguage, ScriptType
+from backend.models.stats import ExecutionStat, ExecutionStatDaily
+from backend.models.task import ExecutionStatus
+from backend.services.execution_stats import ALL_KEY, SKETCH_ACCURACY, ExecutionStats, RunTimeSketch, floor_day
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_sketch_quantiles_are_within_the_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(3, 1.5) for _ in range(5000)]
+    sketch = RunTimeSketch()
+    for value in values:
+        sketch.add(value)
+
+    for q in (0.01, 0.5, 0.95, 0.99):
+        exact = exact_quantile(values, q)
+        assert abs(sketch.quantile(q) - exact) <= SKETCH_ACCURACY * exact * 1.0001
+
+
+def test_sketch_short_runs_and_empty_sketch():
+    sketch = RunTimeSketch()
+    assert sketch.quantile(0.5) is None
+
+    sketch.add(0.0, count=3)
+    sketch.add(10.0)
+    assert sketch.quantile(0.5) == 0.0
+    assert sketch.quantile(1.0) == pytest.approx(10.0, rel=SKETCH_ACCURACY)
+
+
+def test_sketch_merge_subtract_and_round_trip():
+    a, b = RunTimeSketch(), RunTimeSketch()
+    for value in (1, 2, 3):
+        a.add(value)
+    b.add(2)
+    b.add(0)
+
+    a.merge(b)
+    assert a.count == 5
+    a.merge(b, -1)
+    assert a.count == 3 and a.zero == 0
+
+    restored = RunTimeSketch.loads(a.dumps())
+    assert restored.buckets == a.buckets and restored.zero == a.zero
+    assert RunTimeSketch.loads(None).count == 0
+
+
+NOW = datetime(2024, 5, 10, 12)
+
+
+def execution(execution_id, task_id, status, end_time, seconds=10.0):
+    return TaskExecution(id=execution_id, taskId=task_id, nodeId="n1", status=status,
+                         startTime=end_time - timedelta(seconds=seconds), endTime=end_time)
+
+
+def stat(db, scope, key, day=None):
+    if day is None:
+        return db.get(ExecutionStat, (scope, key))
+    return db.get(ExecutionStatDaily, {"scope": scope, "key": key, "day": day})
+
+
+@pytest.fixture
+def tasks(clean_db):
+    with SessionLocal() as db:
+        db.add(Node(id="n1", name="n1", host="h", port=1))
+        db.add(Script(id="s1", name="s", type=ScriptType.PYTHON, language=ScriptLanguage.PYTHON,
+                      filePath="s.py", fileName="s.py"))
+        for task_id in ("t1", "t2"):
+            db.add(Task(id=task_id, name=task_id, scriptId="s1", parameters="{}", maxRunTime=5))
+        db.commit()
+
+
+def test_apply_pending_counts_settled_executions_once(tasks):
+    service = ExecutionStats(interval=5, settle_seconds=5, batch_size=2, reconcile_interval=3600, reconcile_days=2)
+    with SessionLocal() as db:
+        db.add(execution("e1", "t1", ExecutionStatus.SUCCESS, NOW - timedelta(hours=2), seconds=10))
+        db.add(execution("e2", "t1", ExecutionStatus.FAILED, NOW - timedelta(hours=1), seconds=30))
+        db.add(execution("e3", "t2", ExecutionStatus.CANCELLED, NOW - timedelta(minutes=30)))
+        # Not settled yet
+        db.add(execution("e4", "t2", ExecutionStatus.SUCCESS, NOW - timedelta(seconds=1)))
+        db.add(TaskExecution(id="running", taskId="t1", nodeId="n1", status=ExecutionStatus.RUNNING, startTime=NOW))
+        db.commit()
+
+    assert service.apply_pending(NOW) == 3
+    assert service.apply_pending(NOW) == 0
+
+    with SessionLocal() as db:
+        total = stat(db, "all", ALL_KEY)
+        assert (total.totalRuns, total.successfulRuns, total.failedRuns, total.cancelledRuns) == (3, 1, 1, 1)
+        t1 = stat(db, "task", "t1")
+        assert t1.totalRuns == 2 and t1.runTimeTotal == pytest.approx(40)
+        assert t1.p50RunTime == pytest.approx(10, rel=SKETCH_ACCURACY)
+        assert stat(db, "task", "t1", floor_day(NOW)).totalRuns == 2
+
+    assert service.apply_pending(NOW + timedelta(seconds=10)) == 1
+
+
+def test_reconcile_corrects_drift_in_recent_days(tasks):
+    service = ExecutionStats(interval=5, settle_seconds=0, batch_size=100, reconcile_interval=3600, reconcile_days=2)
+    with SessionLocal() as db:
+        db.add(execution("e1", "t1", ExecutionStatus.SUCCESS, NOW - timedelta(hours=2)))
+        db.add(execution("e2", "t2", ExecutionStatus.SUCCESS, NOW - timedelta(hours=1)))
+        db.commit()
+    service.apply_pending(NOW)
+    assert service.reconcile(NOW) == 0
+
+    with SessionLocal() as db:
+        # Committed late, behind the watermark, and a counted row removed
+        db.add(execution("e0", "t1", ExecutionStatus.FAILED, NOW - timedelta(hours=3)))
+        db.delete(db.get(TaskExecution, "e2"))
+        db.commit()
+    assert service.apply_pending(NOW) == 0
+
+    # Corrected rows: all, node n1, task t1 and task t2
+    assert service.reconcile(NOW) == 4
+    assert service.reconcile(NOW) == 0
+
+    with SessionLocal() as db:
+        total = stat(db, "all", ALL_KEY)
+        assert (total.totalRuns, total.successfulRuns, total.failedRuns) == (2, 1, 1)
+        assert stat(db, "task", "t1").totalRuns == 2
+        assert stat(db, "task", "t2").totalRuns == 0
+        assert stat(db, "node", "n1").totalRuns == 2
+        assert stat(db, "task", "t2", floor_day(NOW)) is None
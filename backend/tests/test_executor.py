@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from backend.core.database import SessionLocal
+from backend.models import Script, Task, TaskExecution, TaskExecutionLog
+from backend.models.script import ScriptLanguage, ScriptType
+from backend.models.task import ExecutionStatus, TaskStatus
+from backend.services.executor import ExecutorBusyError, TaskExecutor
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def executor(clean_db):
+    executor = TaskExecutor(max_workers=2, queue_size=10)
+    finished = {}
+    executor.on_finished.append(lambda job, status: finished[job.execution_id].set_result(status))
+    executor.finished = finished
+    await executor.start()
+    yield executor
+    await executor.stop()
+
+
+@pytest.fixture
+def add_task(tmp_path):
+    def add_task(task_id: str, body: str, max_run_time: int = 30, status: TaskStatus = TaskStatus.PENDING):
+        path = tmp_path / f"{task_id}.sh"
+        path.write_text(body)
+        with SessionLocal() as db:
+            db.add(Script(id=task_id, name=task_id, type=ScriptType.SHELL, language=ScriptLanguage.BASH,
+                          filePath=str(path), fileName=path.name))
+            db.add(Task(id=task_id, name=task_id, scriptId=task_id, parameters="{}", maxRunTime=max_run_time,
+                        status=status))
+            db.commit()
+    return add_task
+
+
+def run(executor: TaskExecutor, task_id: str) -> str:
+    execution_id = executor.submit(task_id)
+    executor.finished[execution_id] = asyncio.get_running_loop().create_future()
+    return execution_id
+
+
+async def finished(executor: TaskExecutor, execution_id: str) -> ExecutionStatus:
+    return await asyncio.wait_for(executor.finished[execution_id], 10)
+
+
+def execution(execution_id: str) -> TaskExecution:
+    with SessionLocal() as db:
+        return db.get(TaskExecution, execution_id)
+
+
+def task_status(task_id: str) -> TaskStatus:
+    with SessionLocal() as db:
+        return db.get(Task, task_id).status
+
+
+async def test_successful_run_is_recorded_with_its_output(executor, add_task):
+    add_task("ok", 'echo "hello $TASK_ID"\n')
+    execution_id = run(executor, "ok")
+
+    assert await finished(executor, execution_id) == ExecutionStatus.SUCCESS
+    row = execution(execution_id)
+    assert row.status == ExecutionStatus.SUCCESS
+    assert row.exitCode == 0
+    assert row.output == "hello ok\n"
+    assert row.endTime is not None
+    assert task_status("ok") == TaskStatus.SUCCESS
+    with SessionLocal() as db:
+        segments = db.query(TaskExecutionLog).filter(TaskExecutionLog.executionId == execution_id).all()
+        assert [(s.stream, s.length) for s in segments] == [("stdout", 9)]
+
+
+async def test_failed_run_keeps_exit_code_and_stderr(executor, add_task):
+    add_task("bad", "echo broken >&2\nexit 3\n")
+    execution_id = run(executor, "bad")
+
+    assert await finished(executor, execution_id) == ExecutionStatus.FAILED
+    row = execution(execution_id)
+    assert row.exitCode == 3
+    assert row.error == "broken\n"
+    assert task_status("bad") == TaskStatus.FAILED
+
+
+async def test_max_run_time_kills_the_script_and_its_children(executor, add_task):
+    # The background child keeps the pipes open after the script itself exits
+    add_task("slow", "sleep 30 &\necho started\n", max_run_time=1)
+    execution_id = run(executor, "slow")
+
+    assert await finished(executor, execution_id) == ExecutionStatus.FAILED
+    row = execution(execution_id)
+    assert row.error == "Execution exceeded maxRunTime (1s)"
+    assert row.output == "started\n"
+
+
+async def test_cancel_kills_a_running_script(executor, add_task):
+    add_task("long", "sleep 30\n")
+    execution_id = run(executor, "long")
+    while not executor.runs(execution_id):
+        await asyncio.sleep(0.01)
+
+    with SessionLocal() as db:
+        db.get(Task, "long").status = TaskStatus.CANCELLED
+        db.commit()
+    assert executor.cancel(["long"]) == 1
+
+    assert await finished(executor, execution_id) == ExecutionStatus.CANCELLED
+    assert execution(execution_id).status == ExecutionStatus.CANCELLED
+    assert task_status("long") == TaskStatus.CANCELLED
+
+
+async def test_cancelled_task_is_not_started(executor, add_task):
+    add_task("skipped", "echo never\n", status=TaskStatus.CANCELLED)
+    execution_id = run(executor, "skipped")
+
+    assert await finished(executor, execution_id) == ExecutionStatus.CANCELLED
+    assert execution(execution_id) is None
+
+
+def test_full_queue_rejects_submissions():
+    executor = TaskExecutor(max_workers=1, queue_size=1)
+    executor.submit("a")
+
+    with pytest.raises(ExecutorBusyError):
+        executor.submit("b")
@@ -0,0 +1,94 @@
+import pytest
+
+from backend.services.failure_detector import FAILED_OVER_SECONDS, FailureDetector
+
+
+def detector(policy: str = "phi", **overrides) -> FailureDetector:
+    options = dict(policy=policy, timeout=15.0, phi_threshold=8.0, min_std=0.5, window=100,
+                   check_interval=0.5, requeue=True, heartbeat_lag=5.0)
+    return FailureDetector(**{**options, **overrides})
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        detector("gossip")
+
+
+def test_failed_over_executions_expire_when_nobody_consumes_them():
+    d = detector()
+    d.failed_over.update({"old": 100.0, "recent": 100.0 + FAILED_OVER_SECONDS})
+
+    d.forget_failed_over(101.0 + FAILED_OVER_SECONDS)
+
+    assert d.failed_over == {"recent": 100.0 + FAILED_OVER_SECONDS}
+    assert d.report()["failedOver"] == 1
+
+
+def beat(d: FailureDetector, node_id: str, *times: float):
+    for now in times:
+        d._track(node_id, now)
+
+
+def test_first_heartbeats_use_the_plain_timeout():
+    d = detector()
+    beat(d, "n1", 0.0, 1.0)
+
+    assert d.phi("n1", 2.0) is None
+    assert d.expired(15.9) == []
+    assert d.expired(16.0) == ["n1"]
+
+
+def test_regular_heartbeats_are_suspected_soon_after_they_stop():
+    d = detector()
+    beat(d, "n1", *range(11))
+    deadline = d._nodes["n1"].deadline
+
+    # A steady one-second rhythm: mean 1s, deviation clamped to min_std
+    assert deadline == pytest.approx(10 + 1 + d._phi_z * 0.5)
+    assert d.phi("n1", 11.0) < 1
+    assert d.phi("n1", deadline) == pytest.approx(8.0)
+    assert d.phi("n1", deadline + 1) > 8.0
+    assert d.expired(deadline - 0.01) == []
+    assert d.expired(deadline) == ["n1"]
+    assert d.report()["tracked"] == 0
+
+
+def test_jittery_heartbeats_get_more_patience_capped_at_the_timeout():
+    steady, jittery = detector(), detector()
+    beat(steady, "n1", *range(11))
+    beat(jittery, "n1", 0, 0.2, 2.0, 2.4, 4.0, 4.3, 6.1, 6.2, 8.0, 8.5, 10.0)
+
+    steady_silence = steady._nodes["n1"].deadline - 10
+    jittery_silence = jittery._nodes["n1"].deadline - 10
+    assert steady_silence < jittery_silence < 15.0
+
+    erratic = detector()
+    beat(erratic, "n1", 0, 1, 14, 15)
+    assert erratic._nodes["n1"].deadline == 15 + 15.0
+
+
+def test_timeout_policy_ignores_the_interval_history():
+    d = detector("timeout")
+    beat(d, "n1", *range(11))
+
+    assert d._nodes["n1"].deadline == 25.0
+
+
+def test_a_later_heartbeat_supersedes_the_queued_deadline():
+    d = detector()
+    beat(d, "n1", 0.0)
+    beat(d, "n2", 1.0)
+    beat(d, "n1", 10.0)
+
+    assert d.expired(16.0) == ["n2"]
+    assert d.expired(24.9) == []
+    assert d.expired(25.0) == ["n1"]
+    assert d._deadlines == []
+
+
+def test_interval_history_is_bounded_and_never_goes_backwards():
+    d = detector(window=3)
+    beat(d, "n1", 0, 1, 2, 3, 4, 3.5)
+
+    assert list(d._nodes["n1"].intervals) == [1, 1, 0]
+    assert d._nodes["n1"].last == 4
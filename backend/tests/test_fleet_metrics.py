@@ -0,0 +1,178 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pytest
+
+from backend.core.database import SessionLocal
+from backend.models import Node, NodeMetric
+from backend.services import fleet_metrics
+from backend.services.fleet_metrics import (
+    AGGREGATE_METRICS,
+    ROW,
+    SCALES,
+    Columns,
+    FleetMetrics,
+    _summarize,
+    aggregate,
+    parse_tags,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def write_samples(*ids: int):
+    """模拟任意副本写入的样本"""
+    with SessionLocal() as db:
+        for row_id in ids:
+            db.add(NodeMetric(id=row_id, nodeId="n1", cpuUsage=float(row_id), memoryUsage=50.0, diskUsage=10.0,
+                              timestamp=datetime.utcnow()))
+        db.commit()
+
+
+@pytest.fixture
+async def metrics(clean_db):
+    with SessionLocal() as db:
+        db.add(Node(id="n1", name="n1", host="h", port=1))
+        db.commit()
+    write_samples(1, 2)
+    # Polls are driven by the tests
+    store = FleetMetrics(window=timedelta(hours=1), block_size=4, poll_interval=3600)
+    await store.start()
+    while store._complete_since is None:
+        await asyncio.sleep(0.01)
+    yield store
+    await store.stop()
+
+
+async def test_samples_written_by_any_replica_are_polled(metrics):
+    assert metrics.samples == 2
+    assert metrics.covers(datetime.utcnow() - timedelta(minutes=1))
+
+    write_samples(3, 4, 5)
+    await metrics.poll()
+    await metrics.poll()
+
+    assert metrics.samples == 5
+    assert metrics.report()["polls"] == 2
+
+
+async def test_ids_committed_late_are_read_again(metrics):
+    # Id 3 belongs to a batch still in flight when id 4 is read
+    write_samples(4)
+    await metrics.poll()
+    assert list(metrics._gaps) == [3]
+
+    write_samples(3)
+    await metrics.poll()
+
+    assert metrics.samples == 4
+    assert metrics._gaps == {}
+
+
+async def test_skipped_ids_expire(metrics, monkeypatch):
+    monkeypatch.setattr(fleet_metrics, "GAP_SECONDS", 0)
+    write_samples(5)
+    await metrics.poll()
+    assert sorted(metrics._gaps) == [3, 4]
+
+    await metrics.poll()
+
+    assert metrics._gaps == {}
+
+
+def columns(node_ids: List[str], nodes, metric_values: Dict[str, list], chunk_size: Optional[int] = None) -> Columns:
+    """按指标给出的样本组装为列视图，可切成多个带缓存汇总的分片"""
+    nodes = np.asarray(nodes, dtype=np.int32)
+    values = np.full((len(AGGREGATE_METRICS), len(nodes)), np.nan, dtype=np.float32)
+    for metric, column in metric_values.items():
+        values[ROW[metric]] = column
+    codes = np.stack([SCALES[metric].quantize(values[i]) for i, metric in enumerate(AGGREGATE_METRICS)])
+    size = chunk_size or len(nodes)
+    chunks = [
+        (nodes[i:i + size], values[:, i:i + size], codes[:, i:i + size],
+         _summarize(nodes[i:i + size], values[:, i:i + size], len(node_ids)) if chunk_size else None)
+        for i in range(0, len(nodes), size)
+    ]
+    return Columns(chunks=chunks, node_ids=node_ids)
+
+
+def test_group_percentiles_match_the_samples():
+    rng = np.random.default_rng(7)
+    nodes = rng.integers(0, 3, 3000)
+    cpu = rng.uniform(0, 100, 3000).astype(np.float32)
+    network = rng.lognormal(10, 2, 3000).astype(np.float32)
+    data = columns(["n1", "n2", "n3"], nodes, {"cpuUsage": cpu, "networkIO": network})
+    # n1 carries two tags, n3 none
+    groups = {"n1": ("a", "b"), "n2": ("a",), "n3": ()}
+
+    result = aggregate(data, groups, 60.0, ["cpuUsage", "networkIO"], [50, 99.9], bins=10)
+
+    assert result["samples"] == 3000
+    assert [group["group"] for group in result["groups"]] == ["a", "b"]
+    a = result["groups"][0]
+    in_a = nodes < 2
+    assert a["nodes"] == 2
+    assert a["samples"] == in_a.sum()
+    assert a["sampleRate"] == pytest.approx(in_a.sum() / 60.0)
+    summary = a["metrics"]["cpuUsage"]
+    assert summary["mean"] == pytest.approx(cpu[in_a].mean(), rel=1e-6)
+    # Percent metrics are read from 0.1-wide bins, the others from bins 4% apart
+    assert summary["p50"] == pytest.approx(np.percentile(cpu[in_a], 50), abs=0.1)
+    assert summary["p99_9"] == pytest.approx(np.percentile(cpu[in_a], 99.9), abs=0.1)
+    assert summary["min"] <= cpu[in_a].min() < summary["min"] + 0.1
+    assert summary["max"] - 0.1 < cpu[in_a].max() <= summary["max"]
+    assert sum(summary["histogram"]) == summary["count"] == in_a.sum()
+    assert result["histogramEdges"]["cpuUsage"] == pytest.approx(list(np.linspace(0, 100, 11)))
+    network_p50 = a["metrics"]["networkIO"]["p50"]
+    assert network_p50 == pytest.approx(np.percentile(network[in_a], 50), rel=0.04)
+    assert sum(a["metrics"]["networkIO"]["histogram"]) == in_a.sum()
+
+
+def test_cached_block_summaries_give_the_same_result():
+    rng = np.random.default_rng(3)
+    nodes = rng.integers(0, 2, 100)
+    cpu = rng.uniform(0, 100, 100).astype(np.float32)
+    groups = {"n1": ("n1",), "n2": ("n2",)}
+
+    whole = aggregate(columns(["n1", "n2"], nodes, {"cpuUsage": cpu}), groups, 60.0, ["cpuUsage"], [90], 5)
+    split = aggregate(columns(["n1", "n2"], nodes, {"cpuUsage": cpu}, chunk_size=32), groups, 60.0,
+                      ["cpuUsage"], [90], 5)
+
+    assert split == whole
+
+
+def test_missing_values_are_left_out_of_the_metric():
+    data = columns(["n1"], [0, 0, 0], {"cpuUsage": [10.0, np.nan, 30.0]})
+
+    result = aggregate(data, {"n1": ("n1",)}, 0.0, ["cpuUsage", "loadAverage"], [50], 4)
+
+    group = result["groups"][0]
+    assert group["samples"] == 3
+    assert group["sampleRate"] is None
+    assert group["metrics"]["cpuUsage"]["count"] == 2
+    assert group["metrics"]["cpuUsage"]["mean"] == pytest.approx(20.0)
+    assert group["metrics"]["loadAverage"] is None
+
+
+async def test_query_reads_the_memory_window(metrics):
+    end = datetime.utcnow() + timedelta(minutes=1)
+
+    result = await asyncio.to_thread(
+        metrics.query, end - timedelta(minutes=30), end, "node", ["cpuUsage"], [50], 2
+    )
+
+    assert result["source"] == "memory"
+    assert [(group["group"], group["samples"]) for group in result["groups"]] == [("n1", 2)]
+    assert result["groups"][0]["metrics"]["cpuUsage"]["mean"] == pytest.approx(1.5)
+
+
+@pytest.mark.parametrize("tags, expected", [
+    (None, ()),
+    ('["gpu", " eu "]', ("gpu", "eu")),
+    ('{"zone": "a"}', ("zone=a",)),
+    ("gpu,eu", ("gpu", "eu")),
+])
+def test_parse_tags(tags, expected):
+    assert parse_tags(tags) == expected
@@ -0,0 +1,93 @@
+from datetime import datetime
+
+import pytest
+
+from backend.api.v1 import nodes
+from backend.core.database import SessionLocal
+from backend.models import Node, NodeMetric
+from backend.services.heartbeats import DEFAULT_FIELDS, HeartbeatIngestor, IngestBackpressureError, sample_error
+
+FIELDS = list(DEFAULT_FIELDS) + ["processCount"]
+
+
+@pytest.mark.parametrize("sample, error", [
+    ([None, 1.0, 2.0, 3.0, 4], None),
+    ([1700000000, 1, 2, 3], None),
+    ([], "sample is empty, expected [timestamp, *values]"),
+    ([None, 1, 2, 3, 4, 5], "sample has 5 values for 4 fields"),
+    (["now", 1, 2, 3], "timestamp must be epoch seconds or null"),
+    ([1e20, 1, 2, 3], "timestamp is out of range"),
+    ([None, "high", 2, 3], "cpuUsage must be a number"),
+    ([None, 1, True, 3], "memoryUsage must be a number"),
+    ([None, 1, 2, float("nan")], "diskUsage must be a number"),
+    ([None, 1, 2, 3, [4]], "processCount must be a number"),
+    ([None, 1, None, 3], "memoryUsage is required"),
+    ([None, 1, 2], "diskUsage is required"),
+])
+def test_sample_error(sample, error):
+    assert sample_error(FIELDS, sample) == error
+
+
+@pytest.fixture
+def node(clean_db):
+    with SessionLocal() as db:
+        db.add(Node(id="n1", name="n1", host="h", port=1))
+        db.commit()
+
+
+@pytest.mark.anyio
+async def test_flush_writes_a_batch_and_one_heartbeat_per_node(node):
+    ingestor = HeartbeatIngestor(batch_size=100, flush_interval=60, max_pending=100)
+    received_at = datetime(2026, 1, 1, 12, 0)
+    ingestor.submit("n1", FIELDS, [[None, 1, 2, 3, 4.0]], received_at=received_at)
+    ingestor.submit("n1", FIELDS, [[1700000000, 5, 6, 7]], received_at=received_at)
+    ingestor.submit("gone", FIELDS, [[None, 1, 2, 3]])
+
+    await ingestor.flush()
+
+    with SessionLocal() as db:
+        rows = db.query(NodeMetric).order_by(NodeMetric.id).all()
+        node = db.get(Node, "n1")
+        assert [(row.cpuUsage, row.processCount) for row in rows] == [(1.0, 4), (5.0, None)]
+        assert rows[0].timestamp == received_at
+        assert node.lastHeartbeat == received_at
+        assert node.lastHealthCheck == received_at
+    assert ingestor.stats["flushes"] == 1
+    assert ingestor.stats["flushed_samples"] == 2
+    assert ingestor.stats["flushed_heartbeats"] == 2
+    # Samples of nodes that do not exist are dropped at write time
+    assert ingestor.stats["dropped_samples"] == 1
+    assert ingestor.pending == 0
+
+
+def test_a_report_that_does_not_fit_is_rejected_whole():
+    ingestor = HeartbeatIngestor(batch_size=100, flush_interval=60, max_pending=2)
+    ingestor.submit("n1", FIELDS, [[None, 1, 2, 3]])
+
+    with pytest.raises(IngestBackpressureError):
+        ingestor.submit("n1", FIELDS, [[None, 1, 2, 3], [None, 1, 2, 3]])
+
+    assert ingestor.pending == 1
+
+
+@pytest.mark.anyio
+async def test_endpoint_rejects_a_batch_with_a_bad_value(api_client, monkeypatch):
+    ingestor = HeartbeatIngestor(batch_size=100, flush_interval=60, max_pending=1)
+    monkeypatch.setattr(nodes, "heartbeat_ingestor", ingestor)
+
+    async with api_client(nodes.router, "/api/v1/nodes") as client:
+        invalid = await client.post("/api/v1/nodes/heartbeats", json={"reports": [
+            {"nodeId": "n1", "samples": [[None, 1, 2, 3]]},
+            {"nodeId": "n2", "samples": [[None, 1, "2", 3]]},
+        ]})
+        full = await client.post("/api/v1/nodes/heartbeats", json={"reports": [
+            {"nodeId": "n1", "samples": [[None, 1, 2, 3], [None, 1, 2, 3]]},
+        ]})
+
+    assert invalid.status_code == 400
+    assert invalid.json()["detail"] == [
+        {"index": 1, "nodeId": "n2", "sample": 0, "error": "memoryUsage must be a number"}
+    ]
+    assert full.status_code == 503
+    assert full.headers["Retry-After"] == "60"
+    assert ingestor.pending == 0
@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.services.leader import DatabaseLease, Lease, LeaderElection
+
+LEASE_SECONDS = 0.2
+
+
+def test_database_lease_is_taken_over_once_the_holder_stops_renewing(clean_db):
+    a, b = DatabaseLease("test", LEASE_SECONDS), DatabaseLease("test", LEASE_SECONDS)
+
+    assert a._acquire("A", None) == 1
+    assert b._acquire("B", None) is None
+    time.sleep(LEASE_SECONDS / 2)
+    assert a._acquire("A", 1) == 1
+    # The renewal moved the version, so B starts waiting again
+    time.sleep(LEASE_SECONDS / 2)
+    assert b._acquire("B", None) is None
+
+    time.sleep(LEASE_SECONDS * 1.5)
+    assert b._acquire("B", None) == 2
+    assert a._acquire("A", 1) is None
+    assert b._describe()["holder"] == "B"
+
+
+def test_released_database_lease_is_free_at_once(clean_db):
+    a, b = DatabaseLease("test", 30), DatabaseLease("test", 30)
+    assert a._acquire("A", None) == 1
+    assert b._acquire("B", None) is None
+
+    a._release("A", 1)
+
+    assert a._describe() is None
+    assert b._acquire("B", None) == 2
+
+
+class FlakyLease(Lease):
+    """可切换为应答过慢的租约"""
+
+    def __init__(self):
+        self.slow = False
+        self.granted_at = None
+
+    async def acquire(self, holder, term):
+        if self.slow:
+            await asyncio.sleep(10)
+        self.granted_at = time.monotonic()
+        return term or 1
+
+    async def release(self, holder, term):
+        pass
+
+    async def describe(self):
+        return None
+
+
+@pytest.mark.anyio
+async def test_leader_steps_down_before_its_lease_can_expire():
+    lease = FlakyLease()
+    election = LeaderElection(lease, "A", lease_seconds=0.4, renew_interval=0.1)
+    events = []
+
+    async def elected():
+        events.append("elected")
+
+    async def demoted():
+        events.append(time.monotonic())
+
+    election.on_elected.append(elected)
+    election.on_demoted.append(demoted)
+    await election.start()
+    try:
+        await asyncio.sleep(0.25)
+        assert election.is_leader and election.stats["renewals"] > 0
+
+        lease.slow = True
+        await asyncio.sleep(0.6)
+
+        assert not election.is_leader
+        assert events[0] == "elected" and len(events) == 2
+        assert events[1] < lease.granted_at + 0.4
+    finally:
+        await election.stop()
+
+
+def test_lease_must_cover_two_renewals():
+    with pytest.raises(ValueError):
+        LeaderElection(FlakyLease(), "A", lease_seconds=1, renew_interval=0.6)
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from backend.api.v1 import tasks
+from backend.core.database import SessionLocal
+from backend.models import Node, Script, Task, TaskExecution, TaskExecutionLog
+from backend.models.script import ScriptLanguage, ScriptType
+from backend.models.task import ExecutionStatus
+from backend.services import logs
+from backend.services.logs import ExecutionLogStore, LogUnavailableError
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ExecutionLogStore(str(tmp_path), segment_size=4, chunk_size=3, tail_bytes=0)
+
+
+def add_execution(execution_id: str, status: str):
+    with SessionLocal() as db:
+        if not db.get(Node, "n1"):
+            db.add(Node(id="n1", name="n1", host="h", port=1))
+            db.add(Script(id="s1", name="s", type=ScriptType.PYTHON, language=ScriptLanguage.PYTHON,
+                          filePath="s.py", fileName="s.py"))
+            db.add(Task(id="t1", name="t1", scriptId="s1", parameters="{}", maxRunTime=5))
+        db.add(TaskExecution(id=execution_id, taskId="t1", nodeId="n1", status=status))
+        db.commit()
+
+
+async def collect(store: ExecutionLogStore, execution_id: str, offset: int = 0) -> bytes:
+    data = b""
+    async for _, chunk in store.follow(execution_id, "stdout", offset):
+        data += chunk
+    return data
+
+
+def test_read_spans_segments(store):
+    stdout, _ = store.open("run")
+    stdout.append(b"hello ")
+    stdout.append(b"world")
+
+    assert len(stdout.segments) == 2
+    assert store.read("run", "stdout", 0, 100) == (b"hello world", 11)
+    assert store.read("run", "stdout", 4, 4) == (b"o wo", 11)
+    assert store.read("run", "stderr", 0, 100) == (b"", 0)
+
+
+def test_read_of_a_segment_stored_elsewhere_raises(store):
+    stdout, _ = store.open("run")
+    stdout.append(b"hello")
+    stdout.segments[0].path += ".elsewhere"
+
+    with pytest.raises(LogUnavailableError):
+        store.read("run", "stdout", 0, 100)
+
+
+@pytest.mark.anyio
+async def test_follow_streams_until_the_log_is_closed(store):
+    stdout, _ = store.open("run")
+    stdout.append(b"ab")
+    follower = asyncio.create_task(collect(store, "run", offset=1))
+    await asyncio.sleep(0.05)
+
+    await asyncio.to_thread(stdout.append, b"cdefg")
+    stdout.notify()
+    store.close("run")
+
+    assert await asyncio.wait_for(follower, 1) == b"bcdefg"
+
+
+@pytest.mark.anyio
+async def test_follow_waits_for_a_running_execution_to_open_its_log(store, clean_db, monkeypatch):
+    monkeypatch.setattr(logs, "FOLLOW_POLL_SECONDS", 0.01)
+    add_execution("run", ExecutionStatus.RUNNING)
+    follower = asyncio.create_task(collect(store, "run"))
+    await asyncio.sleep(0.05)
+    assert not follower.done()
+
+    stdout, _ = store.open("run")
+    await asyncio.to_thread(stdout.append, b"late")
+    stdout.notify()
+    store.close("run")
+
+    assert await asyncio.wait_for(follower, 1) == b"late"
+
+
+@pytest.mark.anyio
+async def test_follow_ends_for_a_finished_execution(store, clean_db):
+    add_execution("run", ExecutionStatus.SUCCESS)
+
+    assert await asyncio.wait_for(collect(store, "run"), 1) == b""
+
+
+@pytest.mark.anyio
+async def test_logs_of_a_run_on_another_host_are_a_conflict(api_client, clean_db):
+    add_execution("remote", ExecutionStatus.RUNNING)
+
+    async with api_client(tasks.router, "/api/v1/tasks") as client:
+        read = await client.get("/api/v1/tasks/executions/remote/logs")
+        tail = await client.get("/api/v1/tasks/executions/remote/logs/tail")
+
+    assert read.status_code == 409
+    assert tail.status_code == 409
+
+
+@pytest.mark.anyio
+async def test_segments_missing_on_this_host_are_not_found(api_client, clean_db, tmp_path):
+    add_execution("done", ExecutionStatus.SUCCESS)
+    with SessionLocal() as db:
+        db.add(TaskExecutionLog(executionId="done", stream="stdout", sequence=0, startOffset=0, length=5,
+                                filePath=str(tmp_path / "stdout.000000.log")))
+        db.commit()
+
+    async with api_client(tasks.router, "/api/v1/tasks") as client:
+        response = await client.get("/api/v1/tasks/executions/done/logs")
+
+    assert response.status_code == 404
@@ -0,0 +1,13 @@
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_app_starts_and_serves_requests():
+    from backend.main import app, lifespan
+
+    async with lifespan(app):
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            assert (await client.get("/health")).json() == {"status": "healthy"}
+            assert (await client.get("/api/v1/tasks/")).status_code == 403
@@ -0,0 +1,150 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from backend.core.database import SessionLocal
+from backend.models import Node, NodeMetric, NodeMetricRollup
+from backend.services import metrics
+from backend.services.metrics import MetricStore, floor_time
+
+T0 = datetime(2026, 3, 1, 10, 0)
+
+
+@pytest.fixture
+def store(clean_db):
+    with SessionLocal() as db:
+        db.add_all([Node(id="n1", name="n1", host="h", port=1), Node(id="n2", name="n2", host="h", port=2)])
+        db.commit()
+    return MetricStore(rollup_interval=60, rollup_delay=30, retention={
+        0: timedelta(hours=48),
+        60: timedelta(days=14),
+        3600: timedelta(days=400),
+    })
+
+
+def add_samples(*samples):
+    with SessionLocal() as db:
+        for node_id, seconds, cpu, load in samples:
+            db.add(NodeMetric(nodeId=node_id, cpuUsage=cpu, memoryUsage=50.0, diskUsage=10.0, loadAverage=load,
+                              timestamp=T0 + timedelta(seconds=seconds)))
+        db.commit()
+
+
+def rollups(resolution: int):
+    with SessionLocal() as db:
+        rows = db.query(NodeMetricRollup).filter(NodeMetricRollup.resolution == resolution).order_by(
+            NodeMetricRollup.nodeId, NodeMetricRollup.bucket
+        ).all()
+        return [(row.nodeId, row.bucket, row.cpuUsageMin, row.cpuUsageMax, row.cpuUsageSum, row.cpuUsageCount,
+                 row.loadAverageCount) for row in rows]
+
+
+def test_floor_time():
+    assert floor_time(datetime(2026, 3, 1, 10, 59, 59, 999), 60) == datetime(2026, 3, 1, 10, 59)
+    assert floor_time(datetime(2026, 3, 1, 10, 59, 59), 3600) == T0
+
+
+def test_closed_windows_are_rolled_up_once_per_tier(store):
+    add_samples(("n1", 10, 10.0, None), ("n1", 50, 30.0, 1.0), ("n1", 80, 20.0, None), ("n2", 30, 50.0, 2.0))
+    now = T0 + timedelta(hours=1, seconds=40)
+
+    assert store.rollup(now) == {60: 3, 3600: 2}
+    assert rollups(60) == [
+        ("n1", T0, 10.0, 30.0, 40.0, 2, 1),
+        ("n1", T0 + timedelta(minutes=1), 20.0, 20.0, 20.0, 1, 0),
+        ("n2", T0, 50.0, 50.0, 50.0, 1, 1),
+    ]
+    # Hours are built from the minute rows
+    assert rollups(3600) == [("n1", T0, 10.0, 30.0, 60.0, 3, 1), ("n2", T0, 50.0, 50.0, 50.0, 1, 1)]
+    assert store.rollup(now) == {60: 0, 3600: 0}
+
+
+def test_open_and_delayed_windows_wait_for_a_later_pass(store):
+    add_samples(("n1", 10, 10.0, None), ("n1", 70, 20.0, None))
+
+    # The second minute closes at 10:02, samples may still arrive until 10:02:30
+    assert store.rollup(T0 + timedelta(minutes=2, seconds=20)) == {60: 1, 3600: 0}
+    assert store.rollup(T0 + timedelta(minutes=2, seconds=30)) == {60: 1, 3600: 0}
+
+
+def test_gaps_without_samples_are_skipped(store):
+    store.max_window = timedelta(minutes=5)
+    add_samples(("n1", 0, 10.0, None), ("n1", 3 * 3600, 20.0, None))
+
+    assert store.rollup(T0 + timedelta(hours=3, minutes=2))[60] == 2
+    assert [row[1] for row in rollups(60)] == [T0, T0 + timedelta(hours=3)]
+
+
+def test_raw_samples_outlive_their_retention_until_rolled_up(store):
+    store.retention[0] = timedelta(0)
+    add_samples(("n1", 10, 10.0, None), ("n1", 3590, 20.0, None), ("n1", 3610, 30.0, None))
+
+    # 10:59 only closes at 11:00:30, its sample stays although past retention
+    store.rollup(T0 + timedelta(hours=1, seconds=20))
+
+    with SessionLocal() as db:
+        assert [row.cpuUsage for row in db.query(NodeMetric).order_by(NodeMetric.id)] == [20.0, 30.0]
+    assert store.stats["deleted_rows"][0] == 1
+
+
+def test_series_reads_raw_samples_or_rollups(store):
+    add_samples(("n1", 10, 10.0, None), ("n1", 50, 30.0, 1.0), ("n2", 30, 50.0, 2.0))
+    store.rollup(T0 + timedelta(minutes=2))
+
+    resolution, raw = store.series("n1", T0, T0 + timedelta(minutes=1), resolution=0)
+    assert resolution == 0
+    assert [point["cpuUsage"] for point in raw] == [
+        {"min": 10.0, "max": 10.0, "avg": 10.0}, {"min": 30.0, "max": 30.0, "avg": 30.0}
+    ]
+
+    resolution, minutes = store.series("n1", T0 + timedelta(seconds=30), T0 + timedelta(minutes=1), resolution=60)
+    assert resolution == 60
+    assert minutes == [{
+        "timestamp": T0,
+        "cpuUsage": {"min": 10.0, "max": 30.0, "avg": 20.0},
+        "memoryUsage": {"min": 50.0, "max": 50.0, "avg": 50.0},
+        "diskUsage": {"min": 10.0, "max": 10.0, "avg": 10.0},
+        "loadAverage": {"min": 1.0, "max": 1.0, "avg": 1.0},
+    }]
+
+
+@pytest.mark.parametrize("start, span, expected", [
+    (timedelta(hours=1), timedelta(hours=1), 0),
+    (timedelta(days=1), timedelta(hours=2), 0),
+    (timedelta(days=1), timedelta(hours=3), 60),
+    # Raw samples are gone after 48 hours whatever the span
+    (timedelta(days=3), timedelta(hours=1), 60),
+    (timedelta(days=10), timedelta(days=4), 3600),
+    (timedelta(days=20), timedelta(hours=1), 3600),
+])
+def test_pick_resolution(store, start, span, expected):
+    now = T0
+    assert store.pick_resolution(now - start, now - start + span, now) == expected
+
+
+def test_legacy_string_table_is_converted(tmp_path, monkeypatch):
+    legacy = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    monkeypatch.setattr(metrics, "engine", legacy)
+    with legacy.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE node_metrics (id VARCHAR PRIMARY KEY, "nodeId" VARCHAR, "cpuUsage" VARCHAR, '
+            '"memoryUsage" VARCHAR, "diskUsage" VARCHAR, "networkIO" VARCHAR, "diskIO" VARCHAR, '
+            '"processCount" VARCHAR, "loadAverage" VARCHAR, temperature VARCHAR, uptime VARCHAR, timestamp DATETIME)'
+        ))
+        conn.execute(text('CREATE INDEX "ix_node_metrics_timestamp" ON node_metrics (timestamp)'))
+        conn.execute(text(
+            "INSERT INTO node_metrics VALUES "
+            "('a1b2', 'n1', '12.5', '40', '70.25', '', NULL, '12', '0.5', '', '3600', '2026-03-01 10:00:00')"
+        ))
+
+    store = MetricStore(rollup_interval=60, rollup_delay=30, retention={})
+    store.migrate()
+    store.migrate()
+
+    assert {"node_metrics", "node_metrics_legacy"} <= set(inspect(legacy).get_table_names())
+    with legacy.connect() as conn:
+        row = conn.execute(text("SELECT * FROM node_metrics")).mappings().one()
+    assert (row["id"], row["cpuUsage"], row["diskUsage"], row["processCount"], row["uptime"]) == (
+        1, 12.5, 70.25, 12, 3600)
+    assert row["networkIO"] is None and row["temperature"] is None
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from backend.core.database import SessionLocal
+from backend.core.pagination import decode_cursor, encode_cursor, paginate
+from backend.models import User
+
+pytestmark = pytest.mark.anyio
+
+
+def add_users(*ids: str, created_at=None):
+    with SessionLocal() as db:
+        for user_id in ids:
+            db.add(User(id=user_id, email=f"{user_id}@example.com", password="x", createdAt=created_at))
+        db.commit()
+
+
+async def walk(db, limit: int, between_pages=None) -> list:
+    ids, cursor = [], None
+    while True:
+        page = await paginate(db, select(User), User, cursor, limit)
+        ids += [user.id for user in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+        if between_pages:
+            between_pages()
+
+
+async def test_pages_follow_created_at_then_id_descending(async_db):
+    old = datetime.utcnow() - timedelta(days=1, microseconds=-123)
+    add_users("a", "b", created_at=old)
+    # Server-side defaults are stored without fractional seconds, ties are broken by id
+    add_users("c", "d", "e")
+
+    assert await walk(async_db, limit=2) == ["e", "d", "c", "b", "a"]
+    assert await walk(async_db, limit=5) == ["e", "d", "c", "b", "a"]
+
+
+async def test_rows_inserted_while_paging_are_neither_repeated_nor_skipped(async_db):
+    add_users("a", "b", "c", "d", created_at=datetime.utcnow() - timedelta(hours=1))
+    inserted = iter(["x", "y"])
+
+    ids = await walk(async_db, limit=1, between_pages=lambda: add_users(next(inserted, "z")))
+
+    assert ids == ["d", "c", "b", "a"]
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 1, 2, 3, 4, 5, 678)
+
+    assert decode_cursor(encode_cursor(created_at, "id-1")) == (created_at.isoformat(), "id-1")
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor("yesterday", "id-1"), "WzFd"])
+def test_malformed_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+
+    assert exc_info.value.status_code == 400
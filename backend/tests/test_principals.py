@@ -0,0 +1,167 @@
+import asyncio
+import time
+from datetime import timedelta
+
+import pytest
+
+from backend.core.database import SessionLocal
+from backend.core.security import create_access_token
+from backend.models import Permission, Role, RolePermission, User
+from backend.services.principals import InvalidCredentialsError, principal_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def cache(async_db, monkeypatch):
+    """已注册提交监听的全局缓存，清空后使用"""
+    principal_cache.clear()
+    monkeypatch.setattr(principal_cache, "max_entries", 2)
+    monkeypatch.setattr(principal_cache, "stats", {"hits": 0, "misses": 0, "invalidations": 0})
+    with SessionLocal() as db:
+        read = Permission(id="p-read", name="read", code="task:read")
+        write = Permission(id="p-write", name="write", code="task:write")
+        role = Role(id="r1", name="operator", permissions=[read])
+        db.add_all([write, User(id="u1", email="u1@example.com", password="x", roles=[role]),
+                    User(id="u2", email="u2@example.com", password="x")])
+        db.commit()
+    yield principal_cache
+    principal_cache.clear()
+
+
+def token(email: str = "u1@example.com", **kwargs) -> str:
+    return create_access_token({"sub": email}, **kwargs)
+
+
+async def test_repeated_token_is_served_from_the_cache(cache, async_db):
+    u1 = token()
+    principal = await cache.resolve(u1, async_db)
+
+    # A hit needs no session at all
+    assert await cache.resolve(u1, None) is principal
+    assert principal.roles == {"r1"}
+    assert principal.has_permissions("task:read")
+    assert cache.report()["hits"] == 1
+    assert cache.report()["misses"] == 1
+
+
+async def test_a_token_with_a_reused_signature_is_checked_in_full(cache, async_db):
+    u1 = token()
+    await cache.resolve(u1, async_db)
+    header, payload, signature = u1.split(".")
+
+    with pytest.raises(InvalidCredentialsError):
+        await cache.resolve(f"{header}.{payload}x.{signature}", async_db)
+
+
+@pytest.mark.parametrize("email, deactivate", [("nobody@example.com", False), ("u1@example.com", True)])
+async def test_unknown_or_inactive_users_are_rejected_and_not_cached(cache, async_db, email, deactivate):
+    if deactivate:
+        with SessionLocal() as db:
+            db.get(User, "u1").isActive = False
+            db.commit()
+
+    with pytest.raises(InvalidCredentialsError):
+        await cache.resolve(token(email), async_db)
+    assert cache.report()["entries"] == 0
+
+
+async def test_entries_never_outlive_the_token(cache, async_db):
+    await cache.resolve(token(expires_delta=timedelta(seconds=30)), async_db)
+
+    entry = next(iter(cache._entries.values()))
+    assert entry.expires_at <= time.monotonic() + 30
+
+
+async def test_committed_user_change_invalidates_its_entries(cache, async_db):
+    u1, u2 = token(), token("u2@example.com")
+    await cache.resolve(u1, async_db)
+    await cache.resolve(u2, async_db)
+
+    with SessionLocal() as db:
+        db.get(User, "u1").name = "renamed"
+        db.commit()
+
+    assert list(cache._by_user) == ["u2"]
+    assert (await cache.resolve(u1, async_db)).name == "renamed"
+
+
+async def test_role_permission_change_invalidates_the_role_members(cache, async_db):
+    u1, u2 = token(), token("u2@example.com")
+    await cache.resolve(u1, async_db)
+    await cache.resolve(u2, async_db)
+
+    with SessionLocal() as db:
+        db.add(RolePermission(roleId="r1", permissionId="p-write"))
+        db.commit()
+
+    assert list(cache._by_user) == ["u2"]
+    assert (await cache.resolve(u1, async_db)).has_permissions("task:read", "task:write")
+
+
+async def test_permission_change_clears_everything(cache, async_db):
+    await cache.resolve(token(), async_db)
+    await cache.resolve(token("u2@example.com"), async_db)
+
+    with SessionLocal() as db:
+        db.get(Permission, "p-read").code = "task:view"
+        db.commit()
+
+    assert cache.report()["entries"] == 0
+
+
+async def test_rolled_back_changes_keep_the_entries(cache, async_db):
+    await cache.resolve(token(), async_db)
+
+    with SessionLocal() as db:
+        db.get(User, "u1").name = "renamed"
+        db.flush()
+        db.rollback()
+
+    assert cache.report()["entries"] == 1
+
+
+async def test_concurrent_first_requests_share_one_lookup(cache, async_db, monkeypatch):
+    loads = []
+    load = cache._load
+
+    async def slow_load(token, db):
+        loads.append(token)
+        await asyncio.sleep(0.05)
+        return await load(token, db)
+
+    monkeypatch.setattr(cache, "_load", slow_load)
+    u1 = token()
+
+    principals = await asyncio.gather(*[cache.resolve(u1, async_db) for _ in range(3)])
+
+    assert len(loads) == 1
+    assert principals[0] is principals[1] is principals[2]
+
+
+async def test_lookup_racing_an_invalidation_is_not_cached(cache, async_db, monkeypatch):
+    load = cache._load
+
+    async def load_then_edit(token, db):
+        result = await load(token, db)
+        cache.invalidate_users({"u1"})
+        return result
+
+    monkeypatch.setattr(cache, "_load", load_then_edit)
+
+    await cache.resolve(token(), async_db)
+
+    assert cache.report()["entries"] == 0
+
+
+async def test_least_recently_used_entry_is_evicted(cache, async_db):
+    first, second, third = token(), token("u2@example.com"), token(expires_delta=timedelta(minutes=5))
+    await cache.resolve(first, async_db)
+    await cache.resolve(second, async_db)
+    await cache.resolve(first, async_db)
+
+    await cache.resolve(third, async_db)
+
+    assert cache.report()["entries"] == 2
+    assert list(cache._by_user) == ["u1"]
+    assert len(cache._by_user["u1"]) == 2
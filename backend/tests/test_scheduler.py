@@ -0,0 +1,109 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.core.database import SessionLocal
+from backend.models import Script, Task, TaskSchedule
+from backend.models.script import ScriptLanguage, ScriptType
+from backend.models.task import ScheduleCycle
+from backend.services.scheduler import ScheduleEngine, ScheduleEntry, compute_next_run
+
+
+def entry(schedule_id: str, minutes: float, task_id: str = None) -> ScheduleEntry:
+    run_at = datetime.utcnow() + timedelta(minutes=minutes)
+    return ScheduleEntry(schedule_id, task_id or schedule_id, ScheduleCycle.DAILY, "09:00", run_at, run_at)
+
+
+def test_due_within_walks_the_heap_in_order_and_skips_stale_entries():
+    engine = ScheduleEngine()
+    for e in [entry("late", 30), entry("b", 5), entry("a", 1), entry("moved", 2), entry("gone", 3),
+              entry("same-task", 4, task_id="a")]:
+        engine._push(e)
+    # An edit pushes a new copy, a removal only forgets the entry
+    engine._push(entry("moved", 60))
+    engine.remove("gone")
+
+    assert engine.due_within(10 * 60) == ["a", "b"]
+    assert engine.due_within(0) == []
+    assert engine.due_within(90 * 60) == ["a", "b", "late", "moved"]
+
+
+@pytest.mark.parametrize("cycle, run_time, after, anchor, expected", [
+    (ScheduleCycle.DAILY, "09:00", datetime(2026, 3, 1, 8, 0), None, datetime(2026, 3, 1, 9, 0)),
+    (ScheduleCycle.DAILY, "09:00", datetime(2026, 3, 1, 9, 0), None, datetime(2026, 3, 2, 9, 0)),
+    (ScheduleCycle.DAILY, "23:30", datetime(2026, 12, 31, 23, 45), None, datetime(2027, 1, 1, 23, 30)),
+    # 2026-03-02 is a Monday, the anchor's weekday wins over the day it is computed on
+    (ScheduleCycle.WEEKLY, "09:00", datetime(2026, 3, 4, 12, 0), datetime(2026, 3, 2), datetime(2026, 3, 9, 9, 0)),
+    (ScheduleCycle.WEEKLY, "09:00", datetime(2026, 3, 9, 8, 0), datetime(2026, 3, 2), datetime(2026, 3, 9, 9, 0)),
+    (ScheduleCycle.WEEKLY, "09:00", datetime(2026, 3, 9, 9, 0), datetime(2026, 3, 2), datetime(2026, 3, 16, 9, 0)),
+    # Anchored on the 31st: clamped to the end of shorter months, back to the 31st afterwards
+    (ScheduleCycle.MONTHLY, "09:00", datetime(2026, 1, 31, 10, 0), datetime(2025, 12, 31), datetime(2026, 2, 28, 9, 0)),
+    (ScheduleCycle.MONTHLY, "09:00", datetime(2026, 2, 28, 10, 0), datetime(2025, 12, 31), datetime(2026, 3, 31, 9, 0)),
+    (ScheduleCycle.MONTHLY, "09:00", datetime(2028, 2, 1), datetime(2025, 12, 31), datetime(2028, 2, 29, 9, 0)),
+    (ScheduleCycle.MONTHLY, "09:00", datetime(2026, 4, 30, 9, 0), datetime(2025, 12, 31), datetime(2026, 5, 31, 9, 0)),
+    (ScheduleCycle.MONTHLY, "00:00", datetime(2026, 12, 15), datetime(2026, 1, 15), datetime(2027, 1, 15, 0, 0)),
+])
+def test_compute_next_run(cycle, run_time, after, anchor, expected):
+    assert compute_next_run(cycle, run_time, after, anchor) == expected
+
+
+@pytest.mark.parametrize("run_time", ["9", "nine:00", "25:00", None])
+def test_compute_next_run_rejects_bad_run_times(run_time):
+    with pytest.raises(ValueError):
+        compute_next_run(ScheduleCycle.DAILY, run_time, datetime(2026, 1, 1))
+
+
+def test_pop_due_skips_removed_and_superseded_entries():
+    engine = ScheduleEngine()
+    for e in [entry("a", -3), entry("gone", -2), entry("moved", -1)]:
+        engine._push(e)
+    engine.remove("gone")
+    engine._push(entry("moved", 60))
+    # An edit that kept the same time leaves two identical copies in the heap
+    engine._push(engine._entries["a"])
+
+    assert [e.schedule_id for e in engine._pop_due(datetime.utcnow())] == ["a"]
+    assert engine._pop_due(datetime.utcnow()) == []
+    assert [run_at for run_at, _, schedule_id in engine._heap] == [engine._entries["moved"].next_run_at]
+
+
+def add_schedules(*schedule_ids: str):
+    with SessionLocal() as db:
+        db.add(Script(id="s1", name="s", type=ScriptType.PYTHON, language=ScriptLanguage.PYTHON,
+                      filePath="s.py", fileName="s.py"))
+        for schedule_id in schedule_ids:
+            db.add(Task(id=schedule_id, name=schedule_id, scriptId="s1", parameters="{}", maxRunTime=5))
+            db.add(TaskSchedule(id=schedule_id, taskId=schedule_id, cycleType=ScheduleCycle.DAILY, runTime="09:00",
+                                nextRunAt=datetime.utcnow() + timedelta(days=1)))
+        db.commit()
+
+
+@pytest.mark.anyio
+async def test_refresh_applies_only_changed_schedules(clean_db):
+    add_schedules("kept", "edited", "paused", "deleted")
+    engine = ScheduleEngine(refresh_interval=None)
+    await engine.start()
+    try:
+        assert sorted(engine._entries) == ["deleted", "edited", "kept", "paused"]
+
+        later = datetime.utcnow() + timedelta(days=2)
+        with SessionLocal() as db:
+            db.get(TaskSchedule, "edited").nextRunAt = later
+            db.get(TaskSchedule, "paused").isActive = False
+            db.delete(db.get(TaskSchedule, "deleted"))
+            db.commit()
+        await engine._refresh()
+
+        assert engine._entries["edited"].next_run_at == later
+        assert "paused" not in engine._entries
+        # A delete leaves no row to read, the count mismatch makes the next refresh compare IDs
+        assert "deleted" in engine._entries
+        assert engine._resync
+
+        await engine._refresh()
+
+        assert sorted(engine._entries) == ["edited", "kept"]
+        assert not engine._resync
+        assert engine.due_within(3 * 24 * 3600) == ["kept", "edited"]
+    finally:
+        await engine.stop()
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.core.config import settings
+from backend.core.database import SessionLocal
+from backend.models import Node, Script, Task, TaskSchedule
+from backend.models.script import ScriptLanguage, ScriptType
+from backend.models.task import ScheduleCycle
+from backend.services import script_cache as script_cache_module
+from backend.services.script_cache import ScriptCache, ScriptFetchError
+
+
+class Fetcher:
+    """按哈希写入固定长度的内容，记录每次获取"""
+
+    def __init__(self, size: int = 10):
+        self.size = size
+        self.calls = []
+        self.fail = False
+
+    def __call__(self, script_id, file_hash, source, dest):
+        self.calls.append(file_hash)
+        if self.fail:
+            raise ScriptFetchError("unreachable")
+        with open(dest, "wb") as f:
+            f.write(file_hash.encode()[:1] * self.size)
+
+
+@pytest.fixture
+def fetcher():
+    return Fetcher()
+
+
+@pytest.fixture
+def cache(tmp_path, fetcher):
+    return ScriptCache(str(tmp_path), max_bytes=25, fetcher=fetcher)
+
+
+def test_second_get_hits_without_fetching(cache, fetcher):
+    path = cache.get("s1", "1", "a" * 64, "job.py")
+
+    assert cache.get("s1", "1", "a" * 64, "job.py") == path
+    assert fetcher.calls == ["a" * 64]
+    assert cache.report()["hits"] == 1
+    assert cache.report()["misses"] == 1
+    assert cache.is_fresh("s1", "1")
+    assert not cache.is_fresh("s1", "2")
+
+
+def test_least_recently_used_unpinned_entry_is_evicted(cache):
+    a = cache.get("s", "1", "a" * 64, "a.py", prefetch=True)
+    cache.get("s", "1", "b" * 64, "b.py", prefetch=True)
+    cache.get("s", "1", "a" * 64, "a.py", prefetch=True)
+
+    cache.get("s", "1", "c" * 64, "c.py", prefetch=True)
+
+    assert cache.report()["entries"] == 2
+    assert cache.report()["evictions"] == 1
+    assert cache.get("s", "1", "a" * 64, "a.py", prefetch=True) == a
+
+
+def test_pinned_entries_survive_until_released(cache):
+    cache.get("s", "1", "a" * 64, "a.py")
+    cache.get("s", "1", "b" * 64, "b.py")
+    cache.get("s", "1", "c" * 64, "c.py")
+
+    assert cache.report()["size_bytes"] == 30
+
+    cache.release("a" * 64)
+
+    assert cache.report()["entries"] == 2
+    assert cache.report()["pinned"] == 2
+
+
+def test_failed_fetch_releases_its_lock(cache, fetcher):
+    fetcher.fail = True
+    with pytest.raises(ScriptFetchError):
+        cache.get("s", "1", "a" * 64, "a.py")
+
+    assert cache._fetch_locks == {}
+    fetcher.fail = False
+    cache.get("s", "1", "a" * 64, "a.py")
+    assert cache._fetch_locks == {}
+
+
+def test_load_restores_entries_from_disk(cache, tmp_path, fetcher):
+    cache.get("s", "1", "a" * 64, "a.py", prefetch=True)
+
+    reloaded = ScriptCache(str(tmp_path), max_bytes=25, fetcher=fetcher)
+    reloaded.load()
+
+    assert reloaded.report()["entries"] == 1
+    assert reloaded.report()["size_bytes"] == 10
+
+
+def test_prefetch_reads_due_schedules_for_this_node(cache, fetcher, clean_db, monkeypatch):
+    prepared = []
+    monkeypatch.setattr(script_cache_module.environment_manager, "prepare",
+                        lambda language, requirements: prepared.append(language))
+    soon = datetime.utcnow() + timedelta(minutes=5)
+    with SessionLocal() as db:
+        db.add(Node(id="local", name=settings.local_node_name, host="h", port=1))
+        db.add(Node(id="other", name="other", host="h", port=2))
+        for name, node_id, next_run_at in [
+            ("due", None, soon),
+            ("pinned", "local", soon),
+            ("elsewhere", "other", soon),
+            ("later", None, soon + timedelta(hours=1)),
+        ]:
+            db.add(Script(id=name, name=name, type=ScriptType.PYTHON, language=ScriptLanguage.PYTHON,
+                          filePath=f"{name}.py", fileName=f"{name}.py", fileHash=name[0] * 64))
+            db.add(Task(id=name, name=name, scriptId=name, parameters="{}", maxRunTime=5, nodeId=node_id))
+            db.add(TaskSchedule(taskId=name, cycleType=ScheduleCycle.DAILY, runTime="09:00", nextRunAt=next_run_at))
+        db.commit()
+
+    cache.prefetch(timedelta(minutes=10))
+
+    assert sorted(fetcher.calls) == ["d" * 64, "p" * 64]
+    assert cache.report()["prefetched"] == 2
+    assert len(prepared) == 2
@@ -0,0 +1,182 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from backend.api.v1 import scripts
+from backend.api.v1.auth import get_current_user
+from backend.core.config import settings
+from backend.core.database import SessionLocal, async_engine
+from backend.models import Script
+from backend.models.script import ScriptLanguage, ScriptType
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = b"print('hello')\n" * 100
+
+
+class Principal:
+    id = "user-1"
+
+
+@pytest.fixture
+async def client(clean_db):
+    app = FastAPI()
+    app.include_router(scripts.router, prefix="/scripts")
+    app.dependency_overrides[get_current_user] = Principal
+    async with httpx.AsyncClient(app=app, base_url="http://test") as c:
+        yield c
+    await async_engine.dispose()
+
+
+async def upload(client, content=CONTENT, name="hello.py"):
+    response = await client.post("/scripts/upload", files={"file": (name, content)})
+    assert response.status_code == 200
+    return response.json()
+
+
+def legacy_script(file_path):
+    with SessionLocal() as db:
+        db.add(Script(id="legacy", name="legacy", type=ScriptType.PYTHON, language=ScriptLanguage.PYTHON,
+                      filePath=file_path, fileName=os.path.basename(file_path)))
+        db.commit()
+
+
+async def test_create_references_uploaded_content(client):
+    uploaded = await upload(client)
+
+    response = await client.post("/scripts/", json={"name": "copy", "fileHash": uploaded["fileHash"]})
+
+    assert response.status_code == 200
+    created = response.json()
+    assert created["fileHash"] == hashlib.sha256(CONTENT).hexdigest()
+    assert created["fileSize"] == len(CONTENT)
+    assert (await client.get(f"/scripts/{created['id']}/download")).content == CONTENT
+
+
+@pytest.mark.parametrize("file_hash", ["0" * 64, "../../etc/passwd", "/etc/passwd"])
+async def test_create_rejects_unknown_content(client, file_hash):
+    response = await client.post("/scripts/", json={"name": "x", "fileHash": file_hash})
+
+    assert response.status_code == 404
+
+
+async def test_file_path_is_not_accepted_from_clients(client):
+    uploaded = await upload(client)
+
+    await client.put(f"/scripts/{uploaded['id']}", json={"filePath": "/etc/passwd"})
+
+    assert (await client.get(f"/scripts/{uploaded['id']}")).json()["filePath"] != "/etc/passwd"
+    assert (await client.get(f"/scripts/{uploaded['id']}/download")).content == CONTENT
+
+
+async def test_legacy_path_outside_the_upload_dir_is_not_served(client, tmp_path):
+    secret = tmp_path / "secret.env"
+    secret.write_text("PASSWORD=x")
+    legacy_script(str(secret))
+
+    assert (await client.get("/scripts/legacy/download")).status_code == 404
+    await client.delete("/scripts/legacy")
+    assert secret.exists()
+
+
+async def test_legacy_path_inside_the_upload_dir_is_served(client):
+    os.makedirs(settings.upload_dir, exist_ok=True)
+    path = os.path.join(settings.upload_dir, "legacy.py")
+    with open(path, "wb") as f:
+        f.write(CONTENT)
+    legacy_script(os.path.join(settings.upload_dir, "..", os.path.basename(settings.upload_dir), "legacy.py"))
+
+    assert (await client.get("/scripts/legacy/download")).content == CONTENT
+
+
+async def collected():
+    await asyncio.gather(*scripts._collections)
+
+
+async def test_identical_uploads_share_one_blob(client):
+    first = await upload(client)
+    second = await upload(client, name="again.py")
+
+    assert first["fileHash"] == second["fileHash"]
+    assert first["id"] != second["id"]
+    assert os.path.exists(scripts.content_store.path_for(first["fileHash"]))
+
+
+async def test_deleted_content_is_collected_once_unreferenced(client, monkeypatch):
+    monkeypatch.setattr(settings, "blob_collect_delay", 0)
+    first = await upload(client)
+    second = await upload(client, name="again.py")
+    path = scripts.content_store.path_for(first["fileHash"])
+
+    await client.delete(f"/scripts/{first['id']}")
+    await collected()
+    assert os.path.exists(path)
+
+    await client.delete(f"/scripts/{second['id']}")
+    await collected()
+    assert not os.path.exists(path)
+
+
+async def test_content_reused_after_the_delete_is_kept(client, monkeypatch):
+    # An upload that deduplicated against the content after the delete commits later
+    monkeypatch.setattr(scripts.content_store, "remove", lambda file_hash: pytest.fail("content removed"))
+    monkeypatch.setattr(settings, "blob_collect_delay", 0.2)
+    uploaded = await upload(client)
+
+    await client.delete(f"/scripts/{uploaded['id']}")
+    os.utime(scripts.content_store.path_for(uploaded["fileHash"]), (time.time() + 1, time.time() + 1))
+    await collected()
+
+
+async def test_download_serves_ranges_and_revalidates(client):
+    script = await upload(client)
+    url = f"/scripts/{script['id']}/download"
+    identity = {"Accept-Encoding": "identity"}
+
+    full = await client.get(url, headers=identity)
+    etag = full.headers["etag"]
+    assert etag == f'"{script["fileHash"]}"'
+    assert full.headers["accept-ranges"] == "bytes"
+
+    partial = await client.get(url, headers={**identity, "Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == CONTENT[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(CONTENT)}"
+
+    suffix = await client.get(url, headers={**identity, "Range": "bytes=-5"})
+    assert suffix.content == CONTENT[-5:]
+
+    unsatisfiable = await client.get(url, headers={**identity, "Range": f"bytes={len(CONTENT)}-"})
+    assert unsatisfiable.status_code == 416
+    assert unsatisfiable.headers["content-range"] == f"bytes */{len(CONTENT)}"
+
+    # A stale If-Range falls back to the whole file
+    stale = await client.get(url, headers={**identity, "Range": "bytes=0-9", "If-Range": '"old"'})
+    assert stale.status_code == 200
+    assert stale.content == CONTENT
+
+    not_modified = await client.get(url, headers={**identity, "If-None-Match": f"W/{etag}"})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+
+async def test_download_prefers_the_precompressed_variant(client):
+    script = await upload(client)
+    url = f"/scripts/{script['id']}/download"
+
+    response = await client.get(url, headers={"Accept-Encoding": "br;q=0, gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == f'"{script["fileHash"]}-gzip"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == CONTENT
+    assert int(response.headers["content-length"]) < len(CONTENT)
+
+    head = await client.head(url, headers={"Accept-Encoding": "identity"})
+    assert head.headers["content-length"] == str(len(CONTENT))
+    assert head.content == b""
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from passlib.context import CryptContext
+
+from backend.api.v1 import auth
+from backend.core.database import SessionLocal
+from backend.core.security import PasswordHasher, PasswordHasherBusyError
+from backend.models import User
+
+pytestmark = pytest.mark.anyio
+
+# PBKDF2 keeps the tests fast, the rounds change plays the part of a raised bcrypt cost
+OLD = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__rounds=1000)
+CURRENT = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__min_rounds=2000,
+                       pbkdf2_sha256__default_rounds=2000)
+
+
+@pytest.fixture
+def hasher():
+    return PasswordHasher(workers=1, max_pending=1, context=CURRENT)
+
+
+async def test_hash_and_verify(hasher):
+    hashed = await hasher.hash("secret")
+
+    assert await hasher.verify("secret", hashed) == (True, None)
+    assert await hasher.verify("wrong", hashed) == (False, None)
+    assert hasher.report()["hashed"] == 1
+    assert hasher.report()["verified"] == 2
+
+
+async def test_outdated_hash_is_upgraded(hasher):
+    valid, new_hash = await hasher.verify("secret", OLD.hash("secret"))
+
+    assert valid
+    assert CURRENT.verify("secret", new_hash)
+    assert not CURRENT.needs_update(new_hash)
+    assert hasher.stats["rehashed"] == 1
+
+
+async def test_missing_user_still_pays_for_a_hash(hasher, monkeypatch):
+    calls = []
+    monkeypatch.setattr(CURRENT, "dummy_verify", lambda: calls.append(True))
+
+    assert await hasher.verify("secret", None) == (False, None)
+    assert calls == [True]
+
+
+async def test_requests_beyond_max_pending_are_rejected(hasher):
+    first = asyncio.ensure_future(hasher.hash("a"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(PasswordHasherBusyError):
+        await hasher.hash("b")
+
+    await first
+    assert hasher.report()["pending"] == 0
+    assert hasher.report()["rejected"] == 1
+    await hasher.hash("c")
+
+
+async def test_login_upgrades_the_stored_hash(api_client, clean_db, monkeypatch):
+    monkeypatch.setattr(auth, "password_hasher", PasswordHasher(workers=1, max_pending=4, context=CURRENT))
+    with SessionLocal() as db:
+        db.add(User(id="u1", email="u1@example.com", password=OLD.hash("secret")))
+        db.commit()
+
+    async with api_client(auth.router, "/api/v1/auth") as client:
+        wrong = await client.post("/api/v1/auth/login", json={"username": "u1@example.com", "password": "x"})
+        unknown = await client.post("/api/v1/auth/login", json={"username": "nobody", "password": "x"})
+        ok = await client.post("/api/v1/auth/login", json={"username": "u1@example.com", "password": "secret"})
+
+    assert wrong.status_code == unknown.status_code == 401
+    assert ok.status_code == 200
+    assert ok.json()["token_type"] == "bearer"
+    with SessionLocal() as db:
+        stored = db.get(User, "u1").password
+    assert CURRENT.verify("secret", stored)
+    assert not CURRENT.needs_update(stored)
+
+
+async def test_login_backs_off_when_hashing_is_saturated(api_client, clean_db, monkeypatch):
+    monkeypatch.setattr(auth, "password_hasher", PasswordHasher(workers=1, max_pending=0, context=CURRENT))
+
+    async with api_client(auth.router, "/api/v1/auth") as client:
+        response = await client.post("/api/v1/auth/login", json={"username": "u1@example.com", "password": "x"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,86 @@
+import pytest
+
+from backend.services.task_queue import MemoryTaskQueue, QueueMessage
+
+pytestmark = pytest.mark.anyio
+
+
+def message(execution_id: str, priority: str = "MEDIUM", node_id=None) -> QueueMessage:
+    return QueueMessage(execution_id=execution_id, task_id=f"task-{execution_id}", priority=priority, node_id=node_id)
+
+
+async def pull_ids(queue: MemoryTaskQueue, node_id=None):
+    ids = []
+    while (pulled := await queue.pull(node_id, 30)) is not None:
+        ids.append(pulled.execution_id)
+    return ids
+
+
+async def test_pull_by_priority_then_fifo():
+    queue = MemoryTaskQueue()
+    await queue.push([message("a", "LOW"), message("b"), message("c", "URGENT"), message("d")])
+
+    assert await pull_ids(queue) == ["c", "b", "d", "a"]
+
+
+async def test_pinned_messages_only_reach_their_node():
+    queue = MemoryTaskQueue()
+    await queue.push([message("pinned", node_id="n1"), message("shared", "HIGH")])
+
+    assert await pull_ids(queue, "n2") == ["shared"]
+    assert await pull_ids(queue, "n1") == ["pinned"]
+
+
+async def test_ack_removes_the_delivery():
+    queue = MemoryTaskQueue()
+    await queue.push([message("a")])
+    pulled = await queue.pull(None, 30)
+
+    assert (await queue.depths())["inflight"] == 1
+    assert await queue.ack(pulled.receipt)
+    assert not await queue.ack(pulled.receipt)
+    assert (await queue.depths())["inflight"] == 0
+    assert await queue.requeue_expired() == 0
+
+
+async def test_nack_returns_the_message_to_the_head():
+    queue = MemoryTaskQueue()
+    await queue.push([message("a"), message("b")])
+    pulled = await queue.pull(None, 30)
+
+    await queue.nack(pulled)
+
+    again = await queue.pull(None, 30)
+    assert again.execution_id == "a"
+    assert again.attempts == 0
+
+
+async def test_unacked_message_is_redelivered_after_visibility_timeout():
+    queue = MemoryTaskQueue()
+    await queue.push([message("a"), message("b")])
+    first = await queue.pull(None, 0)
+
+    assert await queue.requeue_expired() == 1
+
+    redelivered = await queue.pull(None, 30)
+    assert redelivered.execution_id == "a"
+    assert redelivered.attempts == 1
+    # The expired delivery's receipt no longer acknowledges the new one
+    assert not await queue.ack(first.receipt)
+    assert await queue.ack(redelivered.receipt)
+
+
+async def test_extend_keeps_a_delivery_from_expiring():
+    queue = MemoryTaskQueue()
+    await queue.push([message("a")])
+    pulled = await queue.pull(None, 0)
+
+    assert await queue.extend([pulled.receipt, "missing:0"], 30) == ["missing:0"]
+    assert await queue.requeue_expired() == 0
+
+
+def test_message_round_trip():
+    original = message("a", "HIGH", node_id="n1")
+    original.attempts = 2
+
+    assert QueueMessage.loads(original.dumps()) == original
@@ -0,0 +1,43 @@
+import pytest
+
+from backend.api.v1 import users
+from backend.core.database import SessionLocal
+from backend.models import User
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def accounts(clean_db):
+    with SessionLocal() as db:
+        db.add(User(id="user-1", email="me@example.com", password="x"))
+        db.add(User(id="user-2", email="other@example.com", password="x"))
+        db.commit()
+
+
+async def test_listing_and_deleting_users_needs_user_manage(api_client, accounts, grant):
+    async with api_client(users.router, "/api/v1/users") as client:
+        assert (await client.get("/api/v1/users/")).status_code == 403
+        assert (await client.delete("/api/v1/users/user-2")).status_code == 403
+
+        grant("user:manage")
+        listed = await client.get("/api/v1/users/")
+        deleted = await client.delete("/api/v1/users/user-2")
+
+    assert sorted(user["id"] for user in listed.json()["items"]) == ["user-1", "user-2"]
+    assert deleted.status_code == 200
+
+
+async def test_users_can_read_and_update_only_themselves(api_client, accounts, grant):
+    async with api_client(users.router, "/api/v1/users") as client:
+        own = await client.get("/api/v1/users/user-1")
+        other = await client.get("/api/v1/users/user-2")
+        update = await client.put("/api/v1/users/user-2", json={"email": "taken@example.com", "password": "p"})
+
+        grant("user:manage")
+        managed = await client.get("/api/v1/users/user-2")
+
+    assert own.status_code == 200
+    assert other.status_code == 403
+    assert update.status_code == 403
+    assert managed.status_code == 200